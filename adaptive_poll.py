@@ -0,0 +1,201 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Phases in which a job is sending orders on its accounts
+ACTIVE_PHASES = ('opening', 'closing', 'flattening')
+
+
+def _exposure(position_info):
+    """(quantity, liquidation prices) over the entries of a positionRisk response that hold something"""
+    quantity, liquidation = 0.0, []
+    for position in position_info or []:
+        amount = abs(float(position['positionAmt']))
+        if amount == 0:
+            continue
+        quantity += amount
+        liquidation.append(float(position.get('liquidationPrice') or 0))
+    return quantity, liquidation
+
+
+class AdaptivePoller:
+    """Polls the account panels' positions and balances as often as the moment needs.
+
+    `targets` are (account_num, api, symbol); each one's next poll follows
+    from its last by an interval picked from what the `jobs` trading on
+    that account are doing and what the last poll showed:
+
+    - at once when a job's phase changed since the last poll, so fills and
+      failures show without waiting out an interval;
+    - `floor` while a job is opening, closing or flattening, in the `lead`
+      seconds before its planned open or close, or while the mark price is
+      within `liquidation_buffer` (a fraction of the price) of a leg's
+      liquidation price;
+    - `steady` while legs are held and safe, or after a failed poll;
+    - `ceiling` while the account is flat and nothing is due.
+
+    Only the steady and flat intervals are stretched by the scheduler as
+    weight usage rises, never past `ceiling`; polls that guard orders or
+    liquidation keep their pace. Targets due within `coalesce` seconds of
+    each other are polled in one round, the price fetched once per symbol
+    for all of them and the accounts read at the same time. Results go to
+    `on_status(account_num, api, position_info, account_info, price)` or
+    `on_error(account_num, e)`.
+    """
+
+    def __init__(self, targets, jobs, on_status, on_error, floor=0.5, steady=2.0, ceiling=10.0, lead=2.0,
+                 liquidation_buffer=0.02, coalesce=None):
+        if not 0 < floor <= steady <= ceiling:
+            raise ValueError(f"Polling intervals must satisfy 0 < floor <= steady <= ceiling, "
+                             f"got {floor}, {steady}, {ceiling}")
+        self.targets = targets
+        self.on_status = on_status
+        self.on_error = on_error
+        self.floor = floor
+        self.steady = steady
+        self.ceiling = ceiling
+        self.lead = lead
+        self.liquidation_buffer = liquidation_buffer
+        self.coalesce = floor if coalesce is None else coalesce
+        self._jobs = [[job for job in jobs if api in (job.account1, job.account2)] for _, api, _ in targets]
+        self._state = [{'last_poll': None, 'phases': None, 'quantity': 0.0, 'liquidation': [], 'price': 0.0,
+                        'failed': False} for _ in targets]
+        self._polls = {}
+        self.rounds = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _near_liquidation(self, state):
+        price = state['price']
+        return price > 0 and any(liquidation > 0 and abs(price - liquidation) <= self.liquidation_buffer * price
+                                 for liquidation in state['liquidation'])
+
+    def _phases(self, index):
+        return tuple(job.stats['phase'] for job in self._jobs[index])
+
+    def interval(self, index, now=None):
+        """(seconds, reason) from the last poll of target `index` to its next"""
+        now = time.monotonic() if now is None else now
+        state = self._state[index]
+        if state['phases'] is not None and self._phases(index) != state['phases']:
+            return 0.0, 'orders'
+        for job in self._jobs[index]:
+            if job.stats['phase'] in ACTIVE_PHASES:
+                return self.floor, 'orders'
+            planner = job.planner
+            for deadline in (planner.next_open, planner.last_close):
+                if deadline is not None and 0 <= deadline - now <= self.lead:
+                    return self.floor, 'orders'
+        if state['quantity'] and self._near_liquidation(state):
+            return self.floor, 'liquidation'
+        if state['failed']:
+            base, reason = self.steady, 'error'
+        elif state['quantity']:
+            base, reason = self.steady, 'holding'
+        else:
+            base, reason = self.ceiling, 'flat'
+        return min(self.ceiling, self.targets[index][1].scheduler.poll_interval(base)), reason
+
+    def due(self, now=None):
+        """Indexes of the targets to poll now, with their reasons, and the seconds until the next is due"""
+        now = time.monotonic() if now is None else now
+        waits = []
+        for index in range(len(self.targets)):
+            last_poll = self._state[index]['last_poll']
+            seconds, reason = self.interval(index, now)
+            waits.append((0.0 if last_poll is None else last_poll + seconds - now, reason))
+        if min(wait for wait, _ in waits) > 0:
+            return [], min(wait for wait, _ in waits)
+        return [(index, reason) for index, (wait, reason) in enumerate(waits) if wait <= self.coalesce], 0.0
+
+    def _price_requests(self, indexes):
+        """One (api, symbol) per symbol of the targets in a round"""
+        requests = {}
+        for index in indexes:
+            _, api, symbol = self.targets[index]
+            requests.setdefault(symbol, api)
+        return requests
+
+    def _record(self, index, reason, phases, position_info, account_info, price, now):
+        account_num, api, _ = self.targets[index]
+        state = self._state[index]
+        # Phases as the round started: a change while its requests were out still gets its own poll
+        state['last_poll'], state['phases'] = now, phases
+        self._polls[reason] = self._polls.get(reason, 0) + 1
+        api.metrics.increment('status_polls_total', reason=reason)
+        if isinstance(price, Exception) or isinstance(position_info, Exception) or isinstance(account_info, Exception):
+            state['failed'] = True
+            error = next(result for result in (position_info, price, account_info) if isinstance(result, Exception))
+            self.on_error(account_num, error)
+            return
+        state['failed'] = False
+        state['quantity'], state['liquidation'] = _exposure(position_info)
+        state['price'] = price
+        try:
+            self.on_status(account_num, api, position_info, account_info, price)
+        except Exception as e:
+            state['failed'] = True
+            self.on_error(account_num, e)
+
+    def poll(self, due, pool):
+        """One round over `due` ([(index, reason)]) with the threaded clients"""
+        phases = [self._phases(index) for index, _ in due]
+        prices = {symbol: pool.submit(api.get_current_price, symbol, max_age=self.floor)
+                  for symbol, api in self._price_requests([index for index, _ in due]).items()}
+        reads = [(pool.submit(self.targets[index][1].get_position_info, self.targets[index][2]),
+                  pool.submit(self.targets[index][1].get_account_info)) for index, _ in due]
+        prices = {symbol: future.exception() or future.result() for symbol, future in prices.items()}
+        now = time.monotonic()
+        for (index, reason), index_phases, (position_info, account_info) in zip(due, phases, reads):
+            self._record(index, reason, index_phases, position_info.exception() or position_info.result(),
+                         account_info.exception() or account_info.result(), prices[self.targets[index][2]], now)
+        self.rounds += 1
+
+    async def poll_async(self, due):
+        """One round over `due` with AsyncAsterDexAPI clients, every request gathered on the event loop"""
+        phases = [self._phases(index) for index, _ in due]
+        requests = self._price_requests([index for index, _ in due])
+        results = await asyncio.gather(
+            *(api.get_current_price(symbol, max_age=self.floor) for symbol, api in requests.items()),
+            *(call for index, _ in due for call in (self.targets[index][1].get_position_info(self.targets[index][2]),
+                                                    self.targets[index][1].get_account_info())),
+            return_exceptions=True)
+        prices = dict(zip(requests, results))
+        reads = results[len(requests):]
+        now = time.monotonic()
+        for offset, (index, reason) in enumerate(due):
+            self._record(index, reason, phases[offset], reads[2 * offset], reads[2 * offset + 1],
+                         prices[self.targets[index][2]], now)
+        self.rounds += 1
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=1 + 2 * len(self.targets), thread_name_prefix="status") as pool:
+            while not self._stopped.is_set():
+                due, wait = self.due()
+                if due:
+                    self.poll(due, pool)
+                    continue
+                # Phases and planned deadlines change between polls, so look again at least every floor
+                self._stopped.wait(min(wait, self.floor))
+
+    async def run_async(self):
+        while True:
+            due, wait = self.due()
+            if due:
+                await self.poll_async(due)
+                continue
+            await asyncio.sleep(min(wait, self.floor))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="status-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        return {'rounds': self.rounds, 'polls': sum(self._polls.values()), 'reasons': dict(self._polls)}
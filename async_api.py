@@ -0,0 +1,419 @@
+import time
+import asyncio
+
+import aiohttp
+import yarl
+
+from clock_sync import ClockSync
+from flatten import flatten_all_async
+from symbol_filters import SymbolFilterCache
+from ticker_cache import TickerCache
+from rate_limiter import RequestScheduler, request_cost
+from deadline import current_deadline, request_timeout
+from request_signer import RequestSigner
+from metrics import MetricsRegistry
+from hedge_executor import HedgeLegError, leg_outcome, new_client_order_id, query_outcome
+
+
+class AsyncAsterDexAPI:
+    """asyncio counterpart of AsterDexAPI: the same methods, as coroutines.
+
+    All requests share one aiohttp connection pool per client, so any number of
+    accounts can be driven from a single event loop without a thread each.
+    """
+
+    def __init__(self, api_key, api_secret, clock=None, time_sync_interval=300,
+                 base_url="https://fapi.asterdex.com", pool_size=10, timeout=10, market_data=None, order_book=None, ssl=None,
+                 symbol_filters=None, exchange_info_ttl=3600, ticker_cache=None, scheduler=None,
+                 metrics=None, name=None):
+        self.api_key = api_key
+        self.name = name or "account"
+        self.api_secret = api_secret
+        self.signer = RequestSigner(api_secret)
+        self.base_url = base_url
+        self.recv_window = 5000
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.ssl = ssl
+        self.market_data = market_data
+        self.order_book = order_book
+        self.clock = clock or ClockSync(None, resync_interval=time_sync_interval)
+        self.symbol_filters = symbol_filters or SymbolFilterCache(ttl=exchange_info_ttl)
+        self.ticker_cache = ticker_cache or TickerCache()
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = metrics or MetricsRegistry()
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ssl=self.ssl),
+                headers={"X-MBX-APIKEY": self.api_key},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _get_server_time(self):
+        return (await self._request("GET", "/fapi/v1/time"))['serverTime']
+
+    async def sync_clock(self):
+        samples = []
+        for _ in range(self.clock.samples):
+            start = time.time() * 1000
+            server_time = await self._get_server_time()
+            samples.append((start, server_time, time.time() * 1000))
+        return self.clock.apply_samples(samples)
+
+    async def run_clock_sync(self):
+        """Resync the shared clock offset every resync_interval seconds"""
+        while True:
+            # Counted from the last sync, which may be the one bootstrap made
+            await asyncio.sleep(max(0.0, self.clock.resync_interval - (time.monotonic() - self.clock.last_sync)))
+            try:
+                await self.sync_clock()
+            except Exception:
+                # Keep the previous offset and retry shortly
+                await asyncio.sleep(1)
+
+    async def get_symbol_filters(self, symbol):
+        if self.symbol_filters.stale:
+            self.symbol_filters.load(await self._request("GET", "/fapi/v1/exchangeInfo"))
+        return self.symbol_filters.get(symbol)
+
+    async def _get_timestamp(self):
+        if not self.clock.synced:
+            await self.sync_clock()
+        return self.clock.now_ms()
+
+    async def _request(self, method, endpoint, params=None):
+        weight, orders, lane = request_cost(method, endpoint)
+        start = time.perf_counter()
+        await self.scheduler.acquire_async(self.api_key, weight, orders, lane)
+        sent = time.perf_counter()
+        self.metrics.observe('request_stage_seconds', sent - start, stage='rate_limit_wait', account=self.name)
+        url = self.base_url + endpoint
+        if isinstance(params, str):
+            # A signed query string goes out exactly as it was signed
+            url, params = yarl.URL(f"{url}?{params}", encoded=True), None
+        # Never waits longer than what is left of the current phase's latency budget
+        timeout = aiohttp.ClientTimeout(total=request_timeout(self.timeout))
+        try:
+            async with self._get_session().request(method, url, params=params, timeout=timeout) as response:
+                self.scheduler.record_response(self.api_key, response.status, response.headers)
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.metrics.increment('request_errors_total', endpoint=endpoint, code=type(e).__name__)
+            current = current_deadline()
+            if isinstance(e, asyncio.TimeoutError) and current is not None and current.expired:
+                raise current.exceeded() from e
+            raise
+        now = time.perf_counter()
+        self.metrics.observe('request_stage_seconds', now - sent, stage='network', account=self.name)
+        self.metrics.observe('request_seconds', now - start, endpoint=endpoint, account=self.name)
+        self.metrics.increment('request_weight_total', weight, account=self.name)
+        if response.status >= 400 or (isinstance(data, dict) and data.get('code', 0) < 0):
+            code = data.get('code', response.status) if isinstance(data, dict) else response.status
+            self.metrics.increment('request_errors_total', endpoint=endpoint, code=code)
+        return data
+
+    async def _sign_params(self, params):
+        timestamp = await self._get_timestamp()
+        with self.metrics.timer('request_stage_seconds', stage='sign', account=self.name):
+            return self.signer.sign(params, timestamp, self.recv_window)
+
+    async def _signed_request(self, method, endpoint, params):
+        for attempt in range(2):
+            data = await self._request(method, endpoint, await self._sign_params(params))
+            if attempt == 0 and isinstance(data, dict) and data.get('code') == -1021:
+                # Server time offset went stale, resync and retry once
+                await self.sync_clock()
+                continue
+            return data
+
+    async def get_account_info(self):
+        """Get account information"""
+        return await self._signed_request("GET", "/fapi/v2/account", {})
+
+    async def get_account_balance(self):
+        """Get account balance"""
+        account_info = await self.get_account_info()
+        for asset in account_info['assets']:
+            if asset['asset'] == 'USDT':
+                return float(asset['walletBalance'])
+        return 0.0
+
+    async def get_current_price(self, symbol, max_age=None):
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None:
+                return cached['mark_price']
+        return await self.ticker_cache.get_async(symbol, lambda: self._fetch_price(symbol), max_age)
+
+    async def _fetch_price(self, symbol):
+        params = {"symbol": symbol}
+        return float((await self._request("GET", "/fapi/v1/ticker/price", params))['price'])
+
+    async def get_position_info(self, symbol):
+        params = {"symbol": symbol}
+        return await self._signed_request("GET", "/fapi/v2/positionRisk", params)
+
+    async def get_funding_rate(self, symbol):
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None:
+                return cached['funding_rate']
+        params = {"symbol": symbol}
+        return float((await self._request("GET", "/fapi/v1/premiumIndex", params))['lastFundingRate'])
+
+    async def get_funding_deadline(self, symbol):
+        """time.monotonic() at which the next funding settles, from the exchange's own countdown"""
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None and cached['next_funding_time']:
+                return cached['received_at'] + (cached['next_funding_time'] - cached['event_time']) / 1000
+        received_at = time.monotonic()
+        index = await self._request("GET", "/fapi/v1/premiumIndex", {"symbol": symbol})
+        return received_at + (index['nextFundingTime'] - index['time']) / 1000
+
+    async def get_depth(self, symbol, limit=1000):
+        """Order book snapshot: {lastUpdateId, bids: [[price, quantity], ...], asks: [...]}, best first"""
+        return await self._request("GET", "/fapi/v1/depth", {"symbol": symbol, "limit": limit})
+
+    async def set_leverage(self, symbol, leverage):
+        params = {
+            "symbol": symbol,
+            "leverage": leverage
+        }
+        return await self._signed_request("POST", "/fapi/v1/leverage", params)
+
+    async def set_margin_type(self, symbol, margin_type):
+        """ISOLATED or CROSSED; {"code": -4046} when the symbol already uses it"""
+        return await self._signed_request("POST", "/fapi/v1/marginType", {"symbol": symbol, "marginType": margin_type})
+
+    async def get_position_mode(self):
+        """{"dualSidePosition": true} in hedge mode, false in one-way mode"""
+        return await self._signed_request("GET", "/fapi/v1/positionSide/dual", {})
+
+    async def calculate_quantity_from_usdt(self, symbol, usdt_amount, leverage=10, price=None, max_slippage_bps=None):
+        current_price = price or await self.get_current_price(symbol)
+        # Sized at the expected fill price and capped at the book's depth while the local order book is fresh
+        book = self.order_book.get(symbol) if self.order_book is not None else None
+        quote = book.hedge_quote(usdt_amount, max_slippage_bps) if book is not None else None
+        if quote is not None:
+            current_price, notional = quote
+            if notional < usdt_amount:
+                self.metrics.increment('sizing_depth_capped_total', symbol=symbol)
+            usdt_amount = notional
+        filters = await self.get_symbol_filters(symbol)
+        return filters.quantity_for_notional(usdt_amount, current_price)
+
+    async def place_order(self, symbol, side, order_type, quantity, position_side="BOTH", reduce_only=False,
+                          client_order_id=None, expected_price=None):
+        if quantity <= 0:
+            raise ValueError(f"Invalid order quantity: {quantity}")
+        filters = await self.get_symbol_filters(symbol)
+        self.symbol_filters.validate(symbol, quantity, order_type, expected_price)
+        params = {
+            "symbol": symbol,
+            "side": side,
+            "type": order_type,
+            "quantity": filters.format_quantity(quantity, order_type),
+            "positionSide": position_side,
+            "newOrderRespType": "RESULT"
+        }
+        if reduce_only:
+            params["reduceOnly"] = "true"
+        if client_order_id is not None:
+            params["newClientOrderId"] = client_order_id
+        return await self._signed_request("POST", "/fapi/v1/order", params)
+
+    async def query_order(self, symbol, client_order_id):
+        return await self._signed_request("GET", "/fapi/v1/order", {"symbol": symbol, "origClientOrderId": client_order_id})
+
+    async def close_position(self, symbol, side, order_type, quantity, position_side="BOTH"):
+        opposite_side = "SELL" if side == "BUY" else "BUY"
+        return await self.place_order(symbol, opposite_side, order_type, quantity, position_side)
+
+    async def start_user_stream(self):
+        return await self._request("POST", "/fapi/v1/listenKey")
+
+    async def keepalive_user_stream(self):
+        return await self._request("PUT", "/fapi/v1/listenKey")
+
+    async def close_user_stream(self):
+        return await self._request("DELETE", "/fapi/v1/listenKey")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def cancel_all_orders(self, symbol):
+        """Cancel every open order of `symbol`"""
+        return await self._signed_request("DELETE", "/fapi/v1/allOpenOrders", {"symbol": symbol})
+
+    async def close_all_positions(self, symbol):
+        """Close every position of the specified trading pair and check it is flat, see flatten.flatten_all"""
+        return await flatten_all_async([(self, symbol)])
+
+
+class BlockingClient:
+    """An AsyncAsterDexAPI for code running on other threads, such as UserDataStream.
+
+    Each coroutine method becomes a blocking call that runs on `loop` and
+    waits at most the client's timeout; other attributes are the client's
+    own. Never call it from the loop's own thread, which it would deadlock.
+    """
+
+    def __init__(self, api, loop):
+        self._api = api
+        self._loop = loop
+
+    def __getattr__(self, name):
+        attribute = getattr(self._api, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return asyncio.run_coroutine_threadsafe(attribute(*args, **kwargs), self._loop).result(self._api.timeout)
+        return call
+
+
+async def _timed_order(api, order, client_order_id, timings, index):
+    sent = time.perf_counter()
+    try:
+        return await api.place_order(**order, client_order_id=client_order_id)
+    finally:
+        timings[index] = (sent, time.perf_counter())
+
+
+async def _send_legs(legs, timings):
+    """Send `legs` at once; (responses, outcomes), with unknown outcomes looked up by client order id.
+
+    `timings` receives each leg's (sent, acked) perf_counter times.
+    """
+    client_order_ids = [new_client_order_id() for _ in legs]
+    responses = await asyncio.gather(*(_timed_order(api, order, client_order_id, timings, i)
+                                       for i, ((api, order), client_order_id) in enumerate(zip(legs, client_order_ids))),
+                                     return_exceptions=True)
+    outcomes = [leg_outcome(response, order['quantity']) for (_, order), response in zip(legs, responses)]
+    unknown = [i for i, outcome in enumerate(outcomes) if outcome == 'unknown']
+    answers = await asyncio.gather(*(legs[i][0].query_order(legs[i][1]['symbol'], client_order_ids[i]) for i in unknown),
+                                   return_exceptions=True)
+    for i, answer in zip(unknown, answers):
+        outcome, response = query_outcome(answer, legs[i][1]['quantity'])
+        outcomes[i] = outcome
+        if response is not None:
+            responses[i] = response
+    return responses, outcomes
+
+
+async def execute_hedge(legs, unwind=True, latencies=None, retries=1, executor=None):
+    """Send every leg of a hedge at once; `legs` is a list of (api, place_order kwargs).
+
+    As HedgeExecutor does for the threaded client: legs whose outcome is
+    unknown are looked up by client order id, legs the exchange rejected are
+    resent up to `retries` times while the current deadline lasts, and if a
+    leg is still not filled in full, the filled legs are reversed when
+    `unwind` is set and HedgeLegError is raised. `latencies`, if given,
+    receives each leg's round trip in leg order, and `executor`, a
+    HedgeExecutor, the round trips (`last_latencies`), the send and ack
+    skew between the legs and the unwind, journaled through its journal.
+    """
+    timings = [(0.0, 0.0)] * len(legs)
+    responses, outcomes = await _send_legs(legs, timings)
+    if executor is not None:
+        executor.record_skew([sent for sent, _ in timings], [acked for _, acked in timings])
+    for _ in range(retries):
+        rejected = [i for i, outcome in enumerate(outcomes) if outcome == 'rejected']
+        current = current_deadline()
+        if not rejected or (current is not None and current.expired):
+            break
+        resent, resent_outcomes = await _send_legs([legs[i] for i in rejected], [(0.0, 0.0)] * len(rejected))
+        for i, response, outcome in zip(rejected, resent, resent_outcomes):
+            responses[i], outcomes[i] = response, outcome
+    round_trips = [acked - sent for sent, acked in timings]
+    if latencies is not None:
+        latencies[:] = round_trips
+    if executor is not None:
+        executor.last_latencies = round_trips
+    if all(outcome == 'filled' for outcome in outcomes):
+        return responses
+    if unwind:
+        reverse = []
+        for (api, order), outcome in zip(legs, outcomes):
+            if outcome == 'filled':
+                order = dict(order)
+                order['side'] = "SELL" if order['side'] == "BUY" else "BUY"
+                # A reversed leg only ever closes what it opened
+                order['reduce_only'] = order.get('position_side', 'BOTH') == 'BOTH'
+                reverse.append((api, order))
+        if reverse:
+            reverse_timings = [(0.0, 0.0)] * len(reverse)
+            reverse_responses, reverse_outcomes = await _send_legs(reverse, reverse_timings)
+            if executor is not None:
+                executor.record_unwind(reverse, reverse_responses, reverse_outcomes,
+                                       [acked - sent for sent, acked in reverse_timings])
+    failed = [i for i, outcome in enumerate(outcomes) if outcome != 'filled']
+    errors = [f"{outcomes[i]}: {responses[i]}" for i in failed]
+    raise HedgeLegError(f"Hedge leg(s) {failed} failed: {errors}", outcomes, responses)
+
+
+class EventLoopIO:
+    """hedge_engine.BlockingIO for AsyncAsterDexAPI clients: HedgeJob's cycle steps make their requests on the event loop"""
+
+    async def call(self, request):
+        return await request()
+
+    async def gather(self, *requests):
+        return await asyncio.gather(*(request() for request in requests))
+
+    async def execute(self, executor, legs, **kwargs):
+        return await execute_hedge(legs, executor=executor, **kwargs)
+
+    async def flatten(self, targets, journal):
+        return await flatten_all_async(targets, journal=journal)
+
+
+EVENT_LOOP_IO = EventLoopIO()
+
+
+async def run_job_async(job, on_open=None, on_error=None):
+    """Run a HedgeJob's open/hold/close cycle forever on the event loop.
+
+    The job's clients must be AsyncAsterDexAPI instances. The steps are the
+    job's own, made through EVENT_LOOP_IO, so stats, missed deadlines and
+    failed legs are handled exactly as HedgeEngine does for the threaded
+    clients; only the waits between them are sleeps on the event loop.
+    """
+    job.stats['started_at'] = time.monotonic()
+    while True:
+        planned = opened = False
+        try:
+            if job.held is not None:
+                # Legs taken over from a checkpoint go straight to their planned close
+                quantity, close_at = job.held['quantity'], job.held_until()
+                planned = opened = True
+            else:
+                # Never open a cycle on top of legs a failed step may have left open
+                await job.ensure_flat_on(EVENT_LOOP_IO)
+                # Sleep to the planned deadlines rather than for fixed intervals, so request time does not drift the cycle
+                open_at, close_at = await job.plan_cycle_on(EVENT_LOOP_IO)
+                planned = True
+                await asyncio.sleep(max(0.0, open_at - time.monotonic()))
+                job.record_lateness('open', open_at)
+                quantity = await job.open_cycle_on(EVENT_LOOP_IO, on_open, close_at)
+                opened = True
+
+            with job.account1.metrics.timer('cycle_phase_seconds', job=job.name, phase='hold'):
+                await asyncio.sleep(max(0.0, close_at - time.monotonic()))
+            job.record_lateness('close', close_at)
+            await job.close_cycle_on(EVENT_LOOP_IO, quantity)
+        except Exception as e:
+            if planned and not opened:
+                # A skipped or flattened cycle frees its planned slot
+                job.planner.cancel()
+            retry_in = job.fail(e)
+            if on_error is not None:
+                on_error(job, e)
+            await asyncio.sleep(retry_in)
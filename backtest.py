@@ -0,0 +1,287 @@
+"""Offline backtest of the hedge cycle over historical klines and funding rates.
+
+The strategy is replayed exactly as HedgeJob runs it: both legs open at the
+same price, are held for `wait_seconds`, close together, and the next cycle
+starts `rest_seconds` (plus the order round trips) later. With the price leg
+netting to zero, what a parameter set costs is fees, slippage, funding and
+the legs that get liquidated during a hold; every cycle of the history is
+evaluated at once with numpy, so a year of 1m klines takes well under a second.
+
+Download history (public endpoints, no keys needed) and run a parameter grid:
+
+    python backtest.py download --symbol ETHUSDT --days 365 --out data
+    python backtest.py run --klines data/ETHUSDT-1m.json --funding data/ETHUSDT-funding.json \\
+        --wait-seconds 30 300 1800 --leverage 3 10 20 --usdt-amount 50 200 --workers 4
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+BACKTEST_DEFAULTS = {
+    'rest_seconds': 5,
+    'fee_rate': 0.0004,
+    'slippage_bps': 1.0,
+    'maintenance_margin': 0.005,
+    'overhead_seconds': 0.5,
+    'step_size': 0.0
+}
+
+GRID_KEYS = ('wait_seconds', 'leverage', 'usdt_amount')
+
+
+class MarketData:
+    """Bar and funding arrays of one symbol, sorted by time (milliseconds)"""
+
+    def __init__(self, times, open, high, low, close, funding_times=None, funding_rates=None, bar_ms=None):
+        self.times = np.asarray(times, dtype=np.int64)
+        if len(self.times) < 2:
+            raise ValueError("At least two klines are needed for a backtest")
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.bar_ms = bar_ms or int(np.median(np.diff(self.times)))
+        self.funding_times = np.asarray(funding_times if funding_times is not None else [], dtype=np.int64)
+        rates = np.asarray(funding_rates if funding_rates is not None else [], dtype=np.float64)
+        # Funding paid over [t0, t1) is a difference of two prefix sums
+        self.funding_cumulative = np.concatenate(([0.0], np.cumsum(rates)))
+
+    @classmethod
+    def from_files(cls, kline_paths, funding_paths=()):
+        """Load klines / funding history saved as the exchange returned them (see `download`)"""
+        rows = []
+        for path in kline_paths:
+            with open(path) as f:
+                rows.extend(json.load(f))
+        if not rows:
+            raise ValueError("No klines in " + ", ".join(kline_paths))
+        bars = np.array([row[:5] for row in rows], dtype=np.float64)
+        # Files may overlap; klines are identified by their open time
+        times, first = np.unique(bars[:, 0].astype(np.int64), return_index=True)
+        bars = bars[first]
+
+        funding = []
+        for path in funding_paths:
+            with open(path) as f:
+                funding.extend(json.load(f))
+        funding_times, first = np.unique(np.array([int(entry['fundingTime']) for entry in funding], dtype=np.int64),
+                                         return_index=True)
+        funding_rates = np.array([float(entry['fundingRate']) for entry in funding], dtype=np.float64)[first]
+        return cls(times, bars[:, 1], bars[:, 2], bars[:, 3], bars[:, 4], funding_times, funding_rates)
+
+    def price_at(self, times, index):
+        """Price at each time, interpolated between the open and close of the bar containing it"""
+        fraction = (times - self.times[index]) / self.bar_ms
+        return self.open[index] + (self.close[index] - self.open[index]) * np.clip(fraction, 0.0, 1.0)
+
+
+def backtest(data, wait_seconds, leverage, usdt_amount, rest_seconds=5, fee_rate=0.0004, slippage_bps=1.0,
+             maintenance_margin=0.005, overhead_seconds=0.5, step_size=0.0):
+    """Cost summary of running one parameter set over the whole history.
+
+    `usdt_amount` is the order notional, sized the way HedgeJob sizes it
+    (rounded down to `step_size` when given). A leg whose liquidation price
+    is touched during a hold loses its margin and is not closed; funding is
+    credited to the short and charged to the long at every settlement inside
+    a hold (a negative rate reverses that).
+    """
+    wait_ms = int(wait_seconds * 1000)
+    period_ms = int((wait_seconds + rest_seconds + overhead_seconds) * 1000)
+    end = data.times[-1] + data.bar_ms
+    open_times = np.arange(data.times[0], end - wait_ms, period_ms, dtype=np.int64)
+    close_times = open_times + wait_ms
+    cycles = len(open_times)
+    if cycles == 0:
+        raise ValueError(f"The history is shorter than one {wait_seconds}s hold")
+    first = np.searchsorted(data.times, open_times, side='right') - 1
+    last = np.searchsorted(data.times, close_times, side='right') - 1
+
+    open_price = data.price_at(open_times, first)
+    close_price = data.price_at(close_times, last)
+    quantity = usdt_amount / open_price
+    if step_size:
+        quantity = np.floor(quantity / step_size) * step_size
+
+    # Extremes of every hold window: reduceat over [first, last + 1) pairs, keeping the even slots.
+    # One padding bar keeps last + 1 a valid index for a hold that ends in the final bar.
+    bounds = np.empty(cycles * 2, dtype=np.int64)
+    bounds[0::2] = first
+    bounds[1::2] = last + 1
+    low = np.minimum.reduceat(np.append(data.low, np.inf), bounds)[0::2]
+    high = np.maximum.reduceat(np.append(data.high, -np.inf), bounds)[0::2]
+    # Entry price moves of 1/leverage minus the maintenance margin wipe out a leg
+    long_liquidated = low <= open_price * (1 - 1 / leverage + maintenance_margin)
+    short_liquidated = high >= open_price * (1 + 1 / leverage - maintenance_margin)
+
+    slip = slippage_bps / 10000
+    margin = quantity * open_price / leverage
+    long_pnl = np.where(long_liquidated, -margin, quantity * (close_price - open_price))
+    short_pnl = np.where(short_liquidated, -margin, quantity * (open_price - close_price))
+
+    open_notional = quantity * open_price
+    close_notional = quantity * close_price
+    closed_legs = (~long_liquidated).astype(np.float64) + (~short_liquidated)
+    volume = 2 * open_notional + closed_legs * close_notional
+    fees = volume * fee_rate
+    slippage = volume * slip
+
+    settled = (data.funding_cumulative[np.searchsorted(data.funding_times, close_times)] -
+               data.funding_cumulative[np.searchsorted(data.funding_times, open_times)])
+    held_legs = (~short_liquidated).astype(np.float64) - (~long_liquidated)
+    funding = open_notional * settled * held_legs
+
+    pnl = long_pnl + short_pnl - fees - slippage + funding
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0.0)) - equity
+    total_volume = float(volume.sum())
+    days = (end - data.times[0]) / 86400000
+    return {
+        'wait_seconds': wait_seconds,
+        'leverage': leverage,
+        'usdt_amount': usdt_amount,
+        'cycles': cycles,
+        'volume_usdt': total_volume,
+        'volume_usdt_per_day': total_volume / days,
+        'fees': float(fees.sum()),
+        'slippage': float(slippage.sum()),
+        'funding': float(funding.sum()),
+        'liquidations': int(long_liquidated.sum() + short_liquidated.sum()),
+        'pnl': float(equity[-1]),
+        'cost_per_10k': float(-equity[-1] / total_volume * 10000) if total_volume else 0.0,
+        'max_drawdown': float(drawdown.max()),
+        # Both accounts post margin for their leg
+        'margin_usdt': float(2 * usdt_amount / leverage)
+    }
+
+
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _run_params(params):
+    return backtest(_worker_data, **params)
+
+
+def parameter_grid(grid, **fixed):
+    """Every combination of the values in `grid` ({name: [values]}), merged with `fixed`"""
+    for key in grid:
+        if key not in GRID_KEYS and key not in BACKTEST_DEFAULTS:
+            raise ValueError(f"Unknown backtest parameter '{key}'")
+    keys = list(grid)
+    return [dict(fixed, **dict(zip(keys, values))) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def run_grid(data, grid, workers=None, **fixed):
+    """Backtest every combination of `grid` and return the results, cheapest per volume first.
+
+    Combinations are spread over a process pool; each worker receives the
+    market data once, when it starts, rather than with every task.
+    `workers=1` runs in this process.
+    """
+    combinations = parameter_grid(grid, **fixed)
+    if workers == 1:
+        results = [backtest(data, **params) for params in combinations]
+    else:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+            chunksize = max(1, len(combinations) // (workers * 4))
+            results = list(pool.map(_run_params, combinations, chunksize=chunksize))
+    return sorted(results, key=lambda result: result['cost_per_10k'])
+
+
+def download(api, symbol, start_time, end_time, interval="1m"):
+    """(klines, funding history) of `symbol` between two millisecond timestamps, paged through the API client"""
+    klines = []
+    cursor = start_time
+    while cursor < end_time:
+        page = api.get_klines(symbol, interval, start_time=cursor, end_time=end_time, limit=1000)
+        if not isinstance(page, list):
+            raise ValueError(f"Failed to download klines: {page}")
+        if not page:
+            break
+        klines.extend(page)
+        cursor = page[-1][0] + 1
+
+    funding = []
+    cursor = start_time
+    while cursor < end_time:
+        page = api.get_funding_rate_history(symbol, start_time=cursor, end_time=end_time, limit=1000)
+        if not isinstance(page, list):
+            raise ValueError(f"Failed to download funding rates: {page}")
+        if not page:
+            break
+        funding.extend(page)
+        cursor = page[-1]['fundingTime'] + 1
+    return klines, funding
+
+
+def _download_command(args):
+    from hedge_trading_EN import AsterDexAPI
+
+    api = AsterDexAPI("", "")
+    end_time = int(time.time() * 1000)
+    start_time = end_time - int(args.days * 86400000)
+    klines, funding = download(api, args.symbol, start_time, end_time, args.interval)
+    os.makedirs(args.out, exist_ok=True)
+    kline_path = os.path.join(args.out, f"{args.symbol}-{args.interval}.json")
+    funding_path = os.path.join(args.out, f"{args.symbol}-funding.json")
+    with open(kline_path, 'w') as f:
+        json.dump(klines, f)
+    with open(funding_path, 'w') as f:
+        json.dump(funding, f)
+    print(f"{len(klines)} klines -> {kline_path}")
+    print(f"{len(funding)} funding rates -> {funding_path}")
+
+
+def _run_command(args):
+    data = MarketData.from_files(args.klines, args.funding)
+    grid = {'wait_seconds': args.wait_seconds, 'leverage': args.leverage, 'usdt_amount': args.usdt_amount}
+    fixed = {key: getattr(args, key) for key in BACKTEST_DEFAULTS}
+    start = time.perf_counter()
+    results = run_grid(data, grid, workers=args.workers, **fixed)
+    elapsed = time.perf_counter() - start
+    days = len(data.times) * data.bar_ms / 86400000
+    print(f"{len(results)} parameter sets over {len(data.times)} klines ({days:.1f} days) in {elapsed:.2f}s")
+    print(f"{'wait':>6} {'lev':>4} {'usdt':>8} {'cycles':>8} {'volume/day':>14} {'fees':>10} {'slippage':>10} "
+          f"{'funding':>10} {'liq':>5} {'pnl':>11} {'cost/10k':>9} {'max dd':>10}")
+    for r in results[:args.top]:
+        print(f"{r['wait_seconds']:>6g} {r['leverage']:>4g} {r['usdt_amount']:>8g} {r['cycles']:>8d} "
+              f"{r['volume_usdt_per_day']:>14.0f} {r['fees']:>10.2f} {r['slippage']:>10.2f} {r['funding']:>10.2f} "
+              f"{r['liquidations']:>5d} {r['pnl']:>11.2f} {r['cost_per_10k']:>9.3f} {r['max_drawdown']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    download_parser = commands.add_parser("download", help="save klines and funding history from the exchange")
+    download_parser.add_argument("--symbol", required=True)
+    download_parser.add_argument("--days", type=float, default=30)
+    download_parser.add_argument("--interval", default="1m")
+    download_parser.add_argument("--out", default="data")
+    download_parser.set_defaults(handler=_download_command)
+
+    run_parser = commands.add_parser("run", help="backtest a parameter grid over saved history")
+    run_parser.add_argument("--klines", nargs="+", required=True, help="kline files saved by `download`")
+    run_parser.add_argument("--funding", nargs="*", default=[], help="funding history files saved by `download`")
+    run_parser.add_argument("--wait-seconds", type=float, nargs="+", default=[30])
+    run_parser.add_argument("--leverage", type=float, nargs="+", default=[10])
+    run_parser.add_argument("--usdt-amount", type=float, nargs="+", default=[100])
+    for key, value in BACKTEST_DEFAULTS.items():
+        run_parser.add_argument("--" + key.replace("_", "-"), type=float, default=value)
+    run_parser.add_argument("--workers", type=int, default=None, help="processes for the grid (default: CPU count)")
+    run_parser.add_argument("--top", type=int, default=20, help="rows to print, cheapest first")
+    run_parser.set_defaults(handler=_run_command)
+
+    args = parser.parse_args()
+    args.handler(args)
@@ -0,0 +1,127 @@
+"""Account status polling: fixed one-second pollers vs the adaptive poller.
+
+Runs one job (`--hold` seconds held, `--rest` seconds flat) against the mock
+exchange for `--duration` seconds, twice: with a poller thread per account
+sleeping one second between polls, as update_position_status did, and with
+AdaptivePoller over both accounts. Reports the status requests and their
+weight per minute, and how long after each open and close filled the panel
+first showed it (the staleness that matters to the UI and risk checks).
+
+Run from the repository root:
+
+    python -m benchmarks.adaptive_poll --duration 60 --hold 30 --rest 10
+"""
+import argparse
+import threading
+import time
+
+from adaptive_poll import AdaptivePoller
+from benchmarks.mock_exchange import WEIGHTS, MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+STATUS_PATHS = ("/fapi/v2/positionRisk", "/fapi/v2/account")
+
+
+def _config(base_url, hold, rest):
+    return {
+        "accounts": {leg: {"api_key": leg, "api_secret": "secret"} for leg in ("long", "short")},
+        "jobs": [{"symbol": "ETHUSDT", "account1": "long", "account2": "short", "usdt_amount": 100,
+                  "leverage": 10, "wait_seconds": hold, "rest_seconds": rest}],
+        "network": {"base_url": base_url}
+    }
+
+
+def _fixed(job, record, stopped):
+    def poll(account_num, api):
+        # update_position_status without the UI
+        while not stopped.is_set():
+            try:
+                api.get_position_info(job.symbol)
+                api.get_current_price(job.symbol, max_age=1)
+                api.get_account_info()
+                record(account_num)
+            except Exception:
+                pass
+            stopped.wait(api.scheduler.poll_interval(1))
+
+    threads = [threading.Thread(target=poll, args=(account_num, api), daemon=True)
+               for account_num, api in ((1, job.account1), (2, job.account2))]
+    for thread in threads:
+        thread.start()
+
+    def stop():
+        for thread in threads:
+            thread.join()
+    return stop
+
+
+def _adaptive(job, record, stopped):
+    poller = AdaptivePoller([(1, job.account1, job.symbol), (2, job.account2, job.symbol)], [job],
+                            on_status=lambda account_num, *_: record(account_num), on_error=lambda *_: None)
+    poller.start()
+
+    def stop():
+        poller.stop()
+        return f"polls by reason {poller.stats()['reasons']}"
+    return stop
+
+
+def run_mode(label, exchange, config, duration, start_pollers):
+    clients = create_clients(config, AsterDexAPI)
+    job = HedgeJob(load_jobs(config)[0], clients["long"], clients["short"])
+    job.set_leverage()
+    # Fills: when the legs went from opening to holding and from closing back to idle
+    fills, polls = [], []
+    set_phase = job.set_phase
+
+    def tracked(phase):
+        if (job.stats['phase'], phase) in (('opening', 'holding'), ('closing', 'idle')):
+            fills.append(time.monotonic())
+        set_phase(phase)
+    job.set_phase = tracked
+    stopped = threading.Event()
+    counts = {path: exchange.path_counts[path] for path in STATUS_PATHS}
+    stop_pollers = start_pollers(job, lambda account_num: polls.append(time.monotonic()), stopped)
+    engine = HedgeEngine([job])
+    try:
+        engine.start()
+        time.sleep(duration)
+    finally:
+        engine.stop()
+        stopped.set()
+        detail = stop_pollers()
+        job.executor.shutdown()
+        job.flatten()
+        for api in clients.values():
+            api.close()
+    requests = {path: exchange.path_counts[path] - counts[path] for path in STATUS_PATHS}
+    weight = sum(count * WEIGHTS.get(path, 1) for path, count in requests.items())
+    lags = [min((poll for poll in polls if poll >= fill), default=fill + duration) - fill for fill in fills]
+    print(f"{label:<9} {sum(requests.values()) * 60 / duration:6.0f} status requests/min  "
+          f"weight {weight * 60 / duration:6.0f}/min  {len(fills)} fills  "
+          f"panel lag after fill mean {sum(lags) / max(len(lags), 1) * 1000:6.0f} ms  "
+          f"max {max(lags, default=0) * 1000:6.0f} ms")
+    if detail:
+        print(f"{'':<9} {detail}")
+
+
+def run(duration, hold, rest, latency):
+    exchange = MockExchange(tls=False, latency=latency)
+    base_url = exchange.start()
+    try:
+        config = _config(base_url, hold, rest)
+        run_mode("fixed", exchange, config, duration, _fixed)
+        run_mode("adaptive", exchange, config, duration, _adaptive)
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--hold", type=float, default=30, help="wait_seconds of the job")
+    parser.add_argument("--rest", type=float, default=10, help="rest_seconds of the job")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.duration, args.hold, args.rest, args.latency)
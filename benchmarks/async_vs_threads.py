@@ -0,0 +1,187 @@
+"""Threaded AsterDexAPI design vs AsyncAsterDexAPI on one event loop.
+
+Each mode runs in its own process against the local mock exchange and drives
+`--pairs` hedge pairs: one status poller per account plus a trading cycle per
+pair. Reports peak thread count, RSS and open+close cycle latency.
+Run from the repository root:
+
+    python -m benchmarks.async_vs_threads --pairs 50 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import summarize
+from benchmarks.mock_exchange import MockExchange
+
+SYMBOL = "ETHUSDT"
+
+
+def _rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _orders(account1, account2, open_cycle):
+    sides = ("BUY", "SELL") if open_cycle else ("SELL", "BUY")
+    return [
+        (account1, dict(symbol=SYMBOL, side=sides[0], order_type="MARKET", quantity=0.01, position_side="BOTH")),
+        (account2, dict(symbol=SYMBOL, side=sides[1], order_type="MARKET", quantity=0.01, position_side="BOTH")),
+    ]
+
+
+def run_threads(base_url, cert, pairs, duration, interval, hold):
+    from hedge_executor import HedgeExecutor
+    from hedge_trading_EN import AsterDexAPI
+
+    stop = threading.Event()
+    cycles = []
+    peak = {'threads': 0, 'rss': 0.0}
+    clock = None
+
+    def client(name):
+        api = AsterDexAPI(name, "secret", clock=clock, base_url=base_url)
+        api.session.trust_env = False
+        api.session.verify = cert or True
+        return api
+
+    def poll(api):
+        while not stop.is_set():
+            api.get_position_info(SYMBOL)
+            api.get_current_price(SYMBOL)
+            api.get_account_info()
+            stop.wait(interval)
+
+    def trade(account1, account2):
+        executor = HedgeExecutor()
+        while not stop.is_set():
+            start = time.perf_counter()
+            executor.execute(_orders(account1, account2, True))
+            opened = time.perf_counter()
+            stop.wait(hold)
+            closing = time.perf_counter()
+            executor.execute(_orders(account1, account2, False), unwind=False)
+            cycles.append((opened - start) + (time.perf_counter() - closing))
+        executor.shutdown()
+
+    first = client("pair-0-a")
+    clock = first.clock
+    threads = []
+    for pair in range(pairs):
+        account1 = first if pair == 0 else client(f"pair-{pair}-a")
+        account2 = client(f"pair-{pair}-b")
+        threads += [threading.Thread(target=poll, args=(account1,), daemon=True),
+                    threading.Thread(target=poll, args=(account2,), daemon=True),
+                    threading.Thread(target=trade, args=(account1, account2), daemon=True)]
+    for thread in threads:
+        thread.start()
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        peak['threads'] = max(peak['threads'], threading.active_count())
+        peak['rss'] = max(peak['rss'], _rss_mb())
+        time.sleep(0.2)
+    stop.set()
+    return peak, cycles
+
+
+def run_async(base_url, cert, pairs, duration, interval, hold):
+    from async_api import AsyncAsterDexAPI, execute_hedge
+
+    cycles = []
+    peak = {'threads': 0, 'rss': 0.0}
+    context = ssl.create_default_context(cafile=cert) if cert else None
+
+    async def poll(api):
+        while True:
+            # Same request pattern as the threaded poller so both modes put the same load on the exchange
+            await api.get_position_info(SYMBOL)
+            await api.get_current_price(SYMBOL)
+            await api.get_account_info()
+            await asyncio.sleep(interval)
+
+    async def trade(account1, account2):
+        while True:
+            start = time.perf_counter()
+            await execute_hedge(_orders(account1, account2, True))
+            opened = time.perf_counter()
+            await asyncio.sleep(hold)
+            closing = time.perf_counter()
+            await execute_hedge(_orders(account1, account2, False), unwind=False)
+            cycles.append((opened - start) + (time.perf_counter() - closing))
+
+    async def main():
+        first = AsyncAsterDexAPI("pair-0-a", "secret", base_url=base_url, ssl=context)
+        await first.sync_clock()
+        clients, tasks = [first], []
+        for pair in range(pairs):
+            account1 = first if pair == 0 else AsyncAsterDexAPI(f"pair-{pair}-a", "secret", clock=first.clock,
+                                                                base_url=base_url, ssl=context)
+            account2 = AsyncAsterDexAPI(f"pair-{pair}-b", "secret", clock=first.clock, base_url=base_url, ssl=context)
+            clients += [account1, account2] if pair else [account2]
+            tasks += [asyncio.create_task(poll(account1)), asyncio.create_task(poll(account2)),
+                      asyncio.create_task(trade(account1, account2))]
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            peak['threads'] = max(peak['threads'], threading.active_count())
+            peak['rss'] = max(peak['rss'], _rss_mb())
+            await asyncio.sleep(0.2)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(api.close() for api in clients))
+
+    asyncio.run(main())
+    return peak, cycles
+
+
+def _child(args):
+    runner = run_threads if args.mode == "threads" else run_async
+    peak, cycles = runner(args.base_url, args.cert, args.pairs, args.duration, args.interval, args.hold)
+    print(json.dumps({"mode": args.mode, "threads": peak['threads'], "rss_mb": peak['rss'],
+                      "cycles": len(cycles), "latency": summarize(cycles)}))
+
+
+def run(args):
+    exchange = MockExchange(tls=not args.no_tls, latency=args.latency)
+    base_url = exchange.start()
+    try:
+        for mode in ("threads", "async"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.async_vs_threads", "--mode", mode, "--base-url", base_url,
+                 "--cert", exchange.cert_path or "", "--pairs", str(args.pairs), "--duration", str(args.duration),
+                 "--interval", str(args.interval), "--hold", str(args.hold)],
+                check=True, capture_output=True, text=True, cwd=os.getcwd()
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            latency = result['latency']
+            print(f"{mode:<8} threads {result['threads']:4d}  rss {result['rss_mb']:7.1f} MB  cycles {result['cycles']:5d}"
+                  f"  cycle latency p50 {latency['p50_ms']:7.2f} ms  p99 {latency['p99_ms']:7.2f} ms")
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=1.0, help="status poll interval in seconds")
+    parser.add_argument("--hold", type=float, default=0.5, help="hold time between open and close in seconds")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected exchange latency in seconds")
+    parser.add_argument("--no-tls", action="store_true", help="serve plain HTTP instead of HTTPS")
+    parser.add_argument("--mode", choices=("threads", "async"), help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--cert", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        _child(args)
+    else:
+        run(args)
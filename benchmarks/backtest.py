@@ -0,0 +1,97 @@
+"""Backtest speed over a year of synthetic 1m klines.
+
+A random-walk price series with 8-hourly funding stands in for downloaded
+history. Times one vectorised backtest per hold length against a per-cycle
+Python loop doing the same arithmetic, then a parameter grid run in this
+process vs the process pool.
+
+Run from the repository root:
+
+    python -m benchmarks.backtest --days 365 --workers 4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backtest import MarketData, backtest, run_grid
+
+
+def synthetic_history(days, seed=1):
+    rng = np.random.default_rng(seed)
+    bars = int(days * 1440)
+    times = 1700000000000 + np.arange(bars, dtype=np.int64) * 60000
+    close = 2000 * np.exp(np.cumsum(rng.normal(0, 0.0008, bars)))
+    open = np.concatenate(([2000.0], close[:-1]))
+    high = np.maximum(open, close) * (1 + np.abs(rng.normal(0, 0.0005, bars)))
+    low = np.minimum(open, close) * (1 - np.abs(rng.normal(0, 0.0005, bars)))
+    funding_times = times[::480]
+    funding_rates = rng.normal(0.0001, 0.0002, len(funding_times))
+    return MarketData(times, open, high, low, close, funding_times, funding_rates)
+
+
+def loop_backtest(data, wait_seconds, leverage, usdt_amount, rest_seconds=5, fee_rate=0.0004, slippage_bps=1.0,
+                  maintenance_margin=0.005, overhead_seconds=0.5):
+    """The same model one cycle at a time, as a reference for the vectorised version"""
+    times, opens, closes = data.times.tolist(), data.open.tolist(), data.close.tolist()
+    highs, lows = data.high.tolist(), data.low.tolist()
+    wait_ms = int(wait_seconds * 1000)
+    period_ms = int((wait_seconds + rest_seconds + overhead_seconds) * 1000)
+    end = times[-1] + data.bar_ms
+    pnl = 0.0
+    bar = 0
+    t = times[0]
+    while t < end - wait_ms:
+        while bar + 1 < len(times) and times[bar + 1] <= t:
+            bar += 1
+        first = bar
+        last = bar
+        while last + 1 < len(times) and times[last + 1] <= t + wait_ms:
+            last += 1
+        open_price = opens[first] + (closes[first] - opens[first]) * min((t - times[first]) / data.bar_ms, 1.0)
+        close_price = opens[last] + (closes[last] - opens[last]) * min((t + wait_ms - times[last]) / data.bar_ms, 1.0)
+        quantity = usdt_amount / open_price
+        low = min(lows[first:last + 1])
+        high = max(highs[first:last + 1])
+        long_liquidated = low <= open_price * (1 - 1 / leverage + maintenance_margin)
+        short_liquidated = high >= open_price * (1 + 1 / leverage - maintenance_margin)
+        margin = quantity * open_price / leverage
+        volume = 2 * quantity * open_price
+        pnl -= margin if long_liquidated else -quantity * (close_price - open_price)
+        pnl -= margin if short_liquidated else -quantity * (open_price - close_price)
+        volume += (2 - long_liquidated - short_liquidated) * quantity * close_price
+        pnl -= volume * (fee_rate + slippage_bps / 10000)
+        t += period_ms
+    return pnl
+
+
+def run(days, workers):
+    start = time.perf_counter()
+    data = synthetic_history(days)
+    print(f"{len(data.times)} klines ({days:g} days) generated in {time.perf_counter() - start:.2f}s")
+
+    for wait_seconds in (30, 300, 1800):
+        start = time.perf_counter()
+        result = backtest(data, wait_seconds, 10, 100)
+        vectorised = time.perf_counter() - start
+        start = time.perf_counter()
+        loop_pnl = loop_backtest(data, wait_seconds, 10, 100)
+        loop = time.perf_counter() - start
+        print(f"wait {wait_seconds:>5}s  {result['cycles']:>8d} cycles  numpy {vectorised * 1000:8.1f} ms  "
+              f"python loop {loop * 1000:9.1f} ms  ({loop / vectorised:5.1f}x)  "
+              f"pnl {result['pnl'] - result['funding']:.2f} / {loop_pnl:.2f}")
+
+    grid = {'wait_seconds': [30, 60, 300, 1800], 'leverage': [3, 5, 10, 20], 'usdt_amount': [50, 200]}
+    sets = len(grid['wait_seconds']) * len(grid['leverage']) * len(grid['usdt_amount'])
+    for label, count in (("in process", 1), (f"pool of {workers or 'cpu_count'}", workers)):
+        start = time.perf_counter()
+        run_grid(data, grid, workers=count)
+        print(f"grid of {sets} sets {label:<18} {time.perf_counter() - start:7.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: CPU count)")
+    args = parser.parse_args()
+    run(args.days, args.workers)
@@ -0,0 +1,88 @@
+"""Startup to the first order: fixed wait and sequential setup vs the concurrent bootstrap.
+
+Starts `--jobs` jobs, each on its own account pair, against the mock
+exchange with `--latency` seconds added to every request, twice: as main()
+used to (clock sync, a `--settle` second wait for the UI, then leverage
+set on one account after the other) and with bootstrap(), which also
+checks margin type, position mode and symbol filters and snapshots every
+balance, all in two concurrent waves. Reports how long setup took, the
+requests it made and the time from start to the first hedge opened.
+
+Run from the repository root:
+
+    python -m benchmarks.bootstrap --jobs 4 --latency 0.05 --settle 2
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from bootstrap import StartupTimer, bootstrap
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def _config(base_url, job_count):
+    return {
+        "accounts": {f"job{i}-{leg}": {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+                     for i in range(job_count) for leg in ("long", "short")},
+        "jobs": [{"symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short", "usdt_amount": 100,
+                  "leverage": 10, "wait_seconds": 1, "rest_seconds": 0, "margin_type": "CROSSED"}
+                 for i in range(job_count)],
+        "network": {"base_url": base_url}
+    }
+
+
+def sequential_setup(jobs, settle):
+    jobs[0].account1.clock.sync()
+    time.sleep(settle)
+    for job in jobs:
+        leverage_result1, leverage_result2 = job.set_leverage()
+        if leverage_result1.get('leverage') != job.leverage or leverage_result2.get('leverage') != job.leverage:
+            raise ValueError("Failed to set leverage")
+
+
+def run_mode(label, exchange, config, setup):
+    startup = StartupTimer()
+    clients = create_clients(config, AsterDexAPI)
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    requests = exchange.request_count
+    start = time.perf_counter()
+    setup(jobs)
+    setup_seconds = time.perf_counter() - start
+    requests = exchange.request_count - requests
+    opened = threading.Event()
+    engine = HedgeEngine(jobs, on_open=lambda *args: opened.set())
+    try:
+        engine.start()
+        opened.wait(30)
+        first_order = startup.first_open(jobs[0].account1.metrics)
+    finally:
+        engine.stop()
+        for job in jobs:
+            job.executor.shutdown()
+            job.flatten()
+        for api in clients.values():
+            api.close()
+    print(f"{label:<11} setup {setup_seconds * 1000:8.1f} ms  {requests:3d} requests  "
+          f"first order after {first_order * 1000:8.1f} ms")
+
+
+def run(job_count, latency, settle):
+    exchange = MockExchange(tls=False, latency=latency)
+    base_url = exchange.start()
+    try:
+        config = _config(base_url, job_count)
+        run_mode("sequential", exchange, config, lambda jobs: sequential_setup(jobs, settle))
+        run_mode("bootstrap", exchange, config, bootstrap)
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="injected base latency in seconds")
+    parser.add_argument("--settle", type=float, default=2, help="fixed wait of the sequential start-up")
+    args = parser.parse_args()
+    run(args.jobs, args.latency, args.settle)
@@ -0,0 +1,123 @@
+"""Cost of a checkpoint save, and a restart that flattens and reopens vs one that resumes.
+
+Times `--saves` checkpoint writes of a job's state as it moves through its
+cycle, with and without fsync. Then stops `--jobs` jobs against the mock
+exchange while their legs are held and starts them again twice: cold, as
+before (every leg closed at exit and a new cycle opened at start), and warm
+from the checkpoint (positions reconciled against positionRisk and the held
+legs closed at their planned time). Reports the orders and taker fees
+(`--fee-rate`) the restart cost, how long until every job was holding
+again, and how many of the trades counted before the restart the new
+jobs' stats still hold.
+
+Run from the repository root:
+
+    python -m benchmarks.checkpoint --saves 2000 --jobs 4 --fee-rate 0.0004
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from checkpoint import Checkpoint
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def bench_saves(directory, saves, fsync):
+    checkpoint = Checkpoint(os.path.join(directory, f"state-{fsync}.json"), fsync=fsync)
+    phases = ('opening', 'holding', 'closing', 'idle')
+    start = time.perf_counter()
+    for i in range(saves):
+        checkpoint.update('jobs', 'ETHUSDT-1', {
+            'symbol': 'ETHUSDT', 'phase': phases[i % 4], 'held': {'quantity': 0.05, 'close_at': time.time()},
+            'open_cash_flow': -0.01, 'stats': {'trade_count': i, 'total_volume': i * 0.1, 'cycles_completed': i}
+        })
+    elapsed = time.perf_counter() - start
+    print(f"checkpoint save{' + fsync' if fsync else '':<8}  {elapsed / saves * 1e6:8.1f} us  "
+          f"({os.path.getsize(checkpoint.path)} bytes)")
+
+
+def _start(config, checkpoint_path, exchange):
+    clients = create_clients(config, AsterDexAPI)
+    for api in clients.values():
+        exchange.configure_session(api.session)
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    if checkpoint is not None:
+        checkpoint.load()
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']], checkpoint=checkpoint)
+            for spec in load_jobs(config)]
+    return clients, jobs, checkpoint
+
+
+def _until_holding(jobs, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not all(job.held is not None for job in jobs) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _stop(engine, jobs, clients, flatten):
+    engine.stop()
+    for job in jobs:
+        job.executor.shutdown()
+        if flatten:
+            job.flatten()
+    for api in clients.values():
+        api.close()
+
+
+def run_restart(label, warm, job_count, fee_rate, directory):
+    exchange = MockExchange(tls=True)
+    base_url = exchange.start()
+    config = {
+        "accounts": {f"job{i}-{leg}": {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+                     for i in range(job_count) for leg in ("long", "short")},
+        "jobs": [{"symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short", "usdt_amount": 1000,
+                  "leverage": 10, "wait_seconds": 5, "rest_seconds": 0.2} for i in range(job_count)],
+        "network": {"base_url": base_url}
+    }
+    path = os.path.join(directory, f"restart-{label}.json") if warm else None
+    try:
+        clients, jobs, _ = _start(config, path, exchange)
+        engine = HedgeEngine(jobs)
+        engine.start()
+        _until_holding(jobs)
+        trades_before = sum(job.stats['trade_count'] for job in jobs)
+        orders = exchange.path_counts['/fapi/v1/order']
+        notional = exchange.accounts['job0-long']['positions']['ETHUSDT'][0] * exchange.price_of("ETHUSDT")
+        start = time.perf_counter()
+        _stop(engine, jobs, clients, flatten=not warm)
+
+        clients, jobs, checkpoint = _start(config, path, exchange)
+        if checkpoint is not None:
+            for job in jobs:
+                job.resume(checkpoint.get('jobs', job.name))
+        carried = sum(job.stats['trade_count'] for job in jobs)
+        engine = HedgeEngine(jobs)
+        engine.start()
+        _until_holding(jobs)
+        elapsed = time.perf_counter() - start
+        orders = exchange.path_counts['/fapi/v1/order'] - orders
+        _stop(engine, jobs, clients, flatten=True)
+    finally:
+        exchange.stop()
+    print(f"{label:<6} restart  {orders:3d} orders  fees {orders * notional * fee_rate:8.4f} USDT  "
+          f"holding again after {elapsed * 1000:7.1f} ms  trades carried over {carried}/{trades_before}")
+
+
+def run(saves, job_count, fee_rate):
+    with tempfile.TemporaryDirectory() as directory:
+        bench_saves(directory, saves, fsync=False)
+        bench_saves(directory, saves, fsync=True)
+        run_restart("cold", False, job_count, fee_rate, directory)
+        run_restart("warm", True, job_count, fee_rate, directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--saves", type=int, default=2000)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--fee-rate", type=float, default=0.0004, help="taker fee rate for the restart cost")
+    args = parser.parse_args()
+    run(args.saves, args.jobs, args.fee_rate)
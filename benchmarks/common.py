@@ -0,0 +1,21 @@
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Mean/p50/p99 of a list of durations in seconds, reported in milliseconds"""
+    if not samples:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def format_summary(name, summary):
+    return f"{name:<28} mean {summary['mean_ms']:8.3f} ms  p50 {summary['p50_ms']:8.3f} ms  p99 {summary['p99_ms']:8.3f} ms"
@@ -0,0 +1,124 @@
+"""Cycle timing of fixed sleeps on one thread per job vs the deadline scheduler.
+
+Runs `--jobs` hedge jobs against the mock exchange (with injected latency)
+twice: with the original engine loop, which sleeps `wait_seconds` and
+`rest_seconds` after every request on a thread of its own, and with
+HedgeEngine, which plans absolute deadlines on one CycleScheduler. Reports
+the achieved cycle period against wait + rest (the drift), the cycles
+completed and the peak number of engine threads (the per-job threads, or
+the scheduler and its worker pool; leg sender threads are the same in both).
+
+Run from the repository root:
+
+    python -m benchmarks.cycle_timing --jobs 10 50 --hold 0.5 --rest 0.2 --latency 0.05
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+class SleepingEngine:
+    """HedgeEngine as it was: one thread per job, fixed sleeps after each step"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def _run_job(self, job):
+        job.stats['started_at'] = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                job.run_cycle(self._stopped)
+                self._stopped.wait(job.rest_seconds)
+            except Exception as e:
+                job.stats['last_error'] = str(e)
+                self._stopped.wait(5)
+
+    def start(self):
+        for job in self.jobs:
+            thread = threading.Thread(target=self._run_job, args=(job,), name=f"hedge-job-{job.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def _engine_threads():
+    return sum(1 for thread in threading.enumerate()
+               if thread.name.startswith(("hedge-job", "cycle")))
+
+
+def _config(base_url, job_count, hold, rest):
+    accounts = {}
+    jobs = []
+    for i in range(job_count):
+        for leg in ("long", "short"):
+            accounts[f"job{i}-{leg}"] = {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+        jobs.append({
+            "symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short",
+            "usdt_amount": 100, "leverage": 10, "wait_seconds": hold, "rest_seconds": rest
+        })
+    # Both engines run against one mock exchange, whose weight headers carry over from run to run;
+    # the client-side limits are lifted so only the timing differs
+    rate_limits = {"request_weight_1m": 10 ** 9, "orders_10s": 10 ** 9, "orders_1m": 10 ** 9}
+    return {"accounts": accounts, "jobs": jobs,
+            "network": {"base_url": base_url, "pool_size": 2, "rate_limits": rate_limits}}
+
+
+def run_once(exchange, base_url, engine_class, job_count, duration, hold, rest):
+    config = _config(base_url, job_count, hold, rest)
+    clients = create_clients(config, AsterDexAPI)
+    for api in clients.values():
+        exchange.configure_session(api.session)
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    engine = engine_class(jobs)
+    peak_threads = 0
+    try:
+        engine.start()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            peak_threads = max(peak_threads, _engine_threads())
+            time.sleep(0.05)
+    finally:
+        engine.stop()
+        for job in jobs:
+            job.executor.shutdown()
+            job.account1.close_all_positions(job.symbol)
+            job.account2.close_all_positions(job.symbol)
+        for api in clients.values():
+            api.close()
+    cycles = sum(job.stats['cycles_completed'] for job in jobs)
+    period = duration * job_count / cycles if cycles else float('inf')
+    print(f"{engine_class.__name__:<15} {job_count:>4} jobs  {cycles:6d} cycles  period {period * 1000:8.1f} ms "
+          f"(target {(hold + rest) * 1000:.0f}, drift {(period - hold - rest) * 1000:+7.1f} ms)  "
+          f"engine threads {peak_threads}")
+
+
+def run(job_counts, duration, hold, rest, latency):
+    exchange = MockExchange(tls=True, latency=latency)
+    base_url = exchange.start()
+    try:
+        for job_count in job_counts:
+            for engine_class in (SleepingEngine, HedgeEngine):
+                run_once(exchange, base_url, engine_class, job_count, duration, hold, rest)
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+    parser.add_argument("--hold", type=float, default=0.5, help="wait_seconds of every job")
+    parser.add_argument("--rest", type=float, default=0.2, help="rest_seconds of every job")
+    parser.add_argument("--latency", type=float, default=0.05, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.jobs, args.duration, args.hold, args.rest, args.latency)
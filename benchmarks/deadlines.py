@@ -0,0 +1,83 @@
+"""Stalled responses with only the per-request timeout vs per-phase latency budgets.
+
+Runs one hedge job against the mock exchange while `--stall-rate` of the
+responses are held back `--stall` seconds, first with budgets too large to
+matter (each request still has the client's `timeout`), then with
+`--budget` seconds for sizing, opening and closing and the default flatten
+budget. Reports the cycles completed, how long the open, close and flatten
+phases took at worst, the deadline misses by phase and action, and that
+both accounts end up flat after the exit flatten.
+
+Run from the repository root:
+
+    python -m benchmarks.deadlines --stall-rate 0.05 --stall 4 --budget 1 --duration 30
+"""
+import argparse
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from deadline import DEFAULT_BUDGETS
+from flatten import flatten_all, flatten_targets
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def _phase_max(metrics, phase):
+    with metrics._lock:
+        samples = [sample for (name, labels), histogram in metrics.histograms.items()
+                   if name == 'cycle_phase_seconds' and dict(labels).get('phase') == phase
+                   for sample in histogram.samples]
+    return max(samples, default=0.0)
+
+
+def run_once(label, stall_rate, stall, budgets, duration, seed):
+    exchange = MockExchange(tls=True, stall_rate=stall_rate, stall_seconds=stall, seed=seed)
+    base_url = exchange.start()
+    config = {
+        "accounts": {name: {"api_key": name, "api_secret": "secret"} for name in ("long", "short")},
+        "jobs": [{"symbol": "ETHUSDT", "account1": "long", "account2": "short", "usdt_amount": 100,
+                  "leverage": 10, "wait_seconds": 0.5, "rest_seconds": 0.2, "budgets": budgets}],
+        "network": {"base_url": base_url, "timeout": 10}
+    }
+    clients = create_clients(config, AsterDexAPI)
+    for api in clients.values():
+        exchange.configure_session(api.session)
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    engine = HedgeEngine(jobs)
+    try:
+        engine.start()
+        time.sleep(duration)
+    finally:
+        engine.stop()
+        for job in jobs:
+            job.executor.shutdown()
+        # As the scripts' exit cleanup does, without a budget
+        flatten_all(flatten_targets(jobs))
+        metrics = jobs[0].account1.metrics
+        for api in clients.values():
+            api.close()
+        exchange.stop()
+    misses = metrics.counter_total('deadline_misses_total', 'phase')
+    actions = metrics.counter_total('deadline_misses_total', 'action')
+    flat = all(amount == 0 for account in exchange.accounts.values() for amount, _ in account['positions'].values())
+    print(f"{label:<14} {jobs[0].stats['cycles_completed']:5d} cycles  worst open {_phase_max(metrics, 'open'):6.2f}s  "
+          f"worst close {_phase_max(metrics, 'close'):6.2f}s  worst flatten {_phase_max(metrics, 'flatten'):6.2f}s  misses {dict(sorted(misses.items())) or '-'}  "
+          f"actions {dict(sorted(actions.items())) or '-'}  flat at exit {flat}")
+
+
+def run(stall_rate, stall, budget, duration, seed):
+    unbounded = {phase: 3600 for phase in DEFAULT_BUDGETS}
+    run_once("timeout only", stall_rate, stall, unbounded, duration, seed)
+    budgets = {phase: budget for phase in ('sizing', 'open', 'close')}
+    run_once(f"budget {budget:g}s", stall_rate, stall, dict(DEFAULT_BUDGETS, **budgets), duration, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="share of responses held back")
+    parser.add_argument("--stall", type=float, default=4, help="seconds a held response is delayed")
+    parser.add_argument("--budget", type=float, default=1, help="seconds for each of sizing, open and close")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(args.stall_rate, args.stall, args.budget, args.duration, args.seed)
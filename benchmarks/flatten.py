@@ -0,0 +1,96 @@
+"""Emergency flatten: account by account vs every leg at once with verification.
+
+Gives `--jobs` jobs (each on its own account pair) open hedges on the mock
+exchange with `--latency` seconds added to every request, the first one
+larger than the book can fill in one market order, and `--error-rate` of
+the close orders failing. Each mode starts from the same positions: the
+previous cleanup (per job, account 1 then account 2, the first position
+entry closed and the response taken as success) and flatten_all (open
+orders cancelled, every leg closed at once, positions read back and
+retried until flat). Reports how long each took, the orders sent and
+which accounts were really flat afterwards.
+
+Run from the repository root:
+
+    python -m benchmarks.flatten --jobs 8 --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from flatten import flatten_all, flatten_targets
+from hedge_engine import HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def _config(base_url, job_count):
+    return {
+        "accounts": {f"job{i}-{leg}": {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+                     for i in range(job_count) for leg in ("long", "short")},
+        "jobs": [{"symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short", "usdt_amount": 100,
+                  "leverage": 10, "wait_seconds": 1} for i in range(job_count)],
+        "network": {"base_url": base_url}
+    }
+
+
+def _open_positions(exchange, jobs):
+    price = exchange.price_of("ETHUSDT")
+    # One book side holds book_levels * level_notional; the first job's legs need a second order
+    oversized = round(exchange.book_levels * exchange.level_notional / price * 1.4, 3)
+    for index, job in enumerate(jobs):
+        quantity = oversized if index == 0 else 0.5
+        exchange.account(job.account1.api_key)['positions']["ETHUSDT"] = (quantity, price)
+        exchange.account(job.account2.api_key)['positions']["ETHUSDT"] = (-quantity, price)
+
+
+def sequential_cleanup(jobs):
+    """What ran at exit before: close account 1, then account 2, for one job after another"""
+    cleared = 0
+    for job in jobs:
+        for api in (job.account1, job.account2):
+            try:
+                position_info = api.get_position_info(job.symbol)
+                amount = float(position_info[0]['positionAmt'])
+                if amount != 0 and api.place_order(job.symbol, "SELL" if amount > 0 else "BUY", "MARKET", abs(amount)):
+                    cleared += 1
+            except Exception:
+                pass
+    return cleared
+
+
+def run_mode(label, exchange, jobs, cleanup):
+    _open_positions(exchange, jobs)
+    orders = exchange.path_counts['/fapi/v1/order']
+    start = time.perf_counter()
+    result = cleanup(jobs)
+    elapsed = time.perf_counter() - start
+    still_open = sum(1 for job in jobs for api in (job.account1, job.account2)
+                     if exchange.accounts[api.api_key]['positions'].get(job.symbol, (0.0, 0.0))[0] != 0)
+    reported = (f"reported flat {result['flat']!s:<5}" if isinstance(result, dict)
+                else f"reported cleared {result}/{2 * len(jobs)}")
+    print(f"{label:<11} {elapsed * 1000:8.1f} ms  {exchange.path_counts['/fapi/v1/order'] - orders:3d} orders  "
+          f"{reported}  accounts still open {still_open}")
+
+
+def run(job_count, latency, error_rate):
+    exchange = MockExchange(tls=False, latency=latency, error_rate=error_rate, error_paths={"/fapi/v1/order"}, seed=7)
+    base_url = exchange.start()
+    try:
+        config = _config(base_url, job_count)
+        clients = create_clients(config, AsterDexAPI)
+        jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+        run_mode("sequential", exchange, jobs, sequential_cleanup)
+        run_mode("flatten_all", exchange, jobs, lambda jobs: flatten_all(flatten_targets(jobs), retry_delay=0.05))
+        for api in clients.values():
+            api.close()
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="injected base latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of close orders that fail")
+    args = parser.parse_args()
+    run(args.jobs, args.latency, args.error_rate)
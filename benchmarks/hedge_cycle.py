@@ -0,0 +1,136 @@
+"""End-to-end hedge cycles against the mock exchange under several network scenarios.
+
+Builds clients and jobs exactly as main() does (create_clients, load_jobs,
+HedgeEngine), with the status pollers of the first job, and runs every
+scenario for `--duration` seconds with zero hold and rest time. Reports
+cycles per second, requests per cycle by endpoint, order (leg) latency, the
+skew between the legs, and the cycle phase / request stage breakdown from the
+clients' shared MetricsRegistry.
+
+Run from the repository root:
+
+    python -m benchmarks.hedge_cycle --duration 5 --jobs 2
+    python -m benchmarks.hedge_cycle --scenario errors --duration 10
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import format_summary, summarize
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+from market_data import MarkPriceFeed
+
+SCENARIOS = {
+    "baseline": dict(exchange=dict(latency=0.01, jitter=0.005)),
+    "jitter": dict(exchange=dict(latency=0.02, jitter=0.03)),
+    "errors": dict(exchange=dict(latency=0.01, jitter=0.005, error_rate=0.02, order_reject_rate=0.02, seed=1)),
+    "volatile": dict(exchange=dict(latency=0.01, jitter=0.005, volatility=0.002, level_notional=30.0)),
+    "streams": dict(exchange=dict(latency=0.01, jitter=0.005), streams=True),
+}
+
+
+def _poll(api, symbol, stopped):
+    # update_position_status without the UI
+    while not stopped.is_set():
+        try:
+            api.get_position_info(symbol)
+            api.get_current_price(symbol, max_age=1)
+            api.get_account_info()
+        except Exception:
+            pass
+        stopped.wait(api.scheduler.poll_interval(1))
+
+
+def _config(base_url, job_count):
+    symbols = ["ETHUSDT", "BTCUSDT", "SOLUSDT", "DOGEUSDT"]
+    accounts, jobs = {}, []
+    for i in range(job_count):
+        for leg in ("long", "short"):
+            accounts[f"job{i}-{leg}"] = {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+        jobs.append({"symbol": symbols[i % len(symbols)], "account1": f"job{i}-long", "account2": f"job{i}-short",
+                     "usdt_amount": 100, "leverage": 10, "wait_seconds": 0, "rest_seconds": 0})
+    return {"accounts": accounts, "jobs": jobs, "network": {"base_url": base_url}}
+
+
+def run_scenario(name, scenario, job_count, duration):
+    exchange = MockExchange(tls=True, **scenario['exchange'])
+    base_url = exchange.start(streams=scenario.get('streams', False), stream_interval=0.05)
+    config = _config(base_url, job_count)
+    clients = create_clients(config, AsterDexAPI)
+    leg_times = []
+    for api in clients.values():
+        exchange.configure_session(api.session)
+        send_prepared = api.send_prepared
+
+        def timed_send(prepared, send_prepared=send_prepared):
+            start = time.perf_counter()
+            try:
+                return send_prepared(prepared)
+            finally:
+                leg_times.append(time.perf_counter() - start)
+        api.send_prepared = timed_send
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    market_data = None
+    if exchange.ws_url:
+        market_data = MarkPriceFeed(sorted(set(job.symbol for job in jobs)), ws_url=exchange.ws_url, max_age=1)
+        market_data.start()
+        for api in clients.values():
+            api.market_data = market_data
+        deadline = time.monotonic() + 5
+        while any(market_data.get(job.symbol) is None for job in jobs) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    for job in jobs:
+        job.set_leverage()
+
+    errors = []
+    engine = HedgeEngine(jobs, on_error=lambda job, e: errors.append(str(e)))
+    stopped = threading.Event()
+    pollers = [threading.Thread(target=_poll, args=(api, jobs[0].symbol, stopped), daemon=True)
+               for api in (jobs[0].account1, jobs[0].account2)]
+    exchange.path_counts.clear()
+    try:
+        for poller in pollers:
+            poller.start()
+        engine.start()
+        time.sleep(duration)
+    finally:
+        engine.stop()
+        stopped.set()
+        engine.wait()
+        for job in jobs:
+            job.executor.shutdown()
+            job.account1.close_all_positions(job.symbol)
+            job.account2.close_all_positions(job.symbol)
+        if market_data is not None:
+            market_data.stop()
+        for api in clients.values():
+            api.close()
+        exchange.stop()
+
+    cycles = sum(job.stats['cycles_completed'] for job in jobs)
+    skew = engine.skew_stats()
+    print(f"{name:<10} {cycles / duration:7.2f} cycles/s  cycles {cycles:5d}  failed {len(errors):3d}  "
+          f"requests/cycle {sum(exchange.path_counts.values()) / max(cycles, 1):6.2f}  "
+          f"partial fills {exchange.partial_fills}")
+    per_cycle = ", ".join(f"{path.rsplit('/', 1)[-1]} {count / max(cycles, 1):.2f}"
+                          for path, count in exchange.path_counts.most_common())
+    print(f"           {per_cycle}")
+    print("           " + format_summary("leg latency", summarize(leg_times)))
+    print(f"           leg skew send p50 {skew['send_p50_ms']:.3f} ms  p99 {skew['send_p99_ms']:.3f} ms")
+    metrics = jobs[0].account1.metrics
+    for name, group_by in (("cycle_phase_seconds", "phase"), ("request_stage_seconds", "stage")):
+        print("           " + "  ".join(f"{row[group_by]} p50 {row['p50_ms']:.1f} / p99 {row['p99_ms']:.1f} ms"
+                                        for row in metrics.summaries(name, group_by)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="scenario to run, may be repeated (default: all)")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=5, help="seconds per scenario")
+    args = parser.parse_args()
+    for scenario in args.scenario or list(SCENARIOS):
+        run_scenario(scenario, SCENARIOS[scenario], args.jobs, args.duration)
@@ -0,0 +1,73 @@
+"""Total hedge cycles per minute as the number of jobs in one HedgeEngine grows.
+
+Every job trades its own account pair against the mock exchange; all clients
+share one connection pool and clock offset, as in main().
+
+Run from the repository root:
+
+    python -m benchmarks.job_scaling --jobs 1 2 4 8 --duration 5 --latency 0.02
+"""
+import argparse
+import threading
+
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def _config(base_url, job_count, hold):
+    accounts = {}
+    jobs = []
+    for i in range(job_count):
+        for leg in ("long", "short"):
+            accounts[f"job{i}-{leg}"] = {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+        jobs.append({
+            "symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short",
+            "usdt_amount": 100, "leverage": 10, "wait_seconds": hold, "rest_seconds": 0
+        })
+    return {"accounts": accounts, "jobs": jobs, "network": {"base_url": base_url}}
+
+
+def run_once(exchange, base_url, job_count, duration, hold):
+    config = _config(base_url, job_count, hold)
+    clients = create_clients(config, AsterDexAPI)
+    for api in clients.values():
+        exchange.configure_session(api.session)
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    errors = []
+    engine = HedgeEngine(jobs, on_error=lambda job, e: errors.append(str(e)))
+    try:
+        engine.start()
+        timer = threading.Timer(duration, engine.stop)
+        timer.start()
+        engine.wait()
+    finally:
+        for job in jobs:
+            job.executor.shutdown()
+        for api in clients.values():
+            api.close()
+    cycles = sum(job.stats['cycles_completed'] for job in jobs)
+    skew = engine.skew_stats()
+    print(f"{job_count:>4} jobs  {cycles * 60 / duration:10.1f} cycles/min  "
+          f"per job {cycles * 60 / duration / job_count:8.1f}  "
+          f"leg skew p99 {skew['send_p99_ms']:7.3f} ms  errors {len(errors)}")
+
+
+def run(job_counts, duration, hold, latency):
+    exchange = MockExchange(tls=True, latency=latency)
+    base_url = exchange.start()
+    try:
+        for job_count in job_counts:
+            run_once(exchange, base_url, job_count, duration, hold)
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=5, help="seconds per job count")
+    parser.add_argument("--hold", type=float, default=0.1, help="wait_seconds of every job")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.jobs, args.duration, args.hold, args.latency)
@@ -0,0 +1,86 @@
+"""Trade journal write cost on the trading thread, and report speed over large journals.
+
+Writes: `--writes` fills through TradeJournal.record (queued, written by the
+background thread) vs a JSON line written and flushed per fill, timing only
+the caller. Reads: a journal of `--records` synthetic fills is summarized
+with the numpy path and with the pure-Python fallback.
+
+Run from the repository root:
+
+    python -m benchmarks.journal --writes 20000 --records 1000000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import format_summary, summarize
+from trade_journal import HEADER, MAGIC, RECORD, JournalReader, TradeJournal
+
+
+def _fills(count, seed=1):
+    rng = random.Random(seed)
+    symbols = ("ETHUSDT", "BTCUSDT", "SOLUSDT", "DOGEUSDT")
+    for i in range(count):
+        yield (symbols[i % len(symbols)], i % 4, "BUY" if i % 2 == 0 else "SELL", 0.05,
+               2000 + rng.uniform(-5, 5), 0.04, rng.uniform(0.005, 0.05), i)
+
+
+def bench_writes(directory, writes):
+    journal = TradeJournal(os.path.join(directory, "writes.journal"))
+    times = []
+    for fill in _fills(writes):
+        start = time.perf_counter()
+        journal.record(*fill)
+        times.append(time.perf_counter() - start)
+    journal.close()
+    print(format_summary("journal record()", summarize(times)))
+
+    times = []
+    with open(os.path.join(directory, "writes.jsonl"), "a") as f:
+        for symbol, leg, side, quantity, price, fee, latency, order_id in _fills(writes):
+            start = time.perf_counter()
+            f.write(json.dumps({"timestamp": time.time(), "symbol": symbol, "leg": leg, "side": side,
+                                "quantity": quantity, "price": price, "fee": fee, "latency": latency,
+                                "order_id": order_id}) + "\n")
+            f.flush()
+            times.append(time.perf_counter() - start)
+    print(format_summary("json line + flush", summarize(times)))
+
+
+def bench_reads(directory, records):
+    path = os.path.join(directory, "reads.journal")
+    now = time.time()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, RECORD.size, 0))
+        f.write(b"".join(RECORD.pack(now, symbol.encode("ascii"), leg, 0 if side == "BUY" else 1,
+                                     quantity, price, fee, latency, order_id)
+                         for symbol, leg, side, quantity, price, fee, latency, order_id in _fills(records)))
+    print(f"journal of {records} fills: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    for name, use_numpy in (("numpy", True), ("pure python", False)):
+        if use_numpy and importlib.util.find_spec("numpy") is None:
+            print("numpy        not installed")
+            continue
+        with JournalReader(path) as reader:
+            start = time.perf_counter()
+            report = reader.report(use_numpy=use_numpy)
+            elapsed = time.perf_counter() - start
+        fills = sum(entry['fills'] for entry in report.values())
+        print(f"{name:<12} report {elapsed * 1000:9.1f} ms  ({fills / elapsed / 1e6:.2f} M fills/s)")
+
+
+def run(writes, records):
+    with tempfile.TemporaryDirectory() as directory:
+        bench_writes(directory, writes)
+        bench_reads(directory, records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=20000)
+    parser.add_argument("--records", type=int, default=1000000)
+    args = parser.parse_args()
+    run(args.writes, args.records)
@@ -0,0 +1,70 @@
+"""Skew between the two hedge legs: sequential place_order calls vs HedgeExecutor.
+
+Run from the repository root:
+
+    python -m benchmarks.leg_skew --cycles 200 --latency 0.02 --jitter 0.01
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile
+from benchmarks.mock_exchange import MockExchange
+from hedge_executor import HedgeExecutor
+from hedge_trading_EN import AsterDexAPI
+
+
+def _legs(account1, account2, side1, side2):
+    return [
+        (account1, dict(symbol="ETHUSDT", side=side1, order_type="MARKET", quantity=0.01, position_side="BOTH")),
+        (account2, dict(symbol="ETHUSDT", side=side2, order_type="MARKET", quantity=0.01, position_side="BOTH")),
+    ]
+
+
+def _report(name, send_skew, ack_skew):
+    print(f"{name:<12} send skew p50 {percentile(send_skew, 50) * 1000:8.3f} ms  p99 {percentile(send_skew, 99) * 1000:8.3f} ms"
+          f"   ack skew p50 {percentile(ack_skew, 50) * 1000:8.3f} ms  p99 {percentile(ack_skew, 99) * 1000:8.3f} ms")
+
+
+def run(cycles, latency, jitter):
+    exchange = MockExchange(tls=True, latency=latency, jitter=jitter)
+    base_url = exchange.start()
+    accounts = []
+    for name in ("bench-1", "bench-2"):
+        api = AsterDexAPI(name, "secret", base_url=base_url)
+        exchange.configure_session(api.session)
+        accounts.append(api)
+    account1, account2 = accounts
+    account2.clock = account1.clock
+    try:
+        # Sequential: the second leg is only sent once the first one is acknowledged
+        send_skew, ack_skew = [], []
+        for i in range(cycles):
+            side1, side2 = ("BUY", "SELL") if i % 2 == 0 else ("SELL", "BUY")
+            times = []
+            for api, order in _legs(account1, account2, side1, side2):
+                sent = time.perf_counter()
+                api.place_order(**order)
+                times.append((sent, time.perf_counter()))
+            send_skew.append(times[1][0] - times[0][0])
+            ack_skew.append(abs(times[1][1] - times[0][1]))
+        _report("sequential", send_skew, ack_skew)
+
+        executor = HedgeExecutor()
+        for i in range(cycles):
+            side1, side2 = ("BUY", "SELL") if i % 2 == 0 else ("SELL", "BUY")
+            executor.execute(_legs(account1, account2, side1, side2))
+        _report("concurrent", list(executor.send_skew), list(executor.ack_skew))
+        executor.shutdown()
+    finally:
+        for api in accounts:
+            api.close()
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="injected base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="injected uniform jitter in seconds")
+    args = parser.parse_args()
+    run(args.cycles, args.latency, args.jitter)
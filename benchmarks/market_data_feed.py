@@ -0,0 +1,73 @@
+"""REST polling vs the mark price stream cache for get_current_price/get_funding_rate.
+
+Also drops the stream connection once to measure reconnect + resubscribe time.
+Run from the repository root:
+
+    python -m benchmarks.market_data_feed --reads 500
+"""
+import argparse
+import time
+
+from benchmarks.common import summarize, format_summary
+from benchmarks.mock_exchange import MockExchange, MockStreamServer
+from hedge_trading_EN import AsterDexAPI
+from market_data import MarkPriceFeed
+
+
+def _wait_fresh(feed, symbol, timeout=10):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        age = feed.age(symbol)
+        if feed.connected and age is not None and age < 0.05:
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    raise TimeoutError("no fresh mark price from the stream")
+
+
+def _read(api, reads):
+    samples = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        api.get_current_price("ETHUSDT", max_age=0)
+        api.get_funding_rate("ETHUSDT")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(reads):
+    exchange = MockExchange(tls=True)
+    base_url = exchange.start()
+    streams = MockStreamServer(exchange, interval=0.05)
+    ws_url = streams.start()
+    api = AsterDexAPI("bench", "secret", base_url=base_url)
+    exchange.configure_session(api.session)
+    feed = MarkPriceFeed(["ETHUSDT"], ws_url=ws_url, max_age=1, reconnect_delay=0.1)
+    try:
+        requests_before = exchange.request_count
+        rest = _read(api, reads)
+        print(format_summary("REST price+funding", summarize(rest)), f" requests {exchange.request_count - requests_before}")
+
+        feed.start()
+        _wait_fresh(feed, "ETHUSDT")
+        api.market_data = feed
+        requests_before = exchange.request_count
+        cached = _read(api, reads)
+        print(format_summary("stream cache", summarize(cached)), f" requests {exchange.request_count - requests_before}")
+
+        streams.drop_connections()
+        time.sleep(0.01)
+        recovery = _wait_fresh(feed, "ETHUSDT")
+        print(f"reconnect + resubscribe      {recovery * 1000:8.3f} ms  reconnects {feed.reconnects}"
+              f"  REST fallbacks {feed.rest_fallbacks}")
+    finally:
+        feed.stop()
+        api.close()
+        streams.stop()
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=500)
+    args = parser.parse_args()
+    run(args.reads)
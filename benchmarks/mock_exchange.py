@@ -0,0 +1,754 @@
+"""Local stand-in for the AsterDex futures REST API and WebSocket streams.
+
+Used by the benchmarks, or run on its own and point `network.base_url` /
+`streams.ws_url` in config.json at it:
+
+    python -m benchmarks.mock_exchange --port 8080 --latency 0.02 --jitter 0.01 --streams
+"""
+import argparse
+import base64
+import collections
+import hashlib
+import hmac
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        if isinstance(self.request, ssl.SSLSocket):
+            # Handshake in the connection's own thread rather than in accept()
+            self.request.do_handshake()
+        super().setup()
+        self.server.exchange.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        params = dict(parse_qsl(parsed.query))
+        total_params = parsed.query
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            request_body = self.rfile.read(length).decode()
+            params.update(parse_qsl(request_body))
+            total_params += request_body
+        exchange = self.server.exchange
+        status, body = exchange.handle(method, parsed.path, params, self.headers, total_params)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in exchange.usage_headers(self.headers.get('X-MBX-APIKEY', '')).items():
+            self.send_header(name, value)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients that time out on a stalled response hang up before it is written
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError, ssl.SSLEOFError)):
+            super().handle_error(request, client_address)
+
+
+WEIGHTS = {"/fapi/v2/account": 5, "/fapi/v2/positionRisk": 5, "/fapi/v1/depth": 20, "/fapi/v1/positionSide/dual": 30}
+
+SYMBOLS = {
+    # price None follows MockExchange.price
+    "ETHUSDT": {"price": None, "stepSize": "0.001", "minQty": "0.001", "maxQty": "10000", "tickSize": "0.01", "notional": "5"},
+    "BTCUSDT": {"price": 60000.0, "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000", "tickSize": "0.1", "notional": "5"},
+    "SOLUSDT": {"price": 150.0, "stepSize": "0.01", "minQty": "0.01", "maxQty": "100000", "tickSize": "0.001", "notional": "5"},
+    "DOGEUSDT": {"price": 0.15, "stepSize": "1", "minQty": "1", "maxQty": "10000000", "tickSize": "0.00001", "notional": "5"},
+}
+
+
+class MockExchange:
+    """Local stand-in for fapi.asterdex.com used by the benchmarks.
+
+    Market orders walk a synthetic order book around the current price
+    (`spread_bps`, `book_levels` levels `level_bps` apart, `level_notional`
+    USDT each), so large orders pay slippage and orders larger than the book
+    are only partly filled. Prices follow a random walk when `volatility`
+    (per sqrt second) is set. Failures can be injected with `error_rate`
+    (-1001 on any endpoint, or only on `error_paths`), `order_reject_rate`
+    (-2019 on orders), `stall_rate` (a response held back `stall_seconds`)
+    and `clock_skew_ms` (server clock offset, checked against recvWindow).
+    Signatures are verified (-1022) for the API keys listed in `secrets`.
+    The same book is served by /fapi/v1/depth and, as numbered diff events,
+    by the `<symbol>@depth` stream.
+    """
+
+    def __init__(self, tls=True, price=2000.0, funding_rate=0.0001, latency=0.0, jitter=0.0,
+                 weight_limit=None, order_limit_10s=None, spread_bps=1.0, book_levels=20, level_bps=0.5,
+                 level_notional=50000.0, volatility=0.0, error_rate=0.0, error_paths=None,
+                 order_reject_rate=0.0, stall_rate=0.0, stall_seconds=2.0, clock_skew_ms=0, seed=None,
+                 funding_interval=28800, secrets=None):
+        self.tls = tls
+        self.price = price
+        self.funding_rate = funding_rate
+        self.funding_interval = funding_interval
+        self.secrets = secrets or {}
+        self.bad_signatures = 0
+        self.latency = latency
+        self.jitter = jitter
+        self.spread_bps = spread_bps
+        self.book_levels = book_levels
+        self.level_bps = level_bps
+        self.level_notional = level_notional
+        self.volatility = volatility
+        self.error_rate = error_rate
+        self.error_paths = error_paths
+        self.order_reject_rate = order_reject_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.clock_skew_ms = clock_skew_ms
+        self._random = random.Random(seed)
+        self._last_walk = time.monotonic()
+        self.injected_errors = 0
+        self.partial_fills = 0
+        self._depth = {}
+        self.symbols = {symbol: dict(spec) for symbol, spec in SYMBOLS.items()}
+        self.accounts = {}
+        self.listen_keys = {}
+        self.streams = None
+        self._order_ids = itertools.count(1)
+        # RESULT-shaped orders by (api key, client order id), for order queries
+        self.orders = {}
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.request_count = 0
+        self.path_counts = collections.Counter()
+        self.rejected_orders = 0
+        # Fixed-window usage counters as the exchange reports them; limits are only enforced when set
+        self.weight_limit = weight_limit
+        self.order_limit_10s = order_limit_10s
+        self.throttled = 0
+        self._weight_used = {}
+        self._orders_used = {}
+        self.ws_url = None
+        self.cert_path = None
+        self._server = None
+        self._thread = None
+        self._tmpdir = None
+
+    def account(self, api_key):
+        with self._lock:
+            if api_key not in self.accounts:
+                self.accounts[api_key] = {'api_key': api_key, 'balance': 10000.0, 'leverage': 20, 'margin_type': 'CROSSED',
+                                          'dual_side': False, 'positions': {}}
+            return self.accounts[api_key]
+
+    def usage_headers(self, api_key):
+        now = time.time()
+        with self._lock:
+            return {
+                "X-MBX-USED-WEIGHT-1M": str(self._weight_used.get(int(now // 60), 0)),
+                "X-MBX-ORDER-COUNT-10S": str(self._orders_used.get((api_key, int(now // 10)), 0))
+            }
+
+    def _count_usage(self, method, path, api_key):
+        """Add the request to the usage windows; False if it breaks a configured limit"""
+        now = time.time()
+        with self._lock:
+            minute = int(now // 60)
+            self._weight_used[minute] = self._weight_used.get(minute, 0) + WEIGHTS.get(path, 1)
+            allowed = self.weight_limit is None or self._weight_used[minute] <= self.weight_limit
+            if path == "/fapi/v1/order" and method == "POST":
+                window = (api_key, int(now // 10))
+                self._orders_used[window] = self._orders_used.get(window, 0) + 1
+                allowed = allowed and (self.order_limit_10s is None or self._orders_used[window] <= self.order_limit_10s)
+            if not allowed:
+                self.throttled += 1
+            return allowed
+
+    def price_of(self, symbol):
+        price = self.symbols.get(symbol, {}).get('price')
+        return self.price if price is None else price
+
+    def server_time(self):
+        return int(time.time() * 1000) + self.clock_skew_ms
+
+    def next_funding_time(self, now_ms):
+        interval_ms = int(self.funding_interval * 1000)
+        return (now_ms // interval_ms + 1) * interval_ms
+
+    def _walk_prices(self):
+        """Move every price by a Gaussian step scaled to the time since the last step"""
+        if not self.volatility:
+            return
+        with self._lock:
+            now = time.monotonic()
+            scale = self.volatility * math.sqrt(now - self._last_walk)
+            self._last_walk = now
+            self.price *= math.exp(self._random.gauss(0, scale))
+            for spec in self.symbols.values():
+                if spec.get('price') is not None:
+                    spec['price'] *= math.exp(self._random.gauss(0, scale))
+
+    def book(self, symbol, side):
+        """Synthetic (price, quantity) levels a market order of `side` would take, best first"""
+        mid = self.price_of(symbol)
+        tick = float(self.symbols.get(symbol, {}).get('tickSize', '0.01'))
+        direction = 1 if side == "BUY" else -1
+        levels = []
+        for i in range(self.book_levels):
+            offset = mid * (self.spread_bps / 2 + i * self.level_bps) / 10000
+            price = round((mid + direction * max(offset, tick * (i + 1))) / tick) * tick
+            levels.append((price, self.level_notional / mid))
+        return levels
+
+    def _depth_state(self, symbol):
+        return self._depth.setdefault(symbol, {'update_id': 0, 'bids': [], 'asks': []})
+
+    def depth_snapshot(self, symbol, limit=1000):
+        """/fapi/v1/depth: the book as of the last depth event published, numbered with that event's `u`"""
+        with self._lock:
+            state = dict(self._depth_state(symbol))
+        if not state['update_id']:
+            state['bids'], state['asks'] = self.book(symbol, "SELL"), self.book(symbol, "BUY")
+        now = int(time.time() * 1000)
+        return {"lastUpdateId": state['update_id'], "E": now, "T": now,
+                "bids": [[str(price), str(quantity)] for price, quantity in state['bids'][:limit]],
+                "asks": [[str(price), str(quantity)] for price, quantity in state['asks'][:limit]]}
+
+    @staticmethod
+    def _level_changes(previous, current):
+        changes = dict(current)
+        for price, quantity in previous:
+            if changes.get(price) == quantity:
+                del changes[price]
+            elif price not in changes:
+                changes[price] = 0.0
+        return [[str(price), str(quantity)] for price, quantity in changes.items()]
+
+    def depth_event(self, symbol, now_ms):
+        """depthUpdate taking the last published book of `symbol` to the current one.
+
+        One is published every stream interval, empty when nothing moved. `u`
+        advances by one per changed level (at least one), `pu` is the previous
+        event's `u`.
+        """
+        bids, asks = self.book(symbol, "SELL"), self.book(symbol, "BUY")
+        with self._lock:
+            state = self._depth_state(symbol)
+            bid_changes = self._level_changes(state['bids'], bids)
+            ask_changes = self._level_changes(state['asks'], asks)
+            previous = state['update_id']
+            state['update_id'] += max(1, len(bid_changes) + len(ask_changes))
+            state['bids'], state['asks'] = bids, asks
+            return {"e": "depthUpdate", "E": now_ms, "T": now_ms, "s": symbol,
+                    "U": previous + 1, "u": state['update_id'], "pu": previous,
+                    "b": bid_changes, "a": ask_changes}
+
+    def _match(self, symbol, side, quantity):
+        """Walk the book; returns (filled quantity, average price)"""
+        remaining, cost = quantity, 0.0
+        for price, size in self.book(symbol, side):
+            take = min(remaining, size)
+            cost += take * price
+            remaining -= take
+            if remaining <= 0:
+                break
+        filled = quantity - max(remaining, 0.0)
+        return filled, (cost / filled if filled else 0.0)
+
+    def _inject_failure(self, method, path, params):
+        """Error response chosen by the injection settings, or None"""
+        if self.stall_rate and self._random.random() < self.stall_rate:
+            time.sleep(self.stall_seconds)
+        if 'timestamp' in params:
+            drift = self.server_time() - int(params['timestamp'])
+            if drift > int(params.get('recvWindow', 5000)) or drift < -1000:
+                return 400, {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."}
+        if self.error_rate and (self.error_paths is None or path in self.error_paths) \
+                and self._random.random() < self.error_rate:
+            self.injected_errors += 1
+            return 503, {"code": -1001, "msg": "Internal error; unable to process your request. Please try again."}
+        if path == "/fapi/v1/order" and method == "POST" and self.order_reject_rate \
+                and self._random.random() < self.order_reject_rate:
+            self.injected_errors += 1
+            return 400, {"code": -2019, "msg": "Margin is insufficient."}
+        return None
+
+    def _exchange_info(self):
+        return {"timezone": "UTC", "serverTime": int(time.time() * 1000), "symbols": [{
+            "symbol": symbol, "status": "TRADING", "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": spec['tickSize'], "maxPrice": "1000000", "tickSize": spec['tickSize']},
+                {"filterType": "LOT_SIZE", "stepSize": spec['stepSize'], "minQty": spec['minQty'], "maxQty": spec['maxQty']},
+                {"filterType": "MARKET_LOT_SIZE", "stepSize": spec['stepSize'], "minQty": spec['minQty'], "maxQty": spec['maxQty']},
+                {"filterType": "MIN_NOTIONAL", "notional": spec['notional']}
+            ]} for symbol, spec in self.symbols.items()]}
+
+    def _reject_order(self, params):
+        """Error body the real exchange returns for an order that breaks a symbol filter, or None"""
+        spec = self.symbols.get(params['symbol'])
+        if spec is None:
+            return {"code": -1121, "msg": "Invalid symbol."}
+        quantity = Decimal(params['quantity'])
+        if quantity % Decimal(spec['stepSize']) != 0:
+            return {"code": -1111, "msg": "Precision is over the maximum defined for this asset."}
+        if not Decimal(spec['minQty']) <= quantity <= Decimal(spec['maxQty']):
+            return {"code": -4003, "msg": "Quantity less than or equal to zero."}
+        # Reduce-only orders may close a position worth less than the minimum notional
+        if params.get('reduceOnly') != "true" and \
+                quantity * Decimal(str(self.price_of(params['symbol']))) < Decimal(spec['notional']):
+            return {"code": -4164, "msg": f"Order's notional must be no smaller than {spec['notional']}"}
+        return None
+
+    def _reduce_only_rejection(self, account, params):
+        """Error body for a reduce-only order that would not reduce the position, or None"""
+        if params.get('reduceOnly') != "true":
+            return None
+        amount = account['positions'].get(params['symbol'], (0.0, 0.0))[0]
+        if amount == 0 or (amount > 0) == (params['side'] == "BUY"):
+            return {"code": -2022, "msg": "ReduceOnly Order is rejected."}
+        return None
+
+    def _fill_order(self, account, params):
+        symbol = params['symbol']
+        requested = float(params['quantity'])
+        if params.get('reduceOnly') == "true":
+            # Never more than the position it reduces
+            requested = min(requested, abs(account['positions'].get(symbol, (0.0, 0.0))[0]))
+        quantity, fill_price = self._match(symbol, params['side'], requested)
+        signed_qty = quantity if params['side'] == "BUY" else -quantity
+        with self._lock:
+            amount, entry = account['positions'].get(symbol, (0.0, 0.0))
+            new_amount = round(amount + signed_qty, 8)
+            if amount == 0 or (amount > 0) == (signed_qty > 0):
+                entry = (abs(amount) * entry + quantity * fill_price) / abs(new_amount) if new_amount else 0.0
+            else:
+                closed = min(abs(amount), quantity)
+                account['balance'] += closed * (fill_price - entry) * (1 if amount > 0 else -1)
+                if abs(signed_qty) > abs(amount):
+                    entry = fill_price
+                elif new_amount == 0:
+                    entry = 0.0
+            account['positions'][symbol] = (new_amount, entry)
+            balance = account['balance']
+        if quantity < requested:
+            # The book ran out; like the exchange, the rest of a market order expires
+            self.partial_fills += 1
+        executed = f"{quantity:.8f}".rstrip('0').rstrip('.')
+        order = {
+            "orderId": next(self._order_ids), "symbol": symbol,
+            "status": "FILLED" if quantity >= requested else "EXPIRED",
+            "clientOrderId": params.get('newClientOrderId', ''), "side": params['side'],
+            "type": params['type'], "positionSide": params.get('positionSide', 'BOTH'),
+            "origQty": params['quantity'], "executedQty": executed,
+            "avgPrice": str(fill_price), "cumQuote": str(quantity * fill_price),
+            "updateTime": int(time.time() * 1000)
+        }
+        self._push_fill(account, order, new_amount, entry, balance)
+        if order['clientOrderId']:
+            self.orders[(account['api_key'], order['clientOrderId'])] = dict(order)
+        if params.get('newOrderRespType') != "RESULT":
+            # The default ACK response is sent before matching: nothing in it says what filled
+            order.update(status="NEW", executedQty="0", avgPrice="0.00000", cumQuote="0")
+        return order
+
+    def _push_fill(self, account, order, amount, entry, balance):
+        if self.streams is None:
+            return
+        now = int(time.time() * 1000)
+        self.streams.publish_user_event(account['api_key'], {
+            "e": "ORDER_TRADE_UPDATE", "E": now, "T": now,
+            "o": {"s": order['symbol'], "c": order['clientOrderId'], "S": order['side'], "o": order['type'],
+                  "q": order['origQty'], "p": "0", "ap": order['avgPrice'], "x": "TRADE", "X": "FILLED",
+                  "i": order['orderId'], "l": order['executedQty'], "z": order['executedQty'],
+                  "L": order['avgPrice'], "N": "USDT", "n": "0", "T": now, "ps": order['positionSide']}
+        })
+        self.streams.publish_user_event(account['api_key'], {
+            "e": "ACCOUNT_UPDATE", "E": now, "T": now,
+            "a": {"m": "ORDER",
+                  "B": [{"a": "USDT", "wb": str(balance), "cw": str(balance), "bc": "0"}],
+                  "P": [{"s": order['symbol'], "pa": str(amount), "ep": str(entry), "cr": "0",
+                         "up": str(amount * (self.price_of(order['symbol']) - entry)), "mt": "cross", "iw": "0", "ps": "BOTH"}]}
+        })
+
+    def _position_risk(self, account, symbol):
+        amount, entry = account['positions'].get(symbol, (0.0, 0.0))
+        # Roughly where the leg's margin runs out, ignoring maintenance margin and the rest of the account
+        liquidation = entry * (1 - math.copysign(1, amount) / account['leverage']) if amount else 0.0
+        return [{
+            "symbol": symbol, "positionAmt": str(amount), "entryPrice": str(entry),
+            "markPrice": str(self.price_of(symbol)), "unRealizedProfit": str(amount * (self.price_of(symbol) - entry)),
+            "liquidationPrice": str(liquidation), "leverage": str(account['leverage']), "positionSide": "BOTH",
+            "marginType": "isolated" if account['margin_type'] == 'ISOLATED' else "cross", "isolatedMargin": "0", "updateTime": int(time.time() * 1000)
+        }]
+
+    def _account_info(self, account):
+        unrealized = sum(amount * (self.price_of(symbol) - entry)
+                         for symbol, (amount, entry) in account['positions'].items())
+        balance = account['balance']
+        return {"assets": [{
+            "asset": "USDT", "walletBalance": str(balance), "marginBalance": str(balance + unrealized),
+            "unrealizedProfit": str(unrealized), "availableBalance": str(balance)
+        }]}
+
+    def _signature_valid(self, api_key, params, total_params):
+        """The signature must cover the query string and body exactly as they were sent"""
+        secret = self.secrets.get(api_key)
+        if secret is None or 'signature' not in params:
+            return True
+        signed, _, signature = total_params.rpartition('&signature=')
+        expected = hmac.new(secret.encode(), signed.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature) and signature == params['signature']
+
+    def handle(self, method, path, params, headers, total_params=''):
+        self.request_count += 1
+        self.path_counts[path] += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        account = self.account(headers.get('X-MBX-APIKEY', ''))
+        if not self._count_usage(method, path, account['api_key']):
+            return 429, {"code": -1003, "msg": "Too many requests; current limit is exceeded."}
+        if not self._signature_valid(account['api_key'], params, total_params):
+            self.bad_signatures += 1
+            return 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+        failure = self._inject_failure(method, path, params)
+        if failure is not None:
+            return failure
+        self._walk_prices()
+        if path == "/fapi/v1/time":
+            return 200, {"serverTime": self.server_time()}
+        if path == "/fapi/v1/ticker/price":
+            return 200, {"symbol": params.get("symbol"), "price": str(self.price_of(params.get("symbol"))), "time": int(time.time() * 1000)}
+        if path == "/fapi/v1/premiumIndex":
+            return 200, {"symbol": params.get("symbol"), "markPrice": str(self.price_of(params.get("symbol"))),
+                         "lastFundingRate": str(self.funding_rate),
+                         "nextFundingTime": self.next_funding_time(int(time.time() * 1000)),
+                         "time": int(time.time() * 1000)}
+        if path == "/fapi/v1/depth":
+            return 200, self.depth_snapshot(params.get("symbol"), int(params.get("limit", 1000)))
+        if path == "/fapi/v1/listenKey":
+            if method == "DELETE":
+                self.listen_keys = {k: v for k, v in self.listen_keys.items() if v != account['api_key']}
+                return 200, {}
+            listen_key = next((k for k, v in self.listen_keys.items() if v == account['api_key']), None)
+            if listen_key is None:
+                listen_key = hashlib.sha256(f"{account['api_key']}{time.time()}".encode()).hexdigest()
+                self.listen_keys[listen_key] = account['api_key']
+            return 200, {"listenKey": listen_key}
+        if path == "/fapi/v1/exchangeInfo":
+            return 200, self._exchange_info()
+        if path == "/fapi/v1/order" and method == "POST":
+            rejection = self._reject_order(params) or self._reduce_only_rejection(account, params)
+            if rejection is not None:
+                self.rejected_orders += 1
+                return 400, rejection
+            return 200, self._fill_order(account, params)
+        if path == "/fapi/v1/order" and method == "GET":
+            order = self.orders.get((account['api_key'], params.get('origClientOrderId')))
+            if order is None:
+                return 400, {"code": -2013, "msg": "Order does not exist."}
+            return 200, order
+        if path == "/fapi/v1/allOpenOrders" and method == "DELETE":
+            # Market orders fill at once, so nothing is ever left open to cancel
+            return 200, {"code": 200, "msg": "The operation of cancel all open order is done."}
+        if path == "/fapi/v1/leverage":
+            account['leverage'] = int(params['leverage'])
+            return 200, {"symbol": params['symbol'], "leverage": account['leverage'], "maxNotionalValue": "1000000"}
+        if path == "/fapi/v1/marginType":
+            if params['marginType'].upper() == account['margin_type']:
+                return 400, {"code": -4046, "msg": "No need to change margin type."}
+            account['margin_type'] = params['marginType'].upper()
+            return 200, {"code": 200, "msg": "success"}
+        if path == "/fapi/v1/positionSide/dual":
+            return 200, {"dualSidePosition": account['dual_side']}
+        if path == "/fapi/v2/positionRisk":
+            return 200, self._position_risk(account, params.get('symbol', 'ETHUSDT'))
+        if path == "/fapi/v2/account":
+            return 200, self._account_info(account)
+        return 404, {"code": -1000, "msg": f"Unknown endpoint {path}"}
+
+    def _make_cert(self):
+        self._tmpdir = tempfile.mkdtemp(prefix="mock-exchange-")
+        self.cert_path = os.path.join(self._tmpdir, "cert.pem")
+        key_path = os.path.join(self._tmpdir, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-keyout", key_path, "-out", self.cert_path, "-subj", "/CN=localhost",
+             "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+            check=True, capture_output=True
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cert_path, key_path)
+        return context
+
+    def start(self, port=0, streams=False, stream_interval=0.1):
+        """Start serving in a background thread and return the base URL.
+
+        With `streams` a MockStreamServer is started too; its URL is in `ws_url`.
+        """
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.exchange = self
+        scheme = "http"
+        if self.tls:
+            self._server.socket = self._make_cert().wrap_socket(self._server.socket, server_side=True,
+                                                                 do_handshake_on_connect=False)
+            scheme = "https"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        host, port = self._server.server_address
+        if streams:
+            self.ws_url = MockStreamServer(self, interval=stream_interval).start()
+        return f"{scheme}://localhost:{port}"
+
+    def configure_session(self, session):
+        """Trust the self-signed certificate (env CA bundles would otherwise override it)"""
+        session.trust_env = False
+        session.verify = self.cert_path if self.tls else True
+
+    def stop(self):
+        if self.ws_url is not None:
+            self.streams.stop()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class MockStreamServer:
+    """Minimal RFC 6455 server publishing markPriceUpdate events, used in place of fstream.asterdex.com"""
+
+    def __init__(self, exchange, interval=0.1):
+        self.exchange = exchange
+        self.interval = interval
+        self.connections = 0
+        self._clients = {}
+        self._user_clients = {}
+        exchange.streams = self
+        self._lock = threading.Lock()
+        self._sock = None
+        self._running = False
+
+    def start(self, port=0):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", port))
+        self._sock.listen()
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._publish_loop, daemon=True).start()
+        return f"ws://127.0.0.1:{self._sock.getsockname()[1]}"
+
+    def stop(self):
+        self._running = False
+        self.drop_connections()
+        self._sock.close()
+
+    def drop_connections(self):
+        """Close every client connection to exercise reconnect/resubscribe"""
+        with self._lock:
+            clients = list(self._clients) + list(self._user_clients)
+            self._clients.clear()
+            self._user_clients.clear()
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+                client.close()
+            except OSError:
+                pass
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _handshake(self, client):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = client.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        lines = request.decode().split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+        accept = base64.b64encode(hashlib.sha1(
+            (headers["Sec-WebSocket-Key"] + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest()).decode()
+        client.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                        f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return path
+
+    @staticmethod
+    def _recv_exact(client, size):
+        data = b""
+        while len(data) < size:
+            chunk = client.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client closed")
+            data += chunk
+        return data
+
+    def _recv_frame(self, client):
+        first, second = self._recv_exact(client, 2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._recv_exact(client, 2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._recv_exact(client, 8))[0]
+        mask = self._recv_exact(client, 4) if second & 0x80 else b"\x00" * 4
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(client, length)))
+        return opcode, payload
+
+    @staticmethod
+    def _frame(payload, opcode=0x1):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([126]) + struct.pack(">H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack(">Q", len(payload))
+        return header + payload
+
+    def _send(self, client, message):
+        try:
+            client.sendall(self._frame(json.dumps(message).encode()))
+        except OSError:
+            with self._lock:
+                self._clients.pop(client, None)
+                self._user_clients.pop(client, None)
+
+    def publish_user_event(self, api_key, event):
+        with self._lock:
+            clients = [client for client, key in self._user_clients.items()
+                       if self.exchange.listen_keys.get(key) == api_key]
+        for client in clients:
+            self._send(client, event)
+
+    def expire_listen_keys(self):
+        """Push listenKeyExpired to every user stream and invalidate the keys"""
+        with self._lock:
+            clients = list(self._user_clients)
+        for client in clients:
+            self._send(client, {"e": "listenKeyExpired", "E": int(time.time() * 1000)})
+        self.exchange.listen_keys.clear()
+
+    def _serve(self, client):
+        path = self._handshake(client)
+        if not path:
+            client.close()
+            return
+        self.connections += 1
+        with self._lock:
+            if path.startswith("/ws/"):
+                self._user_clients[client] = path[len("/ws/"):]
+            else:
+                self._clients[client] = set()
+        try:
+            while self._running:
+                opcode, payload = self._recv_frame(client)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    client.sendall(self._frame(payload, opcode=0xA))
+                    continue
+                if opcode != 0x1:
+                    continue
+                request = json.loads(payload)
+                with self._lock:
+                    streams = self._clients.get(client)
+                    if streams is not None and request.get("method") == "SUBSCRIBE":
+                        streams.update(request.get("params", []))
+                    elif streams is not None and request.get("method") == "UNSUBSCRIBE":
+                        streams.difference_update(request.get("params", []))
+                self._send(client, {"result": None, "id": request.get("id")})
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._clients.pop(client, None)
+                self._user_clients.pop(client, None)
+            client.close()
+
+    def _publish_loop(self):
+        while self._running:
+            self.exchange._walk_prices()
+            now = int(time.time() * 1000)
+            with self._lock:
+                subscriptions = [(client, set(streams)) for client, streams in self._clients.items()]
+            # One depth event per symbol and interval, sent to every client subscribed to it
+            depth_symbols = sorted(set(stream.partition("@")[0].upper() for _, streams in subscriptions
+                                       for stream in streams if stream.partition("@")[2].startswith("depth")))
+            depth_events = {symbol: self.exchange.depth_event(symbol, now) for symbol in depth_symbols}
+            for client, streams in subscriptions:
+                for stream in streams:
+                    symbol, _, kind = stream.partition("@")
+                    if kind.startswith("depth"):
+                        self._send(client, depth_events[symbol.upper()])
+                    elif kind.startswith("markPrice"):
+                        price = self.exchange.price_of(symbol.upper())
+                        self._send(client, {
+                            "e": "markPriceUpdate", "E": now, "s": symbol.upper(),
+                            "p": str(price), "i": str(price),
+                            "P": str(price), "r": str(self.exchange.funding_rate),
+                            "T": self.exchange.next_funding_time(now)
+                        })
+            time.sleep(self.interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mock AsterDex exchange until interrupted")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    parser.add_argument("--streams", action="store_true", help="also serve the WebSocket streams")
+    parser.add_argument("--latency", type=float, default=0.0, help="injected base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="injected uniform jitter in seconds")
+    parser.add_argument("--volatility", type=float, default=0.0, help="price random walk per sqrt second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with -1001")
+    parser.add_argument("--order-reject-rate", type=float, default=0.0, help="share of orders answered with -2019")
+    args = parser.parse_args()
+    exchange = MockExchange(tls=args.tls, latency=args.latency, jitter=args.jitter, volatility=args.volatility,
+                            error_rate=args.error_rate, order_reject_rate=args.order_reject_rate)
+    print(f"REST       {exchange.start(port=args.port, streams=args.streams)}")
+    if exchange.ws_url:
+        print(f"WebSocket  {exchange.ws_url}")
+    if exchange.cert_path:
+        print(f"CA bundle  {exchange.cert_path}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        exchange.stop()
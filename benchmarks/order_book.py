@@ -0,0 +1,135 @@
+"""Local order book speed and the sizing it gives large hedges.
+
+Times diff updates, fill-price queries, and a fill-price query after every
+update (as sizing does on a live book) on a LocalOrderBook of `--levels`
+levels per side against walking a plain list of levels, then sizes hedges
+of increasing `--usdt` notional against the mock exchange's book, at the
+last price as before and at the expected fill price with and without
+`--max-slippage-bps`, and reports what the long leg would actually spend and
+pay over the mid. Finally keeps a DepthFeed in sync with the mock's depth
+stream for `--duration` seconds of a random-walk price and checks the local
+book against the exchange's.
+
+Run from the repository root:
+
+    python -m benchmarks.order_book --levels 1000 --usdt 10000 100000 1000000 --max-slippage-bps 5
+"""
+import argparse
+import random
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from hedge_trading_EN import AsterDexAPI
+from order_book import DepthFeed, LocalOrderBook
+
+
+def linear_fill(levels, quantity):
+    """Walk (price, quantity) levels best first, as a book without running sums would"""
+    remaining, cost = quantity, 0.0
+    for price, size in levels:
+        take = min(remaining, size)
+        cost += take * price
+        remaining -= take
+        if remaining <= 0:
+            break
+    filled = quantity - max(remaining, 0.0)
+    return filled, (cost / filled if filled else 0.0)
+
+
+def bench_structure(level_count, updates, queries):
+    rng = random.Random(1)
+    asks = [(2000 + i * 0.1, rng.uniform(0.5, 5)) for i in range(level_count)]
+    bids = [(2000 - 0.1 - i * 0.1, rng.uniform(0.5, 5)) for i in range(level_count)]
+    book = LocalOrderBook("ETHUSDT")
+    book.apply_snapshot({"lastUpdateId": 1, "bids": bids, "asks": asks})
+    total = sum(size for _, size in asks)
+
+    events = []
+    for i in range(updates):
+        price = round(2000 + rng.randrange(level_count) * 0.1, 1)
+        events.append({"U": i + 1, "u": i + 2, "pu": i + 1, "b": [],
+                       "a": [(price, 0.0 if rng.random() < 0.2 else rng.uniform(0.5, 5))]})
+    start = time.perf_counter()
+    for event in events:
+        book.on_event(event)
+    update_elapsed = time.perf_counter() - start
+    assert book.synced and book.events == updates
+
+    quantities = [rng.uniform(0, total) for _ in range(queries)]
+    start = time.perf_counter()
+    for quantity in quantities:
+        book.fill_price("BUY", quantity)
+    book_elapsed = time.perf_counter() - start
+    levels = book.asks.levels()
+    start = time.perf_counter()
+    for quantity in quantities:
+        linear_fill(levels, quantity)
+    linear_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for event, quantity in zip(events[:queries], quantities):
+        event = dict(event, U=book.last_update_id, u=book.last_update_id + 1, pu=book.last_update_id)
+        book.on_event(event)
+        book.fill_price("BUY", quantity)
+    mixed_elapsed = time.perf_counter() - start
+    print(f"{level_count} levels/side  diff update {update_elapsed / updates * 1e6:6.2f} us  "
+          f"fill price: book {book_elapsed / queries * 1e6:6.2f} us  list walk {linear_elapsed / queries * 1e6:8.2f} us "
+          f"({linear_elapsed / book_elapsed:5.1f}x)  update + fill price {mixed_elapsed / queries * 1e6:6.2f} us")
+
+
+def bench_sizing(amounts, max_slippage_bps):
+    exchange = MockExchange(tls=True, level_notional=20000.0, book_levels=50)
+    book = LocalOrderBook("ETHUSDT")
+    exchange.depth_event("ETHUSDT", 0)
+    book.apply_snapshot(exchange.depth_snapshot("ETHUSDT"))
+    mid = book.mid()
+    print(f"book of {exchange.book_levels} levels x {exchange.level_notional:.0f} USDT per side, mid {mid:.2f}")
+    for usdt_amount in amounts:
+        sizings = [("last price", usdt_amount / exchange.price_of("ETHUSDT"))]
+        for label, bps in (("book", None), (f"book <= {max_slippage_bps:g}bps", max_slippage_bps)):
+            price, notional = book.hedge_quote(usdt_amount, bps)
+            sizings.append((label, notional / price))
+        for label, quantity in sizings:
+            filled, price = exchange._match("ETHUSDT", "BUY", quantity)
+            print(f"  {usdt_amount:>10.0f} USDT  {label:<16} qty {quantity:10.4f}  long leg spends {filled * price:11.2f} "
+                  f"({filled * price / usdt_amount * 100:5.1f}%)  slippage {(price / mid - 1) * 10000:6.2f} bps  "
+                  f"unfilled {quantity - filled:8.4f}")
+
+
+def bench_stream(duration):
+    exchange = MockExchange(tls=True, volatility=0.002)
+    base_url = exchange.start(streams=True, stream_interval=0.05)
+    api = AsterDexAPI("key", "secret", base_url=base_url)
+    exchange.configure_session(api.session)
+    feed = DepthFeed(["ETHUSDT"], api.get_depth, ws_url=exchange.ws_url)
+    try:
+        feed.start()
+        time.sleep(duration)
+        book = feed.get("ETHUSDT")
+        with book._lock:
+            state = exchange._depth["ETHUSDT"]
+            in_step = (book.last_update_id == state['update_id'] and book.bids.levels() == state['bids']
+                       and book.asks.levels() == state['asks'])
+        stats = feed.stats()
+        print(f"depth stream {duration:g}s: {book.events} events, {exchange.path_counts['/fapi/v1/depth']} snapshots, "
+              f"resyncs {stats['resyncs']}, local book matches exchange: {in_step}")
+    finally:
+        feed.stop()
+        api.close()
+        exchange.stop()
+
+
+def run(level_counts, amounts, max_slippage_bps, duration):
+    for level_count in level_counts:
+        bench_structure(level_count, updates=50000, queries=20000)
+    bench_sizing(amounts, max_slippage_bps)
+    bench_stream(duration)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--usdt", type=float, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--max-slippage-bps", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=5, help="seconds on the depth stream")
+    args = parser.parse_args()
+    run(args.levels, args.usdt, args.max_slippage_bps, args.duration)
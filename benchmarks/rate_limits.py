@@ -0,0 +1,98 @@
+"""Orders under a poll burst: no client-side budget vs RequestScheduler priority lanes.
+
+The mock exchange enforces `--weight-limit` request weight per minute and
+answers 429 / -1003 past it. `--pollers` threads poll account and position
+every `--poll-interval` seconds while one hedge job trades; the run reports
+how many orders were throttled and how long order requests took.
+
+Run from the repository root:
+
+    python -m benchmarks.rate_limits --weight-limit 1200 --pollers 8 --duration 10
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import format_summary, summarize
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def _poll(api, stopped, interval, counts):
+    while not stopped.is_set():
+        try:
+            api.get_position_info("ETHUSDT")
+            api.get_account_info()
+            counts['polls'] += 1
+        except Exception:
+            pass
+        stopped.wait(api.scheduler.poll_interval(interval))
+
+
+def run_once(name, weight_limit, scheduled, pollers, poll_interval, duration, latency):
+    exchange = MockExchange(tls=True, latency=latency, weight_limit=weight_limit)
+    base_url = exchange.start()
+    # Without scheduling the client budget is effectively unlimited
+    limits = {"request_weight_1m": weight_limit if scheduled else 10 ** 9}
+    config = {
+        "accounts": {leg: {"api_key": leg, "api_secret": "secret"} for leg in ("long", "short")},
+        "jobs": [{"symbol": "ETHUSDT", "account1": "long", "account2": "short", "usdt_amount": 100,
+                  "leverage": 10, "wait_seconds": 0.2, "rest_seconds": 0.1}],
+        "network": {"base_url": base_url, "rate_limits": limits}
+    }
+    clients = create_clients(config, AsterDexAPI)
+    order_times = []
+    for api in clients.values():
+        exchange.configure_session(api.session)
+        send_prepared = api.send_prepared
+
+        def timed_send(prepared, send_prepared=send_prepared):
+            start = time.perf_counter()
+            try:
+                return send_prepared(prepared)
+            finally:
+                order_times.append(time.perf_counter() - start)
+        api.send_prepared = timed_send
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    errors = []
+    engine = HedgeEngine(jobs, on_error=lambda job, e: errors.append(str(e)))
+    stopped = threading.Event()
+    counts = {'polls': 0}
+    api = clients["long"]
+    threads = [threading.Thread(target=_poll, args=(api, stopped, poll_interval, counts), daemon=True)
+               for _ in range(pollers)]
+    try:
+        for thread in threads:
+            thread.start()
+        engine.start()
+        time.sleep(duration)
+    finally:
+        engine.stop()
+        stopped.set()
+        engine.wait()
+        for job in jobs:
+            job.executor.shutdown()
+        for client in clients.values():
+            client.close()
+        exchange.stop()
+    stats = api.scheduler.stats()
+    print(f"{name:<12} cycles {jobs[0].stats['cycles_completed']:4d}  failed cycles {len(errors):3d}  "
+          f"429s {exchange.throttled:5d}  polls {counts['polls']:5d}  client waits {stats['waits']}")
+    print("  " + format_summary("order request", summarize(order_times)))
+
+
+def run(weight_limit, pollers, poll_interval, duration, latency):
+    run_once("unscheduled", weight_limit, False, pollers, poll_interval, duration, latency)
+    run_once("scheduled", weight_limit, True, pollers, poll_interval, duration, latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weight-limit", type=int, default=1200, help="request weight per minute the mock allows")
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+    parser.add_argument("--latency", type=float, default=0.01, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.weight_limit, args.pollers, args.poll_interval, args.duration, args.latency)
@@ -0,0 +1,57 @@
+"""Per-request latency of one-shot requests.get calls vs the pooled AsterDexAPI session.
+
+Run from the repository root:
+
+    python -m benchmarks.session_pool --requests 300
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.common import summarize, format_summary
+from benchmarks.mock_exchange import MockExchange
+from hedge_trading_EN import AsterDexAPI
+
+
+def run(request_count):
+    exchange = MockExchange(tls=True)
+    base_url = exchange.start()
+    try:
+        # Before: a new TCP+TLS connection for every call
+        connections_before = exchange.connections
+        session_settings = requests.Session()
+        exchange.configure_session(session_settings)
+        one_shot = []
+        for _ in range(request_count):
+            start = time.perf_counter()
+            with requests.Session() as session:
+                session.trust_env, session.verify = session_settings.trust_env, session_settings.verify
+                response = session.get(base_url + "/fapi/v1/ticker/price", params={"symbol": "ETHUSDT"})
+            float(response.json()['price'])
+            one_shot.append(time.perf_counter() - start)
+        one_shot_connections = exchange.connections - connections_before
+
+        # After: keep-alive pooled session owned by the client
+        api = AsterDexAPI("key", "secret", base_url=base_url)
+        exchange.configure_session(api.session)
+        connections_before = exchange.connections
+        pooled = []
+        for _ in range(request_count):
+            start = time.perf_counter()
+            api.get_current_price("ETHUSDT", max_age=0)
+            pooled.append(time.perf_counter() - start)
+        pooled_connections = exchange.connections - connections_before
+        api.close()
+    finally:
+        exchange.stop()
+
+    print(format_summary("requests.get (no pool)", summarize(one_shot)), f" connections {one_shot_connections}")
+    print(format_summary("AsterDexAPI.session", summarize(pooled)), f" connections {pooled_connections}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    run(args.requests)
@@ -0,0 +1,70 @@
+"""Startup time and peak RSS of the terminal UI vs headless mode.
+
+Each run is a fresh interpreter that imports hedge_trading_EN and builds
+its status sink the way main() does: a TradingUI with one rendered layout,
+or a HeadlessStatus that logs one status record. The interpreter on its
+own is measured as a reference. Reports the median wall time, the peak
+RSS, and whether rich / aiohttp were loaded.
+
+Run from the repository root:
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import percentile
+
+MODES = {
+    "interpreter": "",
+    "ui": (
+        "import hedge_trading_EN as h\n"
+        "from trading_ui_EN import TradingUI\n"
+        "ui = TradingUI()\n"
+        "ui.generate_layout()\n"
+    ),
+    "headless": (
+        "import logging\n"
+        "import hedge_trading_EN as h\n"
+        "logging.basicConfig(level=logging.WARNING)\n"
+        "ui = h.HeadlessStatus()\n"
+        "ui.log_status()\n"
+    ),
+}
+
+_REPORT = "import sys\nprint('rich' in sys.modules, 'aiohttp' in sys.modules)\n"
+
+
+def measure(code):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code + _REPORT], stdout=subprocess.PIPE, text=True)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    loaded = process.stdout.read().split()
+    process.stdout.close()
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    if process.returncode != 0:
+        raise RuntimeError(f"Startup run failed with exit code {process.returncode}")
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024, loaded
+
+
+def run(runs):
+    for name, code in MODES.items():
+        times, rss = [], []
+        for _ in range(runs):
+            elapsed, peak, loaded = measure(code)
+            times.append(elapsed)
+            rss.append(peak)
+        print(f"{name:<12} startup p50 {percentile(times, 50) * 1000:7.1f} ms  peak RSS {max(rss):6.1f} MB  "
+              f"rich loaded {loaded[0]:<5}  aiohttp loaded {loaded[1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="interpreter launches per mode")
+    args = parser.parse_args()
+    run(args.runs)
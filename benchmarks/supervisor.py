@@ -0,0 +1,111 @@
+"""Hedge jobs in one process vs sharded over worker processes, and a worker crash.
+
+Runs `--jobs` jobs, each on its own account pair, against the mock exchange
+(plain HTTP, so worker processes can reach it) for `--duration` seconds,
+first in one HedgeEngine as main() does, then under a Supervisor with
+`--workers` processes, and reports the cycles and volume of each. Halfway
+through the second run one worker is killed with SIGKILL, usually with a
+leg open; the report shows its restart, the positions the new process
+closed before trading, and that every account is flat at exit.
+
+Run from the repository root:
+
+    python -m benchmarks.supervisor --jobs 8 --workers 2 --duration 20 --latency 0.02
+"""
+import argparse
+import os
+import signal
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+from supervisor import Supervisor
+
+
+def _config(base_url, job_count, hold):
+    accounts = {}
+    jobs = []
+    for i in range(job_count):
+        for leg in ("long", "short"):
+            accounts[f"job{i}-{leg}"] = {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+        jobs.append({
+            "symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short",
+            "usdt_amount": 100, "leverage": 10, "wait_seconds": hold, "rest_seconds": 0
+        })
+    # The mock enforces no weight limit; a large budget keeps the client-side limiter from being what is measured
+    return {"accounts": accounts, "jobs": jobs,
+            "network": {"base_url": base_url, "rate_limits": {"request_weight_1m": 100000}}}
+
+
+def _flat(exchange):
+    return all(amount == 0 for account in exchange.accounts.values() for amount, _ in account['positions'].values())
+
+
+def run_single(config, duration):
+    clients = create_clients(config, AsterDexAPI)
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    engine = HedgeEngine(jobs)
+    start = time.process_time()
+    try:
+        engine.start()
+        time.sleep(duration)
+    finally:
+        engine.stop()
+        for job in jobs:
+            job.executor.shutdown()
+            job.flatten()
+        for api in clients.values():
+            api.close()
+    cycles = sum(job.stats['cycles_completed'] for job in jobs)
+    volume = sum(job.stats['total_volume_usdt'] for job in jobs)
+    print(f"one process    {cycles * 60 / duration:8.1f} cycles/min  volume {volume:10.2f} USDT  "
+          f"client CPU {time.process_time() - start:5.2f}s")
+
+
+def run_supervised(config, workers, duration):
+    supervisor = Supervisor(config, AsterDexAPI, workers=workers, interval=0.5, heartbeat_timeout=10,
+                            restart_delay=0.5)
+    try:
+        supervisor.start()
+        # Process start-up (spawn, imports, leverage) is not part of the comparison
+        while not all(worker['heartbeat'] for worker in supervisor.stats()['workers']):
+            time.sleep(0.1)
+        started = supervisor.stats()['total']['cycles_completed']
+        time.sleep(duration / 2)
+        victim = supervisor.stats()['workers'][0]['pid']
+        os.kill(victim, signal.SIGKILL)
+        time.sleep(duration / 2)
+    finally:
+        supervisor.stop()
+    stats = supervisor.stats()
+    total = stats['total']
+    print(f"{len(supervisor.shards)} workers      {(total['cycles_completed'] - started) * 60 / duration:8.1f} cycles/min  "
+          f"volume {total['total_volume_usdt']:10.2f} USDT  jobs per worker "
+          f"{[worker['jobs'] for worker in stats['workers']]}")
+    print(f"killed worker 0 (pid {victim}): restarts {stats['workers'][0]['restarts']}, "
+          f"positions closed on restart {stats['workers'][0]['reconciled']:.0f}, realized PnL "
+          f"{total['realized_pnl']:.4f} USDT, errors {total['errors']:.0f}")
+
+
+def run(job_count, workers, duration, hold, latency):
+    exchange = MockExchange(tls=False, latency=latency)
+    base_url = exchange.start()
+    try:
+        config = _config(base_url, job_count, hold)
+        run_single(config, duration)
+        run_supervised(config, workers, duration)
+        print(f"all accounts flat at exit: {_flat(exchange)}")
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--hold", type=float, default=0.5, help="wait_seconds of every job")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.jobs, args.workers, args.duration, args.hold, args.latency)
@@ -0,0 +1,78 @@
+"""Order sizing: fixed 3-decimal rounding vs the exchangeInfo symbol filter cache.
+
+For every symbol of the mock exchange an order worth `--usdt` is sized both
+ways and sent `--orders` times. Reports how many orders the exchange rejected
+(each one a wasted round trip and a lost cycle), how many were rejected
+locally instead, and the time spent sizing.
+
+Run from the repository root:
+
+    python -m benchmarks.symbol_sizing --orders 50 --usdt 20 --latency 0.02
+"""
+import argparse
+import time
+
+from benchmarks.common import format_summary, summarize
+from benchmarks.mock_exchange import MockExchange
+from hedge_trading_EN import AsterDexAPI
+
+
+def _legacy_quantity(api, symbol, usdt_amount):
+    # What calculate_quantity_from_usdt did before the filter cache
+    current_price = api.get_current_price(symbol, max_age=0)
+    return round(max(0.001, usdt_amount / current_price), 3)
+
+
+def _legacy_send(api, symbol, side, quantity):
+    # The order as it was sent before, without the local filter check
+    params = {"symbol": symbol, "side": side, "type": "MARKET", "quantity": quantity, "positionSide": "BOTH"}
+    return api._signed_request("POST", "/fapi/v1/order", params)
+
+
+def run(orders, usdt_amount, latency):
+    exchange = MockExchange(tls=True, latency=latency)
+    base_url = exchange.start()
+    api = AsterDexAPI("bench-sizing", "secret", base_url=base_url)
+    exchange.configure_session(api.session)
+    try:
+        methods = (
+            ("fixed 0.001", lambda symbol: _legacy_quantity(api, symbol, usdt_amount),
+             lambda symbol, side, quantity: _legacy_send(api, symbol, side, quantity)),
+            ("filter cache", lambda symbol: api.calculate_quantity_from_usdt(
+                symbol, usdt_amount, price=exchange.price_of(symbol)),
+             lambda symbol, side, quantity: api.place_order(symbol, side, "MARKET", quantity,
+                                                            expected_price=exchange.price_of(symbol))),
+        )
+        for name, size, send in methods:
+            sizing, wasted = [], []
+            exchange_rejects = local_rejects = 0
+            for symbol in sorted(exchange.symbols):
+                for i in range(orders):
+                    start = time.perf_counter()
+                    quantity = size(symbol)
+                    sizing.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    try:
+                        response = send(symbol, "BUY" if i % 2 == 0 else "SELL", quantity)
+                    except ValueError:
+                        local_rejects += 1
+                        continue
+                    if 'orderId' not in response:
+                        exchange_rejects += 1
+                        wasted.append(time.perf_counter() - start)
+            print(f"{name:<14} exchange rejects {exchange_rejects:4d}  local rejects {local_rejects:4d}  "
+                  f"wasted round trips {sum(wasted) * 1000:9.1f} ms")
+            print("  " + format_summary("sizing", summarize(sizing)))
+        print(f"exchangeInfo loads: {api.symbol_filters.loads}")
+    finally:
+        api.close()
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=50, help="orders per symbol and sizing method")
+    parser.add_argument("--usdt", type=float, default=20, help="order size in USDT")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.orders, args.usdt, args.latency)
@@ -0,0 +1,98 @@
+"""Ticker requests per hedge cycle with and without the shared TickerCache.
+
+Runs `--jobs` hedge jobs on one symbol plus a 1 s status poller per account,
+as main() does without streams, and counts /fapi/v1/ticker/price requests
+that reach the mock exchange.
+
+Run from the repository root:
+
+    python -m benchmarks.ticker_dedup --jobs 4 --duration 5 --latency 0.02
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_jobs
+from hedge_trading_EN import AsterDexAPI
+
+
+def _config(base_url, job_count, hold):
+    accounts = {}
+    jobs = []
+    for i in range(job_count):
+        for leg in ("long", "short"):
+            accounts[f"job{i}-{leg}"] = {"api_key": f"job{i}-{leg}", "api_secret": "secret"}
+        jobs.append({
+            "symbol": "ETHUSDT", "account1": f"job{i}-long", "account2": f"job{i}-short",
+            "usdt_amount": 100, "leverage": 10, "wait_seconds": hold, "rest_seconds": 0.1
+        })
+    return {"accounts": accounts, "jobs": jobs, "network": {"base_url": base_url}}
+
+
+def _poll(api, symbol, stopped):
+    # update_position_status without the UI
+    while not stopped.is_set():
+        try:
+            api.get_position_info(symbol)
+            api.get_current_price(symbol, max_age=1)
+            api.get_account_info()
+        except Exception:
+            pass
+        stopped.wait(1)
+
+
+def run_once(exchange, base_url, job_count, duration, hold, cached):
+    config = _config(base_url, job_count, hold)
+    clients = create_clients(config, AsterDexAPI)
+    for api in clients.values():
+        exchange.configure_session(api.session)
+        if not cached:
+            # Every caller sends its own ticker request, as before the cache
+            api.get_current_price = lambda symbol, max_age=None, api=api: api._fetch_price(symbol)
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']]) for spec in load_jobs(config)]
+    engine = HedgeEngine(jobs)
+    stopped = threading.Event()
+    pollers = [threading.Thread(target=_poll, args=(api, "ETHUSDT", stopped), daemon=True) for api in clients.values()]
+    exchange.path_counts.clear()
+    try:
+        for poller in pollers:
+            poller.start()
+        engine.start()
+        time.sleep(duration)
+    finally:
+        engine.stop()
+        stopped.set()
+        engine.wait()
+        for job in jobs:
+            job.executor.shutdown()
+        for api in clients.values():
+            api.close()
+    cycles = sum(job.stats['trade_count'] for job in jobs)
+    tickers = exchange.path_counts["/fapi/v1/ticker/price"]
+    line = (f"{'shared cache' if cached else 'no cache':<13} ticker requests {tickers:5d}  cycles {cycles:4d}  "
+            f"per cycle {tickers / max(cycles, 1):6.2f}")
+    if cached:
+        stats = next(iter(clients.values())).ticker_cache.stats()
+        line += f"  hits {stats['hits']}  misses {stats['misses']}  coalesced {stats['coalesced']}"
+    print(line)
+
+
+def run(job_count, duration, hold, latency):
+    exchange = MockExchange(tls=True, latency=latency)
+    base_url = exchange.start()
+    try:
+        for cached in (False, True):
+            run_once(exchange, base_url, job_count, duration, hold, cached)
+    finally:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5, help="seconds per run")
+    parser.add_argument("--hold", type=float, default=0.5, help="wait_seconds of every job")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected base latency in seconds")
+    args = parser.parse_args()
+    run(args.jobs, args.duration, args.hold, args.latency)
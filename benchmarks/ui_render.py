@@ -0,0 +1,87 @@
+"""CPU cost of the TradingUI refresh loop: rebuilding every panel per tick vs in-place updates.
+
+No exchange is involved. `--jobs` jobs and two account panels are fed
+synthetic updates; on each tick a fraction `--change-rate` of them carry a
+new price, the rest repeat the previous status, as the one-second pollers
+mostly do. The "rebuild" run recreates the layout on every tick and renders
+it twice (Live auto-refresh plus the manual update the UI used to do); the
+"incremental" run refreshes cells in place and renders only when something
+changed. Rendering goes to an in-memory console.
+
+Run from the repository root:
+
+    python -m benchmarks.ui_render --jobs 8 --ticks 200 --interval 0.05
+"""
+import argparse
+import io
+import random
+import time
+
+from rich.console import Console
+from rich.layout import Layout
+
+from hedge_engine import JOB_DEFAULTS, HedgeJob
+from trading_ui_EN import TradingUI
+from metrics import MetricsRegistry
+
+
+def _make_ui(job_count):
+    ui = TradingUI()
+    jobs = []
+    for i in range(job_count):
+        spec = dict(JOB_DEFAULTS, name=f"job{i}", symbol="ETHUSDT", account1=f"job{i}-long", account2=f"job{i}-short",
+                    usdt_amount=100, leverage=10, wait_seconds=30)
+        jobs.append(HedgeJob(spec, None, None))
+    ui.attach_jobs(jobs)
+    metrics = MetricsRegistry()
+    for endpoint in ("/fapi/v1/order", "/fapi/v2/account", "/fapi/v2/positionRisk"):
+        metrics.observe("request_seconds", 0.02, endpoint=endpoint, account="long")
+    ui.attach_metrics(metrics)
+    return ui, jobs
+
+
+def run_once(name, incremental, job_count, ticks, interval, change_rate):
+    ui, jobs = _make_ui(job_count)
+    console = Console(file=io.StringIO(), width=160, height=60)
+    rng = random.Random(1)
+    price = 2000.0
+    renders = 0
+    cpu_start = time.process_time()
+    for tick in range(ticks):
+        if rng.random() < change_rate:
+            price += rng.choice((-0.1, 0.1))
+            jobs[tick % job_count].stats['phase'] = rng.choice(("opening", "holding", "closing", "idle"))
+        ui.update_status(ui.account1_status, ui.account2_status, round(price, 2))
+        if incremental:
+            if ui.refresh_layout():
+                console.print(ui.layout)
+                renders += 1
+        else:
+            ui.layout = Layout()
+            ui._built = False
+            ui._cells = {}
+            ui._drawn = {}
+            ui.refresh_layout()
+            for _ in range(2):
+                console.print(ui.layout)
+                renders += 1
+        console.file.seek(0)
+        console.file.truncate()
+        time.sleep(interval)
+    cpu = time.process_time() - cpu_start
+    print(f"{name:<12} cpu {cpu * 1000 / ticks:7.3f} ms/tick  renders {renders:5d} / {ticks} ticks")
+
+
+def run(job_count, ticks, interval, change_rate):
+    run_once("rebuild", False, job_count, ticks, interval, change_rate)
+    run_once("incremental", True, job_count, ticks, interval, change_rate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between ticks")
+    parser.add_argument("--change-rate", type=float, default=0.2, help="fraction of ticks with a new price")
+    args = parser.parse_args()
+    run(args.jobs, args.ticks, args.interval, args.change_rate)
@@ -0,0 +1,191 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _accept(result):
+    return result
+
+
+def _leverage_check(job):
+    def check(result):
+        if result.get('leverage') != job.leverage:
+            raise ValueError(f"Failed to set leverage {job.leverage} for {job.name}: {result.get('msg', result)}")
+        return result['leverage']
+    return check
+
+
+def _margin_type_check(job):
+    def check(result):
+        # -4046: the symbol already uses this margin type
+        if result.get('code') not in (200, -4046):
+            raise ValueError(f"Failed to set margin type {job.margin_type} for {job.name}: {result.get('msg', result)}")
+        return job.margin_type
+    return check
+
+
+def _position_mode_check(api, dual_side):
+    def check(result):
+        if result.get('dualSidePosition') != dual_side:
+            modes = {True: "hedge (dual side)", False: "one-way"}
+            raise ValueError(f"Account {api.name} is in {modes.get(result.get('dualSidePosition'), result)} "
+                             f"position mode; its jobs need {modes[dual_side]}")
+        return dual_side
+    return check
+
+
+def bootstrap_steps(jobs):
+    """The setup requests startup makes, each once, as two waves of (step, account, call, check).
+
+    The first wave is public: the clock offset and the symbol filters (both
+    shared by every client). The second is signed, so it needs the offset:
+    leverage and margin type per account and symbol, position mode and a
+    balance snapshot per account. `call()` sends the request (a coroutine
+    for the asyncio client) and `check(result)` returns the value kept, or
+    raises ValueError when the account is not set up the way its jobs need.
+    """
+    first = jobs[0].account1
+    symbols = sorted(set(job.symbol for job in jobs))
+    public = [
+        ('clock', first.name, first.sync_clock, _accept),
+        # One exchangeInfo response holds every symbol; the rest are checked in memory
+        ('symbol_filters', first.name, lambda: first.get_symbol_filters(symbols[0]),
+         lambda result: [first.symbol_filters.get(symbol) for symbol in symbols])
+    ]
+    signed = []
+    accounts = {}
+    for job in jobs:
+        for api in (job.account1, job.account2):
+            signed.append(('leverage', api.name, lambda api=api, job=job: api.set_leverage(job.symbol, job.leverage),
+                           _leverage_check(job)))
+            if job.margin_type:
+                signed.append(('margin_type', api.name,
+                               lambda api=api, job=job: api.set_margin_type(job.symbol, job.margin_type),
+                               _margin_type_check(job)))
+            # An account in hedge mode needs every order to name LONG or SHORT, one in one-way mode BOTH
+            dual_side = accounts.get(api.name, (api, False))[1] or job.position_side != 'BOTH'
+            accounts[api.name] = (api, dual_side)
+    for name, (api, dual_side) in accounts.items():
+        signed.append(('position_mode', name, api.get_position_mode, _position_mode_check(api, dual_side)))
+        signed.append(('balance', name, api.get_account_balance, _accept))
+    return [public, signed]
+
+
+def _collect(report, wave, results):
+    errors = []
+    for (step, account, _, _), result in zip(wave, results):
+        if isinstance(result, Exception):
+            errors.append(f"{step} ({account}): {result}")
+        elif step == 'balance':
+            report['balances'][account] = result
+    report['steps'] += len(wave)
+    if errors:
+        raise ValueError("Bootstrap failed: " + "; ".join(errors))
+
+
+def _run_step(metrics, step):
+    name, account, call, check = step
+    start = time.perf_counter()
+    try:
+        return check(call())
+    finally:
+        metrics.observe('bootstrap_step_seconds', time.perf_counter() - start, step=name, account=account)
+
+
+async def _run_step_async(metrics, step):
+    name, account, call, check = step
+    start = time.perf_counter()
+    try:
+        return check(await call())
+    finally:
+        metrics.observe('bootstrap_step_seconds', time.perf_counter() - start, step=name, account=account)
+
+
+def bootstrap(jobs, max_workers=8):
+    """Set up every account `jobs` trade on, concurrently; returns {'seconds', 'steps', 'balances'}.
+
+    Each wave of bootstrap_steps runs on a thread pool and costs about its
+    slowest request, so startup takes two round trips however many accounts
+    and symbols there are. Every failed check of a wave is raised together
+    as one ValueError. `balances` is the USDT wallet balance per account,
+    the starting point for the PnL shown.
+    """
+    metrics = jobs[0].account1.metrics
+    report = {'seconds': 0.0, 'steps': 0, 'balances': {}}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bootstrap") as pool:
+        for wave in bootstrap_steps(jobs):
+            futures = [pool.submit(_run_step, metrics, step) for step in wave]
+            _collect(report, wave, [future.exception() or future.result() for future in futures])
+    report['seconds'] = time.perf_counter() - start
+    metrics.observe('startup_seconds', report['seconds'], stage='bootstrap')
+    return report
+
+
+async def bootstrap_async(jobs, max_workers=8):
+    """bootstrap() for the asyncio client: each wave is gathered on the running event loop.
+
+    At most `max_workers` requests are in flight at once, as with the
+    thread pool of bootstrap().
+    """
+    metrics = jobs[0].account1.metrics
+    report = {'seconds': 0.0, 'steps': 0, 'balances': {}}
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(max_workers)
+
+    async def run(step):
+        async with slots:
+            return await _run_step_async(metrics, step)
+
+    for wave in bootstrap_steps(jobs):
+        _collect(report, wave, await asyncio.gather(*(run(step) for step in wave), return_exceptions=True))
+    report['seconds'] = time.perf_counter() - start
+    metrics.observe('startup_seconds', report['seconds'], stage='bootstrap')
+    return report
+
+
+def pending_feeds(feeds, symbols):
+    """(feed, symbol) pairs that have no fresh data yet"""
+    return [(feed, symbol) for feed in feeds for symbol in symbols if not feed.ready(symbol)]
+
+
+def wait_ready(feeds, symbols, timeout, poll=0.05):
+    """Wait at most `timeout` seconds for every stream feed to have fresh data; returns what is still pending.
+
+    Trading can start without them: until a feed is ready the jobs price
+    and size from REST, as they would after the feed went stale.
+    """
+    deadline = time.monotonic() + timeout
+    pending = pending_feeds(feeds, symbols)
+    while pending and time.monotonic() < deadline:
+        time.sleep(poll)
+        pending = pending_feeds(feeds, symbols)
+    return pending
+
+
+async def wait_ready_async(feeds, symbols, timeout, poll=0.05):
+    deadline = time.monotonic() + timeout
+    pending = pending_feeds(feeds, symbols)
+    while pending and time.monotonic() < deadline:
+        await asyncio.sleep(poll)
+        pending = pending_feeds(feeds, symbols)
+    return pending
+
+
+class StartupTimer:
+    """Seconds from process start to the first hedge opened, recorded once"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_order = None
+        self._lock = threading.Lock()
+
+    def first_open(self, metrics):
+        """The time to the first open on the first call, None on every later one"""
+        with self._lock:
+            if self.first_order is not None:
+                return None
+            self.first_order = time.perf_counter() - self.started
+        metrics.observe('startup_seconds', self.first_order, stage='first_order')
+        return self.first_order
@@ -0,0 +1,90 @@
+import time
+import threading
+
+
+class ClockSync:
+    """Keeps an in-memory offset between the local clock and the exchange clock.
+
+    The offset is measured with RTT compensation (the server timestamp is
+    assumed to be taken half-way through the round trip) and refreshed in a
+    background thread, so signed requests never need their own /time call.
+    """
+
+    def __init__(self, fetch_server_time, resync_interval=300, samples=3):
+        self.fetch_server_time = fetch_server_time
+        self.resync_interval = resync_interval
+        self.samples = samples
+        self.offset_ms = 0
+        self.rtt_ms = 0
+        self.last_sync = 0
+        self.sync_count = 0
+        self.saved_calls = 0
+        self._synced = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    @property
+    def synced(self):
+        return self._synced
+
+    def sync(self):
+        """Measure the offset, keeping the sample with the smallest round trip"""
+        samples = []
+        for _ in range(self.samples):
+            start = time.time() * 1000
+            server_time = self.fetch_server_time()
+            samples.append((start, server_time, time.time() * 1000))
+        return self.apply_samples(samples)
+
+    def apply_samples(self, samples):
+        """Set the offset from (local_send_ms, server_time_ms, local_receive_ms) samples"""
+        best = None
+        for start, server_time, end in samples:
+            rtt = end - start
+            if best is None or rtt < best[0]:
+                best = (rtt, server_time - (start + rtt / 2))
+        with self._lock:
+            self.rtt_ms = best[0]
+            self.offset_ms = best[1]
+            self.last_sync = time.monotonic()
+            self.sync_count += 1
+            self._synced = True
+        return self.offset_ms
+
+    def now_ms(self):
+        """Current exchange time in milliseconds, without a network call"""
+        if not self._synced:
+            self.sync()
+        else:
+            with self._lock:
+                self.saved_calls += 1
+        return int(time.time() * 1000 + self.offset_ms)
+
+    def force_resync(self):
+        """Resync immediately, e.g. after the exchange rejects a timestamp (-1021)"""
+        self.sync()
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _run(self):
+        while self._running:
+            try:
+                if time.monotonic() - self.last_sync >= self.resync_interval:
+                    self.sync()
+            except Exception:
+                # Keep the previous offset and retry on the next tick
+                pass
+            self._wakeup.wait(max(1, self.resync_interval - (time.monotonic() - self.last_sync)))
+            self._wakeup.clear()
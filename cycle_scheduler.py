@@ -0,0 +1,155 @@
+import math
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+FUNDING_POLICIES = ('ignore', 'avoid', 'hold')
+
+
+class CyclePlanner:
+    """Absolute open/close deadlines (time.monotonic()) for one hedge job.
+
+    Each plan follows from the previous plan, not from when the last request
+    returned, so request time does not pile up as drift. With
+    `cycles_per_hour` the opens sit on a fixed grid of slots and a slot that
+    has already gone by is skipped; otherwise the next open is `rest_seconds`
+    after the planned close, or immediately if the close ran past that.
+
+    `funding_policy` moves a cycle around the next funding settlement
+    (`funding_at`): 'avoid' keeps the legs flat for `funding_guard_seconds`
+    either side of it, 'hold' stretches a hold that would end just before it
+    so the legs are open when it settles, 'ignore' leaves the plan alone.
+    """
+
+    def __init__(self, wait_seconds, rest_seconds, cycles_per_hour=None, funding_policy='ignore',
+                 funding_guard_seconds=10):
+        if funding_policy not in FUNDING_POLICIES:
+            raise ValueError(f"Unknown funding policy '{funding_policy}', expected one of {', '.join(FUNDING_POLICIES)}")
+        self.wait_seconds = wait_seconds
+        self.rest_seconds = rest_seconds
+        self.period = 3600 / cycles_per_hour if cycles_per_hour else None
+        if self.period is not None and self.period <= wait_seconds:
+            raise ValueError(f"{cycles_per_hour} cycles per hour leave no time to close a {wait_seconds}s hold")
+        self.funding_policy = funding_policy
+        self.funding_guard = funding_guard_seconds
+        self.funding_at = None
+        self.funding_shifts = 0
+        self.anchor = None
+        self.next_open = None
+        self.last_close = None
+        self._previous_close = None
+
+    def needs_funding(self, now):
+        """True when the policy uses funding times and the known settlement is missing or past"""
+        return self.funding_policy != 'ignore' and (self.funding_at is None or self.funding_at <= now)
+
+    def _open_time(self, earliest):
+        if self.period is None:
+            return earliest
+        if self.anchor is None:
+            self.anchor = earliest
+        # The small tolerance keeps float error from skipping a slot that is due right now
+        slots = math.ceil((earliest - self.anchor) / self.period - 1e-9)
+        return self.anchor + slots * self.period
+
+    def plan(self, now):
+        """(open_at, close_at) of the next cycle"""
+        if self.last_close is None:
+            earliest = now
+        elif self.period is None:
+            earliest = max(now, self.last_close + self.rest_seconds)
+        else:
+            earliest = max(now, self.last_close)
+        open_at = self._open_time(earliest)
+        close_at = open_at + self.wait_seconds
+
+        funding_at, guard = self.funding_at, self.funding_guard
+        if funding_at is not None and self.funding_policy == 'avoid':
+            if open_at - guard < funding_at < close_at + guard:
+                open_at = funding_at + guard
+                close_at = open_at + self.wait_seconds
+                self.funding_shifts += 1
+        elif funding_at is not None and self.funding_policy == 'hold':
+            next_open = self._open_time(close_at + (self.rest_seconds if self.period is None else 0))
+            if close_at - guard <= funding_at < next_open + guard:
+                close_at = funding_at + guard
+                self.funding_shifts += 1
+        self._previous_close, self.last_close = self.last_close, close_at
+        self.next_open = open_at
+        return open_at, close_at
+
+    def cancel(self):
+        """Forget the last plan, for a cycle that failed to open"""
+        self.last_close = self._previous_close
+
+
+class CycleScheduler:
+    """Runs callbacks at time.monotonic() deadlines from a single timer thread.
+
+    Pending calls live in a heap, so a job that is holding or resting costs
+    one heap entry rather than a sleeping thread. Due calls are handed to a
+    thread pool, and a slow request in one job does not hold up another
+    job's deadline; the pool only grows to the number of calls actually
+    running at once.
+    """
+
+    def __init__(self, workers=8):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cycle")
+        self._thread = None
+        self._running = False
+        self.dispatched = 0
+
+    def call_at(self, deadline, callback, *args):
+        """Run `callback(*args)` at `deadline`; returns a handle for cancel()"""
+        entry = [deadline, next(self._sequence), callback, args]
+        with self._condition:
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._condition.notify()
+        return entry
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    def cancel(self, handle):
+        # Cancelled entries stay in the heap and are dropped when they come due
+        handle[2] = None
+
+    def __len__(self):
+        with self._condition:
+            return sum(1 for entry in self._heap if entry[2] is not None)
+
+    def _run(self):
+        with self._condition:
+            while self._running:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                _, _, callback, args = heapq.heappop(self._heap)
+                if callback is not None:
+                    self._pool.submit(callback, *args)
+                    self.dispatched += 1
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="cycle-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop dispatching; with `wait`, also let the calls already running finish"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._pool.shutdown(wait=wait)
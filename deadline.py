@@ -0,0 +1,84 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+
+# Seconds each phase of a hedge cycle may take, from the first request to the last response;
+# `flatten` bounds one recovery flatten, whatever it leaves open is retried before the next cycle
+DEFAULT_BUDGETS = {'sizing': 2.0, 'open': 3.0, 'close': 5.0, 'flatten': 5.0}
+
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A phase ran out of its latency budget before its requests completed"""
+
+    def __init__(self, phase, budget):
+        super().__init__(f"{phase} exceeded its {budget:g}s budget")
+        self.phase = phase
+        self.budget = budget
+
+
+class Deadline:
+    """Absolute time.monotonic() by which a phase must be done"""
+
+    def __init__(self, phase, budget):
+        self.phase = phase
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def exceeded(self):
+        return DeadlineExceeded(self.phase, self.budget)
+
+    def timeout(self, default):
+        """Timeout for one request: `default`, cut to what is left of the budget; raises once it is spent"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise self.exceeded()
+        return min(default, remaining)
+
+
+@contextmanager
+def deadline(phase, budget):
+    """Run the block under a Deadline every request inside it inherits.
+
+    The deadline is held in a context variable, so it follows the calls into
+    asyncio tasks, and into threads that run them in a copy of the caller's
+    context (see HedgeExecutor). A nested deadline never outlives the one
+    around it.
+    """
+    current = Deadline(phase, budget)
+    outer = _current.get()
+    if outer is not None and outer.expires_at < current.expires_at:
+        current.expires_at = outer.expires_at
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+def current_deadline():
+    return _current.get()
+
+
+def request_timeout(default):
+    """Timeout for a request sent now: `default`, or less under a deadline"""
+    current = _current.get()
+    return default if current is None else current.timeout(default)
+
+
+def load_budgets(budgets):
+    """DEFAULT_BUDGETS updated with a job's `budgets`; unknown phases are rejected"""
+    budgets = budgets or {}
+    unknown = set(budgets) - set(DEFAULT_BUDGETS)
+    if unknown:
+        raise ValueError(f"Unknown budget phase(s) {', '.join(sorted(unknown))}, expected {', '.join(DEFAULT_BUDGETS)}")
+    return dict(DEFAULT_BUDGETS, **budgets)
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import current_deadline
+from trade_journal import LEG_FLATTEN
+
+
+class FlattenError(Exception):
+    """Raised when a flatten could not confirm that every target is flat; `remaining` as in the report"""
+
+    def __init__(self, message, remaining):
+        super().__init__(message)
+        self.remaining = remaining
+
+
+def _out_of_time():
+    current = current_deadline()
+    return current is not None and current.expired
+
+
+def flatten_targets(jobs):
+    """(api, symbol) of both legs of every job, each account and symbol once"""
+    targets = {}
+    for job in jobs:
+        for api in (job.account1, job.account2):
+            targets.setdefault((api.name, job.symbol), (api, job.symbol))
+    return list(targets.values())
+
+
+def close_orders(symbol, positions):
+    """Market orders that close every non-zero entry of a positionRisk response.
+
+    In one-way mode the single BOTH entry is closed reduce-only, so a close
+    sent twice can never open a position the other way; in hedge mode the
+    LONG and SHORT entries are closed through their own position side,
+    which the exchange does not accept together with reduceOnly.
+    """
+    orders = []
+    for position in positions or []:
+        amount = float(position['positionAmt'])
+        if amount == 0:
+            continue
+        position_side = position.get('positionSide', 'BOTH')
+        orders.append(dict(symbol=symbol, side="SELL" if amount > 0 else "BUY", order_type="MARKET",
+                           quantity=abs(amount), position_side=position_side, reduce_only=position_side == 'BOTH'))
+    return orders
+
+
+class FlattenRun:
+    """Bookkeeping of one flatten over (api, symbol) targets, shared by flatten_all and flatten_all_async.
+
+    `positions` holds the last positionRisk read of each target, None while
+    unread or when the read failed; a target is done once a read shows it
+    holds nothing. Every close order's fill goes to `journal`, if given.
+    """
+
+    def __init__(self, targets, journal=None):
+        self.targets = targets
+        self.journal = journal
+        self.positions = [None] * len(targets)
+        self.report = {'seconds': 0.0, 'rounds': 0, 'closed': 0, 'orders': 0, 'errors': [], 'remaining': {},
+                       'flat': False}
+        self._start = time.perf_counter()
+
+    def _label(self, index):
+        api, symbol = self.targets[index]
+        return f"{api.name} {symbol}"
+
+    def record_cancels(self, results):
+        for index, result in enumerate(results):
+            if isinstance(result, Exception) or (isinstance(result, dict) and result.get('code', 200) < 0):
+                self.report['errors'].append(f"cancel {self._label(index)}: {result}")
+
+    def record_reads(self, indexes, results, first=False):
+        for index, result in zip(indexes, results):
+            if isinstance(result, Exception) or not isinstance(result, list):
+                self.positions[index] = None
+                self.report['errors'].append(f"positions {self._label(index)}: {result}")
+                continue
+            self.positions[index] = result
+            if first:
+                self.report['closed'] += len(close_orders(self.targets[index][1], result))
+
+    def pending(self):
+        """Orders for what is still open, as (index, api, order), and the targets that could not be read"""
+        orders = []
+        unread = []
+        for index, (api, symbol) in enumerate(self.targets):
+            if self.positions[index] is None:
+                unread.append(index)
+            for order in close_orders(symbol, self.positions[index]):
+                orders.append((index, api, order))
+        return orders, unread
+
+    def record_orders(self, orders, results, latency=0.0):
+        """Count a round of close orders sent together in `latency` seconds and journal their fills"""
+        self.report['rounds'] += 1
+        self.report['orders'] += len(orders)
+        for (index, _, order), result in zip(orders, results):
+            if not isinstance(result, dict) or 'orderId' not in result:
+                self.report['errors'].append(f"close {self._label(index)} {order['quantity']}: {result}")
+            elif self.journal is not None:
+                self.journal.record_order(order['symbol'], LEG_FLATTEN, order['side'], result, latency)
+
+    def finish(self):
+        for index, positions in enumerate(self.positions):
+            if positions is None:
+                self.report['remaining'][self._label(index)] = None
+            elif close_orders(self.targets[index][1], positions):
+                self.report['remaining'][self._label(index)] = sum(float(p['positionAmt']) for p in positions)
+        self.report['flat'] = not self.report['remaining']
+        self.report['seconds'] = time.perf_counter() - self._start
+        if self.targets:
+            self.targets[0][0].metrics.observe('flatten_seconds', self.report['seconds'],
+                                               outcome='flat' if self.report['flat'] else 'open')
+        return self.report
+
+
+def flatten_all(targets, attempts=3, retry_delay=0.2, cancel=True, max_workers=16, journal=None):
+    """Close every position of every (api, symbol) target at once and verify it is gone.
+
+    Open orders are cancelled and positions read for all targets together,
+    every open position is closed by a market order sent at the same time,
+    and the positions are read back. What is still open, or could not be
+    read, goes round again after `retry_delay` seconds, at most `attempts`
+    rounds of orders in all. The report has the time taken, rounds and
+    orders sent, the positions found open (`closed`), every error, and
+    `remaining`: what is still open by "account symbol" (None when it could
+    not be read), empty when `flat`. Under a deadline its requests are cut
+    to what is left of it, and no round starts once it has run out. The
+    close orders' fills go to `journal` (a TradeJournal), if given.
+    """
+    run = FlattenRun(targets, journal)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flatten") as pool:
+        def gather(calls):
+            # Each call runs in a copy of the caller's context, so its request inherits the deadline
+            futures = [pool.submit(contextvars.copy_context().run, call) for call in calls]
+            return [future.exception() or future.result() for future in futures]
+
+        indexes = list(range(len(targets)))
+        results = gather([lambda api=api, symbol=symbol: api.get_position_info(symbol) for api, symbol in targets] +
+                         ([lambda api=api, symbol=symbol: api.cancel_all_orders(symbol) for api, symbol in targets]
+                          if cancel else []))
+        run.record_reads(indexes, results[:len(targets)], first=True)
+        run.record_cancels(results[len(targets):])
+        for attempt in range(attempts):
+            orders, unread = run.pending()
+            if not orders and not unread or _out_of_time():
+                break
+            if attempt:
+                time.sleep(retry_delay)
+            if orders:
+                sent = time.perf_counter()
+                results = gather([lambda api=api, order=order: api.place_order(**order) for _, api, order in orders])
+                run.record_orders(orders, results, time.perf_counter() - sent)
+            indexes = sorted(set(index for index, _, _ in orders) | set(unread))
+            run.record_reads(indexes, gather([lambda api=api, symbol=symbol: api.get_position_info(symbol)
+                                              for api, symbol in (targets[index] for index in indexes)]))
+    return run.finish()
+
+
+async def flatten_all_async(targets, attempts=3, retry_delay=0.2, cancel=True, journal=None):
+    """flatten_all for AsyncAsterDexAPI clients, every request of a step gathered on the event loop"""
+    run = FlattenRun(targets, journal)
+
+    async def gather(calls):
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    indexes = list(range(len(targets)))
+    results = await gather([api.get_position_info(symbol) for api, symbol in targets] +
+                           ([api.cancel_all_orders(symbol) for api, symbol in targets] if cancel else []))
+    run.record_reads(indexes, results[:len(targets)], first=True)
+    run.record_cancels(results[len(targets):])
+    for attempt in range(attempts):
+        orders, unread = run.pending()
+        if not orders and not unread or _out_of_time():
+            break
+        if attempt:
+            await asyncio.sleep(retry_delay)
+        if orders:
+            sent = time.perf_counter()
+            results = await gather([api.place_order(**order) for _, api, order in orders])
+            run.record_orders(orders, results, time.perf_counter() - sent)
+        indexes = sorted(set(index for index, _, _ in orders) | set(unread))
+        run.record_reads(indexes, await gather([targets[index][0].get_position_info(targets[index][1])
+                                                for index in indexes]))
+    return run.finish()
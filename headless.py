@@ -0,0 +1,94 @@
+import re
+import json
+import time
+import asyncio
+import logging
+
+from trading_status import TradingStatus
+
+
+logger = logging.getLogger("hedge")
+
+_MARKUP = re.compile(r'\[/?[a-z ]+\]')
+_LEVELS = {'red': logging.ERROR, 'yellow': logging.WARNING}
+
+
+class LogConsole:
+    """Stand-in for rich's Console in headless mode: markup is stripped and each message becomes a log record.
+
+    The colour of the message picks the level: red is an error, yellow a
+    warning, anything else info.
+    """
+
+    def print(self, message):
+        message = str(message)
+        match = _MARKUP.match(message)
+        level = _LEVELS.get(match.group(0)[1:-1], logging.INFO) if match else logging.INFO
+        logger.log(level, _MARKUP.sub('', message))
+
+
+class HeadlessStatus(TradingStatus):
+    """TradingUI replacement for server deployments, without rich.
+
+    Takes the same updates as TradingUI through TradingStatus and writes one
+    JSON status record to the `hedge` logger every `interval` seconds
+    instead of drawing panels. Latency and error figures go through the
+    MetricsExporter as before.
+    """
+
+    def __init__(self, interval=10):
+        super().__init__()
+        self.interval = interval
+
+    def status_record(self):
+        total_pnl = (self.account1_status['current_balance'] - self.account1_status['initial_balance'] +
+                     self.account2_status['current_balance'] - self.account2_status['initial_balance'])
+        return {
+            'event': 'status',
+            'price': self.current_price,
+            'trade_count': self.stats['trade_count'],
+            'total_volume_usdt': round(self.stats['total_volume_usdt'], 2),
+            'funding_rate': self.stats['current_funding_rate'],
+            'total_pnl': round(total_pnl, 8),
+            'leg_skew': self.stats['leg_skew'],
+            'rate_limit': self.stats['rate_limit'],
+            'ticker_cache': self.stats['ticker_cache'],
+            'accounts': [
+                {key: status[key] for key in ('position_side', 'quantity', 'entry_price', 'unrealized_pnl',
+                                              'current_balance', 'system_status')}
+                for status in (self.account1_status, self.account2_status)
+            ],
+            'jobs': [
+                {
+                    'name': job.name,
+                    'symbol': job.symbol,
+                    'phase': job.stats['phase'],
+                    'trades': job.stats['trade_count'],
+                    'volume_usdt': round(job.stats['total_volume_usdt'], 2),
+                    'cycles_per_minute': round(job.cycles_per_minute(), 2),
+                    'last_error': job.stats['last_error']
+                }
+                for job in self.jobs
+            ]
+        }
+
+    def log_status(self):
+        logger.info(json.dumps(self.status_record(), default=str))
+
+    def show(self):
+        next_log = 0
+        while self.running:
+            self.refresh_account_states()
+            if time.monotonic() >= next_log:
+                self.log_status()
+                next_log = time.monotonic() + self.interval
+            time.sleep(1)
+
+    async def show_async(self):
+        next_log = 0
+        while self.running:
+            await self.refresh_account_states_async()
+            if time.monotonic() >= next_log:
+                self.log_status()
+                next_log = time.monotonic() + self.interval
+            await asyncio.sleep(1)
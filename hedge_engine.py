@@ -0,0 +1,586 @@
+import time
+import threading
+from datetime import datetime
+
+from requests.adapters import HTTPAdapter
+
+from hedge_executor import HedgeExecutor, HedgeLegError, merged_skew_stats
+from ticker_cache import TickerCache
+from rate_limiter import RequestScheduler
+from metrics import MetricsRegistry
+from cycle_scheduler import FUNDING_POLICIES, CyclePlanner, CycleScheduler
+from checkpoint import PERSISTED_STATS, reconcile
+from deadline import DeadlineExceeded, deadline, load_budgets
+from flatten import FlattenError, flatten_all, flatten_targets
+from trade_journal import LEG_CLOSE_LONG, LEG_CLOSE_SHORT, LEG_OPEN_LONG, LEG_OPEN_SHORT, order_fill
+
+
+JOB_DEFAULTS = {
+    'position_side': 'BOTH',
+    'order_type': 'MARKET',
+    'rest_seconds': 5,
+    'cycles_per_hour': None,
+    'funding_policy': 'ignore',
+    'funding_guard_seconds': 10,
+    'max_slippage_bps': None,
+    'margin_type': None,
+    'budgets': None
+}
+
+
+def load_accounts(config):
+    """Account credentials by name.
+
+    New configs list them under `accounts`; the original `account1`/`account2`
+    sections are still accepted and keep those names.
+    """
+    accounts = dict(config.get('accounts', {}))
+    for name in ('account1', 'account2'):
+        if name in config:
+            accounts.setdefault(name, config[name])
+    return accounts
+
+
+def load_jobs(config):
+    """Hedge jobs from `jobs`, or a single job built from the legacy `trading` section"""
+    accounts = load_accounts(config)
+    if 'jobs' in config:
+        specs = config['jobs']
+    else:
+        specs = [dict(config['trading'], account1='account1', account2='account2')]
+
+    jobs = []
+    seen = set()
+    for index, spec in enumerate(specs):
+        job = dict(JOB_DEFAULTS)
+        job.update(spec)
+        job.setdefault('name', f"{job['symbol']}-{index + 1}")
+        for key in ('symbol', 'account1', 'account2', 'usdt_amount', 'leverage', 'wait_seconds'):
+            if key not in job:
+                raise ValueError(f"Job {job['name']} is missing '{key}'")
+        if job['funding_policy'] not in FUNDING_POLICIES:
+            raise ValueError(f"Job {job['name']} has unknown funding_policy '{job['funding_policy']}'")
+        job['budgets'] = load_budgets(job['budgets'])
+        for leg in ('account1', 'account2'):
+            if job[leg] not in accounts:
+                raise ValueError(f"Job {job['name']} refers to unknown account '{job[leg]}'")
+            # Two jobs on the same account and symbol would net each other's one-way position
+            if (job[leg], job['symbol']) in seen:
+                raise ValueError(f"Account '{job[leg]}' trades {job['symbol']} in more than one job")
+            seen.add((job[leg], job['symbol']))
+        jobs.append(job)
+    return jobs
+
+
+def create_clients(config, api_class):
+    """One API client per account, all sharing a clock offset, symbol filters, prices, rate limits, metrics and an HTTP connection pool"""
+    network_config = config.get('network', {})
+    pool_size = network_config.get('pool_size', 10)
+    accounts = load_accounts(config)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size * max(1, len(accounts)))
+    ticker_cache = TickerCache(max_age=network_config.get('ticker_max_age', 0.5))
+    metrics = MetricsRegistry()
+    scheduler = RequestScheduler(**network_config.get('rate_limits', {}), metrics=metrics)
+    clients = {}
+    clock = None
+    symbol_filters = None
+    for name, account in accounts.items():
+        clients[name] = api_class(
+            account['api_key'],
+            account['api_secret'],
+            clock=clock,
+            time_sync_interval=network_config.get('time_sync_interval', 300),
+            base_url=network_config.get('base_url', "https://fapi.asterdex.com"),
+            pool_size=pool_size,
+            timeout=network_config.get('timeout', 10),
+            adapter=adapter,
+            symbol_filters=symbol_filters,
+            exchange_info_ttl=network_config.get('exchange_info_ttl', 3600),
+            ticker_cache=ticker_cache,
+            scheduler=scheduler,
+            metrics=metrics,
+            name=name
+        )
+        clock = clock or clients[name].clock
+        symbol_filters = symbol_filters or clients[name].symbol_filters
+    return clients
+
+
+class BlockingIO:
+    """How HedgeJob's cycle steps make their requests with blocking AsterDexAPI clients.
+
+    The steps are written once, as coroutines over an `io` object, for the
+    threaded engine and the asyncio mode alike; async_api.EventLoopIO makes
+    the same requests on the event loop. Nothing here ever suspends, so
+    run_blocking takes a step to its end without an event loop.
+    """
+
+    async def call(self, request):
+        """The result of `request()`, a client call"""
+        return request()
+
+    async def gather(self, *requests):
+        """The results of several client calls, in order; the first error is raised"""
+        return [request() for request in requests]
+
+    async def execute(self, executor, legs, **kwargs):
+        return executor.execute(legs, **kwargs)
+
+    async def flatten(self, targets, journal):
+        return flatten_all(targets, journal=journal)
+
+
+BLOCKING_IO = BlockingIO()
+
+
+def run_blocking(step):
+    """Run a cycle step coroutine that makes its requests through BLOCKING_IO; returns its result"""
+    try:
+        step.send(None)
+    except StopIteration as done:
+        return done.value
+    step.close()
+    raise RuntimeError("a cycle step suspended under BLOCKING_IO")
+
+
+class HedgeJob:
+    """One symbol traded long on account1 and short on account2, with its own stats.
+
+    Each cycle step (plan, open, close, flatten, resume) is a coroutine
+    `*_on(io)` shared by both transports, with a blocking method of the
+    same name that runs it through BLOCKING_IO for the threaded engine.
+    """
+
+    def __init__(self, spec, account1, account2, journal=None, checkpoint=None):
+        self.spec = spec
+        self.name = spec['name']
+        self.symbol = spec['symbol']
+        self.account1 = account1
+        self.account2 = account2
+        self.usdt_amount = spec['usdt_amount']
+        self.leverage = spec['leverage']
+        self.wait_seconds = spec['wait_seconds']
+        self.rest_seconds = spec['rest_seconds']
+        self.position_side = spec['position_side']
+        self.order_type = spec['order_type']
+        self.max_slippage_bps = spec['max_slippage_bps']
+        self.margin_type = spec['margin_type']
+        self.budgets = load_budgets(spec['budgets'])
+        self.executor = HedgeExecutor(journal=journal)
+        self.journal = journal
+        self.checkpoint = checkpoint
+        self.planner = CyclePlanner(self.wait_seconds, self.rest_seconds, spec['cycles_per_hour'],
+                                    spec['funding_policy'], spec['funding_guard_seconds'])
+        self.stats = {
+            'trade_count': 0,
+            'total_volume': 0,
+            'total_volume_usdt': 0,
+            'last_trade_time': None,
+            'funding_rate': 0,
+            'last_order_price': 0,
+            'phase': 'idle',
+            'last_error': None,
+            'cycles_completed': 0,
+            'realized_pnl': 0.0,
+            'started_at': None
+        }
+        # Cash in and out of opening the held legs; None when their fills are not known
+        self._open_cash_flow = 0.0
+        # {'quantity', 'close_at' (wall clock)} while both legs are open
+        self.held = None
+        # What the last flatten left open by "account symbol" (None: unread); no cycle opens until it is empty
+        self.unhedged = {}
+        self._restored_cycles = 0
+
+    def legs(self, quantity, opening, expected_price=None):
+        long_side, short_side = ("BUY", "SELL") if opening else ("SELL", "BUY")
+        # In one-way mode a close sent twice must not open the other way; hedge mode closes through the position side
+        reduce_only = not opening and self.position_side == 'BOTH'
+        legs = [
+            (self.account1, dict(symbol=self.symbol, side=long_side, order_type=self.order_type,
+                                 quantity=quantity, position_side=self.position_side, reduce_only=reduce_only)),
+            (self.account2, dict(symbol=self.symbol, side=short_side, order_type=self.order_type,
+                                 quantity=quantity, position_side=self.position_side, reduce_only=reduce_only))
+        ]
+        if expected_price is not None:
+            # Opening legs are checked against MIN_NOTIONAL at this price before either is sent; closes are exempt
+            for _, order in legs:
+                order['expected_price'] = expected_price
+        return legs
+
+    def set_leverage(self):
+        return (self.account1.set_leverage(self.symbol, self.leverage),
+                self.account2.set_leverage(self.symbol, self.leverage))
+
+    def record_open(self, quantity, price, funding_rate):
+        volume = quantity * 2  # Each trade involves both accounts
+        self.stats['trade_count'] += 1
+        self.stats['total_volume'] += volume
+        self.stats['total_volume_usdt'] += volume * price
+        self.stats['last_trade_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.stats['funding_rate'] = funding_rate
+        self.stats['last_order_price'] = price
+
+    def record_fills(self, legs, responses, latencies, opening):
+        """Book the legs' cash flow and append them to the trade journal, if there is one.
+
+        Only fills the responses report in full are booked: when a leg's fill
+        is unknown or short of its order, the cycle's cash flow is unknown
+        and its realized PnL is left out rather than guessed.
+        """
+        cash_flow = 0.0
+        for (_, order), response in zip(legs, responses):
+            fill = order_fill(response)
+            if fill is None or fill[0] < order['quantity']:
+                cash_flow = None
+                break
+            quantity, price = fill
+            cash_flow += quantity * price if order['side'] == "SELL" else -quantity * price
+        if opening:
+            self._open_cash_flow = cash_flow
+        else:
+            if cash_flow is not None and self._open_cash_flow is not None:
+                # Both legs are flat again, so the cycle's cash in and out is its realized PnL (before fees)
+                self.stats['realized_pnl'] += self._open_cash_flow + cash_flow
+            self._open_cash_flow = 0.0
+        self.journal_legs(legs, responses, latencies, opening)
+
+    def journal_legs(self, legs, responses, latencies, opening):
+        """Append whatever the legs filled to the trade journal, if there is one"""
+        if self.journal is None:
+            return
+        codes = (LEG_OPEN_LONG, LEG_OPEN_SHORT) if opening else (LEG_CLOSE_LONG, LEG_CLOSE_SHORT)
+        for code, (_, order), response, latency in zip(codes, legs, responses, latencies):
+            self.journal.record_order(self.symbol, code, order['side'], response, latency)
+
+    def journal_failed(self, legs, error, latencies, opening):
+        """Journal the legs of a hedge that failed with `error` but filled all the same.
+
+        Their unwind or the flatten after them is journaled as it is sent;
+        `error` may be the DeadlineExceeded raised from a HedgeLegError.
+        """
+        failure = error if isinstance(error, HedgeLegError) else error.__cause__
+        if isinstance(failure, HedgeLegError):
+            self.journal_legs(legs, failure.responses, latencies, opening)
+
+    def cycles_per_minute(self):
+        if not self.stats['started_at']:
+            return 0.0
+        elapsed = time.monotonic() - self.stats['started_at']
+        cycles = self.stats['cycles_completed'] - self._restored_cycles
+        return cycles * 60 / elapsed if elapsed > 0 else 0.0
+
+    def plan_cycle(self):
+        """(open_at, close_at) of the next cycle, refreshing the funding countdown once the last one has passed"""
+        return run_blocking(self.plan_cycle_on(BLOCKING_IO))
+
+    async def plan_cycle_on(self, io):
+        if self.planner.needs_funding(time.monotonic()):
+            self.planner.funding_at = await io.call(lambda: self.account1.get_funding_deadline(self.symbol))
+        return self.planner.plan(time.monotonic())
+
+    def record_lateness(self, step, due):
+        """How far behind its deadline a step starts: the drift the planner has to absorb"""
+        self.account1.metrics.observe('cycle_lateness_seconds', time.monotonic() - due, job=self.name, step=step)
+
+    def save_state(self):
+        """Write the job's phase, open legs and stats to the checkpoint, if there is one"""
+        if self.checkpoint is None:
+            return
+        self.checkpoint.update('jobs', self.name, {
+            'symbol': self.symbol,
+            'phase': self.stats['phase'],
+            'held': self.held,
+            'open_cash_flow': self._open_cash_flow,
+            'stats': {key: self.stats[key] for key in PERSISTED_STATS}
+        })
+
+    def set_phase(self, phase):
+        self.stats['phase'] = phase
+        self.save_state()
+
+    def hold(self, quantity, close_at):
+        """Both legs are open for `quantity` until `close_at` (time.monotonic())"""
+        self.held = {'quantity': quantity, 'close_at': time.time() + close_at - time.monotonic()}
+        self.set_phase('holding')
+
+    def held_until(self):
+        """The held legs' planned close as a time.monotonic() deadline"""
+        return time.monotonic() + self.held['close_at'] - time.time()
+
+    def restore(self, state, positions1, positions2):
+        """Take up a checkpointed `state` against both accounts' positionRisk; returns reconcile()'s action.
+
+        Stats carry over in every case; on 'resume' the held legs become the
+        job's own, to be closed at their planned time.
+        """
+        action = reconcile(state, positions1, positions2)
+        if state:
+            self.stats.update(state.get('stats', {}))
+            self._restored_cycles = self.stats['cycles_completed']
+        if action == 'resume':
+            self.held = state['held']
+            self._open_cash_flow = state.get('open_cash_flow', 0.0)
+            self.planner.last_close = self.held_until()
+            self.stats['phase'] = 'holding'
+        return action
+
+    def resume(self, state):
+        """Reconcile a checkpointed `state` with the exchange, flattening what does not match.
+
+        Returns the number of legs that had to be closed; `held` is set if
+        the checkpointed legs were taken over instead.
+        """
+        return run_blocking(self.resume_on(BLOCKING_IO, state))
+
+    async def resume_on(self, io, state):
+        positions1, positions2 = await io.gather(lambda: self.account1.get_position_info(self.symbol),
+                                                 lambda: self.account2.get_position_info(self.symbol))
+        action = self.restore(state, positions1, positions2)
+        closed = await self.flatten_on(io) if action == 'flatten' else 0
+        self.set_phase('holding' if action == 'resume' else 'idle')
+        return closed
+
+    def missed_deadline(self, phase, action):
+        self.account1.metrics.increment('deadline_misses_total', job=self.name, phase=phase, action=action)
+
+    def flatten(self):
+        """Close whatever both accounts hold in the symbol, read back from the exchange.
+
+        Used when legs were sent but their outcome is unknown, so the orders
+        themselves cannot simply be reversed. Both accounts are closed at
+        once and read back until flat (flatten.flatten_all), within the
+        job's flatten budget; returns how many legs were still open.
+        Whatever the read-back still shows open, or could not read, is kept
+        in `unhedged` for ensure_flat to retry with a new budget.
+        """
+        return run_blocking(self.flatten_on(BLOCKING_IO))
+
+    async def flatten_on(self, io):
+        self.set_phase('flattening')
+        self.unhedged = self.unhedged or {self.name: None}
+        with deadline('flatten', self.budgets['flatten']) as budget:
+            with self.account1.metrics.timer('cycle_phase_seconds', job=self.name, phase='flatten'):
+                report = await io.flatten(flatten_targets([self]), self.journal)
+        if report['remaining'] and budget.expired:
+            self.missed_deadline('flatten', 'retry')
+        self.unhedged = report['remaining']
+        self.held = None
+        self._open_cash_flow = 0.0
+        self.save_state()
+        return report['closed']
+
+    def check_flat(self):
+        """FlattenError if the last flatten left something open"""
+        if self.unhedged:
+            raise FlattenError(f"{self.name}: still open after flattening: {self.unhedged}", self.unhedged)
+
+    def ensure_flat(self):
+        """Flatten again if the last flatten left something open; FlattenError if it still does"""
+        run_blocking(self.ensure_flat_on(BLOCKING_IO))
+
+    async def ensure_flat_on(self, io):
+        if self.unhedged:
+            await self.flatten_on(io)
+        self.check_flat()
+
+    async def _size(self, io):
+        with deadline('sizing', self.budgets['sizing']):
+            current_price, funding_rate = await io.gather(lambda: self.account1.get_current_price(self.symbol),
+                                                          lambda: self.account1.get_funding_rate(self.symbol))
+            quantity = await io.call(lambda: self.account1.calculate_quantity_from_usdt(
+                self.symbol, self.usdt_amount, self.leverage, price=current_price,
+                max_slippage_bps=self.max_slippage_bps))
+        return quantity, current_price, funding_rate
+
+    async def _execute(self, io, phase, legs, **kwargs):
+        """Send `legs` within the phase budget; DeadlineExceeded if it ran out first"""
+        # The legs' threads or tasks copy this context, so their requests inherit the phase deadline
+        with deadline(phase, self.budgets[phase]) as budget:
+            try:
+                return await io.execute(self.executor, legs, **kwargs)
+            except Exception as e:
+                if budget.expired:
+                    raise budget.exceeded() from e
+                raise
+
+    def open_cycle(self, on_open=None, close_at=None):
+        """Size and open both legs, to be held until `close_at`; returns the quantity to close.
+
+        Sizing that misses its deadline is tried once more with a new budget,
+        then the cycle is skipped. Legs that miss theirs or fail are
+        flattened, since a leg that timed out or filled in part may still be
+        open; the error is raised once the flatten has run. The phase
+        timers measure the phases alone, not the flatten after them.
+        """
+        return run_blocking(self.open_cycle_on(BLOCKING_IO, on_open, close_at))
+
+    async def open_cycle_on(self, io, on_open=None, close_at=None):
+        metrics = self.account1.metrics
+        self.set_phase('opening')
+        with metrics.timer('cycle_phase_seconds', job=self.name, phase='sizing'):
+            try:
+                quantity, current_price, funding_rate = await self._size(io)
+            except DeadlineExceeded:
+                self.missed_deadline('sizing', 'retry')
+                try:
+                    quantity, current_price, funding_rate = await self._size(io)
+                except DeadlineExceeded:
+                    self.missed_deadline('sizing', 'skip')
+                    raise
+        legs = self.legs(quantity, opening=True, expected_price=current_price)
+        try:
+            with metrics.timer('cycle_phase_seconds', job=self.name, phase='open'):
+                responses = await self._execute(io, 'open', legs)
+        except Exception as e:
+            if isinstance(e, DeadlineExceeded):
+                self.missed_deadline('open', 'flatten')
+            self.journal_failed(legs, e, self.executor.last_latencies, opening=True)
+            await self.flatten_on(io)
+            raise
+        # The orders carried the sized Decimal; stats, the checkpoint and callbacks count in floats
+        quantity = float(quantity)
+        self.record_fills(legs, responses, self.executor.last_latencies, opening=True)
+        self.record_open(quantity, current_price, funding_rate)
+        self.hold(quantity, time.monotonic() + self.wait_seconds if close_at is None else close_at)
+        if on_open is not None:
+            on_open(self, quantity, current_price, funding_rate)
+        return quantity
+
+    def close_cycle(self, quantity):
+        """Close both legs; if that misses its deadline or a leg fails, flatten whatever is left open instead.
+
+        FlattenError if the flatten could not confirm both accounts flat;
+        the next plan retries it (ensure_flat) before opening again.
+        """
+        run_blocking(self.close_cycle_on(BLOCKING_IO, quantity))
+
+    async def close_cycle_on(self, io, quantity):
+        self.set_phase('closing')
+        legs = self.legs(quantity, opening=False)
+        try:
+            with self.account1.metrics.timer('cycle_phase_seconds', job=self.name, phase='close'):
+                responses = await self._execute(io, 'close', legs, retries=3, unwind=False)
+        except Exception as e:
+            # Either leg may be closed, closed in part or still open
+            if isinstance(e, DeadlineExceeded):
+                self.missed_deadline('close', 'flatten')
+            self.stats['last_error'] = str(e)
+            self.journal_failed(legs, e, self.executor.last_latencies, opening=False)
+            await self.flatten_on(io)
+            self.check_flat()
+        else:
+            self.record_fills(legs, responses, self.executor.last_latencies, opening=False)
+        self.stats['cycles_completed'] += 1
+        self.held = None
+        self.set_phase('idle')
+
+    def fail(self, e):
+        """Record the error a step failed with; returns the seconds to wait before planning again"""
+        # Legs left in an unknown state are not held: the next plan flattens them first
+        if self.held is not None:
+            self.unhedged = self.unhedged or {self.name: None}
+        self.held = None
+        self.stats['last_error'] = str(e)
+        self.set_phase('error')
+        # A missed deadline has already been skipped or flattened; anything else waits before retrying
+        return 0 if isinstance(e, DeadlineExceeded) else 5
+
+    def run_cycle(self, stopped, on_open=None):
+        """Open both legs, hold for wait_seconds, close both legs.
+
+        `stopped` is a threading.Event; if it is set during the hold the cycle
+        returns with the legs still open and the caller's cleanup flattens them.
+        """
+        quantity = self.open_cycle(on_open)
+        with self.account1.metrics.timer('cycle_phase_seconds', job=self.name, phase='hold'):
+            if stopped.wait(self.wait_seconds):
+                return
+        self.close_cycle(quantity)
+
+
+class HedgeEngine:
+    """Runs every hedge job concurrently on one CycleScheduler.
+
+    A job is a chain of scheduled steps: open at the planned open deadline,
+    close at the planned close deadline, then plan the next cycle. Holds and
+    rests are heap entries, so only the requests themselves occupy a worker
+    thread, however many jobs there are.
+    """
+
+    def __init__(self, jobs, on_open=None, on_error=None, workers=None):
+        self.jobs = jobs
+        self.on_open = on_open
+        self.on_error = on_error
+        # Steps are short compared with holds, so a few workers serve many jobs
+        self.scheduler = CycleScheduler(workers=workers or min(32, max(1, len(jobs))))
+        self._stopped = threading.Event()
+
+    def _fail(self, job, e):
+        retry_in = job.fail(e)
+        if self.on_error is not None:
+            self.on_error(job, e)
+        self.scheduler.call_later(retry_in, self._plan, job)
+
+    def _plan(self, job):
+        if self._stopped.is_set():
+            return
+        try:
+            # Never open a cycle on top of legs a failed step may have left open
+            job.ensure_flat()
+            open_at, close_at = job.plan_cycle()
+        except Exception as e:
+            self._fail(job, e)
+            return
+        self.scheduler.call_at(open_at, self._open, job, open_at, close_at)
+
+    def _open(self, job, open_at, close_at):
+        if self._stopped.is_set():
+            return
+        job.record_lateness('open', open_at)
+        try:
+            quantity = job.open_cycle(self.on_open, close_at)
+        except Exception as e:
+            # A skipped or flattened cycle frees its planned slot
+            job.planner.cancel()
+            self._fail(job, e)
+            return
+        self.scheduler.call_at(close_at, self._close, job, quantity, close_at, time.monotonic())
+
+    def _close(self, job, quantity, close_at, held_since):
+        # Once stopped, legs still open are left to the caller's cleanup: flattened, or kept for a warm restart
+        if self._stopped.is_set():
+            return
+        job.account1.metrics.observe('cycle_phase_seconds', time.monotonic() - held_since, job=job.name, phase='hold')
+        job.record_lateness('close', close_at)
+        try:
+            job.close_cycle(quantity)
+        except Exception as e:
+            self._fail(job, e)
+            return
+        self._plan(job)
+
+    def start(self):
+        self.scheduler.start()
+        for job in self.jobs:
+            job.stats['started_at'] = time.monotonic()
+            if job.held is not None:
+                # Legs taken over from a checkpoint go straight to their planned close
+                close_at = job.held_until()
+                self.scheduler.call_at(close_at, self._close, job, job.held['quantity'], close_at, time.monotonic())
+            else:
+                self.scheduler.call_later(0, self._plan, job)
+
+    def wait(self):
+        """Block until stop() is called; short waits keep KeyboardInterrupt responsive"""
+        while not self._stopped.wait(0.5):
+            pass
+        self.scheduler.stop()
+
+    def stop(self):
+        """Stop scheduling new steps and wait for the ones already sending orders"""
+        self._stopped.set()
+        self.scheduler.stop()
+
+    def skew_stats(self):
+        return merged_skew_stats([job.executor for job in self.jobs])
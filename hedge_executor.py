@@ -0,0 +1,237 @@
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import current_deadline
+from trade_journal import LEG_UNWIND, order_fill
+
+# Error codes with which the exchange says it does not know whether the order executed
+UNKNOWN_STATUS_CODES = (-1000, -1001, -1006, -1007)
+# Order query: no order with that id reached the exchange
+ORDER_NOT_FOUND = -2013
+
+
+class HedgeLegError(Exception):
+    """Raised when a hedge leg could not be filled; `results` holds every leg's outcome.
+
+    Legs that filled in part or whose outcome is unknown are left as they
+    are: the caller flattens both accounts rather than guess. `responses`
+    are the legs' last order responses, in leg order, for journaling what
+    filled anyway.
+    """
+
+    def __init__(self, message, results, responses):
+        super().__init__(message)
+        self.results = results
+        self.responses = responses
+
+
+def new_client_order_id():
+    """A client order id, so an order whose response was lost can still be looked up"""
+    return f"hedge-{uuid.uuid4().hex[:24]}"
+
+
+def leg_outcome(response, quantity):
+    """'filled', 'partial', 'rejected' or 'unknown' for an order response of `quantity`.
+
+    `response` may be the exception sending the order raised. Only an
+    explicit rejection by the exchange is safe to send again: a timeout, a
+    dropped connection or an "execution status unknown" error may still
+    have reached the book, and is looked up (query_outcome) rather than
+    resent.
+    """
+    if not isinstance(response, dict):
+        return 'unknown'
+    if 'orderId' in response:
+        fill = order_fill(response)
+        if fill is None:
+            # Expired or cancelled without a fill did nothing; any other status does not say yet
+            expired = response.get('status') in ('EXPIRED', 'CANCELED', 'REJECTED')
+            return 'rejected' if expired and not float(response.get('executedQty') or 0) else 'unknown'
+        # A market order the book could not fill in full expires with the rest unfilled
+        return 'filled' if fill[0] >= float(quantity) * (1 - 1e-9) else 'partial'
+    code = response.get('code')
+    if isinstance(code, int) and code < 0 and code not in UNKNOWN_STATUS_CODES:
+        return 'rejected'
+    return 'unknown'
+
+
+def query_outcome(response, quantity):
+    """(outcome, response) from the query_order answer for an order whose outcome was unknown"""
+    if isinstance(response, dict) and response.get('code') == ORDER_NOT_FOUND:
+        return 'rejected', response
+    if isinstance(response, dict) and 'orderId' in response:
+        return leg_outcome(response, quantity), response
+    return 'unknown', None
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class HedgeExecutor:
+    """Sends the legs of a hedge at the same moment and records the skew between them.
+
+    Every leg is signed before any of them goes out; worker threads then wait on a
+    barrier so the requests leave together instead of one round trip apart.
+    Each order carries its own client order id, so a leg whose response is
+    lost is looked up with query_order instead of being sent twice.
+    The fills of unwound legs go to `journal` (a TradeJournal), if given.
+    """
+
+    def __init__(self, legs=2, max_samples=1000, journal=None):
+        self._pool = ThreadPoolExecutor(max_workers=legs, thread_name_prefix="hedge-leg")
+        self._lock = threading.Lock()
+        self.journal = journal
+        self.send_skew = deque(maxlen=max_samples)
+        self.ack_skew = deque(maxlen=max_samples)
+        self.leg_failures = 0
+        self.unwinds = 0
+        # Round trip of each leg of the last execute(), in leg order
+        self.last_latencies = []
+
+    def _send_leg(self, api, order, client_order_id, prepared, barrier):
+        barrier.wait()
+        result = {'api': api, 'response': None, 'error': None, 'client_order_id': client_order_id}
+        result['sent_at'] = time.perf_counter()
+        try:
+            result['response'] = api.send_prepared(prepared)
+        except Exception as e:
+            result['error'] = str(e)
+        result['acked_at'] = time.perf_counter()
+        result['outcome'] = leg_outcome(result['response'] if result['error'] is None else None, order['quantity'])
+        return result
+
+    def _send_all(self, legs):
+        client_order_ids = [new_client_order_id() for _ in legs]
+        prepared = [api.prepare_order(**order, client_order_id=client_order_id)
+                    for (api, order), client_order_id in zip(legs, client_order_ids)]
+        barrier = threading.Barrier(len(legs))
+        # Each leg runs in a copy of the caller's context, so its request inherits the phase deadline
+        futures = [self._pool.submit(contextvars.copy_context().run, self._send_leg, api, order, client_order_id,
+                                     request, barrier)
+                   for (api, order), client_order_id, request in zip(legs, client_order_ids, prepared)]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _query(api, order, result):
+        try:
+            answer = api.query_order(order['symbol'], result['client_order_id'])
+        except Exception:
+            return
+        outcome, response = query_outcome(answer, order['quantity'])
+        result['outcome'] = outcome
+        if response is not None:
+            result['response'], result['error'] = response, None
+
+    def _reconcile(self, legs, results):
+        """Look up the legs whose outcome is unknown by their client order id"""
+        unknown = [i for i, result in enumerate(results) if result['outcome'] == 'unknown']
+        futures = [self._pool.submit(contextvars.copy_context().run, self._query, legs[i][0], legs[i][1], results[i])
+                   for i in unknown]
+        for future in futures:
+            future.result()
+
+    def execute(self, legs, retries=1, unwind=True):
+        """Send all legs concurrently.
+
+        `legs` is a list of (api, order) pairs where `order` holds the keyword
+        arguments of `AsterDexAPI.place_order`. Legs whose outcome is unknown
+        (a timeout, a lost response) are looked up first; legs the exchange
+        rejected are re-signed and resent up to `retries` times, unless the
+        current deadline has run out. If a leg still is not filled in full,
+        the filled legs are closed again when `unwind` is set and
+        HedgeLegError is raised.
+        Returns the order responses in leg order; `last_latencies` holds
+        each leg's round trip either way.
+        """
+        with self._lock:
+            results = self._send_all(legs)
+            self.send_skew.append(max(r['sent_at'] for r in results) - min(r['sent_at'] for r in results))
+            self.ack_skew.append(max(r['acked_at'] for r in results) - min(r['acked_at'] for r in results))
+            self._reconcile(legs, results)
+
+            for _ in range(retries):
+                rejected = [i for i, result in enumerate(results) if result['outcome'] == 'rejected']
+                current = current_deadline()
+                if not rejected or (current is not None and current.expired):
+                    break
+                self.leg_failures += len(rejected)
+                for i in rejected:
+                    response = results[i]['response']
+                    if isinstance(response, dict) and response.get('code') == -1021:
+                        legs[i][0].clock.force_resync()
+                for i, result in zip(rejected, self._send_all([legs[i] for i in rejected])):
+                    results[i] = result
+                self._reconcile(legs, results)
+
+            self.last_latencies = [result['acked_at'] - result['sent_at'] for result in results]
+            failed = [i for i, result in enumerate(results) if result['outcome'] != 'filled']
+            if failed:
+                self.leg_failures += len(failed)
+                if unwind:
+                    self._unwind([legs[i] for i, result in enumerate(results) if result['outcome'] == 'filled'])
+                errors = [f"{results[i]['outcome']}: {results[i]['error'] or results[i]['response']}" for i in failed]
+                raise HedgeLegError(f"Hedge leg(s) {failed} failed: {errors}", results,
+                                    [result['response'] for result in results])
+            return [result['response'] for result in results]
+
+    def record_skew(self, sent, acked):
+        """Record the skew of a hedge sent elsewhere (execute_hedge) from each leg's send and ack times"""
+        with self._lock:
+            self.send_skew.append(max(sent) - min(sent))
+            self.ack_skew.append(max(acked) - min(acked))
+
+    def record_unwind(self, legs, responses, outcomes, latencies):
+        """Count an unwind of reversed `legs` (sent elsewhere for execute_hedge) and journal their fills"""
+        self.unwinds += 1
+        self.leg_failures += sum(1 for outcome in outcomes if outcome != 'filled')
+        if self.journal is None:
+            return
+        for (_, order), response, latency in zip(legs, responses, latencies):
+            self.journal.record_order(order['symbol'], LEG_UNWIND, order['side'], response, latency)
+
+    def _unwind(self, filled_legs):
+        if not filled_legs:
+            return
+        reverse = []
+        for api, order in filled_legs:
+            order = dict(order)
+            order['side'] = "SELL" if order['side'] == "BUY" else "BUY"
+            # A reversed leg only ever closes what it opened
+            order['reduce_only'] = order.get('position_side', 'BOTH') == 'BOTH'
+            reverse.append((api, order))
+        results = self._send_all(reverse)
+        self._reconcile(reverse, results)
+        self.record_unwind(reverse, [result['response'] for result in results],
+                           [result['outcome'] for result in results],
+                           [result['acked_at'] - result['sent_at'] for result in results])
+
+    def skew_stats(self):
+        """Send/ack skew percentiles in milliseconds"""
+        return merged_skew_stats([self])
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+def merged_skew_stats(executors):
+    """Skew percentiles in milliseconds over the samples of several executors"""
+    send, ack = [], []
+    for executor in executors:
+        with executor._lock:
+            send.extend(executor.send_skew)
+            ack.extend(executor.ack_skew)
+    return {
+        'send_p50_ms': _percentile(send, 50) * 1000,
+        'send_p99_ms': _percentile(send, 99) * 1000,
+        'ack_p50_ms': _percentile(ack, 50) * 1000,
+        'ack_p99_ms': _percentile(ack, 99) * 1000,
+        'samples': len(send),
+    }
@@ -1,212 +1,136 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
-import hmac
-import hashlib
-from urllib.parse import urlencode
 import json
 import os
 import math
-from datetime import datetime
 import threading
-from rich.console import Console
-from rich.live import Live
-from rich.table import Table
-from rich.panel import Panel
-from rich.layout import Layout
-from rich.text import Text
+import asyncio
+import sys
+import logging
+from clock_sync import ClockSync
+from symbol_filters import SymbolFilterCache
+from ticker_cache import TickerCache
+from rate_limiter import RequestScheduler, request_cost
+from deadline import current_deadline, request_timeout
+from request_signer import RequestSigner
+from metrics import MetricsExporter, MetricsRegistry
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_accounts, load_jobs
+from hedge_executor import merged_skew_stats
+from market_data import MarkPriceFeed
+from order_book import DepthFeed
+from user_data import UserDataStream
+from headless import HeadlessStatus, LogConsole
+from trade_journal import TradeJournal
+from supervisor import Supervisor
+from checkpoint import Checkpoint
+from flatten import flatten_all, flatten_all_async, flatten_targets
+from bootstrap import StartupTimer, bootstrap, bootstrap_async, wait_ready, wait_ready_async
+from adaptive_poll import AdaptivePoller
 
-class TradingUI:
-    def __init__(self):
-        self.console = Console()
-        self.layout = Layout()
-        self.account1_status = {
-            'position_side': 'NONE',
-            'quantity': 0,
-            'entry_price': 0,
-            'unrealized_pnl': 0,
-            'system_status': '初始化中',
-            'initial_balance': 0,
-            'current_balance': 0,
-            'margin': 0,
-            'liquidation_price': 0
-        }
-        self.account2_status = self.account1_status.copy()
-        self.current_price = 0
-        self.running = True
-        self.stats = {
-            'trade_count': 0,
-            'current_funding_rate': 0,
-            'last_trade_time': None,
-            'symbol': '',
-            'leverage': 0,
-            'wait_seconds': 0,
-            'last_order_price': 0,
-            'total_volume': 0,
-            'total_volume_usdt': 0,
-            'initial_total_balance': 0
-        }
-        
-    def generate_layout(self):
-        # 创建标题面板
-        title_panel = Panel(
-            Text("AsterDex 对冲交易系统", justify="center", style="bold white"),
-            style="blue"
-        )
-        
-        author_panel = Panel(
-            Text("免费开源，推特：@ddazmon", justify="center", style="bold white"),
-            style="blue"
-        )
-        
-        # 创建市场信息表格
-        total_pnl = (self.account1_status['current_balance'] - self.account1_status['initial_balance'] + 
-                    self.account2_status['current_balance'] - self.account2_status['initial_balance'])
-        
-        market_table = Table.grid(padding=1)
-        market_table.add_column("项目", style="cyan")
-        market_table.add_column("数值", style="green")
-        
-        market_table.add_row("交易对", self.stats['symbol'])
-        market_table.add_row("当前价格", f"{self.current_price} USDT")
-        market_table.add_row("当前杠杆", f"{self.stats['leverage']}x")
-        market_table.add_row("当前资金费率", f"{self.stats['current_funding_rate']*100:.4f}%")
-        market_table.add_row("持仓时间", f"{self.stats['wait_seconds']}秒")
-        market_table.add_row("交易次数", str(self.stats['trade_count']))
-        market_table.add_row("总交易量", f"{self.stats['total_volume_usdt']:.2f} USDT")
-        market_table.add_row("账号1余额", f"{self.account1_status['current_balance']:.4f} USDT")
-        market_table.add_row("账号2余额", f"{self.account2_status['current_balance']:.4f} USDT")
-        market_table.add_row("初始总资产", f"{self.stats['initial_total_balance']:.4f} USDT")
-        market_table.add_row("总盈亏", f"{total_pnl:.4f} USDT")
-        market_table.add_row("上次交易时间", self.stats['last_trade_time'] or '无')
-        market_table.add_row("当前时间", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-        
-        market_panel = Panel(
-            market_table,
-            title="市场信息",
-            border_style="green"
-        )
-        
-        # 创建账号状态表格
-        account_table = Table(show_header=True, padding=1)
-        account_table.add_column("账号", style="cyan", justify="left", width=8)
-        account_table.add_column("持仓方向", style="yellow", justify="center", width=10)
-        account_table.add_column("持仓数量", style="yellow", justify="right", width=12)
-        account_table.add_column("开仓价格", style="yellow", justify="right", width=12)
-        account_table.add_column("未实现盈亏", style="yellow", justify="right", width=20)
-        account_table.add_column("保证金", style="yellow", justify="right", width=20)
-        account_table.add_column("清算价格", style="yellow", justify="right", width=20)
-        
-        account_table.add_row(
-            "账号1",
-            self.account1_status['position_side'],
-            f"{self.account1_status['quantity']:>12.3f}",
-            f"{self.account1_status['entry_price']:>12.2f}",
-            f"{self.account1_status['unrealized_pnl']:>20.8f} USDT",
-            f"{self.account1_status['margin']:>20.8f} USDT",
-            f"{self.account1_status['liquidation_price']:>20.8f} USDT"
-        )
-        account_table.add_row(
-            "账号2",
-            self.account2_status['position_side'],
-            f"{self.account2_status['quantity']:>12.3f}",
-            f"{self.account2_status['entry_price']:>12.2f}",
-            f"{self.account2_status['unrealized_pnl']:>20.8f} USDT",
-            f"{self.account2_status['margin']:>20.8f} USDT",
-            f"{self.account2_status['liquidation_price']:>20.8f} USDT"
-        )
-        
-        account_panel = Panel(
-            account_table,
-            title="账号状态",
-            border_style="yellow"
-        )
-
-        # 组合所有面板
-        self.layout.split(
-            Layout(name="header", size=6),
-            Layout(name="main"),
-        )
-        
-        self.layout["header"].split(
-            Layout(title_panel, ratio=1),
-            Layout(author_panel, ratio=1)
-        )
-        self.layout["main"].split_row(
-            Layout(market_panel, ratio=1),
-            Layout(account_panel, ratio=2)
-        )
-        
-        return self.layout
-    
-    def update_status(self, account1_status, account2_status, current_price):
-        self.account1_status = account1_status
-        self.account2_status = account2_status
-        self.current_price = current_price
-        
-    def update_stats(self, funding_rate=0, symbol='', leverage=0, wait_seconds=0, last_order_price=0, volume=0):
-        self.stats['trade_count'] += 1
-        self.stats['current_funding_rate'] = funding_rate
-        self.stats['last_trade_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.stats['symbol'] = symbol
-        self.stats['leverage'] = leverage
-        self.stats['wait_seconds'] = wait_seconds
-        self.stats['last_order_price'] = last_order_price
-        self.stats['total_volume'] += volume
-        self.stats['total_volume_usdt'] += volume * last_order_price
-        
-        # 更新初始总资产（仅在第一次更新时）
-        if self.stats['initial_total_balance'] == 0:
-            self.stats['initial_total_balance'] = (
-                self.account1_status['initial_balance'] + 
-                self.account2_status['initial_balance']
-            )
-        
-    def show(self):
-        with Live(self.generate_layout(), refresh_per_second=1) as live:
-            while self.running:
-                live.update(self.generate_layout())
-                time.sleep(1)
-    
-    def stop(self):
-        self.running = False
+def make_console(headless=False):
+    """提示信息使用 rich Console 输出，无界面模式下写入日志"""
+    if headless:
+        return LogConsole()
+    from rich.console import Console
+    return Console()
 
 class AsterDexAPI:
-    def __init__(self, api_key, api_secret):
+    def __init__(self, api_key, api_secret, clock=None, time_sync_interval=300,
+                 base_url="https://fapi.asterdex.com", pool_size=10, timeout=10, market_data=None, order_book=None, adapter=None,
+                 symbol_filters=None, exchange_info_ttl=3600, ticker_cache=None, scheduler=None,
+                 metrics=None, name=None):
         self.api_key = api_key
+        self.name = name or "account"
         self.api_secret = api_secret
-        self.base_url = "https://fapi.asterdex.com"
+        self.signer = RequestSigner(api_secret)
+        self.base_url = base_url
         self.recv_window = 5000
+        self.timeout = timeout
+        # 每个客户端持有一个长连接池，状态线程、交易循环和清理共用
+        self.session = requests.Session()
+        adapter = adapter or HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"X-MBX-APIKEY": api_key})
+        self.market_data = market_data
+        self.order_book = order_book
+        self.clock = clock or ClockSync(self._get_server_time, resync_interval=time_sync_interval)
+        self.symbol_filters = symbol_filters or SymbolFilterCache(self._get_exchange_info, ttl=exchange_info_ttl)
+        self.ticker_cache = ticker_cache or TickerCache()
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = metrics or MetricsRegistry()
         
-    def _generate_signature(self, params):
-        query_string = urlencode(params)
-        signature = hmac.new(
-            self.api_secret.encode('utf-8'),
-            query_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        return signature
-    
     def _get_server_time(self):
-        response = requests.get(self.base_url + "/fapi/v1/time")
-        return response.json()['serverTime']
+        return self._request("GET", "/fapi/v1/time")['serverTime']
+    
+    def _get_exchange_info(self):
+        return self._request("GET", "/fapi/v1/exchangeInfo")
     
     def _get_timestamp(self):
-        server_time = self._get_server_time()
-        local_time = int(time.time() * 1000)
-        time_diff = server_time - local_time
-        return int(time.time() * 1000) + time_diff
+        return self.clock.now_ms()
+    
+    def sync_clock(self):
+        return self.clock.sync()
+    
+    def get_symbol_filters(self, symbol):
+        return self.symbol_filters.get(symbol)
+    
+    def _request(self, method, endpoint, params=None):
+        # 按接口权重和下单数占用请求额度，下单优先于状态轮询
+        weight, orders, lane = request_cost(method, endpoint)
+        start = time.perf_counter()
+        self.scheduler.acquire(self.api_key, weight, orders, lane)
+        self.metrics.observe('request_stage_seconds', time.perf_counter() - start, stage='rate_limit_wait', account=self.name)
+        # 等待时间不超过当前阶段剩余的延迟预算
+        timeout = request_timeout(self.timeout)
+        response = self._send(endpoint, lambda: self.session.request(
+            method, self.base_url + endpoint, params=params, timeout=timeout))
+        return self._record(endpoint, weight, response, start)
+    
+    def _send(self, endpoint, send):
+        sent = time.perf_counter()
+        try:
+            response = send()
+        except requests.RequestException as e:
+            self.metrics.increment('request_errors_total', endpoint=endpoint, code=type(e).__name__)
+            # 阶段预算已用完时的超时属于超出截止时间，而不是网络错误
+            current = current_deadline()
+            if isinstance(e, requests.Timeout) and current is not None and current.expired:
+                raise current.exceeded() from e
+            raise
+        self.metrics.observe('request_stage_seconds', time.perf_counter() - sent, stage='network', account=self.name)
+        self.scheduler.record_response(self.api_key, response.status_code, response.headers)
+        return response
+    
+    def _record(self, endpoint, weight, response, start):
+        # 按接口和账号记录延迟、请求权重和错误码
+        data = response.json()
+        self.metrics.observe('request_seconds', time.perf_counter() - start, endpoint=endpoint, account=self.name)
+        self.metrics.increment('request_weight_total', weight, account=self.name)
+        if response.status_code >= 400 or (isinstance(data, dict) and data.get('code', 0) < 0):
+            code = data.get('code', response.status_code) if isinstance(data, dict) else response.status_code
+            self.metrics.increment('request_errors_total', endpoint=endpoint, code=code)
+        return data
+    
+    def _sign_params(self, params):
+        timestamp = self._get_timestamp()
+        with self.metrics.timer('request_stage_seconds', stage='sign', account=self.name):
+            return self.signer.sign(params, timestamp, self.recv_window)
+    
+    def _signed_request(self, method, endpoint, params):
+        for attempt in range(2):
+            data = self._request(method, endpoint, self._sign_params(params))
+            if attempt == 0 and isinstance(data, dict) and data.get('code') == -1021:
+                # 服务器时间偏移失效，强制重新同步后重试一次
+                self.clock.force_resync()
+                continue
+            return data
     
     def get_account_info(self):
         """获取账户信息"""
         endpoint = "/fapi/v2/account"
-        params = {
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
-        }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.get(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
+        return self._signed_request("GET", endpoint, {})
     
     def get_account_balance(self):
         """获取账户余额"""
@@ -216,90 +140,174 @@ class AsterDexAPI:
                 return float(asset['walletBalance'])
         return 0.0
     
-    def get_current_price(self, symbol):
+    def get_current_price(self, symbol, max_age=None):
+        # 行情推送数据新鲜时直接读缓存，否则回退到 REST
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None:
+                return cached['mark_price']
+        # 最近的价格所有调用方共用；同时未命中的查询只发一个 REST 请求
+        return self.ticker_cache.get(symbol, lambda: self._fetch_price(symbol), max_age)
+    
+    def _fetch_price(self, symbol):
         endpoint = "/fapi/v1/ticker/price"
         params = {"symbol": symbol}
-        response = requests.get(self.base_url + endpoint, params=params)
-        return float(response.json()['price'])
+        return float(self._request("GET", endpoint, params)['price'])
     
     def get_position_info(self, symbol):
         endpoint = "/fapi/v2/positionRisk"
-        params = {
-            "symbol": symbol,
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
-        }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.get(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
+        params = {"symbol": symbol}
+        return self._signed_request("GET", endpoint, params)
     
     def get_funding_rate(self, symbol):
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None:
+                return cached['funding_rate']
         endpoint = "/fapi/v1/premiumIndex"
         params = {"symbol": symbol}
-        response = requests.get(self.base_url + endpoint, params=params)
-        return float(response.json()['lastFundingRate'])
+        return float(self._request("GET", endpoint, params)['lastFundingRate'])
+    
+    def get_funding_deadline(self, symbol):
+        """下次资金费结算的 time.monotonic() 时间，按交易所返回的倒计时计算"""
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None and cached['next_funding_time']:
+                return cached['received_at'] + (cached['next_funding_time'] - cached['event_time']) / 1000
+        received_at = time.monotonic()
+        index = self._request("GET", "/fapi/v1/premiumIndex", {"symbol": symbol})
+        return received_at + (index['nextFundingTime'] - index['time']) / 1000
+    
+    def get_klines(self, symbol, interval="1m", start_time=None, end_time=None, limit=1000):
+        """交易所返回的K线: [开盘时间, 开盘价, 最高价, 最低价, 收盘价, 成交量, 收盘时间, ...]"""
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return self._request("GET", "/fapi/v1/klines", params)
+    
+    def get_funding_rate_history(self, symbol, start_time=None, end_time=None, limit=1000):
+        """已结算的资金费率, 按时间升序: [{symbol, fundingRate, fundingTime}, ...]"""
+        params = {"symbol": symbol, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return self._request("GET", "/fapi/v1/fundingRate", params)
+    
+    def get_depth(self, symbol, limit=1000):
+        """订单簿快照: {lastUpdateId, bids: [[价格, 数量], ...], asks: [...]}, 最优价在前"""
+        return self._request("GET", "/fapi/v1/depth", {"symbol": symbol, "limit": limit})
     
     def set_leverage(self, symbol, leverage):
         endpoint = "/fapi/v1/leverage"
         params = {
             "symbol": symbol,
-            "leverage": leverage,
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
+            "leverage": leverage
         }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.post(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
-    
-    def calculate_quantity_from_usdt(self, symbol, usdt_amount, leverage=10):
-        current_price = self.get_current_price(symbol)
-        quantity = usdt_amount / current_price
-        quantity = max(0.001, quantity)
-        final_quantity = round(quantity, 3)
-        return final_quantity
-    
-    def place_order(self, symbol, side, order_type, quantity, position_side="BOTH"):
+        return self._signed_request("POST", endpoint, params)
+    
+    def set_margin_type(self, symbol, margin_type):
+        """ISOLATED 或 CROSSED；该交易对已是此模式时返回 {"code": -4046}"""
+        return self._signed_request("POST", "/fapi/v1/marginType", {"symbol": symbol, "marginType": margin_type})
+    
+    def get_position_mode(self):
+        """双向持仓模式为 {"dualSidePosition": true}，单向持仓模式为 false"""
+        return self._signed_request("GET", "/fapi/v1/positionSide/dual", {})
+    
+    def calculate_quantity_from_usdt(self, symbol, usdt_amount, leverage=10, price=None, max_slippage_bps=None):
+        current_price = price or self.get_current_price(symbol)
+        # 本地订单簿有效时，按多头腿预计的成交均价计算数量，并且不超过订单簿两侧能成交的数量
+        # (设置了 max_slippage_bps 时，只计算偏离中间价该范围内的挂单)
+        book = self.order_book.get(symbol) if self.order_book is not None else None
+        quote = book.hedge_quote(usdt_amount, max_slippage_bps) if book is not None else None
+        if quote is not None:
+            current_price, notional = quote
+            if notional < usdt_amount:
+                self.metrics.increment('sizing_depth_capped_total', symbol=symbol)
+            usdt_amount = notional
+        # 按交易对的 LOT_SIZE / MIN_NOTIONAL 规则计算数量，全部在内存中完成
+        # 返回按步长取整的 Decimal，下单时原样写出这些位数（见 _order_params）
+        return self.symbol_filters.get(symbol).quantity_for_notional(usdt_amount, current_price)
+    
+    def _order_params(self, symbol, side, order_type, quantity, position_side, reduce_only=False, client_order_id=None,
+                      expected_price=None):
         if quantity <= 0:
             raise ValueError(f"无效的交易数量: {quantity}")
-            
-        endpoint = "/fapi/v1/order"
+        # 不符合交易规则的订单在本地拒绝，不发送到交易所
+        self.symbol_filters.validate(symbol, quantity, order_type, expected_price)
+        
         params = {
             "symbol": symbol,
             "side": side,
             "type": order_type,
-            "quantity": quantity,
+            # 按步长的精度写出数量，不使用浮点数的表示
+            "quantity": self.symbol_filters.get(symbol).format_quantity(quantity, order_type),
             "positionSide": position_side,
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
+            "newOrderRespType": "RESULT"
         }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.post(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
+        if reduce_only:
+            params["reduceOnly"] = "true"
+        if client_order_id is not None:
+            params["newClientOrderId"] = client_order_id
+        return params
+    
+    def place_order(self, symbol, side, order_type, quantity, position_side="BOTH", reduce_only=False,
+                    client_order_id=None, expected_price=None):
+        endpoint = "/fapi/v1/order"
+        params = self._order_params(symbol, side, order_type, quantity, position_side, reduce_only, client_order_id,
+                                    expected_price)
+        return self._signed_request("POST", endpoint, params)
+    
+    def query_order(self, symbol, client_order_id):
+        endpoint = "/fapi/v1/order"
+        return self._signed_request("GET", endpoint, {"symbol": symbol, "origClientOrderId": client_order_id})
+    
+    def prepare_order(self, symbol, side, order_type, quantity, position_side="BOTH", reduce_only=False,
+                      client_order_id=None, expected_price=None):
+        """签名订单但不发送，配合 send_prepared 使用"""
+        endpoint = "/fapi/v1/order"
+        params = self._sign_params(self._order_params(symbol, side, order_type, quantity, position_side,
+                                                      reduce_only, client_order_id, expected_price))
+        request = requests.Request("POST", self.base_url + endpoint, params=params)
+        # 在签名时占用额度，两条腿发出时不会再因限流等待
+        weight, orders, lane = request_cost("POST", endpoint)
+        with self.metrics.timer('request_stage_seconds', stage='rate_limit_wait', account=self.name):
+            self.scheduler.acquire(self.api_key, weight, orders, lane)
+        return self.session.prepare_request(request)
+    
+    def send_prepared(self, prepared):
+        endpoint = "/fapi/v1/order"
+        start = time.perf_counter()
+        timeout = request_timeout(self.timeout)
+        response = self._send(endpoint, lambda: self.session.send(prepared, timeout=timeout))
+        return self._record(endpoint, request_cost("POST", endpoint)[0], response, start)
     
     def close_position(self, symbol, side, order_type, quantity, position_side="BOTH"):
         opposite_side = "SELL" if side == "BUY" else "BUY"
         return self.place_order(symbol, opposite_side, order_type, quantity, position_side)
     
+    def start_user_stream(self):
+        return self._request("POST", "/fapi/v1/listenKey")
+    
+    def keepalive_user_stream(self):
+        return self._request("PUT", "/fapi/v1/listenKey")
+    
+    def close_user_stream(self):
+        return self._request("DELETE", "/fapi/v1/listenKey")
+    
+    def close(self):
+        # 释放连接池
+        self.session.close()
+    
+    def cancel_all_orders(self, symbol):
+        """撤销该交易对的所有挂单"""
+        return self._signed_request("DELETE", "/fapi/v1/allOpenOrders", {"symbol": symbol})
+    
     def close_all_positions(self, symbol):
-        """关闭指定交易对的所有持仓"""
-        try:
-            position_info = self.get_position_info(symbol)
-            if float(position_info[0]['positionAmt']) != 0:
-                quantity = abs(float(position_info[0]['positionAmt']))
-                side = "SELL" if float(position_info[0]['positionAmt']) > 0 else "BUY"
-                return self.place_order(
-                    symbol=symbol,
-                    side=side,
-                    order_type="MARKET",
-                    quantity=quantity,
-                    position_side="BOTH"
-                )
-        except Exception as e:
-            print(f"关闭持仓时出错: {str(e)}")
-        return None
+        """平掉指定交易对的所有持仓并确认已清空，见 flatten.flatten_all"""
+        return flatten_all([(self, symbol)])
 
 def load_config():
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
@@ -311,216 +319,584 @@ def load_config():
     except json.JSONDecodeError:
         raise Exception("错误：配置文件格式不正确")
 
-def update_position_status(api, symbol, ui, account_num):
-    while True:
-        try:
-            position_info = api.get_position_info(symbol)
-            current_price = api.get_current_price(symbol)
-            account_info = api.get_account_info()
-            
-            # 获取USDT资产信息
-            usdt_asset = next((asset for asset in account_info['assets'] if asset['asset'] == 'USDT'), None)
-            if usdt_asset:
-                current_balance = float(usdt_asset['walletBalance'])
-                margin_balance = float(usdt_asset['marginBalance'])
-                unrealized_pnl = float(usdt_asset['unrealizedProfit'])
-            else:
-                current_balance = 0
-                margin_balance = 0
-                unrealized_pnl = 0
-            
-            status = {
-                'position_side': 'LONG' if float(position_info[0]['positionAmt']) > 0 else 'SHORT',
-                'quantity': abs(float(position_info[0]['positionAmt'])),
-                'entry_price': float(position_info[0]['entryPrice']),
-                'unrealized_pnl': unrealized_pnl,
-                'system_status': '运行中',
-                'current_balance': current_balance,
-                'margin': margin_balance,
-                'liquidation_price': float(position_info[0]['liquidationPrice'])
-            }
-            
-            if account_num == 1:
-                if ui.account1_status['initial_balance'] == 0:
-                    status['initial_balance'] = current_balance
-                else:
-                    status['initial_balance'] = ui.account1_status['initial_balance']
-                ui.account1_status = status
-            else:
-                if ui.account2_status['initial_balance'] == 0:
-                    status['initial_balance'] = current_balance
-                else:
-                    status['initial_balance'] = ui.account2_status['initial_balance']
-                ui.account2_status = status
-                
-            ui.update_status(ui.account1_status, ui.account2_status, current_price)
-            
-        except Exception as e:
-            status = {
-                'position_side': 'NONE',
-                'quantity': 0,
-                'entry_price': 0,
-                'unrealized_pnl': 0,
-                'system_status': f'错误: {str(e)}',
-                'current_balance': 0,
-                'initial_balance': 0,
-                'margin': 0,
-                'liquidation_price': 0
-            }
-            
-            if account_num == 1:
-                ui.account1_status = status
-            else:
-                ui.account2_status = status
-                
-            ui.update_status(ui.account1_status, ui.account2_status, 0)
-            
-        time.sleep(1)
-
-def cleanup_positions(account1, account2, symbol):
-    """清理两个账号的所有持仓"""
-    console = Console()
-    console.print("[yellow]正在清理持仓...[/yellow]")
+def apply_account_status(api, ui, account_num, position_info, account_info, current_price):
+    # 获取USDT资产信息
+    usdt_asset = next((asset for asset in account_info['assets'] if asset['asset'] == 'USDT'), None)
+    if usdt_asset:
+        current_balance = float(usdt_asset['walletBalance'])
+        margin_balance = float(usdt_asset['marginBalance'])
+        unrealized_pnl = float(usdt_asset['unrealizedProfit'])
+    else:
+        current_balance = 0
+        margin_balance = 0
+        unrealized_pnl = 0
     
-    # 关闭账号1的持仓
-    result1 = account1.close_all_positions(symbol)
-    if result1:
-        console.print("[green]账号1持仓已清理[/green]")
+    status = {
+        'position_side': 'LONG' if float(position_info[0]['positionAmt']) > 0 else 'SHORT',
+        'quantity': abs(float(position_info[0]['positionAmt'])),
+        'entry_price': float(position_info[0]['entryPrice']),
+        'unrealized_pnl': unrealized_pnl,
+        'system_status': '运行中',
+        'current_balance': current_balance,
+        'margin': margin_balance,
+        'liquidation_price': float(position_info[0]['liquidationPrice'])
+    }
+    
+    if account_num == 1:
+        if ui.account1_status['initial_balance'] == 0:
+            status['initial_balance'] = current_balance
+        else:
+            status['initial_balance'] = ui.account1_status['initial_balance']
+        ui.account1_status = status
     else:
-        console.print("[red]账号1持仓清理失败[/red]")
+        if ui.account2_status['initial_balance'] == 0:
+            status['initial_balance'] = current_balance
+        else:
+            status['initial_balance'] = ui.account2_status['initial_balance']
+        ui.account2_status = status
+        
+    ui.refresh_client_stats(api)
+    ui.update_status(ui.account1_status, ui.account2_status, current_price)
+
+def apply_account_error(ui, account_num, e):
+    status = {
+        'position_side': 'NONE',
+        'quantity': 0,
+        'entry_price': 0,
+        'unrealized_pnl': 0,
+        'system_status': f'错误: {str(e)}',
+        'current_balance': 0,
+        'initial_balance': 0,
+        'margin': 0,
+        'liquidation_price': 0
+    }
     
-    # 关闭账号2的持仓
-    result2 = account2.close_all_positions(symbol)
-    if result2:
-        console.print("[green]账号2持仓已清理[/green]")
+    if account_num == 1:
+        ui.account1_status = status
     else:
-        console.print("[red]账号2持仓清理失败[/red]")
+        ui.account2_status = status
+        
+    ui.update_status(ui.account1_status, ui.account2_status, 0)
+
+def status_poller(ui, config, jobs):
+    """第一个任务两个账号状态面板的轮询器，轮询间隔随这两个账号上任务的状态调整"""
+    job = jobs[0]
+    return AdaptivePoller(
+        [(1, job.account1, job.symbol), (2, job.account2, job.symbol)],
+        jobs,
+        on_status=lambda account_num, api, position_info, account_info, current_price: apply_account_status(
+            api, ui, account_num, position_info, account_info, current_price),
+        on_error=lambda account_num, e: apply_account_error(ui, account_num, e),
+        **config.get('polling', {})
+    )
 
-def main():
+UI_CHECKPOINT_STATS = ('trade_count', 'total_volume', 'total_volume_usdt', 'initial_total_balance')
+
+def restore_ui(ui, checkpoint, job):
+    """把上次运行的交易统计和初始余额恢复到界面"""
+    saved = checkpoint.get('ui', 'stats') or {}
+    for key in UI_CHECKPOINT_STATS:
+        if key in saved:
+            ui.stats[key] = saved[key]
+    balances = saved.get('initial_balances', {})
+    ui.account1_status['initial_balance'] = balances.get(job.account1.name, 0)
+    ui.account2_status['initial_balance'] = balances.get(job.account2.name, 0)
+
+def save_ui(ui, checkpoint, job):
+    stats = {key: ui.stats[key] for key in UI_CHECKPOINT_STATS}
+    stats['initial_balances'] = {job.account1.name: ui.account1_status['initial_balance'],
+                                 job.account2.name: ui.account2_status['initial_balance']}
+    checkpoint.update('ui', 'stats', stats)
+
+def seed_balances(ui, balances, job):
+    """首次轮询前先显示启动时的余额快照；从检查点恢复的初始余额保持不变"""
+    for status, api in ((ui.account1_status, job.account1), (ui.account2_status, job.account2)):
+        balance = balances.get(api.name, 0)
+        if status['initial_balance'] == 0:
+            status['initial_balance'] = balance
+        if status['current_balance'] == 0:
+            status['current_balance'] = balance
+
+def report_flatten(report, console):
+    """输出平仓结果：先列出错误，再显示用时或仍未平掉的持仓"""
+    for error in report['errors']:
+        console.print(f"[red]{error}[/red]")
+    if report['flat']:
+        console.print(f"[green]所有持仓已清理，用时 {report['seconds'] * 1000:.0f} 毫秒（{report['closed']} 个仓位，"
+                      f"{report['orders']} 笔订单，{report['rounds']} 轮）[/green]")
+    else:
+        still = ', '.join(f"{target} {'未知' if amount is None else amount}"
+                          for target, amount in report['remaining'].items())
+        console.print(f"[red]{report['rounds']} 轮后仍有持仓: {still}[/red]")
+
+def cleanup_positions(jobs, console=None, journal=None):
+    """同时平掉所有任务账号的全部持仓，并确认已清空；平仓成交写入交易日志 journal（如有）"""
+    console = console or make_console()
+    console.print("[yellow]正在清理持仓...[/yellow]")
+    report_flatten(flatten_all(flatten_targets(jobs), journal=journal), console)
+
+async def cleanup_positions_async(jobs, console=None, journal=None):
+    """在事件循环中并发平掉所有任务账号的全部持仓，并确认已清空"""
+    console = console or make_console()
+    console.print("[yellow]正在清理持仓...[/yellow]")
+    report_flatten(await flatten_all_async(flatten_targets(jobs), journal=journal), console)
+
+async def async_main(headless=False, keep_positions=False):
+    """与 main() 相同的交易流程，状态轮询、界面刷新和每个任务都作为同一个事件循环上的任务运行"""
+    from async_api import EVENT_LOOP_IO, AsyncAsterDexAPI, run_job_async  # 只有 asyncio 模式才加载 aiohttp
+    console = make_console(headless)
+    startup = StartupTimer()
+    interrupted = False
     try:
+        # 加载配置
+        config = load_config()
+        
         # 初始化UI
-        ui = TradingUI()
+        ui_config = config.get('ui', {})
+        if headless:
+            ui = HeadlessStatus(interval=ui_config.get('status_interval', 10))
+        else:
+            # 只有终端界面需要 rich，按需导入
+            from trading_ui import TradingUI
+            ui = TradingUI(refresh_per_second=ui_config.get('refresh_per_second', 1))
         
+        # 每个账号创建一个API实例（共用服务器时间偏移和交易规则缓存），并创建对冲任务
+        network_config = config.get('network', {})
+        clients = {}
+        clock = None
+        symbol_filters = None
+        ticker_cache = TickerCache(max_age=network_config.get('ticker_max_age', 0.5))
+        metrics = MetricsRegistry()
+        scheduler = RequestScheduler(**network_config.get('rate_limits', {}), metrics=metrics)
+        for name, account in load_accounts(config).items():
+            clients[name] = AsyncAsterDexAPI(
+                account['api_key'],
+                account['api_secret'],
+                clock=clock,
+                time_sync_interval=network_config.get('time_sync_interval', 300),
+                base_url=network_config.get('base_url', "https://fapi.asterdex.com"),
+                pool_size=network_config.get('pool_size', 10),
+                timeout=network_config.get('timeout', 10),
+                symbol_filters=symbol_filters,
+                exchange_info_ttl=network_config.get('exchange_info_ttl', 3600),
+                ticker_cache=ticker_cache,
+                scheduler=scheduler,
+                metrics=metrics,
+                name=name
+            )
+            clock = clock or clients[name].clock
+            symbol_filters = symbol_filters or clients[name].symbol_filters
+        # 每条成交腿写入只追加的交易日志（如已配置）
+        journal_config = config.get('journal', {})
+        journal = None
+        if journal_config.get('path'):
+            journal = TradeJournal(journal_config['path'], fee_rate=journal_config.get('fee_rate', 0.0))
+        # 运行状态检查点（如已配置），用于热重启；在任何写入之前先读出上次保存的状态
+        checkpoint_config = config.get('checkpoint', {})
+        checkpoint = None
+        if checkpoint_config.get('path'):
+            checkpoint = Checkpoint(checkpoint_config['path'], fsync=checkpoint_config.get('fsync', False))
+            checkpoint.load()
+        keep_positions = keep_positions or checkpoint_config.get('keep_positions', False)
+        jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']], journal=journal,
+                         checkpoint=checkpoint)
+                for spec in load_jobs(config)]
+        ui.attach_jobs(jobs)
+        if checkpoint is not None:
+            restore_ui(ui, checkpoint, jobs[0])
+        
+        # 延迟/错误指标：显示在界面面板，并按配置导出到文件或 HTTP 端点
+        ui.attach_metrics(metrics)
+        metrics_config = config.get('metrics', {})
+        if metrics_config.get('file') or metrics_config.get('port') is not None:
+            metrics_exporter = MetricsExporter(
+                metrics,
+                path=metrics_config.get('file'),
+                port=metrics_config.get('port'),
+                host=metrics_config.get('host', "127.0.0.1"),
+                interval=metrics_config.get('interval', 5)
+            )
+            metrics_exporter.start()
+        
+        stream_config = config.get('streams', {})
+        feeds = []
+        if stream_config.get('market_data', False):
+            market_data = MarkPriceFeed(
+                sorted(set(job.symbol for job in jobs)),
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            market_data.start()
+            feeds.append(market_data)
+            for api in clients.values():
+                api.market_data = market_data
+        
+        # 由增量深度推送维护的本地订单簿，用于按预计成交价计算数量
+        if stream_config.get('depth', False):
+            # 快照在推送自己的线程中获取，通过本事件循环发出请求
+            loop = asyncio.get_running_loop()
+            depth_client = next(iter(clients.values()))
+            order_book = DepthFeed(
+                sorted(set(job.symbol for job in jobs)),
+                fetch_snapshot=lambda symbol: asyncio.run_coroutine_threadsafe(
+                    depth_client.get_depth(symbol), loop).result(depth_client.timeout),
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            order_book.start()
+            feeds.append(order_book)
+            for api in clients.values():
+                api.order_book = order_book
+        
+        # 一次并发完成所有账号的时间同步、交易规则、杠杆、保证金模式、持仓模式检查和余额快照
+        bootstrap_config = config.get('bootstrap', {})
+        report = await bootstrap_async(jobs, max_workers=bootstrap_config.get('workers', 8))
+        seed_balances(ui, report['balances'], jobs[0])
+        console.print(f"[green]启动准备: {report['steps']} 个请求，用时 {report['seconds']:.2f} 秒[/green]")
+        
+        # 状态轮询、时间同步和界面刷新作为任务运行，不再各占一个线程
+        first_client = next(iter(clients.values()))
+        tasks = [
+            asyncio.create_task(first_client.run_clock_sync()),
+            asyncio.create_task(ui.show_async())
+        ]
+        # 账户面板跟随第一个任务的交易对，来自用户数据流或轮询任务
+        user_streams, poll_tasks = await start_account_status_async(ui, config, jobs, stream_config)
+        tasks.extend(poll_tasks)
+        
+        # 接管上次运行留下的持仓，与检查点不符的仓位先平掉
+        if checkpoint is not None:
+            for job in jobs:
+                closed = await job.resume_on(EVENT_LOOP_IO, checkpoint.get('jobs', job.name))
+                if job.held is not None:
+                    console.print(f"[green]{job.name}: 已接管持仓 {job.held['quantity']}，按原计划时间平仓[/green]")
+                elif closed:
+                    console.print(f"[yellow]{job.name}: 已平掉检查点中没有记录的 {closed} 个仓位[/yellow]")
+        
+        # 推送数据就绪后立即开始交易；ready_timeout 秒后仍未就绪则先用 REST 计算数量
+        ready_timeout = bootstrap_config.get('ready_timeout', 5)
+        pending = await wait_ready_async(feeds, sorted(set(job.symbol for job in jobs)), ready_timeout)
+        if pending:
+            console.print(f"[yellow]推送 {ready_timeout} 秒内未就绪，先使用 REST: "
+                          f"{', '.join(f'{type(feed).__name__} {symbol}' for feed, symbol in pending)}[/yellow]")
+        
+        def on_open(job, quantity, current_price, funding_rate):
+            ui.stats['leg_skew'] = merged_skew_stats([job.executor for job in jobs])
+            # 更新统计信息
+            ui.update_stats(
+                funding_rate=funding_rate,
+                symbol=job.symbol,
+                leverage=job.leverage,
+                wait_seconds=job.wait_seconds,
+                last_order_price=current_price,
+                volume=quantity * 2  # 每次交易两个账号各交易一次
+            )
+            if checkpoint is not None:
+                # 统计信息和初始余额在重启后保留
+                save_ui(ui, checkpoint, jobs[0])
+            seconds = startup.first_open(metrics)
+            if seconds is not None:
+                console.print(f"[green]首次开仓距启动 {seconds:.2f} 秒[/green]")
+        
+        def on_error(job, e):
+            console.print(f"[red]交易错误 ({job.name}): {str(e)}[/red]")
+        
+        # 每个对冲任务作为同一个事件循环上的任务运行
+        await asyncio.gather(*(run_job_async(job, on_open, on_error) for job in jobs))
+        
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        interrupted = True
+        console.print("[yellow]程序被用户中断[/yellow]")
+    except Exception as e:
+        console.print(f"[red]错误: {str(e)}[/red]")
+    finally:
+        if 'ui' in locals():
+            ui.stop()
+        for task in locals().get('tasks', []):
+            task.cancel()
+        closing = []
+        for job in locals().get('jobs', []):
+            if interrupted and keep_positions and job.checkpoint is not None and job.held is not None:
+                # 手动停止且开启了 keep_positions：两条腿都按检查点持有，下次启动时直接接管，不再平仓后重新开仓；
+                # 出错退出时总是平仓
+                console.print(f"[yellow]{job.name}: 保留持仓用于热重启[/yellow]")
+                continue
+            closing.append(job)
+        if closing:
+            await cleanup_positions_async(closing, console, journal)
+        # 用户数据流的关闭请求同样通过事件循环发送，所以在关闭客户端之前、事件循环之外停止
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, user_stream.stop)
+                               for user_stream in locals().get('user_streams', [])))
+        await asyncio.gather(*(api.close() for api in locals().get('clients', {}).values()))
+        if 'market_data' in locals():
+            market_data.stop()
+        if 'order_book' in locals():
+            order_book.stop()
+        if 'metrics_exporter' in locals():
+            metrics_exporter.stop()
+        if locals().get('journal') is not None:
+            journal.close()
+
+def new_user_stream(api, symbol, stream_config):
+    """按 streams 配置为一个账号创建用户数据流"""
+    return UserDataStream(
+        api,
+        [symbol],
+        ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+        reconcile_interval=stream_config.get('reconcile_interval', 60)
+    )
+
+def start_account_status(ui, config, jobs, stream_config):
+    """维护第一个任务两个账号的状态面板，来自用户数据流或 REST 轮询"""
+    job = jobs[0]
+    user_streams = []
+    if stream_config.get('user_data', False):
+        for account_num, api in ((1, job.account1), (2, job.account2)):
+            user_stream = new_user_stream(api, job.symbol, stream_config)
+            user_stream.start()
+            user_streams.append(user_stream)
+            ui.attach_account_state(account_num, user_stream.state, job.symbol, api)
+    else:
+        # 一个线程轮询两个账号：下单前后和接近强平价时快，空仓时慢
+        status_poller(ui, config, jobs).start()
+    return user_streams
+
+async def start_account_status_async(ui, config, jobs, stream_config):
+    """start_account_status() 的 asyncio 版本，返回用户数据流和轮询任务"""
+    from async_api import BlockingClient
+    job = jobs[0]
+    user_streams = []
+    if not stream_config.get('user_data', False):
+        # 一个任务轮询两个账号：下单前后和接近强平价时快，空仓时慢
+        return user_streams, [asyncio.create_task(status_poller(ui, config, jobs).run_async())]
+    loop = asyncio.get_running_loop()
+    for account_num, api in ((1, job.account1), (2, job.account2)):
+        # 数据流的线程通过这个事件循环调用客户端；首次快照和 listenKey 是阻塞请求，不在事件循环上执行
+        user_stream = new_user_stream(BlockingClient(api, loop), job.symbol, stream_config)
+        await loop.run_in_executor(None, user_stream.start)
+        user_streams.append(user_stream)
+        ui.attach_account_state(account_num, user_stream.state, job.symbol, api)
+    return user_streams, []
+
+def main(headless=False, keep_positions=False):
+    console = make_console(headless)
+    startup = StartupTimer()
+    interrupted = False
+    try:
         # 加载配置
         config = load_config()
         
-        # 创建API实例
-        account1 = AsterDexAPI(
-            config['account1']['api_key'],
-            config['account1']['api_secret']
-        )
-        account2 = AsterDexAPI(
-            config['account2']['api_key'],
-            config['account2']['api_secret']
-        )
+        # 初始化UI
+        ui_config = config.get('ui', {})
+        if headless:
+            ui = HeadlessStatus(interval=ui_config.get('status_interval', 10))
+        else:
+            # 只有终端界面需要 rich，按需导入
+            from trading_ui import TradingUI
+            ui = TradingUI(refresh_per_second=ui_config.get('refresh_per_second', 1))
         
-        # 获取交易参数
-        trading_config = config['trading']
-        symbol = trading_config['symbol']
-        position_side = trading_config['position_side']
-        order_type = trading_config['order_type']
-        wait_seconds = trading_config['wait_seconds']
-        leverage = trading_config['leverage']
-        usdt_amount = trading_config['usdt_amount']
+        # 每个账号创建一个API实例（共用服务器时间偏移和连接池），并创建对冲任务
+        clients = create_clients(config, AsterDexAPI)
+        # 每条成交腿写入只追加的交易日志（如已配置）
+        journal_config = config.get('journal', {})
+        journal = None
+        if journal_config.get('path'):
+            journal = TradeJournal(journal_config['path'], fee_rate=journal_config.get('fee_rate', 0.0))
+        # 运行状态检查点（如已配置），用于热重启；在任何写入之前先读出上次保存的状态
+        checkpoint_config = config.get('checkpoint', {})
+        checkpoint = None
+        if checkpoint_config.get('path'):
+            checkpoint = Checkpoint(checkpoint_config['path'], fsync=checkpoint_config.get('fsync', False))
+            checkpoint.load()
+        keep_positions = keep_positions or checkpoint_config.get('keep_positions', False)
+        jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']], journal=journal,
+                         checkpoint=checkpoint)
+                for spec in load_jobs(config)]
+        ui.attach_jobs(jobs)
+        if checkpoint is not None:
+            restore_ui(ui, checkpoint, jobs[0])
         
-        # 启动状态更新线程
-        update_thread1 = threading.Thread(target=update_position_status, args=(account1, symbol, ui, 1))
-        update_thread2 = threading.Thread(target=update_position_status, args=(account2, symbol, ui, 2))
-        update_thread1.daemon = True
-        update_thread2.daemon = True
-        update_thread1.start()
-        update_thread2.start()
+        # 延迟/错误指标：显示在界面面板，并按配置导出到文件或 HTTP 端点
+        metrics = jobs[0].account1.metrics
+        ui.attach_metrics(metrics)
+        metrics_config = config.get('metrics', {})
+        if metrics_config.get('file') or metrics_config.get('port') is not None:
+            metrics_exporter = MetricsExporter(
+                metrics,
+                path=metrics_config.get('file'),
+                port=metrics_config.get('port'),
+                host=metrics_config.get('host', "127.0.0.1"),
+                interval=metrics_config.get('interval', 5)
+            )
+            metrics_exporter.start()
+        
+        # 所有任务共用的标记价格/资金费率推送
+        stream_config = config.get('streams', {})
+        feeds = []
+        if stream_config.get('market_data', False):
+            market_data = MarkPriceFeed(
+                sorted(set(job.symbol for job in jobs)),
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            market_data.start()
+            feeds.append(market_data)
+            for api in clients.values():
+                api.market_data = market_data
+        
+        # 由增量深度推送维护的本地订单簿，用于按预计成交价计算数量
+        if stream_config.get('depth', False):
+            order_book = DepthFeed(
+                sorted(set(job.symbol for job in jobs)),
+                fetch_snapshot=next(iter(clients.values())).get_depth,
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            order_book.start()
+            feeds.append(order_book)
+            for api in clients.values():
+                api.order_book = order_book
         
         # 启动UI显示线程
         ui_thread = threading.Thread(target=ui.show)
         ui_thread.daemon = True
         ui_thread.start()
         
-        # 等待UI初始化
-        time.sleep(2)
+        # 一次并发完成所有账号的时间同步、交易规则、杠杆、保证金模式、持仓模式检查和余额快照
+        bootstrap_config = config.get('bootstrap', {})
+        report = bootstrap(jobs, max_workers=bootstrap_config.get('workers', 8))
+        # 之后由后台线程定期重新同步时间，从启动准备的那次同步开始计时
+        next(iter(clients.values())).clock.start()
+        seed_balances(ui, report['balances'], jobs[0])
+        console.print(f"[green]启动准备: {report['steps']} 个请求，用时 {report['seconds']:.2f} 秒[/green]")
         
-        # 设置杠杆倍数
-        leverage_result1 = account1.set_leverage(symbol, leverage)
-        leverage_result2 = account2.set_leverage(symbol, leverage)
+        # 账号面板显示第一个任务的两个账号，所有任务都显示在任务表中
+        user_streams = start_account_status(ui, config, jobs, stream_config)
         
-        if leverage_result1.get('leverage') != leverage or leverage_result2.get('leverage') != leverage:
-            raise ValueError("杠杆设置失败")
+        # 接管上次运行留下的持仓，与检查点不符的仓位先平掉
+        if checkpoint is not None:
+            for job in jobs:
+                closed = job.resume(checkpoint.get('jobs', job.name))
+                if job.held is not None:
+                    console.print(f"[green]{job.name}: 已接管持仓 {job.held['quantity']}，按原计划时间平仓[/green]")
+                elif closed:
+                    console.print(f"[yellow]{job.name}: 已平掉检查点中没有记录的 {closed} 个仓位[/yellow]")
         
-        while True:
-            try:
-                # 计算交易数量
-                quantity = account1.calculate_quantity_from_usdt(symbol, usdt_amount, leverage)
-                
-                # 获取当前资金费率和价格
-                funding_rate = account1.get_funding_rate(symbol)
-                current_price = account1.get_current_price(symbol)
-                
-                # 执行交易
-                long_order = account1.place_order(
-                    symbol=symbol,
-                    side="BUY",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                short_order = account2.place_order(
-                    symbol=symbol,
-                    side="SELL",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                # 更新统计信息
-                ui.update_stats(
-                    funding_rate=funding_rate,
-                    symbol=symbol,
-                    leverage=leverage,
-                    wait_seconds=wait_seconds,
-                    last_order_price=current_price,
-                    volume=quantity * 2  # 每次交易两个账号各交易一次
-                )
-                
-                time.sleep(wait_seconds)
-                
-                # 平仓
-                close_long = account1.close_position(
-                    symbol=symbol,
-                    side="BUY",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                close_short = account2.close_position(
-                    symbol=symbol,
-                    side="SELL",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                # 等待一段时间再开始下一轮
-                time.sleep(5)
-                
-            except Exception as e:
-                console = Console()
-                console.print(f"[red]交易错误: {str(e)}[/red]")
-                time.sleep(5)  # 发生错误时等待一段时间再重试
-                continue
+        # 推送数据就绪后立即开始交易；ready_timeout 秒后仍未就绪则先用 REST 计算数量
+        ready_timeout = bootstrap_config.get('ready_timeout', 5)
+        pending = wait_ready(feeds, sorted(set(job.symbol for job in jobs)), ready_timeout)
+        if pending:
+            console.print(f"[yellow]推送 {ready_timeout} 秒内未就绪，先使用 REST: "
+                          f"{', '.join(f'{type(feed).__name__} {symbol}' for feed, symbol in pending)}[/yellow]")
+        
+        def on_open(job, quantity, current_price, funding_rate):
+            ui.stats['leg_skew'] = engine.skew_stats()
+            # 更新统计信息
+            ui.update_stats(
+                funding_rate=funding_rate,
+                symbol=job.symbol,
+                leverage=job.leverage,
+                wait_seconds=job.wait_seconds,
+                last_order_price=current_price,
+                volume=quantity * 2  # 每次交易两个账号各交易一次
+            )
+            if checkpoint is not None:
+                # 统计信息和初始余额在重启后保留
+                save_ui(ui, checkpoint, jobs[0])
+            seconds = startup.first_open(metrics)
+            if seconds is not None:
+                console.print(f"[green]首次开仓距启动 {seconds:.2f} 秒[/green]")
+        
+        def on_error(job, e):
+            console.print(f"[red]交易错误 ({job.name}): {str(e)}[/red]")
+        
+        # 并发运行所有任务，直到被中断
+        engine = HedgeEngine(jobs, on_open=on_open, on_error=on_error)
+        engine.start()
+        engine.wait()
         
     except KeyboardInterrupt:
-        console = Console()
+        interrupted = True
         console.print("[yellow]程序被用户中断[/yellow]")
     except Exception as e:
-        console = Console()
         console.print(f"[red]错误: {str(e)}[/red]")
     finally:
+        if 'engine' in locals():
+            engine.stop()
         if 'ui' in locals():
             ui.stop()
-        if 'account1' in locals() and 'account2' in locals():
-            cleanup_positions(account1, account2, symbol)
+        closing = []
+        for job in locals().get('jobs', []):
+            if interrupted and keep_positions and job.checkpoint is not None and job.held is not None:
+                # 手动停止且开启了 keep_positions：两条腿都按检查点持有，下次启动时直接接管，不再平仓后重新开仓；
+                # 出错退出时总是平仓
+                console.print(f"[yellow]{job.name}: 保留持仓用于热重启[/yellow]")
+                continue
+            closing.append(job)
+        if closing:
+            cleanup_positions(closing, console, journal)
+        for api in locals().get('clients', {}).values():
+            api.close()
+        for user_stream in locals().get('user_streams', []):
+            user_stream.stop()
+        if 'market_data' in locals():
+            market_data.stop()
+        if 'order_book' in locals():
+            order_book.stop()
+        if 'metrics_exporter' in locals():
+            metrics_exporter.stop()
+        if locals().get('journal') is not None:
+            journal.close()
+
+def supervise(workers=None, headless=False, keep_positions=False):
+    """将配置中的任务分片到多个工作进程运行，并打印汇总统计"""
+    console = make_console(headless)
+    try:
+        config = load_config()
+        if keep_positions and config.get('checkpoint', {}).get('path'):
+            config['checkpoint']['keep_positions'] = True
+        supervisor_config = config.get('supervisor', {})
+        supervisor = Supervisor(
+            config,
+            AsterDexAPI,
+            workers=workers or supervisor_config.get('workers'),
+            interval=supervisor_config.get('interval', 1),
+            heartbeat_timeout=supervisor_config.get('heartbeat_timeout', 30),
+            restart_delay=supervisor_config.get('restart_delay', 1)
+        )
+        supervisor.start()
+        console.print(f"[green]已启动 {len(supervisor.shards)} 个工作进程，共 {len(load_jobs(config))} 个任务[/green]")
+        interval = config.get('ui', {}).get('status_interval', 10)
+        while True:
+            time.sleep(interval)
+            total = supervisor.stats()['total']
+            console.print(f"存活进程 {total['alive']}/{len(supervisor.shards)}  重启 {total['restarts']}  "
+                          f"交易 {total['trade_count']:.0f}  交易量 {total['total_volume_usdt']:.2f} USDT  "
+                          f"已实现盈亏 {total['realized_pnl']:.4f} USDT  错误 {total['errors']:.0f}")
+    except KeyboardInterrupt:
+        console.print("[yellow]程序被用户中断[/yellow]")
+    except Exception as e:
+        console.print(f"[red]错误: {str(e)}[/red]")
+    finally:
+        if 'supervisor' in locals():
+            # 每个工作进程退出前自行平仓（开启 keep_positions 时保留按检查点持有的对冲仓位）
+            supervisor.stop()
+            total = supervisor.stats()['total']
+            console.print(f"交易 {total['trade_count']:.0f}  交易量 {total['total_volume_usdt']:.2f} USDT  "
+                          f"已实现盈亏 {total['realized_pnl']:.4f} USDT")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    headless = "--headless" in sys.argv[1:]
+    keep_positions = "--keep-positions" in sys.argv[1:]
+    if headless:
+        # 状态记录和提示信息写入日志，不显示终端界面
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if "--workers" in sys.argv[1:]:
+        # 将任务分片到多个工作进程；未给出数量时使用 supervisor.workers，否则每个 CPU 一个
+        workers = sys.argv[sys.argv.index("--workers") + 1:][:1]
+        supervise(int(workers[0]) if workers and workers[0].isdigit() else None, headless, keep_positions)
+    elif "--async" in sys.argv[1:]:
+        asyncio.run(async_main(headless, keep_positions))
+    else:
+        main(headless, keep_positions) 
\ No newline at end of file
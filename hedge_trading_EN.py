@@ -1,212 +1,136 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
-import hmac
-import hashlib
-from urllib.parse import urlencode
 import json
 import os
 import math
-from datetime import datetime
 import threading
-from rich.console import Console
-from rich.live import Live
-from rich.table import Table
-from rich.panel import Panel
-from rich.layout import Layout
-from rich.text import Text
+import asyncio
+import sys
+import logging
+from clock_sync import ClockSync
+from symbol_filters import SymbolFilterCache
+from ticker_cache import TickerCache
+from rate_limiter import RequestScheduler, request_cost
+from deadline import current_deadline, request_timeout
+from request_signer import RequestSigner
+from metrics import MetricsExporter, MetricsRegistry
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_accounts, load_jobs
+from hedge_executor import merged_skew_stats
+from market_data import MarkPriceFeed
+from order_book import DepthFeed
+from user_data import UserDataStream
+from headless import HeadlessStatus, LogConsole
+from trade_journal import TradeJournal
+from supervisor import Supervisor
+from checkpoint import Checkpoint
+from flatten import flatten_all, flatten_all_async, flatten_targets
+from bootstrap import StartupTimer, bootstrap, bootstrap_async, wait_ready, wait_ready_async
+from adaptive_poll import AdaptivePoller
 
-class TradingUI:
-    def __init__(self):
-        self.console = Console()
-        self.layout = Layout()
-        self.account1_status = {
-            'position_side': 'NONE',
-            'quantity': 0,
-            'entry_price': 0,
-            'unrealized_pnl': 0,
-            'system_status': 'Initializing',
-            'initial_balance': 0,
-            'current_balance': 0,
-            'margin': 0,
-            'liquidation_price': 0
-        }
-        self.account2_status = self.account1_status.copy()
-        self.current_price = 0
-        self.running = True
-        self.stats = {
-            'trade_count': 0,
-            'current_funding_rate': 0,
-            'last_trade_time': None,
-            'symbol': '',
-            'leverage': 0,
-            'wait_seconds': 0,
-            'last_order_price': 0,
-            'total_volume': 0,
-            'total_volume_usdt': 0,
-            'initial_total_balance': 0
-        }
-        
-    def generate_layout(self):
-        # Create title panel
-        title_panel = Panel(
-            Text("AsterDex Hedge Trading System", justify="center", style="bold white"),
-            style="blue"
-        )
-        
-        author_panel = Panel(
-            Text("Free and Open Source, Twitter: @ddazmon", justify="center", style="bold white"),
-            style="blue"
-        )
-        
-        # Create market information table
-        total_pnl = (self.account1_status['current_balance'] - self.account1_status['initial_balance'] + 
-                    self.account2_status['current_balance'] - self.account2_status['initial_balance'])
-        
-        market_table = Table.grid(padding=1)
-        market_table.add_column("Item", style="cyan")
-        market_table.add_column("Value", style="green")
-        
-        market_table.add_row("Trading Pair", self.stats['symbol'])
-        market_table.add_row("Current Price", f"{self.current_price} USDT")
-        market_table.add_row("Current Leverage", f"{self.stats['leverage']}x")
-        market_table.add_row("Current Funding Rate", f"{self.stats['current_funding_rate']*100:.4f}%")
-        market_table.add_row("Holding Time", f"{self.stats['wait_seconds']} seconds")
-        market_table.add_row("Trade Count", str(self.stats['trade_count']))
-        market_table.add_row("Total Trading Volume", f"{self.stats['total_volume_usdt']:.2f} USDT")
-        market_table.add_row("Account 1 Balance", f"{self.account1_status['current_balance']:.4f} USDT")
-        market_table.add_row("Account 2 Balance", f"{self.account2_status['current_balance']:.4f} USDT")
-        market_table.add_row("Initial Total Assets", f"{self.stats['initial_total_balance']:.4f} USDT")
-        market_table.add_row("Total Profit/Loss", f"{total_pnl:.4f} USDT")
-        market_table.add_row("Last Trade Time", self.stats['last_trade_time'] or 'None')
-        market_table.add_row("Current Time", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-        
-        market_panel = Panel(
-            market_table,
-            title="Market Information",
-            border_style="green"
-        )
-        
-        # Create account status table
-        account_table = Table(show_header=True, padding=1)
-        account_table.add_column("Account", style="cyan", justify="left", width=8)
-        account_table.add_column("Position Side", style="yellow", justify="center", width=10)
-        account_table.add_column("Position Quantity", style="yellow", justify="right", width=12)
-        account_table.add_column("Entry Price", style="yellow", justify="right", width=12)
-        account_table.add_column("Unrealized P/L", style="yellow", justify="right", width=20)
-        account_table.add_column("Margin", style="yellow", justify="right", width=20)
-        account_table.add_column("Liquidation Price", style="yellow", justify="right", width=20)
-        
-        account_table.add_row(
-            "Account 1",
-            self.account1_status['position_side'],
-            f"{self.account1_status['quantity']:>12.3f}",
-            f"{self.account1_status['entry_price']:>12.2f}",
-            f"{self.account1_status['unrealized_pnl']:>20.8f} USDT",
-            f"{self.account1_status['margin']:>20.8f} USDT",
-            f"{self.account1_status['liquidation_price']:>20.8f} USDT"
-        )
-        account_table.add_row(
-            "Account 2",
-            self.account2_status['position_side'],
-            f"{self.account2_status['quantity']:>12.3f}",
-            f"{self.account2_status['entry_price']:>12.2f}",
-            f"{self.account2_status['unrealized_pnl']:>20.8f} USDT",
-            f"{self.account2_status['margin']:>20.8f} USDT",
-            f"{self.account2_status['liquidation_price']:>20.8f} USDT"
-        )
-        
-        account_panel = Panel(
-            account_table,
-            title="Account Status",
-            border_style="yellow"
-        )
-
-        # Combine all panels
-        self.layout.split(
-            Layout(name="header", size=6),
-            Layout(name="main"),
-        )
-        
-        self.layout["header"].split(
-            Layout(title_panel, ratio=1),
-            Layout(author_panel, ratio=1)
-        )
-        self.layout["main"].split_row(
-            Layout(market_panel, ratio=1),
-            Layout(account_panel, ratio=2)
-        )
-        
-        return self.layout
-    
-    def update_status(self, account1_status, account2_status, current_price):
-        self.account1_status = account1_status
-        self.account2_status = account2_status
-        self.current_price = current_price
-        
-    def update_stats(self, funding_rate=0, symbol='', leverage=0, wait_seconds=0, last_order_price=0, volume=0):
-        self.stats['trade_count'] += 1
-        self.stats['current_funding_rate'] = funding_rate
-        self.stats['last_trade_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.stats['symbol'] = symbol
-        self.stats['leverage'] = leverage
-        self.stats['wait_seconds'] = wait_seconds
-        self.stats['last_order_price'] = last_order_price
-        self.stats['total_volume'] += volume
-        self.stats['total_volume_usdt'] += volume * last_order_price
-        
-        # Update initial total assets (only on first update)
-        if self.stats['initial_total_balance'] == 0:
-            self.stats['initial_total_balance'] = (
-                self.account1_status['initial_balance'] + 
-                self.account2_status['initial_balance']
-            )
-        
-    def show(self):
-        with Live(self.generate_layout(), refresh_per_second=1) as live:
-            while self.running:
-                live.update(self.generate_layout())
-                time.sleep(1)
-    
-    def stop(self):
-        self.running = False
+def make_console(headless=False):
+    """rich Console for operator messages, or log records when running headless"""
+    if headless:
+        return LogConsole()
+    from rich.console import Console
+    return Console()
 
 class AsterDexAPI:
-    def __init__(self, api_key, api_secret):
+    def __init__(self, api_key, api_secret, clock=None, time_sync_interval=300,
+                 base_url="https://fapi.asterdex.com", pool_size=10, timeout=10, market_data=None, order_book=None, adapter=None,
+                 symbol_filters=None, exchange_info_ttl=3600, ticker_cache=None, scheduler=None,
+                 metrics=None, name=None):
         self.api_key = api_key
+        self.name = name or "account"
         self.api_secret = api_secret
-        self.base_url = "https://fapi.asterdex.com"
+        self.signer = RequestSigner(api_secret)
+        self.base_url = base_url
         self.recv_window = 5000
+        self.timeout = timeout
+        # One keep-alive connection pool per client, shared by the status threads, the trading loop and cleanup
+        self.session = requests.Session()
+        adapter = adapter or HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"X-MBX-APIKEY": api_key})
+        self.market_data = market_data
+        self.order_book = order_book
+        self.clock = clock or ClockSync(self._get_server_time, resync_interval=time_sync_interval)
+        self.symbol_filters = symbol_filters or SymbolFilterCache(self._get_exchange_info, ttl=exchange_info_ttl)
+        self.ticker_cache = ticker_cache or TickerCache()
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = metrics or MetricsRegistry()
         
-    def _generate_signature(self, params):
-        query_string = urlencode(params)
-        signature = hmac.new(
-            self.api_secret.encode('utf-8'),
-            query_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        return signature
-    
     def _get_server_time(self):
-        response = requests.get(self.base_url + "/fapi/v1/time")
-        return response.json()['serverTime']
+        return self._request("GET", "/fapi/v1/time")['serverTime']
+    
+    def _get_exchange_info(self):
+        return self._request("GET", "/fapi/v1/exchangeInfo")
     
     def _get_timestamp(self):
-        server_time = self._get_server_time()
-        local_time = int(time.time() * 1000)
-        time_diff = server_time - local_time
-        return int(time.time() * 1000) + time_diff
+        return self.clock.now_ms()
+    
+    def sync_clock(self):
+        return self.clock.sync()
+    
+    def get_symbol_filters(self, symbol):
+        return self.symbol_filters.get(symbol)
+    
+    def _request(self, method, endpoint, params=None):
+        # Take the request's weight and order count from the budget; orders go ahead of status polls
+        weight, orders, lane = request_cost(method, endpoint)
+        start = time.perf_counter()
+        self.scheduler.acquire(self.api_key, weight, orders, lane)
+        self.metrics.observe('request_stage_seconds', time.perf_counter() - start, stage='rate_limit_wait', account=self.name)
+        # Never waits longer than what is left of the current phase's latency budget
+        timeout = request_timeout(self.timeout)
+        response = self._send(endpoint, lambda: self.session.request(
+            method, self.base_url + endpoint, params=params, timeout=timeout))
+        return self._record(endpoint, weight, response, start)
+    
+    def _send(self, endpoint, send):
+        sent = time.perf_counter()
+        try:
+            response = send()
+        except requests.RequestException as e:
+            self.metrics.increment('request_errors_total', endpoint=endpoint, code=type(e).__name__)
+            # A timeout once the phase budget is spent is a deadline miss, not a network error
+            current = current_deadline()
+            if isinstance(e, requests.Timeout) and current is not None and current.expired:
+                raise current.exceeded() from e
+            raise
+        self.metrics.observe('request_stage_seconds', time.perf_counter() - sent, stage='network', account=self.name)
+        self.scheduler.record_response(self.api_key, response.status_code, response.headers)
+        return response
+    
+    def _record(self, endpoint, weight, response, start):
+        # Latency per endpoint and account, request weight and error codes
+        data = response.json()
+        self.metrics.observe('request_seconds', time.perf_counter() - start, endpoint=endpoint, account=self.name)
+        self.metrics.increment('request_weight_total', weight, account=self.name)
+        if response.status_code >= 400 or (isinstance(data, dict) and data.get('code', 0) < 0):
+            code = data.get('code', response.status_code) if isinstance(data, dict) else response.status_code
+            self.metrics.increment('request_errors_total', endpoint=endpoint, code=code)
+        return data
+    
+    def _sign_params(self, params):
+        timestamp = self._get_timestamp()
+        with self.metrics.timer('request_stage_seconds', stage='sign', account=self.name):
+            return self.signer.sign(params, timestamp, self.recv_window)
+    
+    def _signed_request(self, method, endpoint, params):
+        for attempt in range(2):
+            data = self._request(method, endpoint, self._sign_params(params))
+            if attempt == 0 and isinstance(data, dict) and data.get('code') == -1021:
+                # Server time offset went stale, resync and retry once
+                self.clock.force_resync()
+                continue
+            return data
     
     def get_account_info(self):
         """Get account information"""
         endpoint = "/fapi/v2/account"
-        params = {
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
-        }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.get(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
+        return self._signed_request("GET", endpoint, {})
     
     def get_account_balance(self):
         """Get account balance"""
@@ -216,90 +140,174 @@ class AsterDexAPI:
                 return float(asset['walletBalance'])
         return 0.0
     
-    def get_current_price(self, symbol):
+    def get_current_price(self, symbol, max_age=None):
+        # Served from the mark price stream while it is fresh, REST otherwise
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None:
+                return cached['mark_price']
+        # Recent prices are shared by every caller; concurrent misses share one REST request
+        return self.ticker_cache.get(symbol, lambda: self._fetch_price(symbol), max_age)
+    
+    def _fetch_price(self, symbol):
         endpoint = "/fapi/v1/ticker/price"
         params = {"symbol": symbol}
-        response = requests.get(self.base_url + endpoint, params=params)
-        return float(response.json()['price'])
+        return float(self._request("GET", endpoint, params)['price'])
     
     def get_position_info(self, symbol):
         endpoint = "/fapi/v2/positionRisk"
-        params = {
-            "symbol": symbol,
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
-        }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.get(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
+        params = {"symbol": symbol}
+        return self._signed_request("GET", endpoint, params)
     
     def get_funding_rate(self, symbol):
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None:
+                return cached['funding_rate']
         endpoint = "/fapi/v1/premiumIndex"
         params = {"symbol": symbol}
-        response = requests.get(self.base_url + endpoint, params=params)
-        return float(response.json()['lastFundingRate'])
+        return float(self._request("GET", endpoint, params)['lastFundingRate'])
+    
+    def get_funding_deadline(self, symbol):
+        """time.monotonic() at which the next funding settles, from the exchange's own countdown"""
+        if self.market_data is not None:
+            cached = self.market_data.get(symbol)
+            if cached is not None and cached['next_funding_time']:
+                return cached['received_at'] + (cached['next_funding_time'] - cached['event_time']) / 1000
+        received_at = time.monotonic()
+        index = self._request("GET", "/fapi/v1/premiumIndex", {"symbol": symbol})
+        return received_at + (index['nextFundingTime'] - index['time']) / 1000
+    
+    def get_klines(self, symbol, interval="1m", start_time=None, end_time=None, limit=1000):
+        """Klines as returned by the exchange: [open time, open, high, low, close, volume, close time, ...]"""
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return self._request("GET", "/fapi/v1/klines", params)
+    
+    def get_funding_rate_history(self, symbol, start_time=None, end_time=None, limit=1000):
+        """Settled funding rates, oldest first: [{symbol, fundingRate, fundingTime}, ...]"""
+        params = {"symbol": symbol, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return self._request("GET", "/fapi/v1/fundingRate", params)
+    
+    def get_depth(self, symbol, limit=1000):
+        """Order book snapshot: {lastUpdateId, bids: [[price, quantity], ...], asks: [...]}, best first"""
+        return self._request("GET", "/fapi/v1/depth", {"symbol": symbol, "limit": limit})
     
     def set_leverage(self, symbol, leverage):
         endpoint = "/fapi/v1/leverage"
         params = {
             "symbol": symbol,
-            "leverage": leverage,
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
+            "leverage": leverage
         }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.post(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
-    
-    def calculate_quantity_from_usdt(self, symbol, usdt_amount, leverage=10):
-        current_price = self.get_current_price(symbol)
-        quantity = usdt_amount / current_price
-        quantity = max(0.001, quantity)
-        final_quantity = round(quantity, 3)
-        return final_quantity
-    
-    def place_order(self, symbol, side, order_type, quantity, position_side="BOTH"):
+        return self._signed_request("POST", endpoint, params)
+    
+    def set_margin_type(self, symbol, margin_type):
+        """ISOLATED or CROSSED; {"code": -4046} when the symbol already uses it"""
+        return self._signed_request("POST", "/fapi/v1/marginType", {"symbol": symbol, "marginType": margin_type})
+    
+    def get_position_mode(self):
+        """{"dualSidePosition": true} in hedge mode, false in one-way mode"""
+        return self._signed_request("GET", "/fapi/v1/positionSide/dual", {})
+    
+    def calculate_quantity_from_usdt(self, symbol, usdt_amount, leverage=10, price=None, max_slippage_bps=None):
+        current_price = price or self.get_current_price(symbol)
+        # With a fresh local order book the legs are sized at the price the long leg expects to fill at, and
+        # no larger than both sides of the book can take (within max_slippage_bps if set)
+        book = self.order_book.get(symbol) if self.order_book is not None else None
+        quote = book.hedge_quote(usdt_amount, max_slippage_bps) if book is not None else None
+        if quote is not None:
+            current_price, notional = quote
+            if notional < usdt_amount:
+                self.metrics.increment('sizing_depth_capped_total', symbol=symbol)
+            usdt_amount = notional
+        # Sized against the symbol's LOT_SIZE / MIN_NOTIONAL filters, entirely in memory
+        # A Decimal on the step size, sent with exactly those digits (see _order_params)
+        return self.symbol_filters.get(symbol).quantity_for_notional(usdt_amount, current_price)
+    
+    def _order_params(self, symbol, side, order_type, quantity, position_side, reduce_only=False, client_order_id=None,
+                      expected_price=None):
         if quantity <= 0:
             raise ValueError(f"Invalid order quantity: {quantity}")
-            
-        endpoint = "/fapi/v1/order"
+        # Orders the exchange would reject never leave the process
+        self.symbol_filters.validate(symbol, quantity, order_type, expected_price)
+        
         params = {
             "symbol": symbol,
             "side": side,
             "type": order_type,
-            "quantity": quantity,
+            # Written to the step size's precision, never as a float's repr
+            "quantity": self.symbol_filters.get(symbol).format_quantity(quantity, order_type),
             "positionSide": position_side,
-            "timestamp": self._get_timestamp(),
-            "recvWindow": self.recv_window
+            "newOrderRespType": "RESULT"
         }
-        params['signature'] = self._generate_signature(params)
-        headers = {"X-MBX-APIKEY": self.api_key}
-        response = requests.post(self.base_url + endpoint, params=params, headers=headers)
-        return response.json()
+        if reduce_only:
+            params["reduceOnly"] = "true"
+        if client_order_id is not None:
+            params["newClientOrderId"] = client_order_id
+        return params
+    
+    def place_order(self, symbol, side, order_type, quantity, position_side="BOTH", reduce_only=False,
+                    client_order_id=None, expected_price=None):
+        endpoint = "/fapi/v1/order"
+        params = self._order_params(symbol, side, order_type, quantity, position_side, reduce_only, client_order_id,
+                                    expected_price)
+        return self._signed_request("POST", endpoint, params)
+    
+    def query_order(self, symbol, client_order_id):
+        endpoint = "/fapi/v1/order"
+        return self._signed_request("GET", endpoint, {"symbol": symbol, "origClientOrderId": client_order_id})
+    
+    def prepare_order(self, symbol, side, order_type, quantity, position_side="BOTH", reduce_only=False,
+                      client_order_id=None, expected_price=None):
+        """Sign an order without sending it, see send_prepared"""
+        endpoint = "/fapi/v1/order"
+        params = self._sign_params(self._order_params(symbol, side, order_type, quantity, position_side,
+                                                      reduce_only, client_order_id, expected_price))
+        request = requests.Request("POST", self.base_url + endpoint, params=params)
+        # The budget is taken when signing so neither leg waits on it once released
+        weight, orders, lane = request_cost("POST", endpoint)
+        with self.metrics.timer('request_stage_seconds', stage='rate_limit_wait', account=self.name):
+            self.scheduler.acquire(self.api_key, weight, orders, lane)
+        return self.session.prepare_request(request)
+    
+    def send_prepared(self, prepared):
+        endpoint = "/fapi/v1/order"
+        start = time.perf_counter()
+        timeout = request_timeout(self.timeout)
+        response = self._send(endpoint, lambda: self.session.send(prepared, timeout=timeout))
+        return self._record(endpoint, request_cost("POST", endpoint)[0], response, start)
     
     def close_position(self, symbol, side, order_type, quantity, position_side="BOTH"):
         opposite_side = "SELL" if side == "BUY" else "BUY"
         return self.place_order(symbol, opposite_side, order_type, quantity, position_side)
     
+    def start_user_stream(self):
+        return self._request("POST", "/fapi/v1/listenKey")
+    
+    def keepalive_user_stream(self):
+        return self._request("PUT", "/fapi/v1/listenKey")
+    
+    def close_user_stream(self):
+        return self._request("DELETE", "/fapi/v1/listenKey")
+    
+    def close(self):
+        # Release pooled connections
+        self.session.close()
+    
+    def cancel_all_orders(self, symbol):
+        """Cancel every open order of `symbol`"""
+        return self._signed_request("DELETE", "/fapi/v1/allOpenOrders", {"symbol": symbol})
+    
     def close_all_positions(self, symbol):
-        """Close all positions for the specified trading pair"""
-        try:
-            position_info = self.get_position_info(symbol)
-            if float(position_info[0]['positionAmt']) != 0:
-                quantity = abs(float(position_info[0]['positionAmt']))
-                side = "SELL" if float(position_info[0]['positionAmt']) > 0 else "BUY"
-                return self.place_order(
-                    symbol=symbol,
-                    side=side,
-                    order_type="MARKET",
-                    quantity=quantity,
-                    position_side="BOTH"
-                )
-        except Exception as e:
-            print(f"Error closing positions: {str(e)}")
-        return None
+        """Close every position of the specified trading pair and check it is flat, see flatten.flatten_all"""
+        return flatten_all([(self, symbol)])
 
 def load_config():
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
@@ -311,216 +319,585 @@ def load_config():
     except json.JSONDecodeError:
         raise Exception("Error: Invalid config file format")
 
-def update_position_status(api, symbol, ui, account_num):
-    while True:
-        try:
-            position_info = api.get_position_info(symbol)
-            current_price = api.get_current_price(symbol)
-            account_info = api.get_account_info()
-            
-            # Get USDT asset information
-            usdt_asset = next((asset for asset in account_info['assets'] if asset['asset'] == 'USDT'), None)
-            if usdt_asset:
-                current_balance = float(usdt_asset['walletBalance'])
-                margin_balance = float(usdt_asset['marginBalance'])
-                unrealized_pnl = float(usdt_asset['unrealizedProfit'])
-            else:
-                current_balance = 0
-                margin_balance = 0
-                unrealized_pnl = 0
-            
-            status = {
-                'position_side': 'LONG' if float(position_info[0]['positionAmt']) > 0 else 'SHORT',
-                'quantity': abs(float(position_info[0]['positionAmt'])),
-                'entry_price': float(position_info[0]['entryPrice']),
-                'unrealized_pnl': unrealized_pnl,
-                'system_status': 'Running',
-                'current_balance': current_balance,
-                'margin': margin_balance,
-                'liquidation_price': float(position_info[0]['liquidationPrice'])
-            }
-            
-            if account_num == 1:
-                if ui.account1_status['initial_balance'] == 0:
-                    status['initial_balance'] = current_balance
-                else:
-                    status['initial_balance'] = ui.account1_status['initial_balance']
-                ui.account1_status = status
-            else:
-                if ui.account2_status['initial_balance'] == 0:
-                    status['initial_balance'] = current_balance
-                else:
-                    status['initial_balance'] = ui.account2_status['initial_balance']
-                ui.account2_status = status
-                
-            ui.update_status(ui.account1_status, ui.account2_status, current_price)
-            
-        except Exception as e:
-            status = {
-                'position_side': 'NONE',
-                'quantity': 0,
-                'entry_price': 0,
-                'unrealized_pnl': 0,
-                'system_status': f'Error: {str(e)}',
-                'current_balance': 0,
-                'initial_balance': 0,
-                'margin': 0,
-                'liquidation_price': 0
-            }
-            
-            if account_num == 1:
-                ui.account1_status = status
-            else:
-                ui.account2_status = status
-                
-            ui.update_status(ui.account1_status, ui.account2_status, 0)
-            
-        time.sleep(1)
-
-def cleanup_positions(account1, account2, symbol):
-    """Clear all positions for both accounts"""
-    console = Console()
-    console.print("[yellow]Clearing positions...[/yellow]")
+def apply_account_status(api, ui, account_num, position_info, account_info, current_price):
+    # Get USDT asset information
+    usdt_asset = next((asset for asset in account_info['assets'] if asset['asset'] == 'USDT'), None)
+    if usdt_asset:
+        current_balance = float(usdt_asset['walletBalance'])
+        margin_balance = float(usdt_asset['marginBalance'])
+        unrealized_pnl = float(usdt_asset['unrealizedProfit'])
+    else:
+        current_balance = 0
+        margin_balance = 0
+        unrealized_pnl = 0
     
-    # Close positions for account 1
-    result1 = account1.close_all_positions(symbol)
-    if result1:
-        console.print("[green]Account 1 positions cleared[/green]")
+    status = {
+        'position_side': 'LONG' if float(position_info[0]['positionAmt']) > 0 else 'SHORT',
+        'quantity': abs(float(position_info[0]['positionAmt'])),
+        'entry_price': float(position_info[0]['entryPrice']),
+        'unrealized_pnl': unrealized_pnl,
+        'system_status': 'Running',
+        'current_balance': current_balance,
+        'margin': margin_balance,
+        'liquidation_price': float(position_info[0]['liquidationPrice'])
+    }
+    
+    if account_num == 1:
+        if ui.account1_status['initial_balance'] == 0:
+            status['initial_balance'] = current_balance
+        else:
+            status['initial_balance'] = ui.account1_status['initial_balance']
+        ui.account1_status = status
     else:
-        console.print("[red]Failed to clear Account 1 positions[/red]")
+        if ui.account2_status['initial_balance'] == 0:
+            status['initial_balance'] = current_balance
+        else:
+            status['initial_balance'] = ui.account2_status['initial_balance']
+        ui.account2_status = status
+        
+    ui.refresh_client_stats(api)
+    ui.update_status(ui.account1_status, ui.account2_status, current_price)
+
+def apply_account_error(ui, account_num, e):
+    status = {
+        'position_side': 'NONE',
+        'quantity': 0,
+        'entry_price': 0,
+        'unrealized_pnl': 0,
+        'system_status': f'Error: {str(e)}',
+        'current_balance': 0,
+        'initial_balance': 0,
+        'margin': 0,
+        'liquidation_price': 0
+    }
     
-    # Close positions for account 2
-    result2 = account2.close_all_positions(symbol)
-    if result2:
-        console.print("[green]Account 2 positions cleared[/green]")
+    if account_num == 1:
+        ui.account1_status = status
     else:
-        console.print("[red]Failed to clear Account 2 positions[/red]")
+        ui.account2_status = status
+        
+    ui.update_status(ui.account1_status, ui.account2_status, 0)
+
+def status_poller(ui, config, jobs):
+    """Status poller of the first job's account panels, paced by what the jobs on those accounts are doing"""
+    job = jobs[0]
+    return AdaptivePoller(
+        [(1, job.account1, job.symbol), (2, job.account2, job.symbol)],
+        jobs,
+        on_status=lambda account_num, api, position_info, account_info, current_price: apply_account_status(
+            api, ui, account_num, position_info, account_info, current_price),
+        on_error=lambda account_num, e: apply_account_error(ui, account_num, e),
+        **config.get('polling', {})
+    )
 
-def main():
+UI_CHECKPOINT_STATS = ('trade_count', 'total_volume', 'total_volume_usdt', 'initial_total_balance')
+
+def restore_ui(ui, checkpoint, job):
+    """Carry the trading statistics and starting balances of the last run over to the UI"""
+    saved = checkpoint.get('ui', 'stats') or {}
+    for key in UI_CHECKPOINT_STATS:
+        if key in saved:
+            ui.stats[key] = saved[key]
+    balances = saved.get('initial_balances', {})
+    ui.account1_status['initial_balance'] = balances.get(job.account1.name, 0)
+    ui.account2_status['initial_balance'] = balances.get(job.account2.name, 0)
+
+def save_ui(ui, checkpoint, job):
+    stats = {key: ui.stats[key] for key in UI_CHECKPOINT_STATS}
+    stats['initial_balances'] = {job.account1.name: ui.account1_status['initial_balance'],
+                                 job.account2.name: ui.account2_status['initial_balance']}
+    checkpoint.update('ui', 'stats', stats)
+
+def seed_balances(ui, balances, job):
+    """Balances from the bootstrap snapshot until the first poll; starting balances a checkpoint restored are kept"""
+    for status, api in ((ui.account1_status, job.account1), (ui.account2_status, job.account2)):
+        balance = balances.get(api.name, 0)
+        if status['initial_balance'] == 0:
+            status['initial_balance'] = balance
+        if status['current_balance'] == 0:
+            status['current_balance'] = balance
+
+def report_flatten(report, console):
+    """Print the outcome of a flatten: its errors, then how long it took or what is still open"""
+    for error in report['errors']:
+        console.print(f"[red]{error}[/red]")
+    if report['flat']:
+        console.print(f"[green]All positions cleared in {report['seconds'] * 1000:.0f} ms ({report['closed']} position(s), "
+                      f"{report['orders']} order(s), {report['rounds']} round(s))[/green]")
+    else:
+        still = ', '.join(f"{target} {'unknown' if amount is None else amount}"
+                          for target, amount in report['remaining'].items())
+        console.print(f"[red]Positions still open after {report['rounds']} round(s): {still}[/red]")
+
+def cleanup_positions(jobs, console=None, journal=None):
+    """Close every position of every job's accounts at once and check they are flat; closes go to `journal`, if given"""
+    console = console or make_console()
+    console.print("[yellow]Clearing positions...[/yellow]")
+    report_flatten(flatten_all(flatten_targets(jobs), journal=journal), console)
+
+async def cleanup_positions_async(jobs, console=None, journal=None):
+    """Close every position of every job's accounts concurrently on the event loop and check they are flat"""
+    console = console or make_console()
+    console.print("[yellow]Clearing positions...[/yellow]")
+    report_flatten(await flatten_all_async(flatten_targets(jobs), journal=journal), console)
+
+async def async_main(headless=False, keep_positions=False):
+    """Same trading cycle as main(), with pollers, UI refresh and every job as tasks on one event loop"""
+    from async_api import EVENT_LOOP_IO, AsyncAsterDexAPI, run_job_async  # aiohttp is only loaded for the asyncio mode
+    console = make_console(headless)
+    startup = StartupTimer()
+    interrupted = False
     try:
+        # Load configuration
+        config = load_config()
+        
         # Initialize UI
-        ui = TradingUI()
+        ui_config = config.get('ui', {})
+        if headless:
+            ui = HeadlessStatus(interval=ui_config.get('status_interval', 10))
+        else:
+            # rich is only imported for the terminal UI
+            from trading_ui_EN import TradingUI
+            ui = TradingUI(refresh_per_second=ui_config.get('refresh_per_second', 1))
         
+        # Create one API client per account (shared clock offset and symbol filters) and the hedge jobs
+        network_config = config.get('network', {})
+        clients = {}
+        clock = None
+        symbol_filters = None
+        ticker_cache = TickerCache(max_age=network_config.get('ticker_max_age', 0.5))
+        metrics = MetricsRegistry()
+        scheduler = RequestScheduler(**network_config.get('rate_limits', {}), metrics=metrics)
+        for name, account in load_accounts(config).items():
+            clients[name] = AsyncAsterDexAPI(
+                account['api_key'],
+                account['api_secret'],
+                clock=clock,
+                time_sync_interval=network_config.get('time_sync_interval', 300),
+                base_url=network_config.get('base_url', "https://fapi.asterdex.com"),
+                pool_size=network_config.get('pool_size', 10),
+                timeout=network_config.get('timeout', 10),
+                symbol_filters=symbol_filters,
+                exchange_info_ttl=network_config.get('exchange_info_ttl', 3600),
+                ticker_cache=ticker_cache,
+                scheduler=scheduler,
+                metrics=metrics,
+                name=name
+            )
+            clock = clock or clients[name].clock
+            symbol_filters = symbol_filters or clients[name].symbol_filters
+        # Append-only journal of every filled leg, if configured
+        journal_config = config.get('journal', {})
+        journal = None
+        if journal_config.get('path'):
+            journal = TradeJournal(journal_config['path'], fee_rate=journal_config.get('fee_rate', 0.0))
+        # Runtime state for a warm restart, if configured; the checkpoint is read before anything overwrites it
+        checkpoint_config = config.get('checkpoint', {})
+        checkpoint = None
+        if checkpoint_config.get('path'):
+            checkpoint = Checkpoint(checkpoint_config['path'], fsync=checkpoint_config.get('fsync', False))
+            checkpoint.load()
+        keep_positions = keep_positions or checkpoint_config.get('keep_positions', False)
+        jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']], journal=journal,
+                         checkpoint=checkpoint)
+                for spec in load_jobs(config)]
+        ui.attach_jobs(jobs)
+        if checkpoint is not None:
+            restore_ui(ui, checkpoint, jobs[0])
+        
+        # Latency / error metrics for the UI panel, exported to a file or an HTTP endpoint if configured
+        ui.attach_metrics(metrics)
+        metrics_config = config.get('metrics', {})
+        if metrics_config.get('file') or metrics_config.get('port') is not None:
+            metrics_exporter = MetricsExporter(
+                metrics,
+                path=metrics_config.get('file'),
+                port=metrics_config.get('port'),
+                host=metrics_config.get('host', "127.0.0.1"),
+                interval=metrics_config.get('interval', 5)
+            )
+            metrics_exporter.start()
+        
+        stream_config = config.get('streams', {})
+        feeds = []
+        if stream_config.get('market_data', False):
+            market_data = MarkPriceFeed(
+                sorted(set(job.symbol for job in jobs)),
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            market_data.start()
+            feeds.append(market_data)
+            for api in clients.values():
+                api.market_data = market_data
+        
+        # Local order books from the diff-depth stream, for sizing at the expected fill price
+        if stream_config.get('depth', False):
+            # Snapshots are fetched from the feed's own threads, through this event loop
+            loop = asyncio.get_running_loop()
+            depth_client = next(iter(clients.values()))
+            order_book = DepthFeed(
+                sorted(set(job.symbol for job in jobs)),
+                fetch_snapshot=lambda symbol: asyncio.run_coroutine_threadsafe(
+                    depth_client.get_depth(symbol), loop).result(depth_client.timeout),
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            order_book.start()
+            feeds.append(order_book)
+            for api in clients.values():
+                api.order_book = order_book
+        
+        # Clock offset, symbol filters, leverage, margin type, position mode and balances of every account at once
+        bootstrap_config = config.get('bootstrap', {})
+        report = await bootstrap_async(jobs, max_workers=bootstrap_config.get('workers', 8))
+        seed_balances(ui, report['balances'], jobs[0])
+        console.print(f"[green]Bootstrap: {report['steps']} setup requests in {report['seconds']:.2f}s[/green]")
+        
+        # Pollers, clock resync and UI refresh run as tasks instead of threads
+        first_client = next(iter(clients.values()))
+        tasks = [
+            asyncio.create_task(first_client.run_clock_sync()),
+            asyncio.create_task(ui.show_async())
+        ]
+        # The account panels follow the first job's pair, from the user data streams or a polling task
+        user_streams, poll_tasks = await start_account_status_async(ui, config, jobs, stream_config)
+        tasks.extend(poll_tasks)
+        
+        # Take over the legs the last run left open, or close what its checkpoint does not account for
+        if checkpoint is not None:
+            for job in jobs:
+                closed = await job.resume_on(EVENT_LOOP_IO, checkpoint.get('jobs', job.name))
+                if job.held is not None:
+                    console.print(f"[green]{job.name}: resumed {job.held['quantity']} held until its planned close[/green]")
+                elif closed:
+                    console.print(f"[yellow]{job.name}: closed {closed} leg(s) the checkpoint did not account for[/yellow]")
+        
+        # Trading starts as soon as the stream feeds have data; after ready_timeout seconds it sizes from REST instead
+        ready_timeout = bootstrap_config.get('ready_timeout', 5)
+        pending = await wait_ready_async(feeds, sorted(set(job.symbol for job in jobs)), ready_timeout)
+        if pending:
+            console.print(f"[yellow]Streams not ready after {ready_timeout}s, using REST for: "
+                          f"{', '.join(f'{type(feed).__name__} {symbol}' for feed, symbol in pending)}[/yellow]")
+        
+        def on_open(job, quantity, current_price, funding_rate):
+            ui.stats['leg_skew'] = merged_skew_stats([job.executor for job in jobs])
+            # Update statistics
+            ui.update_stats(
+                funding_rate=funding_rate,
+                symbol=job.symbol,
+                leverage=job.leverage,
+                wait_seconds=job.wait_seconds,
+                last_order_price=current_price,
+                volume=quantity * 2  # Each trade involves both accounts
+            )
+            if checkpoint is not None:
+                # Statistics and starting balances survive a restart
+                save_ui(ui, checkpoint, jobs[0])
+            seconds = startup.first_open(metrics)
+            if seconds is not None:
+                console.print(f"[green]First hedge opened {seconds:.2f}s after start[/green]")
+        
+        def on_error(job, e):
+            console.print(f"[red]Trading error ({job.name}): {str(e)}[/red]")
+        
+        # Each job runs its cycle as a task on the same event loop
+        await asyncio.gather(*(run_job_async(job, on_open, on_error) for job in jobs))
+        
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        interrupted = True
+        console.print("[yellow]Program interrupted by user[/yellow]")
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+    finally:
+        if 'ui' in locals():
+            ui.stop()
+        for task in locals().get('tasks', []):
+            task.cancel()
+        closing = []
+        for job in locals().get('jobs', []):
+            if interrupted and keep_positions and job.checkpoint is not None and job.held is not None:
+                # Stopped on purpose with keep_positions on: both legs are open as checkpointed, and the next
+                # start takes them over instead of closing and reopening. An error exit always flattens
+                console.print(f"[yellow]{job.name}: legs kept open for a warm restart[/yellow]")
+                continue
+            closing.append(job)
+        if closing:
+            await cleanup_positions_async(closing, console, journal)
+        # The streams close their listenKey through the event loop, so they stop off it and before the clients close
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, user_stream.stop)
+                               for user_stream in locals().get('user_streams', [])))
+        await asyncio.gather(*(api.close() for api in locals().get('clients', {}).values()))
+        if 'market_data' in locals():
+            market_data.stop()
+        if 'order_book' in locals():
+            order_book.stop()
+        if 'metrics_exporter' in locals():
+            metrics_exporter.stop()
+        if locals().get('journal') is not None:
+            journal.close()
+
+def new_user_stream(api, symbol, stream_config):
+    """A user data stream of one account, set up from the streams config"""
+    return UserDataStream(
+        api,
+        [symbol],
+        ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+        reconcile_interval=stream_config.get('reconcile_interval', 60)
+    )
+
+def start_account_status(ui, config, jobs, stream_config):
+    """Keep the first job's account panels current, from the user data stream or by polling"""
+    job = jobs[0]
+    user_streams = []
+    if stream_config.get('user_data', False):
+        for account_num, api in ((1, job.account1), (2, job.account2)):
+            user_stream = new_user_stream(api, job.symbol, stream_config)
+            user_stream.start()
+            user_streams.append(user_stream)
+            ui.attach_account_state(account_num, user_stream.state, job.symbol, api)
+    else:
+        # One thread polls both accounts, fast around orders and near liquidation, slowly while flat
+        status_poller(ui, config, jobs).start()
+    return user_streams
+
+async def start_account_status_async(ui, config, jobs, stream_config):
+    """start_account_status() for AsyncAsterDexAPI clients; returns the user data streams and the polling task"""
+    from async_api import BlockingClient
+    job = jobs[0]
+    user_streams = []
+    if not stream_config.get('user_data', False):
+        # One task polls both accounts, fast around orders and near liquidation, slowly while flat
+        return user_streams, [asyncio.create_task(status_poller(ui, config, jobs).run_async())]
+    loop = asyncio.get_running_loop()
+    for account_num, api in ((1, job.account1), (2, job.account2)):
+        # The stream's threads call the client through this event loop; its first snapshot and listenKey
+        # are blocking calls, made off the loop
+        user_stream = new_user_stream(BlockingClient(api, loop), job.symbol, stream_config)
+        await loop.run_in_executor(None, user_stream.start)
+        user_streams.append(user_stream)
+        ui.attach_account_state(account_num, user_stream.state, job.symbol, api)
+    return user_streams, []
+
+def main(headless=False, keep_positions=False):
+    console = make_console(headless)
+    startup = StartupTimer()
+    interrupted = False
+    try:
         # Load configuration
         config = load_config()
         
-        # Create API instances
-        account1 = AsterDexAPI(
-            config['account1']['api_key'],
-            config['account1']['api_secret']
-        )
-        account2 = AsterDexAPI(
-            config['account2']['api_key'],
-            config['account2']['api_secret']
-        )
+        # Initialize UI
+        ui_config = config.get('ui', {})
+        if headless:
+            ui = HeadlessStatus(interval=ui_config.get('status_interval', 10))
+        else:
+            # rich is only imported for the terminal UI
+            from trading_ui_EN import TradingUI
+            ui = TradingUI(refresh_per_second=ui_config.get('refresh_per_second', 1))
         
-        # Get trading parameters
-        trading_config = config['trading']
-        symbol = trading_config['symbol']
-        position_side = trading_config['position_side']
-        order_type = trading_config['order_type']
-        wait_seconds = trading_config['wait_seconds']
-        leverage = trading_config['leverage']
-        usdt_amount = trading_config['usdt_amount']
+        # Create one API client per account (shared clock offset and connection pool) and the hedge jobs
+        clients = create_clients(config, AsterDexAPI)
+        # Append-only journal of every filled leg, if configured
+        journal_config = config.get('journal', {})
+        journal = None
+        if journal_config.get('path'):
+            journal = TradeJournal(journal_config['path'], fee_rate=journal_config.get('fee_rate', 0.0))
+        # Runtime state for a warm restart, if configured; the checkpoint is read before anything overwrites it
+        checkpoint_config = config.get('checkpoint', {})
+        checkpoint = None
+        if checkpoint_config.get('path'):
+            checkpoint = Checkpoint(checkpoint_config['path'], fsync=checkpoint_config.get('fsync', False))
+            checkpoint.load()
+        keep_positions = keep_positions or checkpoint_config.get('keep_positions', False)
+        jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']], journal=journal,
+                         checkpoint=checkpoint)
+                for spec in load_jobs(config)]
+        ui.attach_jobs(jobs)
+        if checkpoint is not None:
+            restore_ui(ui, checkpoint, jobs[0])
         
-        # Start status update threads
-        update_thread1 = threading.Thread(target=update_position_status, args=(account1, symbol, ui, 1))
-        update_thread2 = threading.Thread(target=update_position_status, args=(account2, symbol, ui, 2))
-        update_thread1.daemon = True
-        update_thread2.daemon = True
-        update_thread1.start()
-        update_thread2.start()
+        # Latency / error metrics for the UI panel, exported to a file or an HTTP endpoint if configured
+        metrics = jobs[0].account1.metrics
+        ui.attach_metrics(metrics)
+        metrics_config = config.get('metrics', {})
+        if metrics_config.get('file') or metrics_config.get('port') is not None:
+            metrics_exporter = MetricsExporter(
+                metrics,
+                path=metrics_config.get('file'),
+                port=metrics_config.get('port'),
+                host=metrics_config.get('host', "127.0.0.1"),
+                interval=metrics_config.get('interval', 5)
+            )
+            metrics_exporter.start()
+        
+        # Mark price / funding rate stream shared by every job
+        stream_config = config.get('streams', {})
+        feeds = []
+        if stream_config.get('market_data', False):
+            market_data = MarkPriceFeed(
+                sorted(set(job.symbol for job in jobs)),
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            market_data.start()
+            feeds.append(market_data)
+            for api in clients.values():
+                api.market_data = market_data
+        
+        # Local order books from the diff-depth stream, for sizing at the expected fill price
+        if stream_config.get('depth', False):
+            order_book = DepthFeed(
+                sorted(set(job.symbol for job in jobs)),
+                fetch_snapshot=next(iter(clients.values())).get_depth,
+                ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                max_age=stream_config.get('max_age', 3)
+            )
+            order_book.start()
+            feeds.append(order_book)
+            for api in clients.values():
+                api.order_book = order_book
         
         # Start UI display thread
         ui_thread = threading.Thread(target=ui.show)
         ui_thread.daemon = True
         ui_thread.start()
         
-        # Wait for UI initialization
-        time.sleep(2)
+        # Clock offset, symbol filters, leverage, margin type, position mode and balances of every account at once
+        bootstrap_config = config.get('bootstrap', {})
+        report = bootstrap(jobs, max_workers=bootstrap_config.get('workers', 8))
+        # From here on the clock resyncs in the background, counted from bootstrap's sync
+        next(iter(clients.values())).clock.start()
+        seed_balances(ui, report['balances'], jobs[0])
+        console.print(f"[green]Bootstrap: {report['steps']} setup requests in {report['seconds']:.2f}s[/green]")
         
-        # Set leverage
-        leverage_result1 = account1.set_leverage(symbol, leverage)
-        leverage_result2 = account2.set_leverage(symbol, leverage)
+        # The account panels follow the first job's pair; every job appears in the jobs table
+        user_streams = start_account_status(ui, config, jobs, stream_config)
         
-        if leverage_result1.get('leverage') != leverage or leverage_result2.get('leverage') != leverage:
-            raise ValueError("Failed to set leverage")
+        # Take over the legs the last run left open, or close what its checkpoint does not account for
+        if checkpoint is not None:
+            for job in jobs:
+                closed = job.resume(checkpoint.get('jobs', job.name))
+                if job.held is not None:
+                    console.print(f"[green]{job.name}: resumed {job.held['quantity']} held until its planned close[/green]")
+                elif closed:
+                    console.print(f"[yellow]{job.name}: closed {closed} leg(s) the checkpoint did not account for[/yellow]")
         
-        while True:
-            try:
-                # Calculate trading quantity
-                quantity = account1.calculate_quantity_from_usdt(symbol, usdt_amount, leverage)
-                
-                # Get current funding rate and price
-                funding_rate = account1.get_funding_rate(symbol)
-                current_price = account1.get_current_price(symbol)
-                
-                # Execute trades
-                long_order = account1.place_order(
-                    symbol=symbol,
-                    side="BUY",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                short_order = account2.place_order(
-                    symbol=symbol,
-                    side="SELL",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                # Update statistics
-                ui.update_stats(
-                    funding_rate=funding_rate,
-                    symbol=symbol,
-                    leverage=leverage,
-                    wait_seconds=wait_seconds,
-                    last_order_price=current_price,
-                    volume=quantity * 2  # Each trade involves both accounts
-                )
-                
-                time.sleep(wait_seconds)
-                
-                # Close positions
-                close_long = account1.close_position(
-                    symbol=symbol,
-                    side="BUY",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                close_short = account2.close_position(
-                    symbol=symbol,
-                    side="SELL",
-                    order_type=order_type,
-                    quantity=quantity,
-                    position_side=position_side
-                )
-                
-                # Wait before starting next round
-                time.sleep(5)
-                
-            except Exception as e:
-                console = Console()
-                console.print(f"[red]Trading error: {str(e)}[/red]")
-                time.sleep(5)  # Wait before retrying after an error
-                continue
+        # Trading starts as soon as the stream feeds have data; after ready_timeout seconds it sizes from REST instead
+        ready_timeout = bootstrap_config.get('ready_timeout', 5)
+        pending = wait_ready(feeds, sorted(set(job.symbol for job in jobs)), ready_timeout)
+        if pending:
+            console.print(f"[yellow]Streams not ready after {ready_timeout}s, using REST for: "
+                          f"{', '.join(f'{type(feed).__name__} {symbol}' for feed, symbol in pending)}[/yellow]")
+        
+        def on_open(job, quantity, current_price, funding_rate):
+            ui.stats['leg_skew'] = engine.skew_stats()
+            # Update statistics
+            ui.update_stats(
+                funding_rate=funding_rate,
+                symbol=job.symbol,
+                leverage=job.leverage,
+                wait_seconds=job.wait_seconds,
+                last_order_price=current_price,
+                volume=quantity * 2  # Each trade involves both accounts
+            )
+            if checkpoint is not None:
+                # Statistics and starting balances survive a restart
+                save_ui(ui, checkpoint, jobs[0])
+            seconds = startup.first_open(metrics)
+            if seconds is not None:
+                console.print(f"[green]First hedge opened {seconds:.2f}s after start[/green]")
+        
+        def on_error(job, e):
+            console.print(f"[red]Trading error ({job.name}): {str(e)}[/red]")
+        
+        # Run every job concurrently until interrupted
+        engine = HedgeEngine(jobs, on_open=on_open, on_error=on_error)
+        engine.start()
+        engine.wait()
         
     except KeyboardInterrupt:
-        console = Console()
+        interrupted = True
         console.print("[yellow]Program interrupted by user[/yellow]")
     except Exception as e:
-        console = Console()
         console.print(f"[red]Error: {str(e)}[/red]")
     finally:
+        if 'engine' in locals():
+            engine.stop()
         if 'ui' in locals():
             ui.stop()
-        if 'account1' in locals() and 'account2' in locals():
-            cleanup_positions(account1, account2, symbol)
+        closing = []
+        for job in locals().get('jobs', []):
+            if interrupted and keep_positions and job.checkpoint is not None and job.held is not None:
+                # Stopped on purpose with keep_positions on: both legs are open as checkpointed, and the next
+                # start takes them over instead of closing and reopening. An error exit always flattens
+                console.print(f"[yellow]{job.name}: legs kept open for a warm restart[/yellow]")
+                continue
+            closing.append(job)
+        if closing:
+            cleanup_positions(closing, console, journal)
+        for api in locals().get('clients', {}).values():
+            api.close()
+        for user_stream in locals().get('user_streams', []):
+            user_stream.stop()
+        if 'market_data' in locals():
+            market_data.stop()
+        if 'order_book' in locals():
+            order_book.stop()
+        if 'metrics_exporter' in locals():
+            metrics_exporter.stop()
+        if locals().get('journal') is not None:
+            journal.close()
+
+def supervise(workers=None, headless=False, keep_positions=False):
+    """Run the configured jobs sharded over worker processes, printing the fleet totals"""
+    console = make_console(headless)
+    try:
+        config = load_config()
+        if keep_positions and config.get('checkpoint', {}).get('path'):
+            config['checkpoint']['keep_positions'] = True
+        supervisor_config = config.get('supervisor', {})
+        supervisor = Supervisor(
+            config,
+            AsterDexAPI,
+            workers=workers or supervisor_config.get('workers'),
+            interval=supervisor_config.get('interval', 1),
+            heartbeat_timeout=supervisor_config.get('heartbeat_timeout', 30),
+            restart_delay=supervisor_config.get('restart_delay', 1)
+        )
+        supervisor.start()
+        console.print(f"[green]{len(supervisor.shards)} workers started for {len(load_jobs(config))} jobs[/green]")
+        interval = config.get('ui', {}).get('status_interval', 10)
+        while True:
+            time.sleep(interval)
+            total = supervisor.stats()['total']
+            console.print(f"Workers alive {total['alive']}/{len(supervisor.shards)}  restarts {total['restarts']}  "
+                          f"trades {total['trade_count']:.0f}  volume {total['total_volume_usdt']:.2f} USDT  "
+                          f"realized PnL {total['realized_pnl']:.4f} USDT  errors {total['errors']:.0f}")
+    except KeyboardInterrupt:
+        console.print("[yellow]Program interrupted by user[/yellow]")
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+    finally:
+        if 'supervisor' in locals():
+            # Each worker closes its own positions before it exits (with keep_positions, all but the checkpointed legs)
+            supervisor.stop()
+            total = supervisor.stats()['total']
+            console.print(f"Trades {total['trade_count']:.0f}  volume {total['total_volume_usdt']:.2f} USDT  "
+                          f"realized PnL {total['realized_pnl']:.4f} USDT")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    headless = "--headless" in sys.argv[1:]
+    keep_positions = "--keep-positions" in sys.argv[1:]
+    if headless:
+        # Status records and messages go to the log instead of the terminal UI
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if "--workers" in sys.argv[1:]:
+        # Shard the jobs over worker processes; without a count, supervisor.workers or one per CPU
+        workers = sys.argv[sys.argv.index("--workers") + 1:][:1]
+        supervise(int(workers[0]) if workers and workers[0].isdigit() else None, headless, keep_positions)
+    elif "--async" in sys.argv[1:]:
+        asyncio.run(async_main(headless, keep_positions))
+    else:
+        main(headless, keep_positions)
\ No newline at end of file
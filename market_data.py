@@ -0,0 +1,149 @@
+import json
+import time
+import threading
+import itertools
+
+import websocket
+
+
+class MarkPriceFeed:
+    """Latest mark price and funding rate per symbol from the `<symbol>@markPrice` stream.
+
+    Values are kept in memory with the time they were received. `get` returns
+    None once an entry is older than `max_age` seconds so callers can fall back
+    to REST. The connection is re-established with exponential backoff and all
+    symbols are resubscribed on every reconnect.
+    """
+
+    def __init__(self, symbols, ws_url="wss://fstream.asterdex.com", max_age=3,
+                 stream_suffix="@markPrice@1s", reconnect_delay=1, max_reconnect_delay=30):
+        self.ws_url = ws_url.rstrip('/')
+        self.max_age = max_age
+        self.stream_suffix = stream_suffix
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.symbols = set(symbol.upper() for symbol in symbols)
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self.rest_fallbacks = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._ws = None
+        self._thread = None
+        self._running = False
+
+    def _stream(self, symbol):
+        return symbol.lower() + self.stream_suffix
+
+    def _send_subscribe(self, symbols):
+        if not symbols:
+            return
+        self._ws.send(json.dumps({
+            "method": "SUBSCRIBE",
+            "params": [self._stream(symbol) for symbol in symbols],
+            "id": next(self._ids)
+        }))
+
+    def subscribe(self, symbol):
+        symbol = symbol.upper()
+        with self._lock:
+            if symbol in self.symbols:
+                return
+            self.symbols.add(symbol)
+        if self.connected:
+            self._send_subscribe([symbol])
+
+    def get(self, symbol, max_age=None):
+        """Cached entry for `symbol`, or None if it is missing or stale"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            entry = self._cache.get(symbol.upper())
+            if entry is None or time.monotonic() - entry['received_at'] > max_age:
+                self.rest_fallbacks += 1
+                return None
+            return entry
+
+    def age(self, symbol):
+        with self._lock:
+            entry = self._cache.get(symbol.upper())
+        return None if entry is None else time.monotonic() - entry['received_at']
+
+    def ready(self, symbol):
+        """Whether `get` would return data for `symbol`, without counting a REST fallback"""
+        age = self.age(symbol)
+        return age is not None and age <= self.max_age
+
+    def _on_open(self, ws):
+        self.connected = True
+        with self._lock:
+            symbols = sorted(self.symbols)
+        self._send_subscribe(symbols)
+
+    def _on_message(self, ws, message):
+        data = json.loads(message)
+        # Combined streams wrap the payload as {"stream": ..., "data": ...}
+        data = data.get('data', data) if isinstance(data, dict) else data
+        events = data if isinstance(data, list) else [data]
+        for event in events:
+            if not isinstance(event, dict) or event.get('e') != 'markPriceUpdate':
+                continue
+            with self._lock:
+                self._cache[event['s']] = {
+                    'mark_price': float(event['p']),
+                    'funding_rate': float(event['r']) if event.get('r') not in (None, '') else 0.0,
+                    'next_funding_time': event.get('T', 0),
+                    'event_time': event.get('E', 0),
+                    'received_at': time.monotonic()
+                }
+                self.messages += 1
+
+    def _on_close(self, ws, status_code, message):
+        self.connected = False
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while self._running:
+            messages_before = self.messages
+            self._ws = websocket.WebSocketApp(
+                self.ws_url + "/ws",
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_close=self._on_close
+            )
+            try:
+                self._ws.run_forever(ping_interval=60, ping_timeout=10)
+            except Exception:
+                pass
+            self.connected = False
+            if not self._running:
+                break
+            if self.messages > messages_before:
+                delay = self.reconnect_delay
+            self.reconnects += 1
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._ws is not None:
+            self._ws.close()
+
+    def stats(self):
+        ages = [self.age(symbol) for symbol in sorted(self.symbols)]
+        ages = [age for age in ages if age is not None]
+        return {
+            'connected': self.connected,
+            'messages': self.messages,
+            'reconnects': self.reconnects,
+            'rest_fallbacks': self.rest_fallbacks,
+            'max_age': max(ages) if ages else None
+        }
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Histogram bucket upper bounds in seconds, 0.5 ms to 30 s
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Histogram:
+    """Cumulative bucket counts for export, plus the latest samples for exact percentiles"""
+
+    def __init__(self, max_samples=2048):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+
+    def summary(self):
+        samples = list(self.samples)
+        return {
+            'count': self.count,
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p90_ms': percentile(samples, 90) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000
+        }
+
+
+class MetricsRegistry:
+    """Latency histograms, counters and gauges keyed by metric name and labels, shared by every client.
+
+    Gauges are not stored: functions registered with add_gauges are read
+    at every export, so a level such as the rate budget in use is current
+    when it is scraped.
+
+    Recorded metrics:
+      request_seconds{endpoint, account}         full REST call, including rate-limit wait
+      request_stage_seconds{stage, account}      sign / rate_limit_wait / network
+      request_weight_total{account}              request weight sent
+      request_errors_total{endpoint, code}       exchange error codes and HTTP failures
+      rate_limit_waits_total{lane}               requests held back by the rate budget, order or poll lane
+      rate_limit_throttled_total{status}         429 / 418 responses
+      rate_limit_weight_used{interval}           gauge: request weight used in the window
+      rate_limit_weight_limit{interval}          gauge: request weight allowed in the window
+      rate_limit_orders_used{interval}           gauge: orders in the window, busiest account
+      rate_limit_orders_limit{interval}          gauge: orders allowed in the window per account
+      cycle_phase_seconds{job, phase}            sizing / open / hold / close / flatten
+      cycle_lateness_seconds{job, step}          how late an open or close started
+      deadline_misses_total{job, phase, action}  phase budgets run out, and what was done
+      flatten_seconds{outcome}                   closing everything, flat or still open
+      sizing_depth_capped_total{symbol}          opens capped by the order book's depth
+      status_polls_total{reason}                 account status polls by why they were due
+      bootstrap_step_seconds{step, account}      startup requests
+      startup_seconds{stage}                     bootstrap / first_order
+      ui_render_seconds{}                        TradingUI layout generation
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._gauges = []
+        self.started_at = time.time()
+        # Bumped on every update so readers can skip recomputing unchanged summaries
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+            self.version += 1
+
+    def increment(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self.version += 1
+
+    def add_gauges(self, collect):
+        """Export what `collect()` returns, (name, value, labels) tuples, as gauges"""
+        with self._lock:
+            self._gauges.append(collect)
+
+    def gauges(self):
+        """Current (name, value, labels) of every gauge"""
+        with self._lock:
+            collectors = list(self._gauges)
+        # Collected outside the lock: a collector may take locks of its own that are held while recording
+        return [gauge for collect in collectors for gauge in collect()]
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summaries(self, name, group_by):
+        """p50/p90/p99 of `name` merged over every label except `group_by`, busiest first"""
+        merged = {}
+        with self._lock:
+            for (metric, labels), histogram in self.histograms.items():
+                if metric != name:
+                    continue
+                group = dict(labels).get(group_by, '')
+                merged.setdefault(group, []).append(histogram)
+            rows = []
+            for group, histograms in merged.items():
+                samples = [sample for histogram in histograms for sample in histogram.samples]
+                rows.append({
+                    group_by: group,
+                    'count': sum(histogram.count for histogram in histograms),
+                    'p50_ms': percentile(samples, 50) * 1000,
+                    'p90_ms': percentile(samples, 90) * 1000,
+                    'p99_ms': percentile(samples, 99) * 1000
+                })
+        return sorted(rows, key=lambda row: -row['count'])
+
+    def counter_total(self, name, group_by):
+        totals = {}
+        with self._lock:
+            for (metric, labels), value in self.counters.items():
+                if metric == name:
+                    group = dict(labels).get(group_by, '')
+                    totals[group] = totals.get(group, 0) + value
+        return totals
+
+    def snapshot(self):
+        gauges = self.gauges()
+        with self._lock:
+            return {
+                'uptime_seconds': time.time() - self.started_at,
+                'histograms': [dict(name=name, labels=dict(labels), **histogram.summary())
+                               for (name, labels), histogram in self.histograms.items()],
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in self.counters.items()],
+                'gauges': [{'name': name, 'labels': labels, 'value': value} for name, value, labels in gauges]
+            }
+
+    def prometheus_text(self):
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{str(value)}"' for key, value in pairs) + '}'
+
+        gauges = self.gauges()
+        lines = []
+        with self._lock:
+            for name in sorted(set(name for name, _ in self.histograms)):
+                metric = f"asterdex_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (hist_name, labels), histogram in sorted(self.histograms.items()):
+                    if hist_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{metric}_bucket{label_text(labels, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{metric}_sum{label_text(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{label_text(labels)} {histogram.count}")
+            for name in sorted(set(name for name, _ in self.counters)):
+                metric = f"asterdex_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, labels), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{metric}{label_text(labels)} {value}")
+        for name in sorted(set(name for name, _, _ in gauges)):
+            metric = f"asterdex_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            for gauge_name, value, labels in gauges:
+                if gauge_name == name:
+                    lines.append(f"{metric}{label_text(sorted(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.prometheus_text().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsExporter:
+    """Publishes a registry at http://host:port/metrics (Prometheus text) and /metrics.json,
+    and/or rewrites `path` every `interval` seconds (JSON if it ends in .json, else Prometheus text).
+    """
+
+    def __init__(self, registry, path=None, port=None, host="127.0.0.1", interval=5):
+        self.registry = registry
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self._server = None
+        self._stopped = threading.Event()
+
+    def write(self):
+        if self.path.endswith(".json"):
+            content = json.dumps(self.registry.snapshot(), indent=2)
+        else:
+            content = self.registry.prometheus_text()
+        # Readers never see a half-written file
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, self.path)
+
+    def _write_loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def start(self):
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.registry = self.registry
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        if self.path:
+            threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.path:
+            try:
+                self.write()
+            except OSError:
+                pass
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
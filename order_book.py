@@ -0,0 +1,444 @@
+import json
+import math
+import time
+import heapq
+import threading
+
+from market_data import MarkPriceFeed
+
+
+# Prices are matched to levels in units of 1e-8, finer than any tick the exchange quotes
+PRICE_SCALE = 10 ** 8
+# Leaves of a side's price grid at most; levels further from the touch are kept out of the tree
+MAX_LEAVES = 2 ** 16
+
+
+class BookSide:
+    """Price levels of one side of a book, best first.
+
+    The levels near the touch are the leaves of a segment tree over the
+    price grid, best first (bids by negated price), every node holding the
+    quantity and notional of the leaves below it. The grid's tick is the
+    largest step that divides the gaps between those levels, so every price
+    the exchange can quote near the book already has a leaf, set or empty.
+    Setting a level rewrites its leaf and the sums above it, and fills,
+    depth and the best price descend the tree, all in O(log n) of the grid.
+
+    The grid spans twice the range of the book, but never more than
+    MAX_LEAVES, with room on the better side for the touch to move into.
+    Levels beyond its far end are only kept by price and are walked, in
+    order, by the rare order larger than everything on the grid, so a stray
+    level far from the touch costs no memory or rebuild time. A price
+    better than the grid, or off its tick, is queued and the tree rebuilt
+    around the touch, O(grid), before the next query.
+    """
+
+    def __init__(self, descending):
+        self._sign = -1 if descending else 1
+        self.clear()
+
+    def __len__(self):
+        return len(self._levels)
+
+    def clear(self):
+        # Scaled and signed price -> (price, quantity) of every level
+        self._levels = {}
+        # Levels set since the last rebuild that have no leaf, and those beyond the grid's far end
+        self._new = set()
+        self._far = set()
+        # Leaf i is the scaled and signed price base + i * tick
+        self._base = 0
+        self._tick = 0
+        self._size = 1
+        self._tree_quantity = [0.0, 0.0]
+        self._tree_notional = [0.0, 0.0]
+
+    def _leaf(self, key):
+        if self._tick:
+            leaf, offset = divmod(key - self._base, self._tick)
+            if not offset and 0 <= leaf < self._size:
+                return leaf
+        return None
+
+    def _beyond(self, key):
+        return self._tick and key >= self._base + self._size * self._tick
+
+    def set(self, price, quantity):
+        """Set the quantity at `price`; a quantity of 0 removes the level"""
+        key = self._sign * round(price * PRICE_SCALE)
+        if quantity > 0:
+            self._levels[key] = (price, quantity)
+        else:
+            quantity = 0.0
+            self._levels.pop(key, None)
+        leaf = self._leaf(key)
+        if leaf is None:
+            pending = self._far if self._beyond(key) else self._new
+            if quantity:
+                pending.add(key)
+            else:
+                pending.discard(key)
+            return
+        tree_quantity, tree_notional = self._tree_quantity, self._tree_notional
+        node = self._size + leaf
+        tree_quantity[node], tree_notional[node] = quantity, quantity * price
+        node >>= 1
+        while node:
+            tree_quantity[node] = tree_quantity[2 * node] + tree_quantity[2 * node + 1]
+            tree_notional[node] = tree_notional[2 * node] + tree_notional[2 * node + 1]
+            node >>= 1
+
+    def _rebuild(self):
+        keys = sorted(self._levels)
+        self._new = set()
+        self._far = set()
+        # The tick of the levels a grid of MAX_LEAVES could hold; those past it do not narrow it
+        tick, last = 0, keys[0] if keys else 0
+        for low, high in zip(keys, keys[1:]):
+            if tick and (high - keys[0]) // tick >= MAX_LEAVES:
+                break
+            tick, last = math.gcd(tick, high - low), high
+        tick = tick or self._tick or 1
+        span = (last - keys[0]) // tick + 1 if keys else 1
+        size = 1
+        while size < 2 * span and size < MAX_LEAVES:
+            size *= 2
+        # Centred on the book when it fits twice over, else a quarter of the grid above the touch
+        base = keys[0] - max((size - span) // 2, size // 4) * tick if keys else 0
+        tree_quantity, tree_notional = [0.0] * (2 * size), [0.0] * (2 * size)
+        for key, (price, quantity) in self._levels.items():
+            leaf = (key - base) // tick
+            if leaf >= size:
+                self._far.add(key)
+                continue
+            tree_quantity[size + leaf], tree_notional[size + leaf] = quantity, quantity * price
+        for node in range(size - 1, 0, -1):
+            tree_quantity[node] = tree_quantity[2 * node] + tree_quantity[2 * node + 1]
+            tree_notional[node] = tree_notional[2 * node] + tree_notional[2 * node + 1]
+        self._base, self._tick, self._size = base, tick, size
+        self._tree_quantity, self._tree_notional = tree_quantity, tree_notional
+
+    def _sync(self):
+        # Also when every level on the grid is gone but some remain beyond it
+        if self._new or self._far and not self._tree_quantity[1] > 0:
+            self._rebuild()
+
+    def _far_levels(self):
+        return [self._levels[key] for key in sorted(self._far)]
+
+    def _price(self, leaf):
+        key = self._base + leaf * self._tick
+        level = self._levels.get(key)
+        return level[0] if level is not None else self._sign * key / PRICE_SCALE
+
+    def best(self):
+        self._sync()
+        tree_quantity = self._tree_quantity
+        if not tree_quantity[1] > 0:
+            return None
+        node = 1
+        while node < self._size:
+            node = 2 * node if tree_quantity[2 * node] > 0 else 2 * node + 1
+        return self._price(node - self._size)
+
+    def levels(self, count=None):
+        keys = sorted(self._levels) if count is None else heapq.nsmallest(count, self._levels)
+        return [self._levels[key] for key in keys]
+
+    def _find(self, target, tree):
+        """(leaf, quantity and notional before it) of the first level at which the running sum of `tree` reaches `target`"""
+        tree_quantity, tree_notional = self._tree_quantity, self._tree_notional
+        node, before, before_quantity, before_notional = 1, 0.0, 0.0, 0.0
+        while node < self._size:
+            left = 2 * node
+            if before + tree[left] >= target:
+                node = left
+            else:
+                before += tree[left]
+                before_quantity += tree_quantity[left]
+                before_notional += tree_notional[left]
+                node = left + 1
+        return node - self._size, before_quantity, before_notional
+
+    def fill(self, quantity):
+        """(filled quantity, average price) of a market order for `quantity` against this side"""
+        self._sync()
+        total_quantity, total_notional = self._tree_quantity[1], self._tree_notional[1]
+        if not total_quantity > 0 or quantity <= 0:
+            return 0.0, 0.0
+        if total_quantity < quantity:
+            for price, level_quantity in self._far_levels():
+                take = min(level_quantity, quantity - total_quantity)
+                total_quantity += take
+                total_notional += take * price
+                if total_quantity >= quantity:
+                    break
+            return total_quantity, total_notional / total_quantity
+        leaf, before_quantity, before_notional = self._find(quantity, self._tree_quantity)
+        return quantity, (before_notional + (quantity - before_quantity) * self._price(leaf)) / quantity
+
+    def fill_notional(self, usdt_amount):
+        """(filled quantity, average price) of a market order spending `usdt_amount` against this side"""
+        self._sync()
+        total_quantity, total_notional = self._tree_quantity[1], self._tree_notional[1]
+        if not total_quantity > 0 or usdt_amount <= 0:
+            return 0.0, 0.0
+        if total_notional < usdt_amount:
+            for price, level_quantity in self._far_levels():
+                take = min(level_quantity, (usdt_amount - total_notional) / price)
+                total_quantity += take
+                total_notional += take * price
+                if total_notional >= usdt_amount:
+                    break
+            return total_quantity, total_notional / total_quantity
+        leaf, before_quantity, before_notional = self._find(usdt_amount, self._tree_notional)
+        quantity = before_quantity + (usdt_amount - before_notional) / self._price(leaf)
+        return quantity, usdt_amount / quantity
+
+    def quantity_to(self, limit_price):
+        """Quantity resting at prices no worse than `limit_price`"""
+        self._sync()
+        if not self._tick:
+            return 0.0
+        tree_quantity = self._tree_quantity
+        # Leaves up to the limit, scaled as the levels are so a level exactly at it counts
+        limit = self._sign * round(limit_price * PRICE_SCALE)
+        leaves = (limit - self._base) // self._tick + 1
+        low, high = self._size, self._size + min(max(leaves, 0), self._size)
+        quantity = 0.0
+        while low < high:
+            if low & 1:
+                quantity += tree_quantity[low]
+                low += 1
+            if high & 1:
+                high -= 1
+                quantity += tree_quantity[high]
+            low >>= 1
+            high >>= 1
+        if leaves > self._size:
+            quantity += sum(self._levels[key][1] for key in self._far if key <= limit)
+        return quantity
+
+
+class LocalOrderBook:
+    """One symbol's book, kept in step with the `<symbol>@depth` diff stream.
+
+    Follows the exchange's recipe for a local book: events are buffered
+    until a REST snapshot arrives, events with `u` below the snapshot's
+    `lastUpdateId` are dropped, the first one applied must straddle it
+    (`U` <= lastUpdateId <= `u`), and from then on every event's `pu` must
+    equal the previous event's `u`. A gap drops the book back to
+    unsynchronised, to be rebuilt from a new snapshot.
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id = None
+        self.updated_at = None
+        self.events = 0
+        self.resyncs = 0
+        self._buffer = []
+        self._previous_u = None
+        self._lock = threading.Lock()
+
+    @property
+    def synced(self):
+        return self.last_update_id is not None
+
+    def on_event(self, event):
+        """Apply a depthUpdate event, or buffer it until the snapshot; False if the book lost sync"""
+        with self._lock:
+            if self.last_update_id is None:
+                self._buffer.append(event)
+                return True
+            return self._apply(event)
+
+    def apply_snapshot(self, snapshot):
+        """Load a /fapi/v1/depth snapshot and replay the events buffered since it was requested"""
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, quantity in snapshot['bids']:
+                self.bids.set(float(price), float(quantity))
+            for price, quantity in snapshot['asks']:
+                self.asks.set(float(price), float(quantity))
+            self.last_update_id = snapshot['lastUpdateId']
+            self._previous_u = None
+            self.updated_at = time.monotonic()
+            buffered, self._buffer = self._buffer, []
+            for event in buffered:
+                if not self._apply(event):
+                    return False
+            return True
+
+    def reset(self):
+        """Forget the book; events are buffered again until the next snapshot"""
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.last_update_id = None
+        self._previous_u = None
+        self._buffer = []
+
+    def _apply(self, event):
+        if event['u'] < self.last_update_id:
+            return True
+        if self._previous_u is None:
+            in_sequence = event['U'] <= self.last_update_id <= event['u']
+        else:
+            in_sequence = event['pu'] == self._previous_u
+        if not in_sequence:
+            self._reset()
+            self.resyncs += 1
+            return False
+        for price, quantity in event['b']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in event['a']:
+            self.asks.set(float(price), float(quantity))
+        self._previous_u = event['u']
+        self.last_update_id = event['u']
+        self.updated_at = time.monotonic()
+        self.events += 1
+        return True
+
+    def _side(self, side):
+        # A BUY takes the asks, a SELL the bids
+        return self.asks if side == "BUY" else self.bids
+
+    def mid(self):
+        with self._lock:
+            bid, ask = self.bids.best(), self.asks.best()
+        return None if bid is None or ask is None else (bid + ask) / 2
+
+    def fill_price(self, side, quantity):
+        """Expected average price of a market order of `side` for `quantity`, or None if the book is empty"""
+        with self._lock:
+            filled, price = self._side(side).fill(quantity)
+        return price if filled else None
+
+    def quantity_within(self, side, bps):
+        """Quantity a market order of `side` could take within `bps` of the mid price"""
+        with self._lock:
+            bid, ask = self.bids.best(), self.asks.best()
+            if bid is None or ask is None:
+                return 0.0
+            mid = (bid + ask) / 2
+            limit = mid * (1 + bps / 10000) if side == "BUY" else mid * (1 - bps / 10000)
+            return self._side(side).quantity_to(limit)
+
+    def hedge_quote(self, usdt_amount, max_slippage_bps=None):
+        """(price, notional) to size a hedge of `usdt_amount` per leg.
+
+        The price is the average the long leg expects to pay walking the
+        asks, so the long leg spends no more than `usdt_amount`; the short
+        leg, walking the bids, receives a little less. The notional is capped
+        at what both sides can fill, and with `max_slippage_bps` at what both
+        sides hold within that distance of the mid. Returns None while either
+        side is empty.
+        """
+        with self._lock:
+            bid, ask = self.bids.best(), self.asks.best()
+            if bid is None or ask is None:
+                return None
+            mid = (bid + ask) / 2
+            bought, price = self.asks.fill_notional(usdt_amount)
+            quantity, _ = self.bids.fill(bought)
+            if max_slippage_bps is not None:
+                quantity = min(quantity, self.asks.quantity_to(mid * (1 + max_slippage_bps / 10000)),
+                               self.bids.quantity_to(mid * (1 - max_slippage_bps / 10000)))
+            return price, min(usdt_amount, quantity * price)
+
+
+class DepthFeed(MarkPriceFeed):
+    """Local order books for a set of symbols from the `<symbol>@depth` diff stream.
+
+    Connection handling and subscriptions are those of MarkPriceFeed. A book
+    that has no snapshot yet, or has lost sequence, is rebuilt from
+    `fetch_snapshot(symbol)` (the /fapi/v1/depth response) on a background
+    thread, requested after its first event is buffered so the snapshot
+    overlaps the stream. `get` returns None for a book that
+    is not in sync or has had no update for `max_age` seconds.
+    """
+
+    def __init__(self, symbols, fetch_snapshot, ws_url="wss://fstream.asterdex.com", max_age=3,
+                 stream_suffix="@depth@100ms", **kwargs):
+        super().__init__(symbols, ws_url=ws_url, max_age=max_age, stream_suffix=stream_suffix, **kwargs)
+        self.fetch_snapshot = fetch_snapshot
+        self.books = {symbol: LocalOrderBook(symbol) for symbol in self.symbols}
+        self.snapshot_errors = 0
+        self._pending = set()
+
+    def subscribe(self, symbol):
+        with self._lock:
+            self.books.setdefault(symbol.upper(), LocalOrderBook(symbol.upper()))
+        super().subscribe(symbol)
+
+    def get(self, symbol, max_age=None):
+        """The symbol's LocalOrderBook, or None if it is out of sync or stale"""
+        max_age = self.max_age if max_age is None else max_age
+        book = self.books.get(symbol.upper())
+        if book is None or not book.synced or time.monotonic() - book.updated_at > max_age:
+            self.rest_fallbacks += 1
+            return None
+        return book
+
+    def age(self, symbol):
+        book = self.books.get(symbol.upper())
+        return None if book is None or book.updated_at is None else time.monotonic() - book.updated_at
+
+    def ready(self, symbol):
+        book = self.books.get(symbol.upper())
+        return book is not None and book.synced and super().ready(symbol)
+
+    def _resync(self, symbol):
+        with self._lock:
+            if symbol in self._pending:
+                return
+            self._pending.add(symbol)
+        threading.Thread(target=self._load_snapshot, args=(symbol,), daemon=True).start()
+
+    def _load_snapshot(self, symbol):
+        try:
+            snapshot = self.fetch_snapshot(symbol)
+        except Exception:
+            self.snapshot_errors += 1
+            time.sleep(self.reconnect_delay)
+            snapshot = None
+        finally:
+            with self._lock:
+                self._pending.discard(symbol)
+        if snapshot is None or not self.books[symbol].apply_snapshot(snapshot):
+            self._resync(symbol)
+
+    def _on_open(self, ws):
+        # Events missed while disconnected cannot be recovered; every book starts again from a snapshot,
+        # requested once its first event has been buffered
+        for book in self.books.values():
+            book.reset()
+        super()._on_open(ws)
+
+    def _on_message(self, ws, message):
+        data = json.loads(message)
+        data = data.get('data', data) if isinstance(data, dict) else data
+        events = data if isinstance(data, list) else [data]
+        for event in events:
+            if not isinstance(event, dict) or event.get('e') != 'depthUpdate':
+                continue
+            book = self.books.get(event['s'])
+            if book is None:
+                continue
+            self.messages += 1
+            if not book.on_event(event):
+                # The event that broke the sequence is the first one buffered for the new snapshot
+                book.on_event(event)
+            if not book.synced:
+                self._resync(event['s'])
+
+    def stats(self):
+        stats = super().stats()
+        stats['resyncs'] = sum(book.resyncs for book in self.books.values())
+        stats['snapshot_errors'] = self.snapshot_errors
+        return stats
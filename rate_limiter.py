@@ -0,0 +1,249 @@
+import re
+import time
+import asyncio
+import threading
+
+from deadline import current_deadline
+
+ORDER_LANE = 'order'
+POLL_LANE = 'poll'
+
+# Request weights of the endpoints this tool calls, from the exchange's API docs
+ENDPOINT_WEIGHTS = {
+    "/fapi/v1/time": 1,
+    "/fapi/v1/exchangeInfo": 1,
+    "/fapi/v1/ticker/price": 1,
+    "/fapi/v1/premiumIndex": 1,
+    "/fapi/v1/klines": 5,  # limit 500-1000, the page size the backtest downloader uses
+    "/fapi/v1/fundingRate": 1,
+    "/fapi/v1/depth": 20,  # limit 1000, the snapshot the local order book is built from
+    "/fapi/v1/leverage": 1,
+    "/fapi/v1/marginType": 1,
+    "/fapi/v1/positionSide/dual": 30,
+    "/fapi/v1/order": 1,
+    "/fapi/v1/listenKey": 1,
+    "/fapi/v2/account": 5,
+    "/fapi/v2/positionRisk": 5,
+}
+
+ORDER_ENDPOINTS = ("/fapi/v1/order", "/fapi/v1/batchOrders", "/fapi/v1/allOpenOrders")
+
+_INTERVAL_SECONDS = {'S': 1, 'M': 60, 'H': 3600, 'D': 86400}
+_USAGE_HEADER = re.compile(r'x-mbx-(used-weight|order-count)-(\d+)([smhd])$', re.IGNORECASE)
+
+
+def request_cost(method, endpoint):
+    """(weight, order count, lane) of one request"""
+    weight = ENDPOINT_WEIGHTS.get(endpoint, 1)
+    if endpoint in ORDER_ENDPOINTS:
+        # Queries of an order whose response was lost decide what the hedge does next, so they go ahead too
+        return weight, 1 if method == "POST" else 0, ORDER_LANE
+    return weight, 0, POLL_LANE
+
+
+class TokenBucket:
+    """`limit` tokens per `interval` seconds, refilled continuously"""
+
+    def __init__(self, limit, interval):
+        self.limit = limit
+        self.interval = interval
+        self.tokens = float(limit)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.limit, self.tokens + (now - self._updated) * self.limit / self.interval)
+        self._updated = now
+
+    def used(self, now):
+        self._refill(now)
+        return self.limit - self.tokens
+
+    def wait_time(self, amount, ceiling, now):
+        """Seconds until `amount` tokens can be taken without usage going above `ceiling`"""
+        self._refill(now)
+        excess = (self.limit - self.tokens) + amount - ceiling
+        return 0.0 if excess <= 0 else excess * self.interval / self.limit
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def sync(self, used, now):
+        # The exchange counts in fixed windows; trust whichever side has seen more usage
+        self._refill(now)
+        self.tokens = min(self.tokens, self.limit - used)
+
+
+class RequestScheduler:
+    """Client-side view of the exchange's rate limits, shared by every client of the process.
+
+    Request weight is counted per IP, order counts per account. Every request
+    takes its cost from the matching token buckets before it is sent, and the
+    buckets are corrected from the `X-MBX-USED-WEIGHT-*` / `X-MBX-ORDER-COUNT-*`
+    headers of each response. Order requests may use the whole budget; status
+    polls stop at `poll_headroom` of it and always yield to waiting orders.
+    With a MetricsRegistry as `metrics`, waits and throttles are counted
+    there and the budgets in use exported as gauges.
+    """
+
+    def __init__(self, request_weight_1m=2400, orders_10s=300, orders_1m=1200, poll_headroom=0.8, metrics=None):
+        self.poll_headroom = poll_headroom
+        self.metrics = metrics
+        self.weight = {60: TokenBucket(request_weight_1m, 60)}
+        self.order_limits = {10: orders_10s, 60: orders_1m}
+        self.orders = {}
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+        self._blocked_until = 0.0
+        self._orders_waiting = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        if metrics is not None:
+            metrics.add_gauges(self.gauges)
+
+    def _order_buckets(self, key):
+        if key not in self.orders:
+            self.orders[key] = {interval: TokenBucket(limit, interval) for interval, limit in self.order_limits.items()}
+        return self.orders[key]
+
+    def _wait_time(self, key, weight, orders, lane, now):
+        wait = self._blocked_until - now
+        if lane == POLL_LANE and self._orders_waiting:
+            wait = max(wait, 0.05)
+        share = 1.0 if lane == ORDER_LANE else self.poll_headroom
+        for bucket in self.weight.values():
+            wait = max(wait, bucket.wait_time(weight, bucket.limit * share, now))
+        if orders:
+            for bucket in self._order_buckets(key).values():
+                wait = max(wait, bucket.wait_time(orders, bucket.limit, now))
+        return wait
+
+    def _take(self, key, weight, orders):
+        for bucket in self.weight.values():
+            bucket.take(weight)
+        if orders:
+            for bucket in self._order_buckets(key).values():
+                bucket.take(orders)
+
+    def acquire(self, key, weight=1, orders=0, lane=POLL_LANE):
+        """Block until the request fits in the budget, then take its cost.
+
+        Under a deadline, DeadlineExceeded is raised instead of waiting past it.
+        """
+        start = time.monotonic()
+        current = current_deadline()
+        with self._changed:
+            waited = False
+            if lane == ORDER_LANE:
+                self._orders_waiting += 1
+            try:
+                while True:
+                    wait = self._wait_time(key, weight, orders, lane, time.monotonic())
+                    if wait <= 0:
+                        self._take(key, weight, orders)
+                        break
+                    if current is not None and wait >= current.remaining():
+                        raise current.exceeded()
+                    waited = True
+                    self._changed.wait(wait)
+            finally:
+                if lane == ORDER_LANE:
+                    self._orders_waiting -= 1
+                    self._changed.notify_all()
+            if waited:
+                self.waits += 1
+                self.wait_seconds += time.monotonic() - start
+        if waited and self.metrics is not None:
+            self.metrics.increment('rate_limit_waits_total', lane=lane)
+
+    async def acquire_async(self, key, weight=1, orders=0, lane=POLL_LANE):
+        start = time.monotonic()
+        current = current_deadline()
+        waited = False
+        with self._lock:
+            if lane == ORDER_LANE:
+                self._orders_waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    wait = self._wait_time(key, weight, orders, lane, time.monotonic())
+                    if wait <= 0:
+                        self._take(key, weight, orders)
+                        break
+                if current is not None and wait >= current.remaining():
+                    raise current.exceeded()
+                waited = True
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                if lane == ORDER_LANE:
+                    self._orders_waiting -= 1
+                if waited:
+                    self.waits += 1
+                    self.wait_seconds += time.monotonic() - start
+        if waited and self.metrics is not None:
+            self.metrics.increment('rate_limit_waits_total', lane=lane)
+
+    def record_response(self, key, status_code, headers):
+        """Correct the buckets from the usage headers; back off on 429 / 418"""
+        now = time.monotonic()
+        with self._changed:
+            for name, value in headers.items():
+                match = _USAGE_HEADER.match(name)
+                if match is None:
+                    continue
+                interval = int(match.group(2)) * _INTERVAL_SECONDS[match.group(3).upper()]
+                buckets = self.weight if match.group(1).lower() == 'used-weight' else self._order_buckets(key)
+                if interval in buckets:
+                    buckets[interval].sync(int(value), now)
+            if status_code in (418, 429):
+                self.throttled += 1
+                retry_after = float(headers.get('Retry-After') or 1)
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._changed.notify_all()
+        if status_code in (418, 429) and self.metrics is not None:
+            self.metrics.increment('rate_limit_throttled_total', status=status_code)
+
+    def usage(self):
+        """Highest fraction of any weight budget in use"""
+        now = time.monotonic()
+        with self._lock:
+            return max(bucket.used(now) / bucket.limit for bucket in self.weight.values())
+
+    def poll_interval(self, base):
+        """Stretch a polling interval as weight usage nears the poll headroom: x1 below half, up to x4 at the limit"""
+        usage = self.usage()
+        if usage <= 0.5:
+            return base
+        return base * (1 + 3 * min(1.0, (usage - 0.5) / max(self.poll_headroom - 0.5, 0.01)))
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            weight = self.weight[60]
+            orders_10s = max((buckets[10].used(now) for buckets in self.orders.values()), default=0)
+            return {
+                'weight_used': round(weight.used(now)),
+                'weight_limit': weight.limit,
+                'orders_10s': round(orders_10s),
+                'orders_10s_limit': self.order_limits[10],
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'throttled': self.throttled
+            }
+
+    def gauges(self):
+        """The weight and order budgets in use, as MetricsRegistry gauges; orders of the busiest account"""
+        now = time.monotonic()
+        gauges = []
+        with self._lock:
+            for interval, bucket in self.weight.items():
+                labels = {'interval': f"{interval}s"}
+                gauges.append(('rate_limit_weight_used', round(bucket.used(now)), labels))
+                gauges.append(('rate_limit_weight_limit', bucket.limit, labels))
+            for interval, limit in self.order_limits.items():
+                labels = {'interval': f"{interval}s"}
+                used = max((buckets[interval].used(now) for buckets in self.orders.values()), default=0)
+                gauges.append(('rate_limit_orders_used', round(used), labels))
+                gauges.append(('rate_limit_orders_limit', limit, labels))
+        return gauges
@@ -0,0 +1,290 @@
+import os
+import time
+import signal
+import threading
+import multiprocessing
+
+from bootstrap import bootstrap, wait_ready
+from checkpoint import PERSISTED_STATS, Checkpoint
+from flatten import flatten_all, flatten_targets
+from hedge_engine import HedgeEngine, HedgeJob, create_clients, load_accounts, load_jobs
+from market_data import MarkPriceFeed
+from metrics import MetricsExporter
+from order_book import DepthFeed
+from trade_journal import TradeJournal
+
+
+# Per-worker figures in shared memory, in this order; each worker writes only its own row
+STAT_FIELDS = ('trade_count', 'total_volume', 'total_volume_usdt', 'realized_pnl', 'cycles_completed',
+               'errors', 'reconciled', 'heartbeat')
+# Summed over the lives of a worker, so a restart does not lose what it had done
+_CUMULATIVE = ('trade_count', 'total_volume', 'total_volume_usdt', 'realized_pnl', 'cycles_completed',
+               'errors', 'reconciled')
+
+
+def shard_jobs(specs, workers):
+    """Split job specs into at most `workers` shards of about equal size.
+
+    Jobs that share an account stay in one shard, so an account's order
+    budget and one-way position are only ever handled by one process.
+    """
+    parent = {}
+
+    def find(account):
+        parent.setdefault(account, account)
+        while parent[account] != account:
+            parent[account] = parent[parent[account]]
+            account = parent[account]
+        return account
+
+    for spec in specs:
+        parent[find(spec['account1'])] = find(spec['account2'])
+    groups = {}
+    for spec in specs:
+        groups.setdefault(find(spec['account1']), []).append(spec)
+
+    shards = [[] for _ in range(max(1, min(workers, len(groups))))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(shards, key=len).extend(group)
+    return shards
+
+
+def worker_config(config, specs, index, workers):
+    """The part of `config` one worker needs: its jobs and accounts, a share of the IP weight budget and its own files"""
+    accounts = load_accounts(config)
+    names = set(spec['account1'] for spec in specs) | set(spec['account2'] for spec in specs)
+    network = dict(config.get('network', {}))
+    rate_limits = dict(network.get('rate_limits', {}))
+    # Request weight is counted per IP, so the workers split it; order counts are per account
+    rate_limits['request_weight_1m'] = rate_limits.get('request_weight_1m', 2400) // workers
+    network['rate_limits'] = rate_limits
+    shard = dict(config, accounts={name: accounts[name] for name in names}, jobs=specs, network=network)
+    for legacy in ('account1', 'account2', 'trading'):
+        shard.pop(legacy, None)
+    for section in ('journal', 'checkpoint'):
+        if config.get(section, {}).get('path'):
+            shard[section] = dict(config[section], path=f"{config[section]['path']}.{index}")
+    metrics = dict(config.get('metrics', {}))
+    if metrics.get('file'):
+        root, ext = os.path.splitext(metrics['file'])
+        metrics['file'] = f"{root}.{index}{ext}"
+    metrics['port'] = None  # One port cannot be shared; each worker writes its own file
+    shard['metrics'] = metrics
+    return shard
+
+
+def _publish(stats, index, values):
+    base = index * len(STAT_FIELDS)
+    for offset, field in enumerate(STAT_FIELDS):
+        stats[base + offset] = values[field]
+
+
+def _job_totals(jobs, errors, reconciled):
+    values = {field: sum(job.stats[field] for job in jobs) for field in
+              ('trade_count', 'total_volume', 'total_volume_usdt', 'realized_pnl', 'cycles_completed')}
+    values.update(errors=errors[0], reconciled=reconciled, heartbeat=time.time())
+    return values
+
+
+def run_worker(index, config, api_class, stats, stop, interval=1.0):
+    """Body of one worker process: its own clients and HedgeEngine for the jobs in `config`.
+
+    Positions the jobs' accounts already hold are reconciled first; after a
+    crash those are the legs the previous process left open. With a
+    checkpoint, legs it records as held are taken over, anything else is
+    closed. On exit every position is closed, unless `checkpoint.keep_positions`
+    is set and the worker was stopped through `stop`: then held legs stay
+    open for the next start to take over. Stats are
+    written to the worker's row of `stats` every `interval` seconds, which
+    doubles as its heartbeat, until `stop.value` is set.
+    """
+    # The supervisor stops its workers through `stop`, not through the terminal's Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    clients = create_clients(config, api_class)
+    journal_config = config.get('journal', {})
+    journal = None
+    if journal_config.get('path'):
+        journal = TradeJournal(journal_config['path'], fee_rate=journal_config.get('fee_rate', 0.0))
+    checkpoint_config = config.get('checkpoint', {})
+    checkpoint = None
+    if checkpoint_config.get('path'):
+        checkpoint = Checkpoint(checkpoint_config['path'], fsync=checkpoint_config.get('fsync', False))
+        checkpoint.load()
+    jobs = [HedgeJob(spec, clients[spec['account1']], clients[spec['account2']], journal=journal,
+                     checkpoint=checkpoint)
+            for spec in load_jobs(config)]
+    metrics_exporter = None
+    if config.get('metrics', {}).get('file'):
+        metrics_exporter = MetricsExporter(jobs[0].account1.metrics, path=config['metrics']['file'],
+                                           interval=config['metrics'].get('interval', 5))
+        metrics_exporter.start()
+    feeds = []
+    stream_config = config.get('streams', {})
+    symbols = sorted(set(job.symbol for job in jobs))
+    if stream_config.get('market_data', False):
+        feeds.append(('market_data', MarkPriceFeed(symbols, ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                                                   max_age=stream_config.get('max_age', 3))))
+    if stream_config.get('depth', False):
+        feeds.append(('order_book', DepthFeed(symbols, fetch_snapshot=next(iter(clients.values())).get_depth,
+                                              ws_url=stream_config.get('ws_url', "wss://fstream.asterdex.com"),
+                                              max_age=stream_config.get('max_age', 3))))
+    for attribute, feed in feeds:
+        feed.start()
+        for api in clients.values():
+            setattr(api, attribute, feed)
+    errors = [0]
+
+    def on_error(job, e):
+        errors[0] += 1
+
+    engine = None
+    reconciled = 0
+    stopped = False
+    try:
+        bootstrap_config = config.get('bootstrap', {})
+        bootstrap(jobs, max_workers=bootstrap_config.get('workers', 8))
+        next(iter(clients.values())).clock.start()
+        _publish(stats, index, _job_totals(jobs, errors, reconciled))
+        # Start-up can be slow behind the rate limiter; a heartbeat per job keeps the worker from being taken for hung
+        for job in jobs:
+            reconciled += job.resume(checkpoint.get('jobs', job.name) if checkpoint is not None else None)
+            _publish(stats, index, _job_totals(jobs, errors, reconciled))
+        wait_ready([feed for _, feed in feeds], symbols, bootstrap_config.get('ready_timeout', 5))
+        engine = HedgeEngine(jobs, on_error=on_error)
+        engine.start()
+        while not stop.value:
+            time.sleep(interval)
+            _publish(stats, index, _job_totals(jobs, errors, reconciled))
+        stopped = True
+    finally:
+        if engine is not None:
+            engine.stop()
+        for job in jobs:
+            job.executor.shutdown()
+        # Every leg not kept for a warm restart, on all accounts at once; a worker that failed keeps nothing
+        keep = stopped and checkpoint is not None and checkpoint_config.get('keep_positions', False)
+        flatten_all(flatten_targets([job for job in jobs if not keep or job.held is None]), journal=journal)
+        for api in clients.values():
+            api.close()
+        for _, feed in feeds:
+            feed.stop()
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        if journal is not None:
+            journal.close()
+    _publish(stats, index, _job_totals(jobs, errors, reconciled))
+
+
+class Supervisor:
+    """Runs the hedge jobs of one config in several worker processes.
+
+    Jobs are sharded with shard_jobs and each shard runs in its own process
+    (run_worker), so JSON decoding, signing and the trading loops of one
+    shard do not compete with another's for the GIL. Workers report through
+    one shared array of doubles, a row each, which the supervisor reads
+    without any messages passing. A worker that exits, or whose heartbeat is
+    older than `heartbeat_timeout` seconds, is restarted after a back-off
+    starting at `restart_delay`; the new process closes what the old one left
+    open before trading. Its figures are carried into the new process's
+    row, except those a checkpoint already restores in the new process.
+    """
+
+    def __init__(self, config, api_class, workers=None, interval=1.0, heartbeat_timeout=30, restart_delay=1,
+                 max_restart_delay=60):
+        self.config = config
+        self.api_class = api_class
+        self.interval = interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shards = shard_jobs(load_jobs(config), workers or os.cpu_count() or 1)
+        self._context = multiprocessing.get_context('spawn')
+        self._stats = self._context.Array('d', len(self.shards) * len(STAT_FIELDS), lock=False)
+        # A plain shared flag rather than a multiprocessing Event: a worker killed while waiting on an
+        # Event leaves it unable to be set
+        self._stop_flag = self._context.RawValue('b', 0)
+        self._stop = threading.Event()
+        self._processes = [None] * len(self.shards)
+        self._started_at = [0.0] * len(self.shards)
+        self._carried = [dict.fromkeys(_CUMULATIVE, 0.0) for _ in self.shards]
+        # A checkpointed worker restores its jobs' stats on restart, so carrying those over would count them twice
+        self._carry = (tuple(field for field in _CUMULATIVE if field not in PERSISTED_STATS)
+                       if config.get('checkpoint', {}).get('path') else _CUMULATIVE)
+        self._failures = [0] * len(self.shards)
+        self.restarts = [0] * len(self.shards)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _spawn(self, index):
+        config = worker_config(self.config, self.shards[index], index, len(self.shards))
+        process = self._context.Process(target=run_worker, name=f"hedge-worker-{index}", daemon=True,
+                                        args=(index, config, self.api_class, self._stats, self._stop_flag, self.interval))
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.time()
+
+    def _row(self, index):
+        base = index * len(STAT_FIELDS)
+        return dict(zip(STAT_FIELDS, self._stats[base:base + len(STAT_FIELDS)]))
+
+    def _restart(self, index):
+        process = self._processes[index]
+        if process.is_alive():
+            process.kill()
+        process.join()
+        with self._lock:
+            row = self._row(index)
+            for field in self._carry:
+                self._carried[index][field] += row[field]
+            _publish(self._stats, index, dict.fromkeys(STAT_FIELDS, 0.0))
+        # A worker that dies straight away again waits longer each time
+        lived = time.time() - self._started_at[index]
+        self._failures[index] = 0 if lived > self.heartbeat_timeout else self._failures[index] + 1
+        self.restarts[index] += 1
+        if self._stop.wait(min(self.restart_delay * 2 ** self._failures[index], self.max_restart_delay)):
+            return
+        self._spawn(index)
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval):
+            for index, process in enumerate(self._processes):
+                heartbeat = self._row(index)['heartbeat'] or self._started_at[index]
+                if process.exitcode is not None or time.time() - heartbeat > self.heartbeat_timeout:
+                    self._restart(index)
+
+    def start(self):
+        for index in range(len(self.shards)):
+            self._spawn(index)
+        self._thread = threading.Thread(target=self._monitor, name="hedge-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        """Ask every worker to flatten and exit; those still running after `timeout` seconds are killed"""
+        self._stop_flag.value = 1
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            if process is not None:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+
+    def stats(self):
+        """Per-worker rows (summed over restarts) and their totals"""
+        workers = []
+        for index, process in enumerate(self._processes):
+            with self._lock:
+                row = self._row(index)
+                for field in _CUMULATIVE:
+                    row[field] += self._carried[index][field]
+            row.update(jobs=len(self.shards[index]), restarts=self.restarts[index],
+                       alive=process is not None and process.is_alive(),
+                       pid=process.pid if process is not None else None)
+            workers.append(row)
+        total = {field: sum(row[field] for row in workers) for field in _CUMULATIVE}
+        total.update(jobs=sum(row['jobs'] for row in workers), restarts=sum(self.restarts),
+                     alive=sum(row['alive'] for row in workers))
+        return {'workers': workers, 'total': total}
@@ -0,0 +1,134 @@
+import time
+import threading
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+
+
+class SymbolFilters:
+    """LOT_SIZE / MARKET_LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL of one symbol as Decimals"""
+
+    def __init__(self, info):
+        self.symbol = info['symbol']
+        filters = {f['filterType']: f for f in info.get('filters', [])}
+        lot = filters.get('LOT_SIZE', {})
+        market_lot = filters.get('MARKET_LOT_SIZE', lot)
+        price = filters.get('PRICE_FILTER', {})
+        notional = filters.get('MIN_NOTIONAL', {})
+        self.step_size = Decimal(lot.get('stepSize', '0.001'))
+        self.min_qty = Decimal(lot.get('minQty', '0'))
+        self.max_qty = Decimal(lot.get('maxQty', '0'))
+        self.market_step_size = Decimal(market_lot.get('stepSize', lot.get('stepSize', '0.001')))
+        self.market_min_qty = Decimal(market_lot.get('minQty', lot.get('minQty', '0')))
+        self.market_max_qty = Decimal(market_lot.get('maxQty', lot.get('maxQty', '0')))
+        self.tick_size = Decimal(price.get('tickSize', '0'))
+        self.min_price = Decimal(price.get('minPrice', '0'))
+        self.max_price = Decimal(price.get('maxPrice', '0'))
+        # Futures exchangeInfo calls it `notional`, spot calls it `minNotional`
+        self.min_notional = Decimal(notional.get('notional', notional.get('minNotional', '0')))
+
+    def _lot(self, order_type):
+        if order_type == "MARKET":
+            return self.market_step_size, self.market_min_qty, self.market_max_qty
+        return self.step_size, self.min_qty, self.max_qty
+
+    @staticmethod
+    def _to_step(value, step, rounding):
+        if not step:
+            return value
+        return (value / step).to_integral_value(rounding=rounding) * step
+
+    def quantize_quantity(self, quantity, order_type="MARKET"):
+        """Round a quantity down to the symbol's step size"""
+        step, _, _ = self._lot(order_type)
+        return self._to_step(Decimal(str(quantity)), step, ROUND_DOWN).quantize(step) if step else Decimal(str(quantity))
+
+    def format_quantity(self, quantity, order_type="MARKET"):
+        """`quantity` as an order carries it: plain digits to the step size's precision, never a float's repr"""
+        step, _, _ = self._lot(order_type)
+        quantity = Decimal(str(quantity))
+        return format(quantity.quantize(step) if step else quantity, 'f')
+
+    def quantize_price(self, price):
+        """Round a price to the nearest valid tick"""
+        price = Decimal(str(price))
+        if not self.tick_size:
+            return price
+        return (price / self.tick_size).quantize(Decimal(1)) * self.tick_size
+
+    def quantity_for_notional(self, usdt_amount, price, order_type="MARKET"):
+        """Largest valid quantity worth at most `usdt_amount`, raised to the smallest valid order if below it"""
+        step, min_qty, _ = self._lot(order_type)
+        price = Decimal(str(price))
+        quantity = self._to_step(Decimal(str(usdt_amount)) / price, step, ROUND_DOWN)
+        quantity = max(quantity, min_qty, self._to_step(self.min_notional / price, step, ROUND_UP))
+        return quantity.quantize(step) if step else quantity
+
+    def check(self, quantity, order_type="MARKET", price=None):
+        """Reason the exchange would reject this order, or None if it passes every filter"""
+        step, min_qty, max_qty = self._lot(order_type)
+        quantity = Decimal(str(quantity))
+        if quantity <= 0:
+            return f"Invalid order quantity: {quantity}"
+        if step and quantity % step != 0:
+            return f"{self.symbol} quantity {quantity} is not a multiple of step size {step.normalize()}"
+        if quantity < min_qty:
+            return f"{self.symbol} quantity {quantity} is below the minimum {min_qty.normalize()}"
+        if max_qty and quantity > max_qty:
+            return f"{self.symbol} quantity {quantity} is above the maximum {max_qty.normalize()}"
+        if price is not None:
+            price = Decimal(str(price))
+            if order_type != "MARKET" and self.tick_size and price % self.tick_size != 0:
+                return f"{self.symbol} price {price} is not a multiple of tick size {self.tick_size.normalize()}"
+            if self.min_notional and quantity * price < self.min_notional:
+                return f"{self.symbol} order notional {quantity * price:.4f} is below the minimum {self.min_notional.normalize()}"
+        return None
+
+
+class SymbolFilterCache:
+    """Symbol filters from /fapi/v1/exchangeInfo, loaded once and refreshed every `ttl` seconds.
+
+    Sizing and validation then run entirely in memory. `fetch_exchange_info`
+    may be None when the owner loads the cache itself (the asyncio client does).
+    """
+
+    def __init__(self, fetch_exchange_info=None, ttl=3600):
+        self.fetch_exchange_info = fetch_exchange_info
+        self.ttl = ttl
+        self.loads = 0
+        self.rejected = 0
+        self._symbols = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def load(self, exchange_info):
+        symbols = {info['symbol']: SymbolFilters(info) for info in exchange_info.get('symbols', [])}
+        with self._lock:
+            self._symbols = symbols
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+
+    def refresh(self):
+        self.load(self.fetch_exchange_info())
+
+    def get(self, symbol):
+        if self.stale and self.fetch_exchange_info is not None:
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the previous filters, refresh is retried on the next call
+                if self._loaded_at is None:
+                    raise
+        filters = self._symbols.get(symbol)
+        if filters is None:
+            raise ValueError(f"Unknown symbol {symbol}")
+        return filters
+
+    def validate(self, symbol, quantity, order_type="MARKET", price=None):
+        """Raise ValueError instead of sending an order the exchange would reject"""
+        reason = self.get(symbol).check(quantity, order_type, price)
+        if reason is not None:
+            self.rejected += 1
+            raise ValueError(reason)
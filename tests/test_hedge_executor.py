@@ -0,0 +1,133 @@
+import pytest
+
+from hedge_executor import HedgeExecutor, HedgeLegError, leg_outcome, query_outcome
+
+
+def order(status="FILLED", executed="0.05", price="2000", order_id=1):
+    return {'orderId': order_id, 'status': status, 'executedQty': executed, 'avgPrice': price}
+
+
+class ScriptedClient:
+    """Stands in for AsterDexAPI: answers each order and order query from a script, raising exceptions in it"""
+
+    class Clock:
+        def force_resync(self):
+            pass
+
+    def __init__(self, responses, answers=()):
+        self.responses = list(responses)
+        self.answers = list(answers)
+        self.sent = []
+        self.queried = []
+        self.clock = self.Clock()
+
+    @staticmethod
+    def _next(script):
+        result = script.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def prepare_order(self, client_order_id=None, **order):
+        return dict(order, client_order_id=client_order_id)
+
+    def send_prepared(self, prepared):
+        self.sent.append(prepared)
+        return self._next(self.responses)
+
+    def query_order(self, symbol, client_order_id):
+        self.queried.append(client_order_id)
+        return self._next(self.answers)
+
+
+def legs(long_client, short_client, quantity=0.05):
+    return [
+        (long_client, dict(symbol="ETHUSDT", side="BUY", order_type="MARKET", quantity=quantity)),
+        (short_client, dict(symbol="ETHUSDT", side="SELL", order_type="MARKET", quantity=quantity)),
+    ]
+
+
+@pytest.fixture
+def executor():
+    executor = HedgeExecutor()
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("response, outcome", [
+    (order(), 'filled'),
+    # A market order the book could not fill in full expires with the rest unfilled
+    (order(status="EXPIRED", executed="0.02"), 'partial'),
+    (order(status="EXPIRED", executed="0", price="0"), 'rejected'),
+    # An ACK-style response does not say what the order did
+    (order(status="NEW", executed="0", price="0"), 'unknown'),
+    ({'code': -2019, 'msg': "Margin is insufficient."}, 'rejected'),
+    ({'code': -1001, 'msg': "Internal error"}, 'unknown'),
+    ({'code': -1007, 'msg': "Timeout waiting for response from backend server"}, 'unknown'),
+    (TimeoutError("read timed out"), 'unknown'),
+    (None, 'unknown'),
+])
+def test_leg_outcome(response, outcome):
+    assert leg_outcome(response, 0.05) == outcome
+
+
+def test_query_outcome():
+    not_found = {'code': -2013, 'msg': "Order does not exist."}
+    assert query_outcome(not_found, 0.05) == ('rejected', not_found)
+    assert query_outcome(order(), 0.05) == ('filled', order())
+    assert query_outcome(order(status="EXPIRED", executed="0.01"), 0.05)[0] == 'partial'
+    assert query_outcome({'code': -1001, 'msg': "Internal error"}, 0.05) == ('unknown', None)
+    assert query_outcome(TimeoutError(), 0.05) == ('unknown', None)
+
+
+def test_timeout_then_order_not_found_is_sent_again(executor):
+    long_client = ScriptedClient([TimeoutError("read timed out"), order(order_id=3)], [{'code': -2013}])
+    short_client = ScriptedClient([order(order_id=2)])
+
+    responses = executor.execute(legs(long_client, short_client))
+
+    assert [response['orderId'] for response in responses] == [3, 2]
+    # Looked up by the client order id it was sent with, then sent again under a new one
+    assert long_client.queried == [long_client.sent[0]['client_order_id']]
+    assert len(long_client.sent) == 2
+    assert long_client.sent[1]['client_order_id'] != long_client.sent[0]['client_order_id']
+    assert executor.leg_failures == 1
+
+
+def test_lost_response_of_a_filled_order_is_not_sent_again(executor):
+    long_client = ScriptedClient([TimeoutError("read timed out")], [order(order_id=7)])
+    short_client = ScriptedClient([order(order_id=2)])
+
+    responses = executor.execute(legs(long_client, short_client))
+
+    assert responses[0]['orderId'] == 7
+    assert len(long_client.sent) == 1
+    assert executor.leg_failures == 0
+
+
+def test_unknown_outcome_is_left_for_the_caller(executor):
+    long_client = ScriptedClient([TimeoutError("read timed out")], [TimeoutError("read timed out")])
+    short_client = ScriptedClient([order(order_id=2), order(order_id=4)])
+
+    with pytest.raises(HedgeLegError) as raised:
+        executor.execute(legs(long_client, short_client), unwind=False)
+
+    assert [result['outcome'] for result in raised.value.results] == ['unknown', 'filled']
+    assert raised.value.responses[1]['orderId'] == 2
+    # Neither resent nor unwound: the order may still be on the book
+    assert len(long_client.sent) == 1
+    assert len(short_client.sent) == 1
+
+
+def test_partial_leg_unwinds_the_filled_one(executor):
+    long_client = ScriptedClient([order(order_id=1), order(order_id=5)])
+    short_client = ScriptedClient([order(status="EXPIRED", executed="0.02", order_id=2)])
+
+    with pytest.raises(HedgeLegError) as raised:
+        executor.execute(legs(long_client, short_client))
+
+    assert [result['outcome'] for result in raised.value.results] == ['filled', 'partial']
+    # The filled long leg is reversed, reduce-only; the partial leg is left for the flatten
+    assert [(sent['side'], sent['reduce_only']) for sent in long_client.sent[1:]] == [("SELL", True)]
+    assert len(short_client.sent) == 1
+    assert executor.unwinds == 1
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from benchmarks.mock_exchange import MockExchange
+from hedge_engine import HedgeJob, create_clients, load_jobs
+from order_book import LocalOrderBook
+from hedge_trading_EN import AsterDexAPI
+
+
+@pytest.fixture
+def exchange():
+    exchange = MockExchange(tls=False)
+    exchange.url = exchange.start()
+    yield exchange
+    exchange.stop()
+
+
+@pytest.fixture
+def job(exchange):
+    config = {'accounts': {name: {'api_key': name, 'api_secret': "s"} for name in ("a", "b")},
+              'jobs': [{'symbol': "ETHUSDT", 'account1': "a", 'account2': "b", 'usdt_amount': 100, 'leverage': 10,
+                        'wait_seconds': 0}],
+              'network': {'base_url': exchange.url, 'timeout': 0.5}}
+    clients = create_clients(config, AsterDexAPI)
+    job = HedgeJob(load_jobs(config)[0], clients['a'], clients['b'])
+    yield job
+    job.executor.shutdown()
+    for api in clients.values():
+        api.close()
+
+
+def positions(exchange):
+    return {name: exchange.accounts[name]['positions'].get("ETHUSDT", (0.0, 0.0))[0] for name in ("a", "b")}
+
+
+def intercept_first_order(exchange, answer):
+    """Have `answer(respond)` produce the response to account a's first order, respond() letting it through.
+
+    Returns the (method, account) of every order request made from then on.
+    """
+    handle = exchange.handle
+    calls = []
+
+    def intercepted(method, path, params, headers, total_params=''):
+        respond = lambda: handle(method, path, params, headers, total_params)
+        if path != "/fapi/v1/order":
+            return respond()
+        calls.append((method, headers.get('X-MBX-APIKEY')))
+        if calls.count(("POST", "a")) == 1 and calls[-1] == ("POST", "a"):
+            return answer(respond)
+        return respond()
+    exchange.handle = intercepted
+    return calls
+
+
+def test_order_lost_before_the_exchange_is_sent_again(exchange, job):
+    # The order never reaches the book, and its response says nothing either way
+    calls = intercept_first_order(exchange, lambda respond: (503, {'code': -1001, 'msg': "Internal error"}))
+
+    quantity = job.open_cycle()
+
+    # Looked up by client order id (-2013), then sent again
+    assert sorted(calls) == [("GET", "a"), ("POST", "a"), ("POST", "a"), ("POST", "b")]
+    assert positions(exchange) == {'a': quantity, 'b': -quantity}
+
+
+def test_order_whose_response_times_out_is_not_sent_twice(exchange, job):
+    def late(respond):
+        response = respond()
+        time.sleep(1.0)  # Past the client's 0.5 s timeout, after the order filled
+        return response
+    calls = intercept_first_order(exchange, late)
+
+    quantity = job.open_cycle()
+
+    # The query finds it filled
+    assert sorted(calls) == [("GET", "a"), ("POST", "a"), ("POST", "b")]
+    assert positions(exchange) == {'a': quantity, 'b': -quantity}
+
+
+def test_depth_stream_keeps_a_local_book_in_step(exchange):
+    book = LocalOrderBook("ETHUSDT")
+    # As DepthFeed does: the snapshot is requested once the first event is buffered
+    book.on_event(exchange.depth_event("ETHUSDT", 0))
+    assert book.apply_snapshot(exchange.depth_snapshot("ETHUSDT"))
+    for price in (2000.5, 1999.0, 2003.25):
+        exchange.price = price
+        assert book.on_event(exchange.depth_event("ETHUSDT", 0))
+        assert book.asks.levels() == exchange.book("ETHUSDT", "BUY")
+        assert book.bids.levels() == exchange.book("ETHUSDT", "SELL")
+
+    # A message lost on the way breaks the sequence
+    exchange.price = 2001.0
+    exchange.depth_event("ETHUSDT", 0)
+    exchange.price = 2002.0
+    assert not book.on_event(exchange.depth_event("ETHUSDT", 0))
+    assert not book.synced
@@ -0,0 +1,182 @@
+import json
+import random
+import threading
+
+import pytest
+
+import order_book
+from order_book import BookSide, DepthFeed, LocalOrderBook
+
+
+def depth_event(first, last, previous, bids=(), asks=(), symbol="ETHUSDT"):
+    return {'e': "depthUpdate", 's': symbol, 'U': first, 'u': last, 'pu': previous,
+            'b': [[str(price), str(quantity)] for price, quantity in bids],
+            'a': [[str(price), str(quantity)] for price, quantity in asks]}
+
+
+def snapshot(last_update_id, bids=((1999.9, 1.0),), asks=((2000.1, 1.0),)):
+    return {'lastUpdateId': last_update_id,
+            'bids': [[str(price), str(quantity)] for price, quantity in bids],
+            'asks': [[str(price), str(quantity)] for price, quantity in asks]}
+
+
+def test_events_buffered_until_the_snapshot_are_replayed_from_it():
+    book = LocalOrderBook("ETHUSDT")
+    assert book.on_event(depth_event(1, 4, 0, bids=[(1999.8, 5.0)]))
+    assert book.on_event(depth_event(5, 7, 4, asks=[(2000.2, 3.0)]))
+    assert not book.synced
+
+    # The first event ends before the snapshot and is dropped; the second straddles it
+    assert book.apply_snapshot(snapshot(6))
+
+    assert book.synced and book.last_update_id == 7
+    assert book.bids.levels() == [(1999.9, 1.0)]
+    assert book.asks.levels() == [(2000.1, 1.0), (2000.2, 3.0)]
+
+
+def test_snapshot_newer_than_every_buffered_event_is_out_of_sequence():
+    book = LocalOrderBook("ETHUSDT")
+    book.on_event(depth_event(5, 7, 4))
+
+    # Update 8 is missing between the snapshot and the next event
+    assert book.on_event(depth_event(9, 9, 8)) and not book.apply_snapshot(snapshot(7))
+    assert not book.synced and book.resyncs == 1
+
+
+def test_gap_in_update_ids_forces_a_resync():
+    book = LocalOrderBook("ETHUSDT")
+    book.apply_snapshot(snapshot(10))
+    assert book.on_event(depth_event(9, 12, 8, asks=[(2000.2, 2.0)]))
+    assert book.on_event(depth_event(13, 15, 12, asks=[(2000.3, 2.0)]))
+
+    # pu 16 is not the previous event's u 15: an event was lost
+    assert not book.on_event(depth_event(17, 18, 16, asks=[(2000.4, 2.0)]))
+
+    assert not book.synced and book.resyncs == 1
+    assert 2000.4 not in [price for price, _ in book.asks.levels()]
+    # Until the next snapshot, events are buffered again rather than applied
+    assert book.on_event(depth_event(19, 20, 18))
+    assert book.last_update_id is None
+
+
+def test_depth_feed_refetches_the_snapshot_after_a_gap():
+    fetched = threading.Event()
+    snapshots = [snapshot(10), snapshot(17, asks=[(2000.1, 4.0)])]
+
+    def fetch_snapshot(symbol):
+        fetched.set()
+        return snapshots.pop(0)
+
+    feed = DepthFeed(["ETHUSDT"], fetch_snapshot=fetch_snapshot)
+    book = feed.books["ETHUSDT"]
+    feed._on_message(None, json.dumps(depth_event(9, 12, 8)))
+    assert fetched.wait(2)
+    fetched.clear()
+    feed._on_message(None, json.dumps(depth_event(13, 15, 12)))
+    assert book.synced
+
+    # The event that breaks the sequence is buffered for the new snapshot, which it straddles
+    feed._on_message(None, json.dumps(depth_event(16, 18, 14, asks=[(2000.5, 1.0)])))
+    assert fetched.wait(2)
+    for _ in range(200):
+        if book.synced:
+            break
+        threading.Event().wait(0.01)
+
+    assert book.synced and book.last_update_id == 18
+    assert book.asks.levels() == [(2000.1, 4.0), (2000.5, 1.0)]
+    assert feed.stats()['resyncs'] == 1
+
+
+class ReferenceSide:
+    """A book side as a sorted list, for checking BookSide"""
+
+    def __init__(self, descending):
+        self.descending = descending
+        self.levels = {}
+
+    def set(self, price, quantity):
+        if quantity > 0:
+            self.levels[price] = quantity
+        else:
+            self.levels.pop(price, None)
+
+    def ordered(self):
+        return sorted(self.levels.items(), reverse=self.descending)
+
+    def best(self):
+        ordered = self.ordered()
+        return ordered[0][0] if ordered else None
+
+    def fill(self, quantity):
+        filled = notional = 0.0
+        for price, level_quantity in self.ordered():
+            take = min(level_quantity, quantity - filled)
+            filled += take
+            notional += take * price
+            if filled >= quantity:
+                break
+        return filled, notional / filled if filled else 0.0
+
+    def quantity_to(self, limit_price):
+        return sum(quantity for price, quantity in self.levels.items()
+                   if (price >= limit_price if self.descending else price <= limit_price))
+
+
+@pytest.fixture
+def small_grid(monkeypatch):
+    # A grid of a few leaves, so levels land on and past its edges all the time
+    monkeypatch.setattr(order_book, 'MAX_LEAVES', 16)
+
+
+def check(side, reference):
+    assert side.best() == reference.best()
+    assert side.levels() == reference.ordered()
+    for quantity in (0.5, 3.0, 40.0, 1000.0):
+        filled, price = side.fill(quantity)
+        expected_filled, expected_price = reference.fill(quantity)
+        assert filled == pytest.approx(expected_filled)
+        assert price == pytest.approx(expected_price)
+    best = reference.best()
+    if best is not None:
+        for ticks in (0, 5, 20, 400):
+            limit = round(best + (-ticks if reference.descending else ticks) * 0.01, 2)
+            assert side.quantity_to(limit) == pytest.approx(reference.quantity_to(limit))
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_levels_added_and_removed_at_the_grid_edge(small_grid, descending):
+    side, reference = BookSide(descending), ReferenceSide(descending)
+    sign = -1 if descending else 1
+
+    def set_level(ticks, quantity):
+        price = round(2000 + sign * ticks * 0.01, 2)
+        side.set(price, quantity)
+        reference.set(price, quantity)
+        check(side, reference)
+
+    for ticks in range(4):
+        set_level(ticks, 1.0 + ticks)
+    # Beyond the grid's far end, then past the touch, then removed again at both ends
+    set_level(500, 7.0)
+    set_level(-3, 2.0)
+    set_level(-3, 0)
+    set_level(0, 0)
+    set_level(500, 0)
+    # Every level on the grid gone: the ones left beyond it become the book
+    set_level(300, 5.0)
+    for ticks in range(1, 4):
+        set_level(ticks, 0)
+    set_level(299, 1.5)
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_random_updates_match_a_sorted_book(small_grid, descending):
+    rng = random.Random(7)
+    side, reference = BookSide(descending), ReferenceSide(descending)
+    for _ in range(400):
+        price = round(2000 + rng.choice((rng.randint(-10, 10), rng.randint(-2000, 2000))) * 0.01, 2)
+        quantity = 0 if rng.random() < 0.3 else round(rng.uniform(0.1, 10), 3)
+        side.set(price, quantity)
+        reference.set(price, quantity)
+        check(side, reference)
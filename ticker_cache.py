@@ -0,0 +1,105 @@
+import time
+import asyncio
+import threading
+
+
+class TickerCache:
+    """Process-wide last price per symbol with single-flight fetching.
+
+    Every caller passes the freshness it needs (`max_age` seconds). A miss
+    fetches through the caller's own function; callers that miss the same
+    symbol while that request is in flight wait for it instead of sending
+    their own.
+    """
+
+    def __init__(self, max_age=0.5):
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._prices = {}
+        self._inflight = {}
+        self._inflight_async = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, symbol, max_age):
+        entry = self._prices.get(symbol)
+        if entry is not None and time.monotonic() - entry[1] <= max_age:
+            self.hits += 1
+            return entry[0]
+        return None
+
+    def put(self, symbol, price):
+        with self._lock:
+            self._prices[symbol] = (price, time.monotonic())
+
+    def get(self, symbol, fetch, max_age=None):
+        """Price of `symbol` no older than `max_age`, calling `fetch()` at most once per miss"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            price = self._cached(symbol, max_age)
+            if price is not None:
+                return price
+            flight = self._inflight.get(symbol)
+            if flight is None:
+                flight = self._inflight[symbol] = {'done': threading.Event(), 'price': None, 'error': None}
+                self.misses += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['price']
+
+        try:
+            flight['price'] = fetch()
+            self.put(symbol, flight['price'])
+            return flight['price']
+        except BaseException as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+            flight['done'].set()
+
+    async def get_async(self, symbol, fetch, max_age=None):
+        """asyncio version of get; `fetch` is a coroutine function"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            price = self._cached(symbol, max_age)
+            if price is not None:
+                return price
+            future = self._inflight_async.get(symbol)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._inflight_async[symbol] = asyncio.get_running_loop().create_future()
+        try:
+            price = await fetch()
+            self.put(symbol, price)
+            future.set_result(price)
+            return price
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        except BaseException:
+            # The leader was cancelled, the waiters get an ordinary error instead
+            future.set_exception(RuntimeError(f"Price fetch for {symbol} was cancelled"))
+            future.exception()
+            raise
+        finally:
+            self._inflight_async.pop(symbol, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
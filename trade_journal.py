@@ -0,0 +1,266 @@
+"""Append-only binary journal of hedge order fills.
+
+Every filled leg becomes one 64-byte record after a 64-byte file header, so
+the file can be memory-mapped and read as an array. Summarize a journal:
+
+    python trade_journal.py trades.journal
+"""
+import os
+import sys
+import mmap
+import time
+import queue
+import struct
+import threading
+from collections import namedtuple
+
+
+MAGIC = b'ASTJRNL1'
+HEADER = struct.Struct('<8sHH52x')
+# timestamp, symbol, leg, side, quantity, price, fee, latency, order id
+RECORD = struct.Struct('<d16sBBdddfq2x')
+
+LEG_OPEN_LONG = 0
+LEG_OPEN_SHORT = 1
+LEG_CLOSE_LONG = 2
+LEG_CLOSE_SHORT = 3
+# Orders outside the cycle: flattening what an account holds, reversing a filled leg of a failed hedge
+LEG_FLATTEN = 4
+LEG_UNWIND = 5
+LEG_NAMES = ('long_order', 'short_order', 'close_long', 'close_short', 'flatten', 'unwind')
+
+SIDE_BUY = 0
+SIDE_SELL = 1
+
+JournalRecord = namedtuple('JournalRecord', 'timestamp symbol leg side quantity price fee latency order_id')
+
+
+def order_fill(response):
+    """(executed quantity, average price) of an order response, None when it does not say.
+
+    Orders are sent with newOrderRespType=RESULT so the response carries the
+    fill; an ACK response reports executedQty "0" and avgPrice "0.00000"
+    however the order fills, so zero here means unknown rather than free.
+    """
+    if not isinstance(response, dict):
+        return None
+    quantity = float(response.get('executedQty') or 0)
+    price = float(response.get('avgPrice') or 0)
+    if not price and quantity:
+        price = float(response.get('cumQuote') or 0) / quantity
+    if quantity <= 0 or price <= 0:
+        return None
+    return quantity, price
+
+
+_numpy = None
+
+
+def _load_numpy():
+    """(numpy, record dtype), imported on first use so the trading process never loads numpy; None without it"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as np
+        except ImportError:
+            _numpy = False
+        else:
+            dtype = np.dtype([
+                ('timestamp', '<f8'), ('symbol', 'S16'), ('leg', 'u1'), ('side', 'u1'), ('quantity', '<f8'),
+                ('price', '<f8'), ('fee', '<f8'), ('latency', '<f4'), ('order_id', '<i8'), ('pad', 'V2')
+            ])
+            assert dtype.itemsize == RECORD.size
+            _numpy = (np, dtype)
+    return _numpy or None
+
+
+class TradeJournal:
+    """Appends fill records from a background thread.
+
+    `record` / `record_order` only pack the record and queue it, so the
+    trading loop never waits on the disk. The writer thread appends whatever
+    has queued up in one write and flushes after each batch.
+    """
+
+    def __init__(self, path, fee_rate=0.0, fsync=False):
+        self.path = path
+        self.fee_rate = fee_rate
+        self.fsync = fsync
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, RECORD.size, 0))
+            self._file.flush()
+        self._thread = threading.Thread(target=self._write_loop, name="trade-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, symbol, leg, side, quantity, price, fee=0.0, latency=0.0, order_id=0, timestamp=None):
+        self._queue.put(RECORD.pack(
+            time.time() if timestamp is None else timestamp,
+            symbol.encode('ascii'),
+            leg,
+            SIDE_BUY if side == "BUY" else SIDE_SELL,
+            quantity,
+            price,
+            fee,
+            latency,
+            order_id
+        ))
+
+    def record_order(self, symbol, leg, side, response, latency=0.0):
+        """Journal the fill of one order response; returns False, journaling nothing, when it carries none.
+
+        The fee is estimated from `fee_rate` when the response has no commission.
+        """
+        fill = order_fill(response)
+        if fill is None:
+            return False
+        quantity, price = fill
+        if 'commission' in response:
+            fee = float(response['commission'])
+        else:
+            fee = quantity * price * self.fee_rate
+        self.record(symbol, leg, side, quantity, price, fee, latency, int(response.get('orderId', 0)))
+        return True
+
+    def _write_loop(self):
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                closing = True
+            if batch:
+                self._file.write(b''.join(batch))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self.written += len(batch)
+
+    def close(self):
+        """Write everything still queued and close the file"""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+class JournalReader:
+    """Memory-mapped view of a journal written by TradeJournal.
+
+    A partly written last record (the process died mid-write) is ignored.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path} is not a trade journal")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, record_size, _ = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a trade journal (or was written by an incompatible version)")
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def _body(self):
+        return memoryview(self._mmap)[HEADER.size:HEADER.size + self.count * RECORD.size]
+
+    def __iter__(self):
+        for fields in RECORD.iter_unpack(self._body()):
+            yield JournalRecord(fields[0], fields[1].rstrip(b'\0').decode('ascii'), *fields[2:])
+
+    def array(self):
+        """The records as a numpy structured array backed by the mapping (numpy required)"""
+        numpy = _load_numpy()
+        if numpy is None:
+            raise ValueError("numpy is not installed")
+        np, dtype = numpy
+        return np.frombuffer(self._mmap, dtype=dtype, count=self.count, offset=HEADER.size)
+
+    def report(self, use_numpy=True):
+        """Per-symbol fills, volume, fees, cash-flow PnL, net quantity and leg latency percentiles.
+
+        PnL is sell proceeds minus buy cost minus fees, which is the realized
+        PnL once every cycle is closed; `net_quantity` shows what is still open.
+        Summed with numpy when it is installed and `use_numpy` is set, else
+        in pure Python.
+        """
+        if use_numpy and _load_numpy() is not None:
+            return self._report_numpy()
+        return self._report_python()
+
+    def _report_numpy(self):
+        np, _ = _load_numpy()
+        records = self.array()
+        symbols, index = np.unique(records['symbol'], return_inverse=True)
+        notional = records['quantity'] * records['price']
+        sign = np.where(records['side'] == SIDE_SELL, 1.0, -1.0)
+        groups = len(symbols)
+        fills = np.bincount(index, minlength=groups)
+        volume = np.bincount(index, weights=notional, minlength=groups)
+        fees = np.bincount(index, weights=records['fee'], minlength=groups)
+        cash = np.bincount(index, weights=sign * notional, minlength=groups)
+        net = np.bincount(index, weights=-sign * records['quantity'], minlength=groups)
+        latency = records['latency']
+        report = {}
+        for i, symbol in enumerate(symbols):
+            p50, p99 = np.percentile(latency[index == i], (50, 99))
+            report[symbol.decode('ascii')] = {
+                'fills': int(fills[i]),
+                'volume_usdt': float(volume[i]),
+                'fees': float(fees[i]),
+                'pnl': float(cash[i] - fees[i]),
+                'net_quantity': float(net[i]),
+                'latency_p50_ms': float(p50 * 1000),
+                'latency_p99_ms': float(p99 * 1000),
+            }
+        return report
+
+    def _report_python(self):
+        totals = {}
+        for record in self:
+            entry = totals.setdefault(record.symbol, {'fills': 0, 'volume_usdt': 0.0, 'fees': 0.0, 'pnl': 0.0,
+                                                      'net_quantity': 0.0, 'latencies': []})
+            notional = record.quantity * record.price
+            sign = 1.0 if record.side == SIDE_SELL else -1.0
+            entry['fills'] += 1
+            entry['volume_usdt'] += notional
+            entry['fees'] += record.fee
+            entry['pnl'] += sign * notional - record.fee
+            entry['net_quantity'] -= sign * record.quantity
+            entry['latencies'].append(record.latency)
+        for entry in totals.values():
+            latencies = sorted(entry.pop('latencies'))
+            entry['latency_p50_ms'] = latencies[int(round(0.50 * (len(latencies) - 1)))] * 1000
+            entry['latency_p99_ms'] = latencies[int(round(0.99 * (len(latencies) - 1)))] * 1000
+        return totals
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"usage: python {sys.argv[0]} <journal file>")
+        sys.exit(1)
+    with JournalReader(sys.argv[1]) as reader:
+        print(f"{len(reader)} fills")
+        for symbol, entry in sorted(reader.report().items()):
+            print(f"{symbol:<12} fills {entry['fills']:8d}  volume {entry['volume_usdt']:14.2f} USDT  "
+                  f"fees {entry['fees']:10.4f}  pnl {entry['pnl']:12.4f}  open {entry['net_quantity']:g}  "
+                  f"latency p50 {entry['latency_p50_ms']:.1f} / p99 {entry['latency_p99_ms']:.1f} ms")
@@ -0,0 +1,144 @@
+from datetime import datetime
+
+
+class TradingStatus:
+    """Account panels, trading stats and jobs of a run, as the status sinks show them.
+
+    TradingUI draws them with rich and HeadlessStatus logs them; both take
+    their updates (update_status, update_stats, the attach_* methods and the
+    account-state refresh in user data stream mode) through this class.
+    `touch` bumps the version of the panels an update changed, so a sink
+    redraws only those. The system status texts are class attributes, for
+    the translated UI to override.
+    """
+
+    INITIALIZING = 'Initializing'
+    RUNNING = 'Running'
+    ERROR = 'Error'
+
+    def __init__(self):
+        self.account1_status = {
+            'position_side': 'NONE',
+            'quantity': 0,
+            'entry_price': 0,
+            'unrealized_pnl': 0,
+            'system_status': self.INITIALIZING,
+            'initial_balance': 0,
+            'current_balance': 0,
+            'margin': 0,
+            'liquidation_price': 0
+        }
+        self.account2_status = self.account1_status.copy()
+        self.current_price = 0
+        self.running = True
+        self.stats = {
+            'trade_count': 0,
+            'current_funding_rate': 0,
+            'last_trade_time': None,
+            'symbol': '',
+            'leverage': 0,
+            'wait_seconds': 0,
+            'last_order_price': 0,
+            'total_volume': 0,
+            'total_volume_usdt': 0,
+            'initial_total_balance': 0,
+            'time_calls_saved': 0,
+            'leg_skew': {'send_p50_ms': 0, 'send_p99_ms': 0},
+            'market_data': None,
+            'order_book': None,
+            'ticker_cache': None,
+            'rate_limit': None
+        }
+        self.account_sources = {}
+        self.jobs = []
+        self.metrics = None
+        # Bumped by update_status / update_stats; a panel is redrawn when its version moved
+        self.versions = {'market': 0, 'accounts': 0}
+
+    def touch(self, *panels):
+        for panel in panels:
+            self.versions[panel] += 1
+
+    def update_status(self, account1_status, account2_status, current_price):
+        self.account1_status = account1_status
+        self.account2_status = account2_status
+        self.current_price = current_price
+        self.touch('market', 'accounts')
+
+    def update_stats(self, funding_rate=0, symbol='', leverage=0, wait_seconds=0, last_order_price=0, volume=0):
+        self.stats['trade_count'] += 1
+        self.stats['current_funding_rate'] = funding_rate
+        self.stats['last_trade_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.stats['symbol'] = symbol
+        self.stats['leverage'] = leverage
+        self.stats['wait_seconds'] = wait_seconds
+        self.stats['last_order_price'] = last_order_price
+        self.stats['total_volume'] += volume
+        self.stats['total_volume_usdt'] += volume * last_order_price
+        # Initial total assets are taken on the first trade
+        if self.stats['initial_total_balance'] == 0:
+            self.stats['initial_total_balance'] = (
+                self.account1_status['initial_balance'] +
+                self.account2_status['initial_balance']
+            )
+        self.touch('market')
+
+    def attach_jobs(self, jobs):
+        self.jobs = jobs
+
+    def attach_metrics(self, metrics):
+        self.metrics = metrics
+
+    def attach_account_state(self, account_num, state, symbol, api):
+        self.account_sources[account_num] = (state, symbol, api)
+
+    def refresh_account_states(self):
+        # Account panels read the stream-maintained state directly, no REST polling
+        for account_num, (state, symbol, api) in self.account_sources.items():
+            try:
+                self._set_account_state(account_num, state, symbol, api, api.get_current_price(symbol, max_age=1))
+            except Exception as e:
+                self._set_account_error(account_num, e)
+
+    async def refresh_account_states_async(self):
+        """refresh_account_states() for AsyncAsterDexAPI clients"""
+        for account_num, (state, symbol, api) in self.account_sources.items():
+            try:
+                self._set_account_state(account_num, state, symbol, api,
+                                        await api.get_current_price(symbol, max_age=1))
+            except Exception as e:
+                self._set_account_error(account_num, e)
+
+    def _set_account_state(self, account_num, state, symbol, api, current_price):
+        previous = self.account1_status if account_num == 1 else self.account2_status
+        status = state.status(symbol, current_price)
+        status['system_status'] = self.RUNNING
+        status['initial_balance'] = previous['initial_balance'] or status['current_balance']
+        self.current_price = current_price
+        self.refresh_client_stats(api)
+        self._set_account_status(account_num, status)
+
+    def _set_account_error(self, account_num, e):
+        status = dict(self.account1_status if account_num == 1 else self.account2_status)
+        status['system_status'] = f'{self.ERROR}: {str(e)}'
+        self._set_account_status(account_num, status)
+
+    def _set_account_status(self, account_num, status):
+        if account_num == 1:
+            self.account1_status = status
+        else:
+            self.account2_status = status
+        self.touch('market', 'accounts')
+
+    def refresh_client_stats(self, api):
+        """Rows read from what the clients share: clock, stream feeds, ticker cache and rate budget"""
+        self.stats['time_calls_saved'] = api.clock.saved_calls
+        if api.market_data is not None:
+            self.stats['market_data'] = api.market_data.stats()
+        if api.order_book is not None:
+            self.stats['order_book'] = api.order_book.stats()
+        self.stats['ticker_cache'] = api.ticker_cache.stats()
+        self.stats['rate_limit'] = api.scheduler.stats()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,278 @@
+import time
+import asyncio
+from datetime import datetime
+
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+from rich.panel import Panel
+from rich.layout import Layout
+from rich.text import Text
+
+from trading_status import TradingStatus
+
+
+class TradingUI(TradingStatus):
+    """用 rich 绘制的终端界面；只在显示界面时导入，无界面模式不会加载 rich"""
+
+    INITIALIZING = '初始化中'
+    RUNNING = '运行中'
+    ERROR = '错误'
+
+    def __init__(self, refresh_per_second=1):
+        super().__init__()
+        self.console = Console()
+        self.layout = Layout()
+        self.refresh_per_second = refresh_per_second
+        self._drawn = {}
+        self._cells = {}
+        self._metrics_drawn_at = 0
+        self._built = False
+
+    def _build_layout(self):
+        # 创建标题面板
+        title_panel = Panel(
+            Text("AsterDex 对冲交易系统", justify="center", style="bold white"),
+            style="blue"
+        )
+
+        author_panel = Panel(
+            Text("免费开源，推特：@ddazmon", justify="center", style="bold white"),
+            style="blue"
+        )
+
+        # 组合所有面板；市场、账号、任务和延迟面板由 refresh_layout 填充
+        self.layout.split(
+            Layout(name="header", size=6),
+            Layout(name="main"),
+            Layout(name="jobs", size=6),
+            Layout(name="metrics", size=4, visible=False),
+        )
+
+        self.layout["header"].split(
+            Layout(title_panel, ratio=1),
+            Layout(author_panel, ratio=1)
+        )
+        self.layout["main"].split_row(
+            Layout(name="market", ratio=1),
+            Layout(name="accounts", ratio=2)
+        )
+        self._built = True
+
+    def _fill_table(self, name, rows, new_table, title, border_style):
+        """把 `rows` 写入表格 `name` 的单元格，有单元格变化时返回 True。
+
+        只有行数变化时才重建表格和面板，否则直接修改已有的 Text 单元格。
+        """
+        cells = self._cells.get(name)
+        if cells is None or len(cells) != len(rows):
+            table = new_table()
+            cells = []
+            for row in rows:
+                texts = [Text(value) for value in row]
+                table.add_row(*texts)
+                cells.append(texts)
+            self._cells[name] = cells
+            self.layout[name].update(Panel(table, title=title, border_style=border_style))
+            return True
+        changed = False
+        for texts, row in zip(cells, rows):
+            for text, value in zip(texts, row):
+                if text.plain != value:
+                    text.plain = value
+                    changed = True
+        return changed
+
+    def _new_market_table(self):
+        market_table = Table.grid(padding=1)
+        market_table.add_column("项目", style="cyan")
+        market_table.add_column("数值", style="green")
+        return market_table
+
+    def _market_rows(self):
+        total_pnl = (self.account1_status['current_balance'] - self.account1_status['initial_balance'] +
+                    self.account2_status['current_balance'] - self.account2_status['initial_balance'])
+
+        rows = [
+            ("交易对", self.stats['symbol']),
+            ("当前价格", f"{self.current_price} USDT"),
+            ("当前杠杆", f"{self.stats['leverage']}x"),
+            ("当前资金费率", f"{self.stats['current_funding_rate']*100:.4f}%"),
+            ("持仓时间", f"{self.stats['wait_seconds']}秒"),
+            ("交易次数", str(self.stats['trade_count'])),
+            ("总交易量", f"{self.stats['total_volume_usdt']:.2f} USDT"),
+            ("账号1余额", f"{self.account1_status['current_balance']:.4f} USDT"),
+            ("账号2余额", f"{self.account2_status['current_balance']:.4f} USDT"),
+            ("初始总资产", f"{self.stats['initial_total_balance']:.4f} USDT"),
+            ("总盈亏", f"{total_pnl:.4f} USDT"),
+            ("上次交易时间", self.stats['last_trade_time'] or '无'),
+            ("节省时间请求", str(self.stats['time_calls_saved'])),
+            ("对冲腿时差 p50/p99", f"{self.stats['leg_skew']['send_p50_ms']:.2f} / {self.stats['leg_skew']['send_p99_ms']:.2f} ms")
+        ]
+        if self.stats['market_data'] is not None:
+            feed = self.stats['market_data']
+            feed_age = f"{feed['max_age']:.1f}s" if feed['max_age'] is not None else '-'
+            rows.append(("行情推送", f"{'已连接' if feed['connected'] else '未连接'} {feed_age}, REST回退 {feed['rest_fallbacks']}"))
+        if self.stats['order_book'] is not None:
+            book = self.stats['order_book']
+            book_age = f"{book['max_age']:.1f}s" if book['max_age'] is not None else '-'
+            rows.append(("订单簿", f"{'已连接' if book['connected'] else '未连接'} {book_age}, 重新同步 {book['resyncs']}"))
+        if self.stats['ticker_cache'] is not None:
+            ticker = self.stats['ticker_cache']
+            rows.append(("价格缓存 命中/未命中/合并", f"{ticker['hits']} / {ticker['misses']} / {ticker['coalesced']}"))
+        if self.stats['rate_limit'] is not None:
+            budget = self.stats['rate_limit']
+            rows.append(("请求额度", f"权重 {budget['weight_used']}/{budget['weight_limit']}, 10秒下单 {budget['orders_10s']}/{budget['orders_10s_limit']}, 限流 {budget['throttled']}"))
+        rows.append(("当前时间", datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return rows
+
+    def _new_account_table(self):
+        account_table = Table(show_header=True, padding=1)
+        account_table.add_column("账号", style="cyan", justify="left", width=8)
+        account_table.add_column("持仓方向", style="yellow", justify="center", width=10)
+        account_table.add_column("持仓数量", style="yellow", justify="right", width=12)
+        account_table.add_column("开仓价格", style="yellow", justify="right", width=12)
+        account_table.add_column("未实现盈亏", style="yellow", justify="right", width=20)
+        account_table.add_column("保证金", style="yellow", justify="right", width=20)
+        account_table.add_column("清算价格", style="yellow", justify="right", width=20)
+        return account_table
+
+    def _account_rows(self):
+        return [
+            (
+                label,
+                status['position_side'],
+                f"{status['quantity']:>12.3f}",
+                f"{status['entry_price']:>12.2f}",
+                f"{status['unrealized_pnl']:>20.8f} USDT",
+                f"{status['margin']:>20.8f} USDT",
+                f"{status['liquidation_price']:>20.8f} USDT"
+            )
+            for label, status in (("账号1", self.account1_status), ("账号2", self.account2_status))
+        ]
+
+    def _new_jobs_table(self):
+        jobs_table = Table(show_header=True, padding=(0, 1))
+        jobs_table.add_column("任务", style="cyan")
+        jobs_table.add_column("交易对", style="cyan")
+        jobs_table.add_column("账号", style="cyan")
+        jobs_table.add_column("阶段", style="yellow", justify="center")
+        jobs_table.add_column("交易次数", style="yellow", justify="right")
+        jobs_table.add_column("交易量", style="yellow", justify="right")
+        jobs_table.add_column("每分钟轮次", style="yellow", justify="right")
+        jobs_table.add_column("最后交易", style="yellow", justify="right")
+        return jobs_table
+
+    def _job_rows(self):
+        return [
+            (
+                job.name,
+                job.symbol,
+                f"{job.spec['account1']} / {job.spec['account2']}",
+                job.stats['phase'],
+                str(job.stats['trade_count']),
+                f"{job.stats['total_volume_usdt']:.2f} USDT",
+                f"{job.cycles_per_minute():.2f}",
+                job.stats['last_trade_time'] or '无'
+            )
+            for job in self.jobs
+        ]
+
+    def _new_latency_table(self):
+        latency_table = Table(show_header=True, padding=(0, 1))
+        latency_table.add_column("项目", style="cyan")
+        latency_table.add_column("次数", style="yellow", justify="right")
+        latency_table.add_column("p50", style="yellow", justify="right")
+        latency_table.add_column("p90", style="yellow", justify="right")
+        latency_table.add_column("p99", style="yellow", justify="right")
+        latency_table.add_column("错误", style="red", justify="right")
+        return latency_table
+
+    def latency_rows(self):
+        if self.metrics is None:
+            return []
+        # 请求最多的接口，然后是交易轮次阶段和请求环节
+        errors = self.metrics.counter_total('request_errors_total', 'endpoint')
+        rows = [(row['endpoint'], row, errors.get(row['endpoint'], 0))
+                for row in self.metrics.summaries('request_seconds', 'endpoint')[:5]]
+        rows += [(f"轮次 {row['phase']}", row, None) for row in self.metrics.summaries('cycle_phase_seconds', 'phase')]
+        rows += [(f"延迟 {row['step']}", row, None) for row in self.metrics.summaries('cycle_lateness_seconds', 'step')]
+        rows += [(f"请求 {row['stage']}", row, None) for row in self.metrics.summaries('request_stage_seconds', 'stage')]
+        return [
+            (label, str(row['count']), f"{row['p50_ms']:.1f}", f"{row['p90_ms']:.1f}", f"{row['p99_ms']:.1f}",
+             '-' if errors is None else str(errors))
+            for label, row, errors in rows
+        ]
+
+    def _due(self, panel, version):
+        if self._drawn.get(panel) == version:
+            return False
+        self._drawn[panel] = version
+        return True
+
+    def refresh_layout(self):
+        """更新界面布局，屏幕内容有变化时返回 True。
+
+        面板只在版本号变化后重绘：`market` 和 `accounts` 通过 touch() 递增，
+        延迟面板跟随指标注册表的版本（最多每秒一次），任务表每次都检查，
+        因为各任务在自己的线程中更新统计。
+        """
+        render_start = time.perf_counter()
+        changed = False
+        if not self._built:
+            self._build_layout()
+            changed = True
+
+        if self._due('market', self.versions['market']):
+            # 更新市场信息表格；当前时间一行在下面单独更新
+            changed |= self._fill_table("market", self._market_rows(), self._new_market_table,
+                                        "市场信息", "green")
+        now = self._cells["market"][-1][1]
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if now.plain != current_time:
+            now.plain = current_time
+            changed = True
+
+        if self._due('accounts', self.versions['accounts']):
+            # 更新账号状态表格
+            changed |= self._fill_table("accounts", self._account_rows(), self._new_account_table,
+                                        "账号状态", "yellow")
+
+        # 更新对冲任务表
+        self.layout["jobs"].size = len(self.jobs) + 6
+        changed |= self._fill_table("jobs", self._job_rows(), self._new_jobs_table, "对冲任务", "magenta")
+
+        if (self.metrics is not None and time.monotonic() - self._metrics_drawn_at >= 1
+                and self._due('metrics', self.metrics.version)):
+            # 更新延迟表
+            self._metrics_drawn_at = time.monotonic()
+            latency_rows = self.latency_rows()
+            self.layout["metrics"].size = len(latency_rows) + 4
+            self.layout["metrics"].visible = bool(latency_rows)
+            changed |= self._fill_table("metrics", latency_rows, self._new_latency_table, "延迟（毫秒）", "blue")
+
+        if self.metrics is not None:
+            # 记录界面刷新本身的耗时
+            self.metrics.observe('ui_render_seconds', time.perf_counter() - render_start)
+        return changed
+
+    def generate_layout(self):
+        self.refresh_layout()
+        return self.layout
+
+    def show(self):
+        # 只在界面内容变化时重绘，不再叠加 Live 的自动刷新
+        with Live(self.generate_layout(), auto_refresh=False) as live:
+            while self.running:
+                self.refresh_account_states()
+                if self.refresh_layout():
+                    live.refresh()
+                time.sleep(1 / self.refresh_per_second)
+
+    async def show_async(self):
+        with Live(self.generate_layout(), auto_refresh=False) as live:
+            while self.running:
+                await self.refresh_account_states_async()
+                if self.refresh_layout():
+                    live.refresh()
+                await asyncio.sleep(1 / self.refresh_per_second)
@@ -0,0 +1,276 @@
+import time
+import asyncio
+from datetime import datetime
+
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+from rich.panel import Panel
+from rich.layout import Layout
+from rich.text import Text
+
+from trading_status import TradingStatus
+
+
+class TradingUI(TradingStatus):
+    """Terminal panels drawn with rich; imported only when the UI is shown, so headless runs never load rich"""
+
+    def __init__(self, refresh_per_second=1):
+        super().__init__()
+        self.console = Console()
+        self.layout = Layout()
+        self.refresh_per_second = refresh_per_second
+        self._drawn = {}
+        self._cells = {}
+        self._metrics_drawn_at = 0
+        self._built = False
+
+    def _build_layout(self):
+        # Create title panel
+        title_panel = Panel(
+            Text("AsterDex Hedge Trading System", justify="center", style="bold white"),
+            style="blue"
+        )
+
+        author_panel = Panel(
+            Text("Free and Open Source, Twitter: @ddazmon", justify="center", style="bold white"),
+            style="blue"
+        )
+
+        # Combine all panels; the market, account, jobs and latency panels are filled in by refresh_layout
+        self.layout.split(
+            Layout(name="header", size=6),
+            Layout(name="main"),
+            Layout(name="jobs", size=6),
+            Layout(name="metrics", size=4, visible=False),
+        )
+
+        self.layout["header"].split(
+            Layout(title_panel, ratio=1),
+            Layout(author_panel, ratio=1)
+        )
+        self.layout["main"].split_row(
+            Layout(name="market", ratio=1),
+            Layout(name="accounts", ratio=2)
+        )
+        self._built = True
+
+    def _fill_table(self, name, rows, new_table, title, border_style):
+        """Write `rows` into the cells of table `name`, True if any cell changed.
+
+        The table and its panel are only rebuilt when the number of rows
+        changes; otherwise the existing Text cells are updated in place.
+        """
+        cells = self._cells.get(name)
+        if cells is None or len(cells) != len(rows):
+            table = new_table()
+            cells = []
+            for row in rows:
+                texts = [Text(value) for value in row]
+                table.add_row(*texts)
+                cells.append(texts)
+            self._cells[name] = cells
+            self.layout[name].update(Panel(table, title=title, border_style=border_style))
+            return True
+        changed = False
+        for texts, row in zip(cells, rows):
+            for text, value in zip(texts, row):
+                if text.plain != value:
+                    text.plain = value
+                    changed = True
+        return changed
+
+    def _new_market_table(self):
+        market_table = Table.grid(padding=1)
+        market_table.add_column("Item", style="cyan")
+        market_table.add_column("Value", style="green")
+        return market_table
+
+    def _market_rows(self):
+        total_pnl = (self.account1_status['current_balance'] - self.account1_status['initial_balance'] +
+                    self.account2_status['current_balance'] - self.account2_status['initial_balance'])
+
+        rows = [
+            ("Trading Pair", self.stats['symbol']),
+            ("Current Price", f"{self.current_price} USDT"),
+            ("Current Leverage", f"{self.stats['leverage']}x"),
+            ("Current Funding Rate", f"{self.stats['current_funding_rate']*100:.4f}%"),
+            ("Holding Time", f"{self.stats['wait_seconds']} seconds"),
+            ("Trade Count", str(self.stats['trade_count'])),
+            ("Total Trading Volume", f"{self.stats['total_volume_usdt']:.2f} USDT"),
+            ("Account 1 Balance", f"{self.account1_status['current_balance']:.4f} USDT"),
+            ("Account 2 Balance", f"{self.account2_status['current_balance']:.4f} USDT"),
+            ("Initial Total Assets", f"{self.stats['initial_total_balance']:.4f} USDT"),
+            ("Total Profit/Loss", f"{total_pnl:.4f} USDT"),
+            ("Last Trade Time", self.stats['last_trade_time'] or 'None'),
+            ("Time Calls Saved", str(self.stats['time_calls_saved'])),
+            ("Leg Skew p50/p99", f"{self.stats['leg_skew']['send_p50_ms']:.2f} / {self.stats['leg_skew']['send_p99_ms']:.2f} ms")
+        ]
+        if self.stats['market_data'] is not None:
+            feed = self.stats['market_data']
+            feed_age = f"{feed['max_age']:.1f}s" if feed['max_age'] is not None else '-'
+            rows.append(("Market Stream", f"{'connected' if feed['connected'] else 'disconnected'} {feed_age}, REST fallbacks {feed['rest_fallbacks']}"))
+        if self.stats['order_book'] is not None:
+            book = self.stats['order_book']
+            book_age = f"{book['max_age']:.1f}s" if book['max_age'] is not None else '-'
+            rows.append(("Order Book", f"{'connected' if book['connected'] else 'disconnected'} {book_age}, resyncs {book['resyncs']}"))
+        if self.stats['ticker_cache'] is not None:
+            ticker = self.stats['ticker_cache']
+            rows.append(("Ticker Cache hit/miss/shared", f"{ticker['hits']} / {ticker['misses']} / {ticker['coalesced']}"))
+        if self.stats['rate_limit'] is not None:
+            budget = self.stats['rate_limit']
+            rows.append(("Rate Budget", f"weight {budget['weight_used']}/{budget['weight_limit']}, orders/10s {budget['orders_10s']}/{budget['orders_10s_limit']}, throttled {budget['throttled']}"))
+        rows.append(("Current Time", datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return rows
+
+    def _new_account_table(self):
+        account_table = Table(show_header=True, padding=1)
+        account_table.add_column("Account", style="cyan", justify="left", width=8)
+        account_table.add_column("Position Side", style="yellow", justify="center", width=10)
+        account_table.add_column("Position Quantity", style="yellow", justify="right", width=12)
+        account_table.add_column("Entry Price", style="yellow", justify="right", width=12)
+        account_table.add_column("Unrealized P/L", style="yellow", justify="right", width=20)
+        account_table.add_column("Margin", style="yellow", justify="right", width=20)
+        account_table.add_column("Liquidation Price", style="yellow", justify="right", width=20)
+        return account_table
+
+    def _account_rows(self):
+        return [
+            (
+                label,
+                status['position_side'],
+                f"{status['quantity']:>12.3f}",
+                f"{status['entry_price']:>12.2f}",
+                f"{status['unrealized_pnl']:>20.8f} USDT",
+                f"{status['margin']:>20.8f} USDT",
+                f"{status['liquidation_price']:>20.8f} USDT"
+            )
+            for label, status in (("Account 1", self.account1_status), ("Account 2", self.account2_status))
+        ]
+
+    def _new_jobs_table(self):
+        jobs_table = Table(show_header=True, padding=(0, 1))
+        jobs_table.add_column("Job", style="cyan")
+        jobs_table.add_column("Trading Pair", style="cyan")
+        jobs_table.add_column("Accounts", style="cyan")
+        jobs_table.add_column("Phase", style="yellow", justify="center")
+        jobs_table.add_column("Trades", style="yellow", justify="right")
+        jobs_table.add_column("Volume", style="yellow", justify="right")
+        jobs_table.add_column("Cycles/min", style="yellow", justify="right")
+        jobs_table.add_column("Last Trade", style="yellow", justify="right")
+        return jobs_table
+
+    def _job_rows(self):
+        return [
+            (
+                job.name,
+                job.symbol,
+                f"{job.spec['account1']} / {job.spec['account2']}",
+                job.stats['phase'],
+                str(job.stats['trade_count']),
+                f"{job.stats['total_volume_usdt']:.2f} USDT",
+                f"{job.cycles_per_minute():.2f}",
+                job.stats['last_trade_time'] or 'None'
+            )
+            for job in self.jobs
+        ]
+
+    def _new_latency_table(self):
+        latency_table = Table(show_header=True, padding=(0, 1))
+        latency_table.add_column("Item", style="cyan")
+        latency_table.add_column("Count", style="yellow", justify="right")
+        latency_table.add_column("p50", style="yellow", justify="right")
+        latency_table.add_column("p90", style="yellow", justify="right")
+        latency_table.add_column("p99", style="yellow", justify="right")
+        latency_table.add_column("Errors", style="red", justify="right")
+        return latency_table
+
+    def latency_rows(self):
+        if self.metrics is None:
+            return []
+        # Busiest endpoints, then cycle phases and request stages
+        errors = self.metrics.counter_total('request_errors_total', 'endpoint')
+        rows = [(row['endpoint'], row, errors.get(row['endpoint'], 0))
+                for row in self.metrics.summaries('request_seconds', 'endpoint')[:5]]
+        rows += [(f"cycle {row['phase']}", row, None) for row in self.metrics.summaries('cycle_phase_seconds', 'phase')]
+        rows += [(f"late {row['step']}", row, None) for row in self.metrics.summaries('cycle_lateness_seconds', 'step')]
+        rows += [(f"stage {row['stage']}", row, None) for row in self.metrics.summaries('request_stage_seconds', 'stage')]
+        return [
+            (label, str(row['count']), f"{row['p50_ms']:.1f}", f"{row['p90_ms']:.1f}", f"{row['p99_ms']:.1f}",
+             '-' if errors is None else str(errors))
+            for label, row, errors in rows
+        ]
+
+    def _due(self, panel, version):
+        if self._drawn.get(panel) == version:
+            return False
+        self._drawn[panel] = version
+        return True
+
+    def refresh_layout(self):
+        """Bring the layout up to date, True if anything on screen changed.
+
+        Panels are redrawn only when their version moved since the last
+        refresh: `market` and `accounts` through touch(), the latency panel
+        through the registry version (at most once a second), the jobs table
+        every time since the jobs update their stats on their own threads.
+        """
+        render_start = time.perf_counter()
+        changed = False
+        if not self._built:
+            self._build_layout()
+            changed = True
+
+        if self._due('market', self.versions['market']):
+            # Update market information table; the current time row is kept up to date below
+            changed |= self._fill_table("market", self._market_rows(), self._new_market_table,
+                                        "Market Information", "green")
+        now = self._cells["market"][-1][1]
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if now.plain != current_time:
+            now.plain = current_time
+            changed = True
+
+        if self._due('accounts', self.versions['accounts']):
+            # Update account status table
+            changed |= self._fill_table("accounts", self._account_rows(), self._new_account_table,
+                                        "Account Status", "yellow")
+
+        # Update hedge jobs table
+        self.layout["jobs"].size = len(self.jobs) + 6
+        changed |= self._fill_table("jobs", self._job_rows(), self._new_jobs_table, "Hedge Jobs", "magenta")
+
+        if (self.metrics is not None and time.monotonic() - self._metrics_drawn_at >= 1
+                and self._due('metrics', self.metrics.version)):
+            # Update latency table
+            self._metrics_drawn_at = time.monotonic()
+            latency_rows = self.latency_rows()
+            self.layout["metrics"].size = len(latency_rows) + 4
+            self.layout["metrics"].visible = bool(latency_rows)
+            changed |= self._fill_table("metrics", latency_rows, self._new_latency_table, "Latency (ms)", "blue")
+
+        if self.metrics is not None:
+            # Time spent refreshing the layout itself
+            self.metrics.observe('ui_render_seconds', time.perf_counter() - render_start)
+        return changed
+
+    def generate_layout(self):
+        self.refresh_layout()
+        return self.layout
+
+    def show(self):
+        # Redraw only when something changed, without Live's own auto refresh on top
+        with Live(self.generate_layout(), auto_refresh=False) as live:
+            while self.running:
+                self.refresh_account_states()
+                if self.refresh_layout():
+                    live.refresh()
+                time.sleep(1 / self.refresh_per_second)
+
+    async def show_async(self):
+        with Live(self.generate_layout(), auto_refresh=False) as live:
+            while self.running:
+                await self.refresh_account_states_async()
+                if self.refresh_layout():
+                    live.refresh()
+                await asyncio.sleep(1 / self.refresh_per_second)
@@ -0,0 +1,238 @@
+import json
+import time
+import threading
+
+import websocket
+
+
+class AccountState:
+    """Local balances, positions and open orders of one account.
+
+    Built from a REST snapshot and then kept current by ACCOUNT_UPDATE and
+    ORDER_TRADE_UPDATE events. Every entry remembers the exchange time it was
+    last updated at, so an older snapshot never overwrites a newer event.
+    """
+
+    def __init__(self):
+        self.balances = {}
+        self.positions = {}
+        self.orders = {}
+        self.version = 0
+        self.last_event_time = 0
+        self._lock = threading.Lock()
+
+    def apply_snapshot(self, account_info, position_info):
+        with self._lock:
+            for asset in account_info.get('assets', []):
+                current = self.balances.get(asset['asset'])
+                updated = int(asset.get('updateTime', 0))
+                if current is not None and current['updated'] > updated:
+                    continue
+                self.balances[asset['asset']] = {
+                    'wallet_balance': float(asset['walletBalance']),
+                    'cross_wallet': float(asset.get('crossWalletBalance', asset['walletBalance'])),
+                    'updated': updated
+                }
+            for position in position_info:
+                key = (position['symbol'], position.get('positionSide', 'BOTH'))
+                current = self.positions.get(key)
+                updated = int(position.get('updateTime', 0))
+                if current is not None and current['updated'] > updated:
+                    # Keep the streamed amount, the snapshot only adds the liquidation price
+                    current['liquidation_price'] = float(position['liquidationPrice'])
+                    continue
+                self.positions[key] = {
+                    'amount': float(position['positionAmt']),
+                    'entry_price': float(position['entryPrice']),
+                    'unrealized_pnl': float(position.get('unRealizedProfit', 0)),
+                    'liquidation_price': float(position['liquidationPrice']),
+                    'margin_type': position.get('marginType', ''),
+                    'updated': updated
+                }
+            self.version += 1
+
+    def apply_event(self, event):
+        event_type = event.get('e')
+        if event_type == 'ACCOUNT_UPDATE':
+            self._apply_account_update(event)
+        elif event_type == 'ORDER_TRADE_UPDATE':
+            self._apply_order_update(event)
+
+    def _apply_account_update(self, event):
+        updated = event.get('E', 0)
+        data = event.get('a', {})
+        with self._lock:
+            for balance in data.get('B', []):
+                self.balances[balance['a']] = {
+                    'wallet_balance': float(balance['wb']),
+                    'cross_wallet': float(balance['cw']),
+                    'updated': updated
+                }
+            for position in data.get('P', []):
+                key = (position['s'], position.get('ps', 'BOTH'))
+                previous = self.positions.get(key, {})
+                self.positions[key] = {
+                    'amount': float(position['pa']),
+                    'entry_price': float(position['ep']),
+                    'unrealized_pnl': float(position['up']),
+                    'liquidation_price': previous.get('liquidation_price', 0.0),
+                    'margin_type': position.get('mt', ''),
+                    'updated': updated
+                }
+            self.last_event_time = max(self.last_event_time, updated)
+            self.version += 1
+
+    def _apply_order_update(self, event):
+        order = event.get('o', {})
+        with self._lock:
+            if order.get('X') in ('NEW', 'PARTIALLY_FILLED'):
+                self.orders[order['i']] = {
+                    'symbol': order['s'],
+                    'side': order['S'],
+                    'type': order['o'],
+                    'quantity': float(order['q']),
+                    'filled': float(order['z']),
+                    'status': order['X']
+                }
+            else:
+                self.orders.pop(order.get('i'), None)
+            self.last_event_time = max(self.last_event_time, event.get('E', 0))
+            self.version += 1
+
+    def position(self, symbol, position_side='BOTH'):
+        with self._lock:
+            return dict(self.positions.get((symbol, position_side), {
+                'amount': 0.0, 'entry_price': 0.0, 'unrealized_pnl': 0.0, 'liquidation_price': 0.0
+            }))
+
+    def status(self, symbol, mark_price=None, asset='USDT'):
+        """Account status in the shape TradingUI displays"""
+        position = self.position(symbol)
+        with self._lock:
+            balance = self.balances.get(asset, {}).get('wallet_balance', 0.0)
+        unrealized_pnl = position['unrealized_pnl']
+        if mark_price:
+            unrealized_pnl = (mark_price - position['entry_price']) * position['amount']
+        return {
+            'position_side': 'LONG' if position['amount'] > 0 else 'SHORT',
+            'quantity': abs(position['amount']),
+            'entry_price': position['entry_price'],
+            'unrealized_pnl': unrealized_pnl,
+            'current_balance': balance,
+            'margin': balance + unrealized_pnl,
+            'liquidation_price': position['liquidation_price']
+        }
+
+
+class UserDataStream:
+    """Keeps an AccountState current from the account's user data stream.
+
+    Handles the listenKey lifecycle (create, keepalive, close, renew on
+    listenKeyExpired), reconnects with backoff and reconciles against REST on
+    start and every `reconcile_interval` seconds.
+    """
+
+    def __init__(self, api, symbols, state=None, ws_url="wss://fstream.asterdex.com",
+                 keepalive_interval=1800, reconcile_interval=60, reconnect_delay=1, max_reconnect_delay=30):
+        self.api = api
+        self.symbols = list(symbols)
+        self.state = state or AccountState()
+        self.ws_url = ws_url.rstrip('/')
+        self.keepalive_interval = keepalive_interval
+        self.reconcile_interval = reconcile_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.listen_key = None
+        self.connected = False
+        self.events = 0
+        self.reconnects = 0
+        self.reconciles = 0
+        self._ws = None
+        self._running = False
+        self._stopped = threading.Event()
+
+    def reconcile(self):
+        account_info = self.api.get_account_info()
+        positions = []
+        for symbol in self.symbols:
+            positions.extend(self.api.get_position_info(symbol))
+        self.state.apply_snapshot(account_info, positions)
+        self.reconciles += 1
+
+    def _on_open(self, ws):
+        self.connected = True
+
+    def _on_message(self, ws, message):
+        event = json.loads(message)
+        self.events += 1
+        if event.get('e') == 'listenKeyExpired':
+            # Drop the key so the reconnect below creates a fresh one
+            self.listen_key = None
+            ws.close()
+            return
+        self.state.apply_event(event)
+
+    def _on_close(self, ws, status_code, message):
+        self.connected = False
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while self._running:
+            events_before = self.events
+            try:
+                if self.listen_key is None:
+                    self.listen_key = self.api.start_user_stream()['listenKey']
+                    # Events may have been missed while there was no valid key
+                    self.reconcile()
+                self._ws = websocket.WebSocketApp(
+                    f"{self.ws_url}/ws/{self.listen_key}",
+                    on_open=self._on_open,
+                    on_message=self._on_message,
+                    on_close=self._on_close
+                )
+                self._ws.run_forever(ping_interval=60, ping_timeout=10)
+            except Exception:
+                pass
+            self.connected = False
+            if not self._running:
+                break
+            if self.events > events_before:
+                delay = self.reconnect_delay
+            self.reconnects += 1
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _maintain(self):
+        last_keepalive = last_reconcile = time.monotonic()
+        while not self._stopped.wait(1):
+            now = time.monotonic()
+            try:
+                if self.listen_key is not None and now - last_keepalive >= self.keepalive_interval:
+                    last_keepalive = now
+                    self.api.keepalive_user_stream()
+                if now - last_reconcile >= self.reconcile_interval:
+                    last_reconcile = now
+                    self.reconcile()
+            except Exception:
+                # The next tick or the reconnect loop will try again
+                pass
+
+    def start(self):
+        """Take the first REST snapshot, then follow the stream in the background"""
+        self.reconcile()
+        self.listen_key = self.api.start_user_stream()['listenKey']
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        threading.Thread(target=self._maintain, daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        self._stopped.set()
+        if self._ws is not None:
+            self._ws.close()
+        if self.listen_key is not None:
+            try:
+                self.api.close_user_stream()
+            except Exception:
+                pass
+            self.listen_key = None